@@ -0,0 +1,79 @@
+"""
+Benchmark de memória das exportações em streaming.
+
+Gera históricos sintéticos de tamanhos crescentes e mede, em um subprocesso
+isolado, o tempo e o pico de memória (RSS) de cada exportação. Com os
+exportadores em streaming, o pico de RSS deve ficar estável enquanto a
+quantidade de registros cresce.
+
+Uso:
+    python -m benchmarks.bench_export --rows 10000 100000 1000000 --format csv.gz
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.synthetic import generate
+from src.storage import BACKENDS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado no subprocesso: exporta e reporta tempo e pico de RSS (em KiB)
+CHILD = """
+import resource, sys, time
+from src.exporters import export
+from src.storage import open_storage
+
+backend, db_path, fmt, out_path = sys.argv[1:5]
+storage = open_storage(backend, db_path)
+start = time.perf_counter()
+count = export(storage, fmt, out_path)
+elapsed = time.perf_counter() - start
+print(count, elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def measure_export(
+    backend: str, db_path: str, fmt: str, out_path: str
+) -> tuple[int, float, int]:
+    """
+    Exporta em um subprocesso isolado e retorna (registros, tempo em s,
+    pico de RSS em KiB).
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD, backend, db_path, fmt, out_path],
+        env={**os.environ, "PYTHONPATH": ROOT},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    count, elapsed, max_rss_kib = result.stdout.split()
+    return int(count), float(elapsed), int(max_rss_kib)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--format", default="csv")
+    args = parser.parse_args()
+
+    print(f"{'registros':>12} {'tempo (s)':>10} {'pico RSS (MiB)':>15}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, f"prices.{args.backend}")
+            generate(args.backend, db_path, rows)
+            out_path = os.path.join(tmp, f"out.{args.format}")
+            count, elapsed, max_rss_kib = measure_export(
+                args.backend, db_path, args.format, out_path
+            )
+            print(f"{count:>12} {elapsed:>10.2f} {max_rss_kib / 1024:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark do processamento particionado (export e stats com --workers).
+
+Gera um histórico sintético de vários anos (um tick a cada 5 minutos) e mede
+o tempo da exportação e das estatísticas sobre o histórico inteiro no caminho
+sequencial e particionado por mês com 1, 2, 4... processos, com o speed-up
+de cada um em relação ao sequencial. Em hosts com vários núcleos e
+históricos grandes, o ganho deve ser próximo de linear até o número de
+núcleos, limitado pela leitura do banco e, na exportação sem --partitioned,
+pela concatenação das partições.
+
+Uso:
+    python -m benchmarks.bench_parallel --rows 1000000 --workers 1 2 4 8 --format csv
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_suite import patched_config
+from benchmarks.synthetic import generate
+from src import cli, exporters, partitions
+from src.logger import logger
+from src.storage import BACKENDS, get_storage, set_storage
+
+PAIR = "BTC-USD"
+
+
+def best_of(func, repeat: int) -> float:
+    """Menor duração (em s) de 'repeat' execuções de 'func'."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+def bench(
+    backend: str, rows: int, workers: list[int], fmt: str, repeat: int, tmp: str
+) -> list[dict]:
+    """Mede export e stats sequenciais e particionados; retorna uma linha por medição."""
+    db_path = os.path.join(tmp, f"prices.{backend}")
+    generate(backend, db_path, rows)
+    out = os.path.join(tmp, f"out.{exporters.FORMATS[fmt][2]}")
+    with patched_config(DB_BACKEND=backend, DB_PATH=db_path, ARCHIVE_DIR=""):
+        set_storage(None)
+        storage = get_storage()
+        try:
+            tasks = {
+                "export": (
+                    lambda: exporters.export(storage, fmt, out, pair=PAIR),
+                    lambda n: partitions.export(fmt, out, pair=PAIR, workers=n),
+                ),
+                "stats": (
+                    lambda: cli.get_series(pair=PAIR).summary(),
+                    lambda n: partitions.statistics(pair=PAIR, workers=n),
+                ),
+            }
+            results = []
+            for task, (sequential, partitioned) in tasks.items():
+                baseline = best_of(sequential, repeat)
+                results.append(
+                    {
+                        "task": task,
+                        "workers": "seq",
+                        "seconds": baseline,
+                        "speedup": 1.0,
+                    }
+                )
+                for n in workers:
+                    seconds = best_of(lambda: partitioned(n), repeat)
+                    results.append(
+                        {
+                            "task": task,
+                            "workers": n,
+                            "seconds": seconds,
+                            "speedup": baseline / seconds,
+                        }
+                    )
+            return results
+        finally:
+            storage.close()
+            set_storage(None)
+
+
+def main(argv: list[str] | None = None) -> list[dict]:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--backend", choices=BACKENDS, default="sqlite")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--format", choices=list(exporters.FORMATS), default="csv")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            results = bench(
+                args.backend, args.rows, args.workers, args.format, args.repeat, tmp
+            )
+    finally:
+        logger.setLevel(level)
+
+    print(f"{args.rows} registros ({args.backend}, {os.cpu_count()} núcleos)")
+    print(f"{'tarefa':<8} {'processos':>9} {'tempo (s)':>10} {'speed-up':>9}")
+    for r in results:
+        print(
+            f"{r['task']:<8} {r['workers']:>9} {r['seconds']:>10.3f} "
+            f"{r['speedup']:>8.2f}x"
+        )
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
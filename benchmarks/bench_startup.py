@@ -0,0 +1,99 @@
+"""
+Benchmark do tempo de inicialização da CLI.
+
+Executa cada comando em um subprocesso com 'python -X importtime', mede o
+tempo total (mediana de várias execuções) e lista os módulos mais caros de
+importar. Com --forbid, falha se algum módulo pesado for importado por um
+comando que não precisa dele, o que ajuda a pegar regressões de startup.
+
+Uso:
+    python -m benchmarks.bench_startup --runs 5
+    python -m benchmarks.bench_startup --command "--help" --forbid requests numpy
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Comandos medidos por padrão (argumentos de 'python -m src.main')
+COMMANDS = ["--help", "history --help", "stats --help"]
+
+# Módulos que não devem ser carregados só para exibir a ajuda
+HEAVY_MODULES = ["requests", "urllib3", "numpy", "tinydb", "tabulate", "http.client"]
+
+
+def parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """
+    Converte a saída de '-X importtime' em {módulo: (próprio µs, cumulativo µs)}.
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(args: list[str], cwd: str | None = None) -> tuple[float, dict]:
+    """
+    Executa 'python -X importtime -m src.main <args>' e retorna o tempo total
+    (s) e os módulos importados.
+    """
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "src.main", *args],
+        cwd=cwd or ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    return elapsed, parse_importtime(result.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--command",
+        action="append",
+        default=None,
+        help="Argumentos de 'python -m src.main' (repetível). Padrão: ajudas.",
+    )
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8)
+    parser.add_argument(
+        "--forbid",
+        nargs="*",
+        default=None,
+        help=f"Falha se algum destes módulos for importado. Padrão: {HEAVY_MODULES}.",
+    )
+    args = parser.parse_args()
+    forbidden = HEAVY_MODULES if args.forbid is None else args.forbid
+
+    failed = False
+    for command in args.command or COMMANDS:
+        runs = [measure(command.split()) for _ in range(args.runs)]
+        wall = statistics.median(elapsed for elapsed, _ in runs)
+        modules = runs[-1][1]
+        print(f"\n$ python -m src.main {command}")
+        print(f"  tempo total (mediana de {args.runs}): {wall * 1000:.1f} ms")
+        print(f"  módulos importados: {len(modules)}")
+        ranked = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (_, cumulative) in ranked[: args.top]:
+            print(f"  {cumulative / 1000:>8.1f} ms  {name}")
+        loaded = [name for name in forbidden if name in modules]
+        if loaded:
+            failed = True
+            print(f"  ERRO: módulos pesados importados: {', '.join(loaded)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Suíte de benchmarks de ingestão, consulta e exportação.
+
+Para cada backend e tamanho de histórico sintético (de 10 mil a 10 milhões
+de ticks), mede:
+
+- ingestão: vazão da carga em lote (insert_many), espaço em disco, tempo de
+  abertura do banco já populado e vazão do commit_records do pipeline (inserção + estatísticas
+  + candles, em lotes de WRITE_BATCH_SIZE);
+- consultas: latência (p50/p95) de get_history, get_statistics (janela
+  incremental e intervalo arbitrário) e get_candles, além da primeira
+  consulta de estatísticas a frio e da reconstrução dos candles;
+- exportação: tempo e pico de RSS de cada formato, em um subprocesso.
+
+Com --e2e, mede também o run_etl_pipeline completo contra um servidor de
+preços local (benchmarks.fake_server). Os resultados são gravados em JSON
+(por padrão, um arquivo por commit em benchmarks/results/), e --compare
+mostra a variação em relação a um resultado anterior.
+
+Uso:
+    python -m benchmarks.bench_suite --rows 10000 100000 --backend sqlite jsonl
+    python -m benchmarks.bench_suite --rows 1000000 --e2e --compare benchmarks/results/abc1234.json
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from benchmarks.bench_export import measure_export
+from benchmarks.fake_server import FakePriceServer, config_for
+from benchmarks.synthetic import STEP, synthetic_records
+from src import aggregates, cli, config, pipeline, rollups
+from src.logger import logger
+from src.storage import BACKENDS, open_storage, set_storage
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+# Registros por insert_many na carga do histórico
+INSERT_BATCH_SIZE = 10_000
+# Registros gravados pelo commit_records depois da carga
+COMMIT_RECORDS = 1_000
+# O TinyDB reescreve o arquivo inteiro a cada gravação; acima disso ele é pulado
+TINYDB_MAX_ROWS = 100_000
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Percentil 'q' (0-100) pelo método do vizinho mais próximo."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100))]
+
+
+def disk_usage(path: str) -> int:
+    """Bytes ocupados pelo banco: o arquivo (e seus auxiliares, ex: '-wal', '.idx') ou o diretório."""
+    total = 0
+    for name in glob.glob(f"{glob.escape(path)}*"):
+        if os.path.isdir(name):
+            for root, _, files in os.walk(name):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        else:
+            total += os.path.getsize(name)
+    return total
+
+
+def latencies_ms(func, repeat: int) -> list[float]:
+    """Executa 'func' 'repeat' vezes e retorna a duração de cada chamada em ms."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+@contextmanager
+def patched_config(**values):
+    """Altera valores do config durante o bloco e restaura os originais no final."""
+    original = {name: getattr(config, name) for name in values}
+    for name, value in values.items():
+        setattr(config, name, value)
+    try:
+        yield
+    finally:
+        for name, value in original.items():
+            setattr(config, name, value)
+
+
+@contextmanager
+def isolated(tmp: str, **values):
+    """
+    Executa o bloco com os arquivos auxiliares em 'tmp' e sem o estado em
+    memória de medições anteriores (estatísticas, candles e cache de câmbio).
+    """
+    aggregates._engines.clear()
+    rollups._engine = None
+    pipeline._rate_cache = None
+    with patched_config(
+        STATS_SNAPSHOT_PATH=os.path.join(tmp, "stats.json"),
+        RATE_CACHE_PATH=os.path.join(tmp, "rate_cache.json"),
+        DAEMON_STATE_PATH=os.path.join(tmp, "daemon.json"),
+        **values,
+    ):
+        yield
+
+
+class Results:
+    """Resultados da suíte, no formato gravado em JSON."""
+
+    def __init__(self) -> None:
+        self.entries: list[dict] = []
+
+    def add(
+        self, backend: str, rows: int, metric: str, value: float, unit: str
+    ) -> None:
+        entry = {
+            "backend": backend,
+            "rows": rows,
+            "metric": metric,
+            "value": round(value, 4),
+            "unit": unit,
+        }
+        self.entries.append(entry)
+        print(f"  {backend:<7} {rows:>10} {metric:<24} {value:>14,.3f} {unit}")
+
+    def add_latencies(
+        self, backend: str, rows: int, metric: str, durations: list[float]
+    ) -> None:
+        self.add(backend, rows, f"{metric}_p50", percentile(durations, 50), "ms")
+        self.add(backend, rows, f"{metric}_p95", percentile(durations, 95), "ms")
+
+
+def bench_backend(
+    results: Results,
+    backend: str,
+    rows: int,
+    tmp: str,
+    queries: int,
+    formats: list[str],
+) -> None:
+    """Mede ingestão, consultas e exportação de um backend com 'rows' ticks."""
+    path = os.path.join(tmp, f"prices.{backend}")
+    # O histórico termina agora, para que as janelas de estatísticas tenham dados
+    end = datetime.now().replace(microsecond=0)
+    start = end - STEP * rows
+
+    storage = open_storage(backend, path)
+    began = time.perf_counter()
+    batch = []
+    for record in synthetic_records(rows, start=start):
+        batch.append(record)
+        if len(batch) == INSERT_BATCH_SIZE:
+            storage.insert_many(batch)
+            batch = []
+    storage.insert_many(batch)
+    results.add(backend, rows, "insert", rows / (time.perf_counter() - began), "rec/s")
+    storage.close()
+    results.add(backend, rows, "size", disk_usage(path) / 2**20, "MiB")
+
+    began = time.perf_counter()
+    storage = open_storage(backend, path)
+    results.add(backend, rows, "open", (time.perf_counter() - began) * 1000, "ms")
+    set_storage(storage)
+    try:
+        results.add(
+            backend,
+            rows,
+            "stats_cold",
+            latencies_ms(cli.get_statistics, 1)[0],
+            "ms",
+        )
+        results.add_latencies(
+            backend, rows, "history", latencies_ms(cli.get_history, queries)
+        )
+        rng = random.Random(42)
+        span = (end - start).total_seconds()
+
+        def history_range() -> None:
+            since = start + timedelta(seconds=rng.uniform(0, span))
+            cli.get_history(100, since=since, until=since + timedelta(days=1))
+
+        results.add_latencies(
+            backend, rows, "history_range", latencies_ms(history_range, queries)
+        )
+        results.add_latencies(
+            backend, rows, "stats", latencies_ms(cli.get_statistics, queries)
+        )
+        results.add_latencies(
+            backend,
+            rows,
+            "stats_range_7d",
+            latencies_ms(
+                lambda: cli.get_statistics(since=end - timedelta(days=7)),
+                max(1, queries // 10),
+            ),
+        )
+        results.add(
+            backend, rows, "rollup_rebuild", latencies_ms(rollups.rebuild, 1)[0], "ms"
+        )
+        results.add_latencies(
+            backend,
+            rows,
+            "candles",
+            latencies_ms(lambda: cli.get_candles("1h", limit=24), queries),
+        )
+
+        new_records = list(synthetic_records(COMMIT_RECORDS, start=end, seed=7))
+        size = max(1, config.WRITE_BATCH_SIZE)
+        began = time.perf_counter()
+        for i in range(0, len(new_records), size):
+            pipeline.commit_records(new_records[i : i + size])
+        elapsed = time.perf_counter() - began
+        results.add(backend, rows, "commit", len(new_records) / elapsed, "rec/s")
+    finally:
+        set_storage(None)
+        storage.close()
+
+    for fmt in formats:
+        out_path = os.path.join(tmp, f"out.{fmt}")
+        _, elapsed, max_rss_kib = measure_export(backend, path, fmt, out_path)
+        results.add(backend, rows, f"export_{fmt}", elapsed, "s")
+        results.add(backend, rows, f"export_{fmt}_rss", max_rss_kib / 1024, "MiB")
+
+
+def bench_e2e(results: Results, backend: str, tmp: str, runs: int, pairs: int) -> None:
+    """Mede o run_etl_pipeline completo contra o servidor de preços local."""
+    names = [f"BTC-{q}" for q in ("USD", "BRL", "EUR", "GBP")][:pairs]
+    names += [f"A{i}-USD" for i in range(pairs - len(names))]
+    server = FakePriceServer().start()
+    storage = open_storage(backend, os.path.join(tmp, f"e2e.{backend}"))
+    set_storage(storage)
+    try:
+        with isolated(tmp, PAIRS=names, **config_for(server)):
+            pipeline.run_etl_pipeline()  # aquece a sessão HTTP e o cache de câmbio
+            durations = latencies_ms(pipeline.run_etl_pipeline, runs)
+            pipeline.close_writer()
+    finally:
+        set_storage(None)
+        storage.close()
+        server.stop()
+    results.add_latencies(backend, pairs, "e2e_run", durations)
+    ticks_per_s = pairs * runs / (sum(durations) / 1000)
+    results.add(backend, pairs, "e2e_throughput", ticks_per_s, "ticks/s")
+
+
+def git_commit() -> str:
+    """Hash curto do commit atual (ou 'unknown' fora de um repositório git)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(entries: list[dict], baseline_path: str) -> None:
+    """Mostra a variação de cada métrica em relação a um resultado anterior."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {
+        (e["backend"], e["rows"], e["metric"]): e["value"] for e in baseline["results"]
+    }
+    print(f"\nComparação com {baseline.get('commit', baseline_path)}:")
+    for entry in entries:
+        before = previous.get((entry["backend"], entry["rows"], entry["metric"]))
+        if not before:
+            continue
+        change = (entry["value"] - before) / before * 100
+        print(
+            f"  {entry['backend']:<7} {entry['rows']:>10} {entry['metric']:<24} "
+            f"{before:>14,.3f} -> {entry['value']:>14,.3f} {entry['unit']:<6} "
+            f"({change:+.1f}%)"
+        )
+
+
+def main(argv: list[str] | None = None) -> dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument(
+        "--backend", choices=BACKENDS, nargs="+", default=list(BACKENDS)
+    )
+    parser.add_argument(
+        "--queries", type=int, default=200, help="Repetições de cada consulta."
+    )
+    parser.add_argument(
+        "--format",
+        nargs="*",
+        default=["csv", "json"],
+        help="Formatos exportados. Padrão: csv json.",
+    )
+    parser.add_argument(
+        "--e2e", action="store_true", help="Mede também o pipeline completo."
+    )
+    parser.add_argument("--e2e-runs", type=int, default=50)
+    parser.add_argument("--e2e-pairs", type=int, default=4)
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Arquivo JSON dos resultados. Padrão: benchmarks/results/<commit>.json.",
+    )
+    parser.add_argument(
+        "--compare", default=None, help="Resultado anterior (JSON) para comparar."
+    )
+    args = parser.parse_args(argv)
+
+    # As mensagens de INFO do pipeline dominariam o tempo medido
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    results = Results()
+    try:
+        for backend in args.backend:
+            for rows in args.rows:
+                if backend == "tinydb" and rows > TINYDB_MAX_ROWS:
+                    print(f"  {backend:<7} {rows:>10} pulado (TINYDB_MAX_ROWS)")
+                    continue
+                with tempfile.TemporaryDirectory() as tmp, isolated(tmp):
+                    bench_backend(
+                        results, backend, rows, tmp, args.queries, args.format
+                    )
+            if args.e2e:
+                with tempfile.TemporaryDirectory() as tmp:
+                    bench_e2e(results, backend, tmp, args.e2e_runs, args.e2e_pairs)
+    finally:
+        logger.setLevel(level)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results.entries,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados gravados em {output}.")
+    if args.compare:
+        compare(results.entries, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,139 @@
+"""
+Feed WebSocket local que imita o canal 'ticker' da Coinbase Exchange.
+
+Reproduz ticks gravados (mensagens 'ticker') respeitando o intervalo original
+entre eles dividido por 'speed', para testar e medir o comando 'stream' sem
+depender da rede. Com 'drop_every', derruba a conexão a cada N mensagens; a
+reprodução continua de onde parou na conexão seguinte.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+
+def recorded_ticks(
+    pairs: list[str],
+    count: int,
+    step: float = 1.0,
+    start: datetime = datetime(2024, 1, 1, tzinfo=timezone.utc),
+    seed: int = 42,
+) -> list[dict]:
+    """Gera 'count' mensagens de ticker em passeio aleatório, alternando os pares."""
+    rng = random.Random(seed)
+    prices = dict.fromkeys(pairs, 30000.0)
+    messages = []
+    for i in range(count):
+        pair = pairs[i % len(pairs)]
+        prices[pair] *= 1 + rng.gauss(0, 0.001)
+        moment = start + timedelta(seconds=i * step)
+        messages.append(
+            {
+                "type": "ticker",
+                "sequence": i + 1,
+                "product_id": pair,
+                "price": f"{prices[pair]:.2f}",
+                "time": moment.isoformat().replace("+00:00", "Z"),
+            }
+        )
+    return messages
+
+
+def _epoch(message: dict) -> float:
+    return datetime.fromisoformat(message["time"]).timestamp()
+
+
+class FakeTickerFeed:
+    """
+    Servidor do feed falso, usado como contexto assíncrono:
+
+        async with FakeTickerFeed(ticks, speed=100) as feed:
+            ... conecta em feed.url ...
+
+    'sent' conta as mensagens enviadas, 'connections' as conexões aceitas e
+    'done' é sinalizado quando todas as mensagens foram enviadas.
+    """
+
+    def __init__(
+        self,
+        messages: list[dict],
+        speed: float = 1.0,
+        drop_every: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.messages = messages
+        self.speed = speed
+        self.drop_every = drop_every
+        self.host = host
+        self.port = port
+        self.sent = 0
+        self.connections = 0
+        self.done = asyncio.Event()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = next(iter(self._server.sockets)).getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def __aenter__(self) -> "FakeTickerFeed":
+        from websockets.asyncio.server import serve
+
+        self._server = await serve(self._handler, self.host, self.port)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handler(self, websocket) -> None:
+        self.connections += 1
+        subscribe = json.loads(await websocket.recv())
+        products = set(subscribe.get("product_ids", []))
+        await websocket.send(json.dumps({"type": "subscriptions"}))
+        in_connection = 0
+        while self.sent < len(self.messages):
+            message = self.messages[self.sent]
+            if self.sent:
+                gap = _epoch(message) - _epoch(self.messages[self.sent - 1])
+                await asyncio.sleep(max(0.0, gap) / self.speed)
+            if message.get("product_id") in products:
+                await websocket.send(json.dumps(message))
+            self.sent += 1
+            in_connection += 1
+            if self.drop_every and in_connection >= self.drop_every:
+                await websocket.close()
+                return
+        self.done.set()
+        await websocket.wait_closed()
+
+
+async def _serve(messages: list[dict], speed: float, port: int) -> None:
+    async with FakeTickerFeed(messages, speed=speed, port=port) as feed:
+        print(f"Feed de tickers falso em {feed.url} (Ctrl+C para sair).")
+        await asyncio.Future()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--file", help="Mensagens gravadas (JSONL). Padrão: sintéticas."
+    )
+    parser.add_argument("--pairs", default="BTC-USD,ETH-USD")
+    parser.add_argument("--count", type=int, default=10_000)
+    parser.add_argument("--speed", type=float, default=10.0)
+    parser.add_argument("--port", type=int, default=8898)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            ticks = [json.loads(line) for line in f if line.strip()]
+    else:
+        ticks = recorded_ticks(args.pairs.split(","), args.count)
+    try:
+        asyncio.run(_serve(ticks, args.speed, args.port))
+    except KeyboardInterrupt:
+        pass
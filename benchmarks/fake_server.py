@@ -0,0 +1,109 @@
+"""
+Servidor local que imita as APIs de preço e de câmbio usadas pelo pipeline.
+
+Responde aos endpoints da Coinbase (legado com ?currency= e por par) e da
+tabela de câmbio, com preços em passeio aleatório e uma latência opcional,
+para medir o 'run_etl_pipeline' de ponta a ponta sem depender da rede.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RATES = {"USD": 1.0, "BRL": 5.5, "EUR": 0.92, "GBP": 0.79}
+
+
+class FakePriceHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        if parts == ["latest", "USD"]:
+            body = {"base": "USD", "rates": RATES}
+        elif parts[:2] == ["v2", "prices"] and parts[-1] == "spot":
+            if len(parts) == 4:
+                pair = parts[2]
+            else:
+                pair = f"BTC-{parse_qs(url.query).get('currency', ['USD'])[0]}"
+            asset, _, quote = pair.upper().partition("-")
+            body = {
+                "data": {
+                    "base": asset,
+                    "currency": quote,
+                    "amount": f"{self.server.next_price(pair):.2f}",
+                }
+            }
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class FakePriceServer(ThreadingHTTPServer):
+    """Servidor de preços falso; 'requests' conta as requisições atendidas."""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        super().__init__((host, port), FakePriceHandler)
+        self.delay = delay
+        self.requests = 0
+        self._prices: dict[str, float] = {}
+        self._rng = random.Random(42)
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def next_price(self, pair: str) -> float:
+        with self._lock:
+            self.requests += 1
+            price = self._prices.get(pair, 30000.0)
+            price *= 1 + self._rng.gauss(0, 0.001)
+            self._prices[pair] = price
+            return price
+
+    def start(self) -> "FakePriceServer":
+        threading.Thread(
+            target=self.serve_forever, name="fake-price-server", daemon=True
+        ).start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def config_for(server: FakePriceServer) -> dict:
+    """Valores do config que apontam as APIs de preço e de câmbio para o servidor."""
+    return {
+        "API_URL": f"{server.url}/v2/prices/spot",
+        "PAIR_API_URL": f"{server.url}/v2/prices/{{pair}}/spot",
+        "EXCHANGE_RATE_API_URL": f"{server.url}/latest/USD",
+        "PRICE_SOURCES": ["coinbase"],
+        "HEDGE_AFTER_SECONDS": 0.0,
+    }
+
+
+if __name__ == "__main__":
+    server = FakePriceServer(port=8899).start()
+    print(f"Servidor de preços falso em {server.url} (Ctrl+C para sair).")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,66 @@
+"""
+Históricos sintéticos para os benchmarks.
+
+Os registros têm o mesmo formato dos gravados pelo pipeline (asset, quote,
+price, price_usd, price_real, timestamp) e seguem um passeio aleatório com
+semente fixa, para que execuções em commits diferentes meçam os mesmos dados.
+"""
+
+import random
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+
+from src.pairs import parse_pair
+from src.storage import open_storage
+
+START = datetime(2020, 1, 1)
+STEP = timedelta(minutes=5)
+
+
+def synthetic_records(
+    rows: int,
+    pairs: tuple[str, ...] = ("BTC-USD",),
+    start: datetime = START,
+    step: timedelta = STEP,
+    seed: int = 42,
+) -> Iterator[dict]:
+    """
+    Gera 'rows' registros em ordem de tempo, alternando entre os pares.
+
+    Cada rodada de pares compartilha o mesmo timestamp, como em uma execução
+    do pipeline; as rodadas são espaçadas de 'step'.
+    """
+    rng = random.Random(seed)
+    prices = {pair: 30000.0 for pair in pairs}
+    for i in range(rows):
+        pair = pairs[i % len(pairs)]
+        asset, quote = parse_pair(pair)
+        prices[pair] = max(1.0, prices[pair] * (1 + rng.gauss(0, 0.002)))
+        price = round(prices[pair], 2)
+        yield {
+            "asset": asset,
+            "quote": quote,
+            "price": price,
+            "price_usd": price,
+            "price_real": round(price * 5.5, 2),
+            "timestamp": (start + step * (i // len(pairs))).isoformat(),
+        }
+
+
+def generate(
+    backend: str,
+    path: str,
+    rows: int,
+    pairs: tuple[str, ...] = ("BTC-USD",),
+    batch_size: int = 50_000,
+) -> None:
+    """Grava 'rows' registros sintéticos no backend, em lotes de 'batch_size'."""
+    storage = open_storage(backend, path)
+    batch = []
+    for record in synthetic_records(rows, pairs):
+        batch.append(record)
+        if len(batch) == batch_size:
+            storage.insert_many(batch)
+            batch = []
+    storage.insert_many(batch)
+    storage.close()
@@ -0,0 +1,364 @@
+import atexit
+import contextlib
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+
+from src import config
+from src.logger import logger
+from src.pairs import default_pair, pair_of
+from src.storage import get_storage
+from src.timeutils import parse_duration, to_epoch
+
+SNAPSHOT_VERSION = 2
+
+
+class RollingWindow:
+    """
+    Estatísticas incrementais de uma janela deslizante de tempo.
+
+    Mantém as entradas da janela em uma fila, uma soma corrente para a média
+    e duas filas monotônicas para mínimo e máximo. Cada entrada entra e sai
+    no máximo uma vez, então inserções custam O(1) amortizado e a consulta é O(1).
+    """
+
+    def __init__(self, span_seconds: float) -> None:
+        self.span = span_seconds
+        self.entries: deque = deque()  # (seq, epoch, price)
+        self.min_q: deque = deque()  # preços crescentes
+        self.max_q: deque = deque()  # preços decrescentes
+        self.total = 0.0
+        self.seq = 0
+
+    def add(self, epoch: float, price: float) -> bool:
+        """
+        Adiciona um preço à janela.
+
+        Returns:
+            bool: False se o registro estiver fora de ordem (e não foi aplicado).
+        """
+        if self.entries and epoch < self.entries[-1][1]:
+            return False
+
+        entry = (self.seq, epoch, price)
+        self.seq += 1
+        self.entries.append(entry)
+        self.total += price
+        while self.min_q and self.min_q[-1][2] >= price:
+            self.min_q.pop()
+        self.min_q.append(entry)
+        while self.max_q and self.max_q[-1][2] <= price:
+            self.max_q.pop()
+        self.max_q.append(entry)
+        self.evict(epoch)
+        return True
+
+    def evict(self, now: float) -> None:
+        """Remove as entradas mais antigas que o início da janela."""
+        start = now - self.span
+        while self.entries and self.entries[0][1] < start:
+            seq, _, price = self.entries.popleft()
+            self.total -= price
+            if self.min_q and self.min_q[0][0] == seq:
+                self.min_q.popleft()
+            if self.max_q and self.max_q[0][0] == seq:
+                self.max_q.popleft()
+        if not self.entries:
+            # Zera a soma para não acumular erro de ponto flutuante
+            self.total = 0.0
+
+    def stats(self, now: float | None = None) -> dict | None:
+        """Retorna as estatísticas da janela, ou None se houver menos de 2 registros."""
+        if now is not None:
+            self.evict(now)
+        count = len(self.entries)
+        if count < 2:
+            return None
+
+        first_price = self.entries[0][2]
+        last_price = self.entries[-1][2]
+        variation = (
+            ((last_price - first_price) / first_price) * 100 if first_price != 0 else 0
+        )
+        return {
+            "records_count": count,
+            "avg_price": self.total / count,
+            "min_price": self.min_q[0][2],
+            "max_price": self.max_q[0][2],
+            "variation": variation,
+        }
+
+
+class StatsEngine:
+    """
+    Conjunto de janelas deslizantes (ex: 1h, 24h, 7d, 30d) atualizadas a cada inserção.
+
+    O estado é persistido em um snapshot, de modo que um 'stats' a frio não
+    precisa reprocessar o banco de dados. O snapshot guarda uma única vez os
+    ticks da maior janela (epoch e preço), dos quais as demais são
+    reconstruídas em memória ao carregar: o tamanho e o custo de gravação e
+    de carga são O(ticks da maior janela), ex: ~43 mil pares de números para
+    30d com um tick por minuto. Por isso ele é regravado no máximo a cada
+    'snapshot_interval' segundos (ver save_if_due) e ao encerrar o processo;
+    um snapshot atrasado só faz o catch_up ler um trecho maior do banco.
+    Com 'pair', o motor acompanha apenas os registros daquele par.
+    """
+
+    def __init__(
+        self,
+        windows: list[str],
+        snapshot_path: str | None = None,
+        pair: str | None = None,
+        snapshot_interval: float = 0.0,
+    ) -> None:
+        self.snapshot_path = snapshot_path
+        self.pair = pair
+        self.snapshot_interval = snapshot_interval
+        self.windows = {
+            name: RollingWindow(parse_duration(name).total_seconds())
+            for name in windows
+        }
+        self.last_epoch: float | None = None
+        self.dirty = False
+        self.saved_at: float | None = None
+
+    @property
+    def max_span(self) -> float:
+        return max((w.span for w in self.windows.values()), default=0.0)
+
+    def update(self, record: dict) -> bool:
+        """
+        Aplica um novo registro a todas as janelas.
+
+        Returns:
+            bool: False se o registro chegou fora de ordem e as janelas
+                  precisam ser reconstruídas (ver rebuild).
+        """
+        epoch = to_epoch(record["timestamp"])
+        if self.last_epoch is not None and epoch < self.last_epoch:
+            return False
+        for window in self.windows.values():
+            window.add(epoch, record["price_usd"])
+        self.last_epoch = epoch
+        self.dirty = True
+        return True
+
+    def stats(self, window: str, now: float | None = None) -> dict | None:
+        """Retorna as estatísticas da janela informada no instante 'now'."""
+        now = datetime.now().timestamp() if now is None else now
+        return self.windows[window].stats(now)
+
+    def rebuild(self, records) -> None:
+        """Reconstrói todas as janelas a partir de registros em ordem de timestamp."""
+        self.windows = {
+            name: RollingWindow(window.span) for name, window in self.windows.items()
+        }
+        self.last_epoch = None
+        for record in records:
+            self.update(record)
+
+    def catch_up(self, storage) -> int:
+        """
+        Aplica os registros gravados após o último visto pelo snapshot.
+
+        Sem snapshot, lê apenas o trecho coberto pela maior janela, usando o
+        índice temporal do backend.
+
+        Returns:
+            int: Quantidade de registros aplicados.
+        """
+        if self.last_epoch is None:
+            since = datetime.fromtimestamp(datetime.now().timestamp() - self.max_span)
+        else:
+            since = datetime.fromtimestamp(self.last_epoch)
+
+        applied = 0
+        for record in storage.iter_range(since=since, pair=self.pair):
+            epoch = to_epoch(record["timestamp"])
+            if self.last_epoch is not None and epoch <= self.last_epoch:
+                continue
+            self.update(record)
+            applied += 1
+        return applied
+
+    def save(self) -> None:
+        """Grava o snapshot de forma atômica (arquivo temporário + rename)."""
+        if not self.snapshot_path:
+            return
+        largest = max(self.windows.values(), key=lambda w: w.span, default=None)
+        entries = largest.entries if largest else ()
+        data = {
+            "version": SNAPSHOT_VERSION,
+            "last_epoch": self.last_epoch,
+            "span": self.max_span,
+            "epochs": [epoch for _, epoch, _ in entries],
+            "prices": [price for _, _, price in entries],
+        }
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+        self.dirty = False
+        self.saved_at = time.monotonic()
+
+    def save_if_due(self) -> None:
+        """Grava o snapshot se houver mudanças e 'snapshot_interval' já tiver passado."""
+        if not self.dirty:
+            return
+        if (
+            self.saved_at is None
+            or time.monotonic() - self.saved_at >= self.snapshot_interval
+        ):
+            self.save()
+
+    def load(self) -> bool:
+        """
+        Restaura as janelas a partir do snapshot, se ele existir e for compatível.
+
+        Returns:
+            bool: True se o snapshot foi carregado.
+        """
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path) as f:
+                data = json.load(f)
+            if data.get("version") != SNAPSHOT_VERSION:
+                return False
+            # Só reaproveita o snapshot se ele cobrir a maior janela configurada
+            if data["span"] < self.max_span:
+                return False
+            windows = {
+                name: RollingWindow(window.span)
+                for name, window in self.windows.items()
+            }
+            for epoch, price in zip(data["epochs"], data["prices"]):
+                for window in windows.values():
+                    window.add(epoch, price)
+            self.windows = windows
+            self.last_epoch = data["last_epoch"]
+            self.saved_at = time.monotonic()
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Snapshot de estatísticas inválido, ignorando: %s", e)
+            return False
+
+
+_engines: dict[str, StatsEngine] = {}
+_atexit_registered = False
+
+
+def snapshot_path_for(pair: str) -> str | None:
+    """
+    Caminho do snapshot de estatísticas do par.
+
+    O par padrão mantém STATS_SNAPSHOT_PATH, preservando snapshots já gravados.
+    """
+    path = config.STATS_SNAPSHOT_PATH
+    if not path or pair == default_pair():
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{pair}{ext}"
+
+
+def get_stats_engine(pair: str | None = None) -> StatsEngine:
+    """Retorna o motor de estatísticas do par, restaurado do snapshot e sincronizado com o banco."""
+    global _atexit_registered
+    pair = pair or default_pair()
+    if pair not in _engines:
+        if not _atexit_registered:
+            # Snapshots com gravação adiada (STATS_SNAPSHOT_INTERVAL) são gravados ao sair
+            atexit.register(save_snapshots)
+            _atexit_registered = True
+        engine = StatsEngine(
+            config.STATS_WINDOWS,
+            snapshot_path_for(pair),
+            pair,
+            parse_duration(config.STATS_SNAPSHOT_INTERVAL).total_seconds(),
+        )
+        engine.load()
+        applied = engine.catch_up(get_storage())
+        if applied:
+            logger.debug(
+                "%s registros de %s aplicados ao snapshot de estatísticas.",
+                applied,
+                pair,
+            )
+            engine.save()
+        _engines[pair] = engine
+    return _engines[pair]
+
+
+def record_inserted(record: dict) -> None:
+    """Atualiza as janelas de estatísticas do par após uma inserção no banco."""
+    records_inserted([record])
+
+
+def records_inserted(records: list[dict]) -> None:
+    """
+    Atualiza as janelas de estatísticas após a gravação de um lote.
+
+    O snapshot de cada par é gravado no máximo uma vez por lote e a cada
+    STATS_SNAPSHOT_INTERVAL (ver StatsEngine.save_if_due).
+    """
+    synced: set[str] = set()
+    changed: set[str] = set()
+    for record in records:
+        pair = pair_of(record)
+        if pair in synced:
+            continue
+        if pair not in _engines:
+            # A sincronização inicial com o banco já inclui todo o lote recém-gravado
+            get_stats_engine(pair)
+            synced.add(pair)
+            continue
+
+        engine = _engines[pair]
+        if not engine.update(record):
+            logger.debug(
+                "Registro fora de ordem; reconstruindo janelas de estatísticas de %s.",
+                pair,
+            )
+            since = datetime.fromtimestamp(datetime.now().timestamp() - engine.max_span)
+            engine.rebuild(get_storage().iter_range(since=since, pair=pair))
+            # A reconstrução também já inclui o restante do lote
+            synced.add(pair)
+        changed.add(pair)
+    for pair in changed:
+        _engines[pair].save_if_due()
+
+
+def catch_up() -> int:
+    """
+    Aplica às janelas já carregadas os registros gravados por outros processos.
+
+    Returns:
+        int: Quantidade de registros aplicados.
+    """
+    storage = get_storage()
+    return sum(engine.catch_up(storage) for engine in list(_engines.values()))
+
+
+def save_snapshots() -> None:
+    """Grava os snapshots com mudanças ainda não persistidas (ex: ao encerrar)."""
+    for engine in list(_engines.values()):
+        # Sem log: no encerramento, a thread do logger pode já ter parado. Um
+        # snapshot não gravado só faz o próximo catch_up ler mais do banco.
+        if engine.dirty:
+            with contextlib.suppress(OSError):
+                engine.save()
+
+
+def rebuild(pair: str | None = None) -> None:
+    """
+    Reconstrói as janelas de estatísticas do par a partir do banco.
+
+    Usado após cargas em massa de registros antigos (ex: backfill), que
+    chegariam fora de ordem às janelas incrementais.
+    """
+    engine = get_stats_engine(pair)
+    since = datetime.fromtimestamp(datetime.now().timestamp() - engine.max_span)
+    engine.rebuild(get_storage().iter_range(since=since, pair=engine.pair))
+    engine.save()
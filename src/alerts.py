@@ -0,0 +1,581 @@
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from contextlib import nullcontext
+from datetime import datetime
+
+import requests
+
+from src import config
+from src.aggregates import RollingWindow
+from src.http_client import get_session
+from src.logger import logger
+from src.metrics import ALERT_DELIVERIES, ALERTS_FIRED, ALERTS_SUPPRESSED
+from src.pairs import pair_of
+from src.resilience import backoff_delays
+from src.storage import Storage, get_storage
+from src.timeutils import parse_duration, to_epoch
+
+# Ex: "BTC-USD > 70000", "BTC-USD < 60000", "ETH-USD +3%/15m", "ETH-USD 5%/1h"
+_RULE_RE = re.compile(
+    r"^([A-Z0-9]+-[A-Z]+)\s*"
+    r"(?:([<>])\s*(\d+(?:\.\d+)?)|([+-]?)\s*(\d+(?:\.\d+)?)\s*%\s*/\s*(\S+))$"
+)
+_CHANGE_KINDS = {"+": "rise", "-": "drop", "": "move"}
+
+
+class AlertRule:
+    """
+    Regra de alerta de um par.
+
+    - 'above' / 'below': o preço cruza 'value' para cima / para baixo.
+    - 'rise' / 'drop' / 'move': o preço sobe / cai / varia pelo menos
+      'value'% dentro da janela 'window' (ex: '15m').
+    """
+
+    def __init__(
+        self, pair: str, kind: str, value: float, window: str | None = None
+    ) -> None:
+        self.pair = pair
+        self.kind = kind
+        self.value = value
+        self.window = window
+        self.span = parse_duration(window).total_seconds() if window else 0.0
+
+    @property
+    def id(self) -> str:
+        """Forma canônica da regra, usada na deduplicação e no cooldown."""
+        if self.kind in ("above", "below"):
+            op = ">" if self.kind == "above" else "<"
+            return f"{self.pair}{op}{self.value:g}"
+        sign = {"rise": "+", "drop": "-", "move": ""}[self.kind]
+        return f"{self.pair}{sign}{self.value:g}%/{self.window}"
+
+    def __repr__(self) -> str:
+        return f"AlertRule({self.id!r})"
+
+
+def parse_rule(text: str) -> AlertRule:
+    """
+    Converte uma regra no formato 'PAR > PREÇO', 'PAR < PREÇO' ou
+    'PAR [+|-]PCT%/JANELA' em AlertRule.
+
+    Raises:
+        ValueError: Se a regra estiver mal formatada.
+    """
+    match = _RULE_RE.match(text.strip().upper())
+    if not match:
+        raise ValueError(
+            f"Regra de alerta inválida: '{text}'. "
+            "Use, por exemplo, 'BTC-USD > 70000' ou 'ETH-USD +3%/15m'."
+        )
+    pair, op, level, sign, pct, window = match.groups()
+    if op:
+        return AlertRule(pair, "above" if op == ">" else "below", float(level))
+    if not float(pct) > 0:
+        raise ValueError(f"Variação inválida na regra '{text}': use um valor > 0.")
+    return AlertRule(pair, _CHANGE_KINDS[sign], float(pct), window.lower())
+
+
+def parse_rules(spec: str) -> list[AlertRule]:
+    """
+    Converte um conjunto de regras separadas por ';' ou por linha.
+
+    Linhas vazias e comentários ('#') são ignorados; regras inválidas são
+    registradas no log e descartadas, sem invalidar as demais.
+    """
+    rules = []
+    for line in re.split(r"[;\n]", spec):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            rules.append(parse_rule(line))
+        except ValueError as e:
+            logger.error("%s", e)
+    return rules
+
+
+class _Levels:
+    """Limiares ordenados, com as regras na mesma ordem (para busca binária)."""
+
+    def __init__(self) -> None:
+        self.values: list[float] = []
+        self.rules: list[AlertRule] = []
+
+    def add(self, rule: AlertRule) -> None:
+        position = bisect_right(self.values, rule.value)
+        self.values.insert(position, rule.value)
+        self.rules.insert(position, rule)
+
+    def crossed_up(self, previous: float, price: float) -> list[AlertRule]:
+        """Regras com limiar em (previous, price]: cruzados na subida."""
+        start = bisect_right(self.values, previous)
+        return self.rules[start : bisect_right(self.values, price, lo=start)]
+
+    def crossed_down(self, previous: float, price: float) -> list[AlertRule]:
+        """Regras com limiar em [price, previous): cruzados na queda."""
+        start = bisect_left(self.values, price)
+        return self.rules[start : bisect_left(self.values, previous, lo=start)]
+
+    def up_to(self, value: float) -> list[AlertRule]:
+        """Regras com limiar <= value."""
+        return self.rules[: bisect_right(self.values, value)]
+
+
+class _ChangeIndex:
+    """
+    Regras de variação de um par que compartilham a mesma janela.
+
+    Uma única janela deslizante (com mínimo e máximo em O(1)) atende todas as
+    regras; as disparadas por um tick são um prefixo dos limiares ordenados.
+    """
+
+    def __init__(self, span: float) -> None:
+        self.window = RollingWindow(span)
+        self.rise = _Levels()
+        self.drop = _Levels()
+
+
+class _PairIndex:
+    """Regras compiladas de um par e o último preço visto."""
+
+    def __init__(self) -> None:
+        self.above = _Levels()
+        self.below = _Levels()
+        self.changes: dict[float, _ChangeIndex] = {}
+        self.last_price: float | None = None
+        self.last_epoch: float | None = None
+        self.seeded = False
+
+    @property
+    def max_span(self) -> float:
+        return max(self.changes, default=0.0)
+
+    def add(self, rule: AlertRule) -> None:
+        if rule.kind == "above":
+            self.above.add(rule)
+        elif rule.kind == "below":
+            self.below.add(rule)
+        else:
+            index = self.changes.setdefault(rule.span, _ChangeIndex(rule.span))
+            if rule.kind in ("rise", "move"):
+                index.rise.add(rule)
+            if rule.kind in ("drop", "move"):
+                index.drop.add(rule)
+
+    def apply(self, epoch: float, price: float) -> list[tuple[AlertRule, float]]:
+        """
+        Aplica um tick e retorna as regras disparadas, com o valor observado
+        (o preço, nos cruzamentos, ou a variação em %).
+
+        O custo é O(log n + k) para n regras do par e k regras disparadas.
+        """
+        fired = []
+        previous = self.last_price
+        if previous is not None and price > previous:
+            crossed = self.above.crossed_up(previous, price)
+            fired += [(rule, price) for rule in crossed]
+        elif previous is not None and price < previous:
+            crossed = self.below.crossed_down(previous, price)
+            fired += [(rule, price) for rule in crossed]
+
+        for index in self.changes.values():
+            window = index.window
+            window.add(epoch, price)
+            low, high = window.min_q[0][2], window.max_q[0][2]
+            rise = (price - low) / low * 100 if low else 0.0
+            drop = (high - price) / high * 100 if high else 0.0
+            fired += [(rule, rise) for rule in index.rise.up_to(rise)]
+            fired += [(rule, -drop) for rule in index.drop.up_to(drop)]
+
+        self.last_price = price
+        self.last_epoch = epoch
+        return fired
+
+
+class AlertEngine:
+    """
+    Avalia as regras de alerta a cada tick.
+
+    As regras são compiladas por par em níveis ordenados (cruzamentos) e em
+    janelas deslizantes compartilhadas por todas as regras de mesma janela
+    (variações), de modo que cada tick custa O(log n) e não O(n) regras.
+    Ticks repetidos ou fora de ordem são ignorados, e uma regra que disparou
+    fica em cooldown por 'cooldown' segundos; o instante do último disparo
+    de cada regra é persistido em 'state_path'.
+    """
+
+    def __init__(
+        self,
+        rules: list[AlertRule],
+        cooldown: float = 0.0,
+        state_path: str | None = None,
+    ) -> None:
+        self.rules = rules
+        self.cooldown = cooldown
+        self.state_path = state_path
+        self.pairs: dict[str, _PairIndex] = {}
+        by_pair: dict[str, list[AlertRule]] = {}
+        for rule in rules:
+            by_pair.setdefault(rule.pair, []).append(rule)
+        for pair, pair_rules in by_pair.items():
+            self.pairs[pair] = _PairIndex()
+            for rule in pair_rules:
+                self.pairs[pair].add(rule)
+        self.fired_at: dict[str, float] = {}
+        self._load()
+
+    def _load(self) -> None:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                self.fired_at = {k: float(v) for k, v in json.load(f).items()}
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            logger.warning("Estado dos alertas inválido, ignorando: %s", e)
+
+    def _save(self) -> None:
+        """Grava o estado de forma atômica (arquivo temporário + rename)."""
+        if not self.state_path:
+            return
+        try:
+            tmp_path = f"{self.state_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.fired_at, f)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            logger.warning("Falha ao gravar o estado dos alertas: %s", e)
+
+    def seed(self, pair: str, storage: Storage, until: str) -> None:
+        """
+        Carrega do banco o último preço e o trecho das janelas anteriores a
+        'until', para que o primeiro tick do processo já possa disparar alertas.
+        """
+        index = self.pairs[pair]
+        index.seeded = True
+        history = []
+        if index.max_span:
+            since = datetime.fromtimestamp(to_epoch(until) - index.max_span)
+            history = list(storage.iter_range(since=since, until=until, pair=pair))
+        if not history:
+            history = storage.last(1, until=until, pair=pair)
+        for record in history:
+            index.apply(to_epoch(record["timestamp"]), price_of(record))
+
+    def check(self, record: dict) -> list[dict]:
+        """Aplica um tick e retorna os alertas disparados (já fora do cooldown)."""
+        pair = pair_of(record)
+        index = self.pairs.get(pair)
+        if index is None:
+            return []
+        epoch = to_epoch(record["timestamp"])
+        if index.last_epoch is not None and epoch <= index.last_epoch:
+            return []
+
+        alerts = []
+        for rule, observed in index.apply(epoch, price_of(record)):
+            last = self.fired_at.get(rule.id)
+            # O mesmo tick nunca dispara a mesma regra duas vezes (ex: 'move')
+            if last is not None and (epoch == last or epoch - last < self.cooldown):
+                ALERTS_SUPPRESSED.labels(pair=pair).inc()
+                continue
+            self.fired_at[rule.id] = epoch
+            ALERTS_FIRED.labels(pair=pair, kind=rule.kind).inc()
+            alerts.append(build_alert(rule, record, observed))
+        return alerts
+
+    def evaluate(
+        self, records: list[dict], storage: Storage | None = None, lock=None
+    ) -> list[dict]:
+        """
+        Avalia um lote de ticks, em ordem.
+
+        Pares ainda não vistos pelo processo são inicializados a partir de
+        'storage' (sob 'lock', se informado) antes do primeiro tick.
+        """
+        alerts = []
+        for record in records:
+            pair = pair_of(record)
+            index = self.pairs.get(pair)
+            if index is None:
+                continue
+            if not index.seeded and storage is not None:
+                with lock or nullcontext():
+                    self.seed(pair, storage, record["timestamp"])
+            alerts += self.check(record)
+        if alerts:
+            self._save()
+        return alerts
+
+
+def price_of(record: dict) -> float:
+    """Preço do registro na moeda do par (registros antigos só têm price_usd)."""
+    return record.get("price", record["price_usd"])
+
+
+def build_alert(rule: AlertRule, record: dict, observed: float) -> dict:
+    """Monta o alerta entregue aos sinks."""
+    price = price_of(record)
+    if rule.kind in ("above", "below"):
+        direction = "acima de" if rule.kind == "above" else "abaixo de"
+        message = f"{rule.pair} cruzou {direction} {rule.value:g}: {price:.2f}"
+    else:
+        message = (
+            f"{rule.pair} variou {observed:+.2f}% em {rule.window} "
+            f"(limite {rule.value:g}%): {price:.2f}"
+        )
+    alert = {
+        "id": f"{rule.id}@{record['timestamp']}",
+        "rule": rule.id,
+        "pair": rule.pair,
+        "kind": rule.kind,
+        "threshold": rule.value,
+        "price": price,
+        "timestamp": record["timestamp"],
+        "message": message,
+    }
+    if rule.window:
+        alert["window"] = rule.window
+        alert["change"] = round(observed, 4)
+    return alert
+
+
+class AlertSink(ABC):
+    """Destino dos alertas. 'send' deve levantar uma exceção em caso de falha."""
+
+    name = ""
+
+    @abstractmethod
+    def send(self, alert: dict) -> None:
+        """Entrega um alerta."""
+
+
+class StdoutSink(AlertSink):
+    name = "stdout"
+
+    def send(self, alert: dict) -> None:
+        print(f"[ALERTA] {alert['message']}", flush=True)
+
+
+class FileSink(AlertSink):
+    """Acrescenta cada alerta como uma linha JSON em 'path'."""
+
+    name = "file"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def send(self, alert: dict) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink(AlertSink):
+    """
+    Envia cada alerta como JSON (POST) para 'url', com novas tentativas em
+    falhas de rede e respostas 5xx. O campo 'id' permite ao receptor
+    descartar entregas repetidas.
+    """
+
+    name = "webhook"
+
+    def __init__(self, url: str, retries: int = 0) -> None:
+        self.url = url
+        self.retries = retries
+
+    def send(self, alert: dict) -> None:
+        delays = backoff_delays(
+            self.retries, config.FETCH_BACKOFF_BASE, config.FETCH_BACKOFF_MAX
+        )
+        while True:
+            try:
+                response = get_session().post(
+                    self.url, json=alert, timeout=config.REQUEST_TIMEOUT
+                )
+                response.raise_for_status()
+                return
+            except requests.exceptions.RequestException as e:
+                status = getattr(e.response, "status_code", None)
+                delay = next(delays, None)
+                if delay is None or (status is not None and status < 500):
+                    raise
+                time.sleep(delay)
+
+
+def build_sinks(names: list[str]) -> list[AlertSink]:
+    """
+    Cria os sinks configurados (stdout, file, webhook).
+
+    Raises:
+        ValueError: Se um sink for desconhecido ou faltar a sua configuração.
+    """
+    sinks: list[AlertSink] = []
+    for name in names:
+        if name == "stdout":
+            sinks.append(StdoutSink())
+        elif name == "file":
+            sinks.append(FileSink(config.ALERT_FILE))
+        elif name == "webhook":
+            if not config.ALERT_WEBHOOK_URL:
+                raise ValueError("O sink 'webhook' requer ALERT_WEBHOOK_URL.")
+            sinks.append(WebhookSink(config.ALERT_WEBHOOK_URL, config.FETCH_RETRIES))
+        else:
+            raise ValueError(
+                f"Sink de alerta desconhecido: '{name}'. Use stdout, file ou webhook."
+            )
+    return sinks
+
+
+class AlertDispatcher:
+    """
+    Entrega os alertas aos sinks em uma thread dedicada, para que um webhook
+    lento não atrase o pipeline. A falha de um sink não impede os demais.
+    """
+
+    def __init__(self, sinks: list[AlertSink]) -> None:
+        self.sinks = sinks
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, alerts: list[dict]) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="alert-dispatcher", daemon=True
+                )
+                self._thread.start()
+        for alert in alerts:
+            self._queue.put(alert)
+
+    def _run(self) -> None:
+        while True:
+            alert = self._queue.get()
+            try:
+                if alert is None:
+                    return
+                self.deliver(alert)
+            finally:
+                self._queue.task_done()
+
+    def deliver(self, alert: dict) -> None:
+        for sink in self.sinks:
+            try:
+                sink.send(alert)
+                ALERT_DELIVERIES.labels(sink=sink.name, outcome="success").inc()
+            except Exception as e:
+                ALERT_DELIVERIES.labels(sink=sink.name, outcome="error").inc()
+                logger.error(
+                    "Falha ao entregar o alerta '%s' via %s: %s",
+                    alert["id"],
+                    sink.name,
+                    e,
+                )
+
+    def flush(self) -> None:
+        """Aguarda a entrega dos alertas enfileirados."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Entrega os alertas pendentes e encerra a thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+_engine: AlertEngine | None = None
+_dispatcher: AlertDispatcher | None = None
+_loaded = False
+_init_lock = threading.Lock()
+
+
+def load_rules() -> list[AlertRule]:
+    """Regras de ALERT_RULES e do arquivo ALERT_RULES_FILE (uma por linha)."""
+    spec = config.ALERT_RULES
+    if config.ALERT_RULES_FILE:
+        try:
+            with open(config.ALERT_RULES_FILE, encoding="utf-8") as f:
+                spec += "\n" + f.read()
+        except OSError as e:
+            logger.error("Falha ao ler ALERT_RULES_FILE: %s", e)
+    return parse_rules(spec)
+
+
+def _init() -> None:
+    global _engine, _dispatcher, _loaded
+    with _init_lock:
+        if _loaded:
+            return
+        rules = load_rules()
+        if not rules:
+            _loaded = True
+            return
+        try:
+            sinks = build_sinks(config.ALERT_SINKS)
+        except ValueError as e:
+            logger.error("Alertas desativados: %s", e)
+            _loaded = True
+            return
+        # Se a criação falhar, a próxima execução tenta de novo em vez de
+        # seguir sem alertas
+        engine = AlertEngine(
+            rules,
+            parse_duration(config.ALERT_COOLDOWN).total_seconds(),
+            config.ALERT_STATE_PATH,
+        )
+        _engine, _dispatcher = engine, AlertDispatcher(sinks)
+        atexit.register(_dispatcher.close)
+        _loaded = True
+        logger.info(
+            "%s regras de alerta carregadas para %s pares.",
+            len(rules),
+            len(_engine.pairs),
+        )
+
+
+def get_alert_engine() -> AlertEngine | None:
+    """Retorna o motor de alertas configurado, ou None se não houver regras."""
+    _init()
+    return _engine
+
+
+def evaluate(records: list[dict], lock=None) -> list[dict]:
+    """
+    Avalia as regras de alerta para os ticks de uma execução e enfileira os
+    alertas disparados para entrega.
+
+    Returns:
+        list[dict]: Os alertas disparados.
+    """
+    engine = get_alert_engine()
+    if engine is None or not records:
+        return []
+    alerts = engine.evaluate(records, get_storage(), lock)
+    for alert in alerts:
+        logger.warning("Alerta: %s", alert["message"])
+    if alerts:
+        _dispatcher.submit(alerts)
+    return alerts
+
+
+def reset() -> None:
+    """Descarta o motor e entrega os alertas pendentes (ex: após mudar o config)."""
+    global _engine, _dispatcher, _loaded
+    with _init_lock:
+        dispatcher = _dispatcher
+        _engine, _dispatcher, _loaded = None, None, False
+    if dispatcher is not None:
+        dispatcher.close()
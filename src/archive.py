@@ -0,0 +1,244 @@
+import gzip
+import heapq
+import itertools
+import json
+import os
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+
+from src.logger import logger
+from src.storage import Storage, _as_epoch
+from src.timeutils import to_epoch
+
+MANIFEST_NAME = "manifest.json"
+
+
+def _epoch(record: dict) -> float:
+    return to_epoch(record["timestamp"])
+
+
+class Archive:
+    """
+    Arquivo frio do histórico: segmentos JSON-lines comprimidos e imutáveis.
+
+    Cada segmento guarda um trecho contínuo dos ticks de um par dentro de um
+    mês ('<par>/<AAAA-MM>.<parte>.jsonl.gz') e nunca é alterado depois de
+    gravado. O manifesto (manifest.json) descreve o intervalo e a quantidade
+    de registros de cada segmento, de modo que uma consulta só descomprime os
+    segmentos que cruzam o intervalo pedido.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_NAME)
+        self.segments: list[dict] = []
+        self._manifest_mtime: int | None = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Recarrega o manifesto se ele foi regravado (ex: compactação de outro processo)."""
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._manifest_mtime:
+            return False
+        with open(self.manifest_path, encoding="utf-8") as f:
+            self.segments = json.load(f)["segments"]
+        self._manifest_mtime = mtime
+        return True
+
+    def __len__(self) -> int:
+        return sum(segment["count"] for segment in self.segments)
+
+    def newest(self, pair: str) -> dict | None:
+        """Retorna o segmento mais recente do par (o último gravado), se houver."""
+        for segment in reversed(self.segments):
+            if segment["pair"] == pair:
+                return segment
+        return None
+
+    def select(self, since=None, until=None, pair: str | None = None) -> list[dict]:
+        """Segmentos (do par, se informado) que cruzam [since, until), do mais antigo ao mais novo."""
+        since, until = _as_epoch(since), _as_epoch(until)
+        return sorted(
+            (
+                segment
+                for segment in self.segments
+                if (pair is None or segment["pair"] == pair)
+                and (since is None or segment["last_epoch"] >= since)
+                and (until is None or segment["first_epoch"] < until)
+            ),
+            key=lambda segment: segment["first_epoch"],
+        )
+
+    def read(self, segment: dict) -> Iterator[dict]:
+        """Itera os registros de um segmento, em ordem de tempo."""
+        path = os.path.join(self.directory, segment["file"])
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        """Itera, em ordem crescente de timestamp, os registros arquivados em [since, until)."""
+        lo, hi = _as_epoch(since), _as_epoch(until)
+        # Segmentos que não se sobrepõem são lidos em sequência; só as sequências
+        # (normalmente uma por par) são intercaladas, com um arquivo aberto por vez
+        runs: list[list[dict]] = []
+        for segment in self.select(since, until, pair):
+            for run in runs:
+                if run[-1]["last_epoch"] <= segment["first_epoch"]:
+                    run.append(segment)
+                    break
+            else:
+                runs.append([segment])
+        streams = [
+            itertools.chain.from_iterable(self.read(segment) for segment in run)
+            for run in runs
+        ]
+        for record in heapq.merge(*streams, key=_epoch):
+            epoch = _epoch(record)
+            if (lo is None or epoch >= lo) and (hi is None or epoch < hi):
+                yield record
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        """Retorna os N registros arquivados mais recentes em [since, until), do mais novo ao mais antigo."""
+        lo, hi = _as_epoch(since), _as_epoch(until)
+        best: list[tuple] = []  # heap mínimo com os N mais recentes
+        order = itertools.count()
+        segments = self.select(since, until, pair)
+        for segment in sorted(segments, key=lambda s: s["last_epoch"], reverse=True):
+            if len(best) >= n and segment["last_epoch"] < best[0][0]:
+                break
+            for record in self.read(segment):
+                epoch = _epoch(record)
+                if (lo is not None and epoch < lo) or (hi is not None and epoch >= hi):
+                    continue
+                entry = (epoch, next(order), record)
+                if len(best) < n:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+        return [record for _, _, record in sorted(best, reverse=True)]
+
+    def write_segment(self, pair: str, records: list[dict]) -> dict:
+        """
+        Grava um novo segmento com os registros (em ordem de tempo) e o
+        registra no manifesto.
+
+        O segmento é gravado em um arquivo temporário e renomeado, e o
+        manifesto só é atualizado depois, para que um segmento incompleto
+        nunca seja lido.
+        """
+        first, last = records[0]["timestamp"], records[-1]["timestamp"]
+        month = datetime.fromisoformat(first).strftime("%Y-%m")
+        part = sum(
+            1 for s in self.segments if s["pair"] == pair and s["month"] == month
+        )
+        name = f"{pair}/{month}.{part:03d}.jsonl.gz"
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, path)
+
+        segment = {
+            "pair": pair,
+            "month": month,
+            "file": name,
+            "first": first,
+            "last": last,
+            "first_epoch": to_epoch(first),
+            "last_epoch": to_epoch(last),
+            "count": len(records),
+        }
+        self.segments.append(segment)
+        self._save_manifest()
+        logger.debug("Segmento '%s' arquivado com %s registros.", name, len(records))
+        return segment
+
+    def _save_manifest(self) -> None:
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"segments": self.segments}, f, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+        self._manifest_mtime = os.stat(self.manifest_path).st_mtime_ns
+
+
+class TieredStorage(Storage):
+    """
+    Armazenamento em camadas: o backend configurado (quente) e o arquivo frio.
+
+    Inserções e candles vão sempre para o backend. Consultas de ticks cujo
+    intervalo alcança o período arquivado combinam as duas camadas em ordem
+    de tempo; as demais são respondidas só pelo backend.
+    """
+
+    def __init__(self, hot: Storage, archive: Archive) -> None:
+        self.hot = hot
+        self.archive = archive
+
+    def insert(self, record: dict) -> None:
+        self.hot.insert(record)
+
+    def insert_many(self, records: Iterable[dict]) -> int:
+        return self.hot.insert_many(records)
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        recent = self.hot.iter_range(since, until, pair)
+        if not self.archive.select(since, until, pair):
+            return recent
+        return heapq.merge(
+            self.archive.iter_range(since, until, pair), recent, key=_epoch
+        )
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        recent = self.hot.last(n, since, until, pair)
+        segments = self.archive.select(since, until, pair)
+        if not segments or n <= 0:
+            return recent
+        archived_until = max(segment["last_epoch"] for segment in segments)
+        if len(recent) == n and _epoch(recent[-1]) > archived_until:
+            return recent
+        merged = recent + self.archive.last(n, since, until, pair)
+        return sorted(merged, key=_epoch, reverse=True)[:n]
+
+    def columns(self, pair: str, since=None, until=None):
+        # Trechos que alcançam o arquivo frio não têm representação colunar
+        if self.archive.select(since, until, pair):
+            return None
+        return self.hot.columns(pair, since, until)
+
+    def count(self) -> int:
+        return self.hot.count() + len(self.archive)
+
+    def upsert_candles(self, interval: str, candles: Iterable[dict], pair=None) -> None:
+        self.hot.upsert_candles(interval, candles, pair)
+
+    def iter_candles(
+        self, interval: str, since=None, until=None, pair=None
+    ) -> Iterator[dict]:
+        return self.hot.iter_candles(interval, since, until, pair)
+
+    def clear_candles(self, interval: str, since=None, pair=None) -> None:
+        self.hot.clear_candles(interval, since, pair)
+
+    def delete_before(self, until, pair=None) -> int:
+        return self.hot.delete_before(until, pair)
+
+    def prune_candles(self, interval: str, until, pair=None) -> int:
+        return self.hot.prune_candles(interval, until, pair)
+
+    def drop_duplicates(self, key) -> list[dict]:
+        # Os segmentos arquivados são imutáveis: só o backend é deduplicado
+        return self.hot.drop_duplicates(key)
+
+    def refresh(self) -> bool:
+        archived = self.archive.refresh()
+        return self.hot.refresh() or archived
+
+    def close(self) -> None:
+        self.hot.close()
@@ -0,0 +1,323 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from src import aggregates, config, dedupe, rollups
+from src.http_client import fetch_json
+from src.logger import logger
+from src.metrics import PIPELINE_STAGE_SECONDS
+from src.pairs import default_pair, parse_pair
+from src.pipeline import get_exchange_rates, quote_to_usd_rate, storage_lock
+from src.storage import Storage, get_storage
+
+# Resoluções aceitas pela API de candles (nome -> segundos)
+GRANULARITIES = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "6h": 21600,
+    "1d": 86400,
+}
+
+# Máximo de candles devolvidos pela API em cada requisição
+CANDLES_PER_REQUEST = 300
+
+# Trechos baixados em paralelo antes de cada gravação e checkpoint, por worker
+CHUNKS_PER_WORKER = 4
+
+# Novas tentativas por trecho (com backoff exponencial e jitter)
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5
+
+
+class BackfillError(Exception):
+    """Falha definitiva no backfill; o progresso até o último checkpoint é mantido."""
+
+
+class TokenBucket:
+    """
+    Limitador de taxa por token bucket, compartilhado entre threads.
+
+    Acumula até 'capacity' tokens à taxa de 'rate' por segundo; cada
+    requisição consome um token e espera quando não há nenhum disponível.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Consome um token, aguardando se necessário."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def chunk_ranges(start: float, end: float, step: int) -> list[tuple[float, float]]:
+    """Divide [start, end) em trechos de até CANDLES_PER_REQUEST candles."""
+    span = step * CANDLES_PER_REQUEST
+    chunks = []
+    while start < end:
+        chunks.append((start, min(start + span, end)))
+        start += span
+    return chunks
+
+
+def default_checkpoint_path(pair: str, granularity: str) -> str:
+    """Arquivo de checkpoint do backfill, ao lado do banco de dados."""
+    directory = os.path.dirname(config.DB_PATH)
+    return os.path.join(directory, f"backfill-{pair}-{granularity}.json")
+
+
+class Backfill:
+    """
+    Download de candles históricos de um par, em trechos paralelos.
+
+    Os trechos são baixados por um pool de threads sob um token bucket, com
+    novas tentativas e backoff exponencial. A cada grupo de trechos, os
+    candles novos (timestamps ainda ausentes no banco) são gravados em uma
+    única transação e o checkpoint é atualizado, de modo que um backfill
+    interrompido continua de onde parou.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        pair: str,
+        granularity: str = "1h",
+        url: str | None = None,
+        workers: int | None = None,
+        rate_limit: float | None = None,
+        checkpoint_path: str | None = None,
+    ) -> None:
+        if granularity not in GRANULARITIES:
+            raise ValueError(
+                f"Resolução inválida: '{granularity}'. "
+                f"Use uma de: {', '.join(GRANULARITIES)}."
+            )
+        self.storage = storage
+        self.pair = pair
+        self.asset, self.quote = parse_pair(pair)
+        self.granularity = granularity
+        self.step = GRANULARITIES[granularity]
+        self.url = (url or config.BACKFILL_API_URL).format(pair=pair)
+        self.workers = max(1, workers or config.BACKFILL_WORKERS)
+        self.limiter = TokenBucket(rate_limit or config.BACKFILL_RATE_LIMIT)
+        self.checkpoint_path = checkpoint_path or default_checkpoint_path(
+            pair, granularity
+        )
+
+    def fetch_chunk(self, start: float, end: float) -> list[list]:
+        """
+        Baixa os candles de [start, end), com novas tentativas em caso de falha.
+
+        Returns:
+            list: Linhas [time, low, high, open, close, volume] da API.
+
+        Raises:
+            BackfillError: Se todas as tentativas falharem.
+        """
+        params = {
+            "start": datetime.fromtimestamp(start).astimezone().isoformat(),
+            "end": datetime.fromtimestamp(end - 1).astimezone().isoformat(),
+            "granularity": self.step,
+        }
+        self.limiter.acquire()
+        try:
+            with PIPELINE_STAGE_SECONDS.labels(stage="backfill_chunk").time():
+                rows = fetch_json(
+                    self.url,
+                    "coinbase_exchange",
+                    params=params,
+                    retries=MAX_RETRIES,
+                    backoff_base=BACKOFF_BASE,
+                )
+            # O fim é inclusivo na API; mantém apenas o trecho [start, end)
+            return [row for row in rows if start <= row[0] < end]
+        except (
+            requests.exceptions.RequestException,
+            ValueError,
+            TypeError,
+            IndexError,
+        ) as e:
+            raise BackfillError(
+                f"Falha ao baixar candles de {params['start']} a {params['end']}: {e}"
+            ) from e
+
+    def to_records(self, rows: list[list], rates: dict) -> list[dict]:
+        """Converte linhas da API em registros de preço (preço de fechamento)."""
+        quote_rate = quote_to_usd_rate(rates, self.quote)
+        if not quote_rate:
+            raise BackfillError(f"Cotação de {self.quote} indisponível.")
+        records = []
+        for row in rows:
+            epoch, close = float(row[0]), float(row[4])
+            price_usd = close / quote_rate
+            records.append(
+                {
+                    "asset": self.asset,
+                    "quote": self.quote,
+                    "price": close,
+                    "price_usd": price_usd,
+                    "price_real": price_usd * rates["BRL"],
+                    "timestamp": datetime.fromtimestamp(epoch).isoformat(),
+                    "source": "backfill",
+                }
+            )
+        return records
+
+    def load_checkpoint(self, since: float, until: float) -> float:
+        """
+        Retorna o ponto de retomada salvo para um backfill de [since, until), ou 'since'.
+
+        Um checkpoint de outro intervalo (ex: outro --until, ou o padrão
+        "agora" de uma execução anterior) é descartado e o backfill recomeça.
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return since
+        try:
+            with open(self.checkpoint_path) as f:
+                data = json.load(f)
+            if data["since"] == since and data["until"] == until:
+                logger.info(
+                    "Retomando backfill a partir de %s.",
+                    datetime.fromtimestamp(data["done_until"]).isoformat(),
+                )
+                return float(data["done_until"])
+            logger.info("Checkpoint de backfill de outro intervalo; recomeçando.")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Checkpoint de backfill inválido, ignorando: %s", e)
+        return since
+
+    def save_checkpoint(self, since: float, until: float, done_until: float) -> None:
+        """Grava o progresso de forma atômica."""
+        directory = os.path.dirname(self.checkpoint_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {
+                    "pair": self.pair,
+                    "granularity": self.granularity,
+                    "since": since,
+                    "until": until,
+                    "done_until": done_until,
+                },
+                f,
+            )
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _load(self, records: list[dict], start: float, end: float) -> int:
+        """
+        Grava em uma transação os registros cujo timestamp ainda não existe no banco.
+
+        A gravação é serializada com o agendador e o daemon (storage_lock) e
+        passa pela deduplicação por par e bucket (ver src.dedupe). As
+        estatísticas e os candles não são atualizados registro a registro:
+        os registros antigos chegariam fora de ordem, e run os reconstrói ao
+        final.
+        """
+        with storage_lock:
+            existing = {
+                r["timestamp"]
+                for r in self.storage.iter_range(
+                    since=datetime.fromtimestamp(start),
+                    until=datetime.fromtimestamp(end),
+                    pair=self.pair,
+                )
+            }
+            unique: dict[str, dict] = {}
+            for record in records:
+                if record["timestamp"] not in existing:
+                    unique.setdefault(record["timestamp"], record)
+            new = sorted(unique.values(), key=lambda r: r["timestamp"])
+            new = dedupe.filter_new(self.storage, new)
+            if new:
+                self.storage.insert_many(new)
+            dedupe.records_inserted(new)
+        return len(new)
+
+    def run(self, since: datetime, until: datetime | None = None) -> int:
+        """
+        Executa (ou retoma) o backfill de [since, until).
+
+        Returns:
+            int: Quantidade de registros novos gravados.
+
+        Raises:
+            BackfillError: Se um trecho falhar após todas as tentativas.
+        """
+        start = since.timestamp()
+        end = (until or datetime.now()).timestamp()
+        # Alinha o início à resolução, para que retomadas gerem os mesmos trechos
+        start -= start % self.step
+        resume = self.load_checkpoint(start, end)
+
+        rates = dict(get_exchange_rates() or {})
+        rates.setdefault("BRL", config.FALLBACK_USD_TO_BRL_RATE)
+
+        chunks = chunk_ranges(resume, end, self.step)
+        group_size = self.workers * CHUNKS_PER_WORKER
+        logger.info(
+            "Backfill de %s (%s): %s trechos.", self.pair, self.granularity, len(chunks)
+        )
+        inserted = 0
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="etl-backfill"
+        ) as executor:
+            for i in range(0, len(chunks), group_size):
+                group = chunks[i : i + group_size]
+                results = executor.map(lambda c: self.fetch_chunk(*c), group)
+                records = []
+                for rows in results:
+                    records.extend(self.to_records(rows, rates))
+                group_start, group_end = group[0][0], group[-1][1]
+                inserted += self._load(records, group_start, group_end)
+                self.save_checkpoint(start, end, group_end)
+                logger.info(
+                    "Backfill: %s/%s trechos, %s registros novos.",
+                    i + len(group),
+                    len(chunks),
+                    inserted,
+                )
+
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        if inserted or resume > start:
+            # Os registros antigos chegam fora de ordem às janelas e candles
+            rollups.rebuild(since=datetime.fromtimestamp(start))
+            aggregates.rebuild(self.pair)
+        return inserted
+
+
+def run(
+    since: datetime,
+    until: datetime | None = None,
+    granularity: str = "1h",
+    pair: str | None = None,
+    workers: int | None = None,
+) -> int:
+    """Executa o backfill do par (padrão: o primeiro de PAIRS) no armazenamento configurado."""
+    backfill = Backfill(
+        get_storage(), pair or default_pair(), granularity, workers=workers
+    )
+    return backfill.run(since, until)
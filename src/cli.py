@@ -1,13 +1,17 @@
-import csv
-import json
-import os
-from datetime import datetime, timedelta
+from collections import deque
+from collections.abc import Callable
+from datetime import datetime
+from typing import TYPE_CHECKING
 
-from tabulate import tabulate
-from tinydb import TinyDB
-
-from src import config
+from src import client, config, exporters, partitions, rollups
+from src.aggregates import get_stats_engine
 from src.logger import logger
+from src.pairs import default_pair, pair_of
+from src.storage import get_storage
+from src.timeutils import parse_duration
+
+if TYPE_CHECKING:
+    from src.series import PriceSeries
 
 
 # ANSI color codes
@@ -19,60 +23,132 @@ class Colors:
     ENDC = "\033[0m"
 
 
-# Garante que o diretório do banco de dados exista
-db_dir = os.path.dirname(config.DB_PATH)
-if db_dir:
-    os.makedirs(db_dir, exist_ok=True)
-
-db = TinyDB(config.DB_PATH)
-
+def print_table(rows: list[list], headers: list[str]) -> None:
+    """Imprime uma tabela no formato 'fancy_grid'."""
+    # Import local: só os comandos que exibem tabelas carregam o tabulate
+    from tabulate import tabulate
 
-def get_history(n: int = 10) -> list[dict]:
-    """Busca os últimos N registros de preço do banco de dados."""
-    all_records = sorted(db.all(), key=lambda x: x["timestamp"], reverse=True)
-    return all_records[:n]
+    print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
 
 
-def get_statistics() -> dict | None:
-    """Calcula estatísticas dos preços registrados nas últimas 24 horas."""
-    now = datetime.now()
-    twenty_four_hours_ago = now - timedelta(hours=24)
+def query(endpoint: str, local: Callable, **params):
+    """
+    Responde uma consulta pelo daemon, se houver um em execução, ou localmente.
 
-    all_records = db.all()
-    recent_records = [
-        rec
-        for rec in all_records
-        if datetime.fromisoformat(rec["timestamp"]) >= twenty_four_hours_ago
-    ]
-
-    if len(recent_records) < 2:
+    'local' é a função equivalente deste módulo, chamada com os mesmos
+    parâmetros nomeados que o daemon recebe.
+    """
+    try:
+        return client.query(endpoint, **params)
+    except client.DaemonUnavailable:
+        return local(**params)
+
+
+def get_history(
+    limit: int = 10,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+) -> list[dict]:
+    """Busca os últimos N registros de preço em [since, until) (de todos os pares, se 'pair' for None)."""
+    return get_storage().last(limit, since=since, until=until, pair=pair)
+
+
+def get_series(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int | None = None,
+    pair: str | None = None,
+) -> "PriceSeries":
+    """Carrega o intervalo [since, until) do par (padrão: o primeiro de PAIRS) em uma PriceSeries."""
+    # Import local: o NumPy só é carregado pelos comandos que analisam séries
+    from src.series import PriceSeries
+
+    storage = get_storage()
+    pair = pair or default_pair()
+    columns = storage.columns(pair, since=since, until=until)
+    if columns is not None:
+        if limit is not None:
+            columns = columns[max(0, len(columns) - limit) :]
+        return PriceSeries.from_columns(columns)
+    if limit is not None:
+        records = storage.last(limit, since=since, until=until, pair=pair)[::-1]
+    else:
+        records = storage.iter_range(since=since, until=until, pair=pair)
+    return PriceSeries.from_records(records)
+
+
+def get_statistics(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int | None = None,
+    window: str = "24h",
+    pair: str | None = None,
+    workers: int | None = None,
+) -> dict | None:
+    """
+    Calcula estatísticas dos preços da janela deslizante informada (padrão: 24h).
+
+    As janelas configuradas em STATS_WINDOWS são respondidas pelo motor
+    incremental em O(1). Com --since/--until/--limit, ou para janelas não
+    configuradas, as estatísticas são calculadas sobre o intervalo lido pelo
+    índice temporal do backend; com 'workers' maior que 1 (sem --limit), o
+    intervalo é particionado e processado em paralelo (ver src.partitions).
+    """
+    if since is None and until is None and limit is None:
+        engine = get_stats_engine(pair)
+        if window in engine.windows:
+            return engine.stats(window)
+
+    if since is None:
+        since = (until or datetime.now()) - parse_duration(window)
+    if limit is None and workers is not None and workers != 1:
+        return partitions.statistics(since, until, pair or default_pair(), workers)
+    return get_series(since, until, limit, pair).summary()
+
+
+def get_analysis(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    window: str = "24h",
+    rolling: int = 12,
+    pair: str | None = None,
+) -> dict | None:
+    """Calcula métricas vetorizadas (volatilidade, TWAP, percentis, média móvel) do período."""
+    if since is None:
+        since = (until or datetime.now()) - parse_duration(window)
+    series = get_series(since, until, pair=pair)
+    summary = series.summary()
+    if not summary:
         return None
 
-    prices_usd = [rec["price_usd"] for rec in recent_records]
-
-    # Ordena por timestamp para calcular a variação corretamente
-    recent_records.sort(key=lambda x: x["timestamp"])
-
-    first_price = recent_records[0]["price_usd"]
-    last_price = recent_records[-1]["price_usd"]
-
-    variation = (
-        ((last_price - first_price) / first_price) * 100 if first_price != 0 else 0
-    )
-
+    rolling_mean = series.rolling_mean(rolling)
     return {
-        "records_count": len(prices_usd),
-        "avg_price": sum(prices_usd) / len(prices_usd),
-        "min_price": min(prices_usd),
-        "max_price": max(prices_usd),
-        "variation_24h": variation,
+        **summary,
+        "twap": series.weighted_average(),
+        "volatility": series.volatility(),
+        "volatility_annualized": series.volatility(annualize=True),
+        "percentiles": series.percentile_bands(),
+        "rolling_mean": float(rolling_mean[-1]) if len(rolling_mean) else None,
     }
 
 
-def show_history() -> None:
-    """Mostra os últimos 10 registros de preço do banco de dados em uma tabela."""
+def format_brl(value: float | None) -> str:
+    """Formata um preço em reais; registros sem price_real (ex: NaN no backend binary) mostram '-'."""
+    return "-" if value is None else f"R${value:,.2f}"
+
+
+def show_history(
+    limit: int = 10,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+) -> None:
+    """Mostra os últimos registros de preço do banco de dados em uma tabela."""
     logger.info("Executando comando 'history'.")
-    history_data = get_history(10)
+    history_data = query(
+        "history", get_history, limit=limit, since=since, until=until, pair=pair
+    )
 
     if not history_data:
         print(
@@ -83,104 +159,346 @@ def show_history() -> None:
     table_data = [
         [
             record["timestamp"],
+            pair_of(record),
             f"${record['price_usd']:,.2f}",
-            f"R${record['price_real']:,.2f}",
+            format_brl(record.get("price_real")),
         ]
         for record in history_data
     ]
-    headers = ["Timestamp", "USD", "BRL"]
+    headers = ["Timestamp", "Par", "USD", "BRL"]
+    title = f"{pair} Price History" if pair else "Price History"
     print(
         f"\n{Colors.BLUE}╔{'═' * 40}╗\n"
-        f"║{'Bitcoin Price History':^40}║\n"
+        f"║{title:^40}║\n"
         f"╚{'═' * 40}╝"
         f"{Colors.ENDC}"
     )
-    print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
-
-
-def show_stats() -> None:
-    """Calcula e exibe estatísticas sobre os preços das últimas 24h."""
+    print_table(table_data, headers)
+
+
+def show_stats(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int | None = None,
+    window: str = "24h",
+    pair: str | None = None,
+    workers: int | None = None,
+) -> None:
+    """Calcula e exibe estatísticas sobre os preços da janela (padrão: 24h) ou do período informado."""
     logger.info("Executando comando 'stats'.")
-    stats = get_statistics()
+    pair = pair or default_pair()
+    workers = partitions.resolve_workers(workers)
+    params = dict(since=since, until=until, limit=limit, window=window, pair=pair)
+    try:
+        if workers > 1:
+            # O cálculo particionado é sempre local, no pool de processos
+            stats = get_statistics(**params, workers=workers)
+        else:
+            stats = query("stats", get_statistics, **params)
+    except ValueError as e:
+        print(f"{Colors.RED}{e}{Colors.ENDC}")
+        return
+    default_period = since is None and until is None
+    period = window if default_period else "Período"
 
     if not stats:
+        where = f"nas últimas {window}" if default_period else "no período informado"
         print(
-            f"{Colors.YELLOW}Nenhum registro nas últimas 24 horas para calcular estatísticas.{Colors.ENDC}"
+            f"{Colors.YELLOW}Nenhum registro {where} para calcular estatísticas.{Colors.ENDC}"
         )
         return
 
-    variation_str = f"{stats['variation_24h']:.2f}%"
-    color = Colors.GREEN if stats["variation_24h"] >= 0 else Colors.RED
+    variation_str = f"{stats['variation']:.2f}%"
+    color = Colors.GREEN if stats["variation"] >= 0 else Colors.RED
     colored_variation = f"{color}{variation_str}{Colors.ENDC}"
 
     table_data = [
-        ["Registros (24h)", stats["records_count"]],
+        [f"Registros ({period})", stats["records_count"]],
         ["Preço Médio (USD)", f"${stats['avg_price']:,.2f}"],
         ["Preço Mínimo (USD)", f"${stats['min_price']:,.2f}"],
         ["Preço Máximo (USD)", f"${stats['max_price']:,.2f}"],
-        ["Variação (24h)", colored_variation],
+        [f"Variação ({period})", colored_variation],
     ]
 
+    headers = [f"{Colors.BLUE}Métrica{Colors.ENDC}", f"{Colors.BLUE}Valor{Colors.ENDC}"]
+    title = (
+        f"Estatísticas {pair} (Últimas {window})"
+        if default_period
+        else f"Estatísticas {pair} (Período)"
+    )
+    print(
+        f"\n{Colors.BLUE}╔{'═' * 40}╗\n" f"║{title:^40}║\n" f"╚{'═' * 40}╝{Colors.ENDC}"
+    )
+    print_table(table_data, headers)
+
+
+def show_analysis(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    window: str = "24h",
+    rolling: int = 12,
+    pair: str | None = None,
+) -> None:
+    """Exibe as métricas de análise do período em uma tabela."""
+    logger.info("Executando comando 'analyze'.")
+    pair = pair or default_pair()
+    try:
+        analysis = get_analysis(
+            since=since, until=until, window=window, rolling=rolling, pair=pair
+        )
+    except ValueError as e:
+        print(f"{Colors.RED}{e}{Colors.ENDC}")
+        return
+
+    if not analysis:
+        print(
+            f"{Colors.YELLOW}Registros insuficientes no período para análise.{Colors.ENDC}"
+        )
+        return
+
+    table_data = [
+        ["Registros", analysis["records_count"]],
+        ["Preço Médio (USD)", f"${analysis['avg_price']:,.2f}"],
+        ["Preço Médio no Tempo - TWAP (USD)", f"${analysis['twap']:,.2f}"],
+        ["Preço Mínimo (USD)", f"${analysis['min_price']:,.2f}"],
+        ["Preço Máximo (USD)", f"${analysis['max_price']:,.2f}"],
+        ["Variação", f"{analysis['variation']:.2f}%"],
+        ["Volatilidade (por registro)", f"{analysis['volatility'] * 100:.4f}%"],
+        [
+            "Volatilidade (anualizada)",
+            f"{analysis['volatility_annualized'] * 100:.2f}%",
+        ],
+    ]
+    for pct, value in analysis["percentiles"].items():
+        table_data.append([f"Percentil {pct:g} (USD)", f"${value:,.2f}"])
+    if analysis["rolling_mean"] is not None:
+        table_data.append(
+            [f"Média Móvel ({rolling} registros)", f"${analysis['rolling_mean']:,.2f}"]
+        )
+
     headers = [f"{Colors.BLUE}Métrica{Colors.ENDC}", f"{Colors.BLUE}Valor{Colors.ENDC}"]
     print(
         f"\n{Colors.BLUE}╔{'═' * 40}╗\n"
-        f"║{'Estatísticas (Últimas 24h)':^40}║\n"
+        f"║{f'Análise de Preços {pair}':^40}║\n"
         f"╚{'═' * 40}╝{Colors.ENDC}"
     )
-    print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
-
+    print_table(table_data, headers)
+
+
+def get_candles(
+    interval: str = "1h",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int | None = None,
+    pair: str | None = None,
+) -> list[dict]:
+    """Busca os candles pré-agregados do par em [since, until), sem ler os ticks brutos."""
+    candles = get_storage().iter_candles(interval, since=since, until=until, pair=pair)
+    if limit is not None:
+        return list(deque(candles, maxlen=limit))
+    return list(candles)
+
+
+def show_candles(
+    interval: str = "1h",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int | None = 24,
+    pair: str | None = None,
+) -> None:
+    """Mostra os candles OHLC do intervalo em uma tabela."""
+    logger.info("Executando comando 'candles' (%s).", interval)
+    pair = pair or default_pair()
+    candles = query(
+        "candles",
+        get_candles,
+        interval=interval,
+        since=since,
+        until=until,
+        limit=limit,
+        pair=pair,
+    )
 
-def export_to_csv(filename: str = "prices.csv") -> None:
-    """Exporta todos os dados de preço para um arquivo CSV."""
-    logger.info(f"Executando exportação para CSV em '{filename}'.")
-    all_records = db.all()
-    if not all_records:
-        logger.warning("Nenhum registro encontrado para exportar.")
-        print(f"{Colors.YELLOW}Nenhum registro para exportar.{Colors.ENDC}")
+    if not candles:
+        print(f"{Colors.YELLOW}Nenhum candle encontrado no período.{Colors.ENDC}")
         return
 
+    table_data = [
+        [
+            candle["bucket"],
+            f"${candle['open']:,.2f}",
+            f"${candle['high']:,.2f}",
+            f"${candle['low']:,.2f}",
+            f"${candle['close']:,.2f}",
+            candle["count"],
+        ]
+        for candle in candles
+    ]
+    headers = ["Início", "Abertura", "Máxima", "Mínima", "Fechamento", "Registros"]
+    print(
+        f"\n{Colors.BLUE}╔{'═' * 40}╗\n"
+        f"║{f'Candles {interval} {pair} (USD)':^40}║\n"
+        f"╚{'═' * 40}╝{Colors.ENDC}"
+    )
+    print_table(table_data, headers)
+
+
+def rebuild_rollups(since: datetime | None = None) -> None:
+    """Reconstrói os candles a partir do histórico e informa o resultado."""
+    logger.info("Executando comando 'rollup'.")
+    processed = rollups.rebuild(since=since)
+    print(
+        f"Candles reconstruídos a partir de {processed} registros... {Colors.GREEN}✅{Colors.ENDC}"
+    )
+
+
+def run_backfill(
+    since: datetime,
+    until: datetime | None = None,
+    granularity: str = "1h",
+    pair: str | None = None,
+    workers: int | None = None,
+) -> None:
+    """Baixa o histórico de candles do período e informa quantos registros foram gravados."""
+    # Import local: o backfill depende do pipeline (cotações e cliente HTTP)
+    from src import backfill
+
+    pair = pair or default_pair()
+    logger.info("Executando comando 'backfill' (%s, %s).", pair, granularity)
     try:
-        with open(filename, "w", newline="") as csvfile:
-            fieldnames = ["timestamp", "price_usd", "price_real"]
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-            writer.writeheader()
-            for record in sorted(all_records, key=lambda x: x["timestamp"]):
-                writer.writerow(
-                    {
-                        "timestamp": record["timestamp"],
-                        "price_usd": record["price_usd"],
-                        "price_real": record["price_real"],
-                    }
-                )
-        logger.info(f"Dados exportados com sucesso para {filename}")
+        inserted = backfill.run(since, until, granularity, pair, workers)
+    except backfill.BackfillError as e:
+        logger.error("Backfill interrompido: %s", e)
         print(
-            f"Exportando {len(all_records)} registros para {filename}... {Colors.GREEN}✅{Colors.ENDC}"
+            f"{Colors.RED}Backfill interrompido: {e}{Colors.ENDC}\n"
+            "Execute o mesmo comando novamente para continuar do último checkpoint."
         )
+        return
+    print(
+        f"Backfill de {pair} concluído: {inserted} registros novos... "
+        f"{Colors.GREEN}✅{Colors.ENDC}"
+    )
+
+
+def run_compaction() -> None:
+    """Aplica a política de retenção agora e informa o que foi movido ou removido."""
+    # Import local: só o comando 'compact' precisa do arquivo frio
+    from src import retention
+
+    logger.info("Executando comando 'compact'.")
+    if not (config.RETENTION_RAW or config.RETENTION_CANDLES):
+        print(
+            f"{Colors.YELLOW}Nenhuma retenção configurada "
+            f"(RETENTION_RAW, RETENTION_CANDLES).{Colors.ENDC}"
+        )
+        return
+    try:
+        moved, pruned = retention.compact()
+    except ValueError as e:
+        logger.error("Política de retenção inválida: %s", e)
+        print(f"{Colors.RED}Política de retenção inválida: {e}{Colors.ENDC}")
+        return
+    destination = config.ARCHIVE_DIR or "descarte"
+    print(
+        f"{moved} ticks movidos para {destination} e {pruned} candles removidos... "
+        f"{Colors.GREEN}✅{Colors.ENDC}"
+    )
+
+
+def run_dedupe(bucket: str | None = None) -> None:
+    """Remove os registros duplicados do histórico e informa quantos foram removidos."""
+    from src import dedupe
+
+    logger.info("Executando comando 'dedupe'.")
+    try:
+        removed = dedupe.run(bucket)
+    except ValueError as e:
+        logger.error("Bucket de deduplicação inválido: %s", e)
+        print(f"{Colors.RED}Bucket de deduplicação inválido: {e}{Colors.ENDC}")
+        return
+    print(f"{removed} registros duplicados removidos... {Colors.GREEN}✅{Colors.ENDC}")
+
+
+def show_profile() -> None:
+    """Exibe o tempo acumulado de cada etapa medida nos histogramas desta execução."""
+    from src.metrics import REGISTRY
+
+    table_data = []
+    for metric in REGISTRY.collect():
+        if metric.kind != "histogram" or not metric.name.endswith("_seconds"):
+            continue
+        for values, child in sorted(metric.samples().items()):
+            if not child.count:
+                continue
+            labels = ", ".join(f"{n}={v}" for n, v in zip(metric.labelnames, values))
+            name = metric.name.removeprefix("etl_").removesuffix("_seconds")
+            table_data.append(
+                [
+                    f"{name} ({labels})" if labels else name,
+                    child.count,
+                    f"{child.sum * 1000:,.1f}",
+                    f"{child.sum / child.count * 1000:,.1f}",
+                ]
+            )
+
+    if not table_data:
+        print(f"{Colors.YELLOW}Nenhuma etapa medida.{Colors.ENDC}")
+        return
+    headers = ["Etapa", "Execuções", "Total (ms)", "Média (ms)"]
+    print(
+        f"\n{Colors.BLUE}╔{'═' * 40}╗\n║{'Perfil do Fetch':^40}║\n╚{'═' * 40}╝{Colors.ENDC}"
+    )
+    print_table(table_data, headers)
+
+
+def export_data(
+    fmt: str,
+    filename: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+    workers: int | None = None,
+    partitioned: bool = False,
+) -> None:
+    """
+    Exporta em streaming os dados de preço do período (e do par, se informado).
+
+    Com mais de um worker ou 'partitioned', o histórico é particionado e as
+    partições são gravadas em paralelo (ver src.partitions).
+    """
+    logger.info("Executando exportação para %s em '%s'.", fmt, filename)
+    try:
+        if partitioned or partitions.resolve_workers(workers) > 1:
+            count = partitions.export(
+                fmt, filename, since, until, pair, workers, partitioned
+            )
+        else:
+            count = exporters.export(get_storage(), fmt, filename, since, until, pair)
+    except exporters.ExportError as e:
+        logger.error("Erro ao exportar para %s: %s", fmt, e)
+        print(f"{Colors.RED}{e}{Colors.ENDC}")
+        return
     except IOError as e:
-        logger.error(f"Erro ao escrever no arquivo {filename}: {e}")
+        logger.error("Erro ao escrever no arquivo %s: %s", filename, e)
         print(f"{Colors.RED}Erro ao escrever no arquivo {filename}: {e}{Colors.ENDC}")
+        return
 
-
-def export_to_json(filename: str = "prices.json") -> None:
-    """Exporta todos os dados de preço para um arquivo JSON."""
-    logger.info(f"Executando exportação para JSON em '{filename}'.")
-    all_records = db.all()
-    if not all_records:
+    if count == 0:
         logger.warning("Nenhum registro encontrado para exportar.")
         print(f"{Colors.YELLOW}Nenhum registro para exportar.{Colors.ENDC}")
         return
 
-    try:
-        # Ordena os registros por timestamp para consistência
-        sorted_records = sorted(all_records, key=lambda x: x["timestamp"])
-        with open(filename, "w") as jsonfile:
-            json.dump(sorted_records, jsonfile, indent=4)
+    logger.info("Dados exportados com sucesso para %s", filename)
+    print(
+        f"Exportando {count} registros para {filename}... {Colors.GREEN}✅{Colors.ENDC}"
+    )
 
-        logger.info(f"Dados exportados com sucesso para {filename}")
-        print(
-            f"Exportando {len(all_records)} registros para {filename}... {Colors.GREEN}✅{Colors.ENDC}"
-        )
-    except IOError as e:
-        logger.error(f"Erro ao escrever no arquivo {filename}: {e}")
-        print(f"{Colors.RED}Erro ao escrever no arquivo {filename}: {e}{Colors.ENDC}")
+
+def export_to_csv(filename: str = "prices.csv") -> None:
+    """Exporta todos os dados de preço para um arquivo CSV."""
+    export_data("csv", filename)
+
+
+def export_to_json(filename: str = "prices.json") -> None:
+    """Exporta todos os dados de preço para um arquivo JSON."""
+    export_data("json", filename)
@@ -0,0 +1,69 @@
+import json
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+
+from src import config
+from src.logger import logger
+
+
+class DaemonUnavailable(Exception):
+    """Nenhum daemon respondendo; a consulta deve ser feita localmente."""
+
+
+def daemon_url() -> str | None:
+    """Endereço do daemon em execução, lido de DAEMON_STATE_PATH (None se não houver)."""
+    try:
+        with open(config.DAEMON_STATE_PATH) as f:
+            return json.load(f)["url"]
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Arquivo de estado do daemon inválido, ignorando: %s", e)
+        return None
+
+
+def query(endpoint: str, **params):
+    """
+    Executa uma consulta ('history', 'stats' ou 'candles') no daemon.
+
+    Parâmetros None são omitidos e datetimes são enviados em ISO 8601.
+
+    Returns:
+        O corpo JSON da resposta.
+
+    Raises:
+        DaemonUnavailable: Se não houver daemon em execução ou ele não responder.
+        ValueError: Se o daemon rejeitar os parâmetros da consulta.
+    """
+    url = daemon_url()
+    if url is None:
+        raise DaemonUnavailable("Nenhum daemon em execução.")
+    query_string = urlencode(
+        {
+            name: value.isoformat() if isinstance(value, datetime) else value
+            for name, value in params.items()
+            if value is not None
+        }
+    )
+    # Conexão HTTP direta: sem proxies do ambiente nem carga do módulo ssl.
+    # Import local: sem daemon, a CLI não precisa do http.client
+    from http.client import HTTPConnection, HTTPException
+
+    address = urlparse(url)
+    conn = HTTPConnection(address.hostname, address.port, timeout=config.DAEMON_TIMEOUT)
+    try:
+        conn.request("GET", f"/{endpoint}?{query_string}")
+        response = conn.getresponse()
+        body = json.loads(response.read())
+    except (OSError, HTTPException, ValueError) as e:
+        logger.debug("Daemon em %s indisponível: %s", url, e)
+        raise DaemonUnavailable(str(e)) from e
+    finally:
+        conn.close()
+
+    if response.status == 400:
+        raise ValueError(body["error"])
+    if response.status != 200:
+        logger.warning("Daemon respondeu %s para '%s'.", response.status, endpoint)
+        raise DaemonUnavailable(f"HTTP {response.status}")
+    return body
@@ -2,12 +2,40 @@ import os
 
 from dotenv import load_dotenv
 
+from src.timeutils import parse_duration
+
 # Carrega as variáveis de ambiente do arquivo .env
 load_dotenv()
 
+
+def _duration_list(name: str, default: str) -> list[str]:
+    """Lê uma lista de durações separadas por vírgula, ignorando as inválidas."""
+    values = [v.strip() for v in os.getenv(name, default).split(",") if v.strip()]
+    valid = []
+    for value in values:
+        try:
+            parse_duration(value)
+        except ValueError:
+            print(f"Aviso: {name} com duração inválida ({value}). Ignorando-a.")
+            continue
+        valid.append(value)
+    return valid or default.split(",")
+
+
 # Configurações da API
 API_URL = os.getenv("API_URL", "https://api.coinbase.com/v2/prices/spot")
 CURRENCY = os.getenv("CURRENCY", "USD")
+# Endpoint de preço por par (ATIVO-MOEDA), usado para ativos além do BTC
+PAIR_API_URL = os.getenv(
+    "PAIR_API_URL", "https://api.coinbase.com/v2/prices/{pair}/spot"
+)
+
+# Pares coletados a cada execução (ex: BTC-USD,ETH-USD,BTC-EUR)
+PAIRS = [
+    p.strip().upper()
+    for p in os.getenv("PAIRS", f"BTC-{CURRENCY}").split(",")
+    if p.strip()
+]
 
 # Configurações de processamento de dados
 try:
@@ -22,11 +50,142 @@ EXCHANGE_RATE_API_URL = os.getenv(
     "EXCHANGE_RATE_API_URL", "https://api.exchangerate-api.com/v4/latest/USD"
 )
 
+# Cache da cotação de câmbio (a cotação muda bem mais devagar que o preço do BTC)
+try:
+    # Tempo, em segundos, em que a cotação em cache é considerada atual
+    RATE_CACHE_TTL = float(os.getenv("RATE_CACHE_TTL", "3600"))
+except ValueError:
+    print("Aviso: RATE_CACHE_TTL não é um número válido. Usando o padrão 3600.")
+    RATE_CACHE_TTL = 3600.0
+
 # Configurações de Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Arquivo de log, gravado em segundo plano (fila + thread), e seu nível
+LOG_FILE = os.getenv("LOG_FILE", "logs/app.log")
+LOG_FILE_LEVEL = os.getenv("LOG_FILE_LEVEL", "INFO").upper()
+# Formato do arquivo: text ou json (uma linha JSON por mensagem)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+# Rotação do arquivo: size (por tamanho), time (por horário, ver LOG_ROTATE_WHEN) ou none
+LOG_ROTATE = os.getenv("LOG_ROTATE", "size").lower()
+LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "midnight")
+# Comprime os arquivos rotacionados com gzip
+LOG_COMPRESS = os.getenv("LOG_COMPRESS", "true").lower() in ("1", "true", "yes")
+try:
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+except ValueError:
+    print("Aviso: configuração de rotação de logs inválida. Usando os padrões.")
+    LOG_MAX_BYTES, LOG_BACKUP_COUNT = 10 * 1024 * 1024, 5
 
 # Configurações do Banco de Dados
-DB_PATH = os.getenv("DB_PATH", "db/db.json")
+# Backends disponíveis: tinydb (legado), sqlite (WAL), jsonl (append-only) e
+# binary (registros de largura fixa lidos via mmap)
+DB_BACKEND = os.getenv("DB_BACKEND", "tinydb").lower()
+_DEFAULT_DB_PATHS = {
+    "tinydb": "db/db.json",
+    "sqlite": "db/prices.db",
+    "jsonl": "db/prices.jsonl",
+    "binary": "db/ticks",
+}
+DB_PATH = os.getenv("DB_PATH", _DEFAULT_DB_PATHS.get(DB_BACKEND, "db/db.json"))
+
+# Arquivo da última cotação de câmbio válida, reaproveitada entre execuções
+RATE_CACHE_PATH = os.getenv(
+    "RATE_CACHE_PATH", os.path.join(os.path.dirname(DB_PATH), "rate_cache.json")
+)
+
+# Configurações das estatísticas incrementais
+# Janelas mantidas a cada inserção (ex: 1h,24h,7d,30d)
+STATS_WINDOWS = _duration_list("STATS_WINDOWS", "1h,24h,7d,30d")
+# Resoluções dos candles OHLC mantidos a cada inserção
+ROLLUP_INTERVALS = _duration_list("ROLLUP_INTERVALS", "1m,5m,1h,1d")
+# Snapshot das janelas, para que um 'stats' a frio não releia o histórico
+STATS_SNAPSHOT_PATH = os.getenv(
+    "STATS_SNAPSHOT_PATH", f"{os.path.splitext(DB_PATH)[0]}.stats.json"
+)
+# Intervalo mínimo entre regravações do snapshot (ele tem os ticks da maior janela)
+STATS_SNAPSHOT_INTERVAL = os.getenv("STATS_SNAPSHOT_INTERVAL", "5m")
+try:
+    parse_duration(STATS_SNAPSHOT_INTERVAL)
+except ValueError:
+    print(
+        "Aviso: STATS_SNAPSHOT_INTERVAL não é uma duração válida. Usando o padrão 5m."
+    )
+    STATS_SNAPSHOT_INTERVAL = "5m"
+
+# Retenção e arquivamento do histórico
+# Tempo que os ticks brutos ficam no banco (ex: 90d); vazio mantém para sempre
+RETENTION_RAW = os.getenv("RETENTION_RAW", "")
+# Retenção dos candles por resolução (ex: "1m=7d,5m=90d"); as demais ficam para sempre
+RETENTION_CANDLES = os.getenv("RETENTION_CANDLES", "")
+# Segmentos comprimidos com os ticks que saem do banco; vazio descarta esses ticks
+ARCHIVE_DIR = os.getenv(
+    "ARCHIVE_DIR", os.path.join(os.path.dirname(DB_PATH), "archive")
+)
+# Frequência da compactação no agendador e ticks movidos por lote
+COMPACTION_INTERVAL = os.getenv("COMPACTION_INTERVAL", "1h")
+try:
+    parse_duration(COMPACTION_INTERVAL)
+except ValueError:
+    print("Aviso: COMPACTION_INTERVAL não é uma duração válida. Usando o padrão 1h.")
+    COMPACTION_INTERVAL = "1h"
+try:
+    COMPACTION_BATCH_SIZE = int(os.getenv("COMPACTION_BATCH_SIZE", "10000"))
+except ValueError:
+    print(
+        "Aviso: COMPACTION_BATCH_SIZE não é um inteiro válido. Usando o padrão 10000."
+    )
+    COMPACTION_BATCH_SIZE = 10000
+
+# Alertas avaliados a cada execução do pipeline
+# Regras separadas por ';', ex: "BTC-USD > 70000; BTC-USD < 60000; ETH-USD +3%/15m"
+ALERT_RULES = os.getenv("ALERT_RULES", "")
+# Arquivo com uma regra por linha (somadas às de ALERT_RULES)
+ALERT_RULES_FILE = os.getenv("ALERT_RULES_FILE", "")
+# Destinos dos alertas: stdout, file e/ou webhook
+ALERT_SINKS = [
+    s.strip().lower()
+    for s in os.getenv("ALERT_SINKS", "stdout").split(",")
+    if s.strip()
+]
+ALERT_WEBHOOK_URL = os.getenv("ALERT_WEBHOOK_URL", "")
+ALERT_FILE = os.getenv("ALERT_FILE", "logs/alerts.jsonl")
+# Tempo mínimo entre dois disparos da mesma regra
+ALERT_COOLDOWN = os.getenv("ALERT_COOLDOWN", "15m")
+try:
+    parse_duration(ALERT_COOLDOWN)
+except ValueError:
+    print("Aviso: ALERT_COOLDOWN não é uma duração válida. Usando o padrão 15m.")
+    ALERT_COOLDOWN = "15m"
+# Último disparo de cada regra, para respeitar o cooldown entre execuções
+ALERT_STATE_PATH = os.getenv(
+    "ALERT_STATE_PATH", os.path.join(os.path.dirname(DB_PATH), "alerts.json")
+)
+
+# Ingestão contínua pelo feed WebSocket (comando 'stream')
+STREAM_URL = os.getenv("STREAM_URL", "wss://ws-feed.exchange.coinbase.com")
+# Intervalo em que os ticks de cada par são agregados em um registro
+STREAM_INTERVAL = os.getenv("STREAM_INTERVAL", "10s")
+# Sem ticks de um par por esse tempo, o par é buscado pelo REST até o feed voltar
+STREAM_STALE_AFTER = os.getenv("STREAM_STALE_AFTER", "30s")
+# Espera máxima entre tentativas de reconexão ao feed
+STREAM_RECONNECT_MAX = os.getenv("STREAM_RECONNECT_MAX", "30s")
+
+# Gravação idempotente: um registro por par e bucket de DEDUPE_BUCKET (vazio ou 0 desativa)
+DEDUPE_BUCKET = os.getenv("DEDUPE_BUCKET", "1s")
+# Janela de chaves recentes mantida em memória; anteriores são conferidas no banco
+DEDUPE_WINDOW = os.getenv("DEDUPE_WINDOW", "1h")
+try:
+    if DEDUPE_BUCKET.strip() not in ("", "0"):
+        parse_duration(DEDUPE_BUCKET)
+except ValueError:
+    print("Aviso: DEDUPE_BUCKET não é uma duração válida. Usando o padrão 1s.")
+    DEDUPE_BUCKET = "1s"
+try:
+    parse_duration(DEDUPE_WINDOW)
+except ValueError:
+    print("Aviso: DEDUPE_WINDOW não é uma duração válida. Usando o padrão 1h.")
+    DEDUPE_WINDOW = "1h"
 
 # Configurações de Requisição
 try:
@@ -36,6 +195,120 @@ except ValueError:
     print("Aviso: REQUEST_TIMEOUT não é um inteiro válido. Usando o padrão 5.")
     REQUEST_TIMEOUT = 5
 
+try:
+    # Tamanho do pool de conexões HTTP (e de threads de requisição)
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+except ValueError:
+    print("Aviso: HTTP_POOL_SIZE não é um inteiro válido. Usando o padrão 10.")
+    HTTP_POOL_SIZE = 10
+
+try:
+    # Máximo de requisições de preço simultâneas por execução
+    FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "4"))
+except ValueError:
+    print("Aviso: FETCH_CONCURRENCY não é um inteiro válido. Usando o padrão 4.")
+    FETCH_CONCURRENCY = 4
+
+try:
+    # Registros acumulados antes de cada gravação em lote (1 desativa o buffer)
+    WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "100"))
+except ValueError:
+    print("Aviso: WRITE_BATCH_SIZE não é um inteiro válido. Usando o padrão 100.")
+    WRITE_BATCH_SIZE = 100
+
+try:
+    # Tempo máximo (s) que um registro espera no buffer antes de ser gravado
+    WRITE_FLUSH_SECONDS = float(os.getenv("WRITE_FLUSH_SECONDS", "1.0"))
+except ValueError:
+    print("Aviso: WRITE_FLUSH_SECONDS não é um número válido. Usando o padrão 1.0.")
+    WRITE_FLUSH_SECONDS = 1.0
+
+# Resiliência das requisições HTTP
+try:
+    # Novas tentativas em falhas de rede, 429 e 5xx (com backoff exponencial e jitter)
+    FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "2"))
+    FETCH_BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", "0.25"))
+    FETCH_BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX", "5"))
+    # Falhas seguidas que abrem o disjuntor de um provedor e tempo até novo teste (s)
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+    BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+except ValueError:
+    print("Aviso: configuração de resiliência inválida. Usando os padrões.")
+    FETCH_RETRIES, FETCH_BACKOFF_BASE, FETCH_BACKOFF_MAX = 2, 0.25, 5.0
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS = 5, 30.0
+
+# Fonte secundária de preço, consultada em paralelo (hedge) quando a primária
+# demora mais que HEDGE_AFTER_SECONDS (0 desativa)
+SECONDARY_PRICE_API_URL = os.getenv(
+    "SECONDARY_PRICE_API_URL",
+    "https://api.exchange.coinbase.com/products/{pair}/ticker",
+)
+try:
+    HEDGE_AFTER_SECONDS = float(os.getenv("HEDGE_AFTER_SECONDS", "0"))
+except ValueError:
+    print("Aviso: HEDGE_AFTER_SECONDS não é um número válido. Usando o padrão 0.")
+    HEDGE_AFTER_SECONDS = 0.0
+
+# Agregação de preços de várias fontes (ver providers.PROVIDERS)
+# Fontes desconhecidas são ignoradas, com um aviso, na primeira busca
+PRICE_SOURCES = [
+    s.strip().lower()
+    for s in os.getenv("PRICE_SOURCES", "coinbase").split(",")
+    if s.strip()
+]
+# Agregação das cotações aceitas: median ou trimmed_mean
+PRICE_AGGREGATIONS = ("median", "trimmed_mean")
+PRICE_AGGREGATION = os.getenv("PRICE_AGGREGATION", "median").lower()
+if PRICE_AGGREGATION not in PRICE_AGGREGATIONS:
+    print("Aviso: PRICE_AGGREGATION inválida. Usando o padrão median.")
+    PRICE_AGGREGATION = "median"
+try:
+    # Desvio máximo em relação à mediana antes de descartar uma cotação (0.02 = 2%)
+    PRICE_MAX_DEVIATION = float(os.getenv("PRICE_MAX_DEVIATION", "0.02"))
+    # Prazo total (s) para as fontes responderem, independente de quantas sejam
+    PRICE_SOURCE_DEADLINE = float(os.getenv("PRICE_SOURCE_DEADLINE", "2.0"))
+    # Mínimo de cotações aceitas para gravar um preço
+    PRICE_MIN_SOURCES = int(os.getenv("PRICE_MIN_SOURCES", "1"))
+except ValueError:
+    print("Aviso: configuração de agregação de preços inválida. Usando os padrões.")
+    PRICE_MAX_DEVIATION, PRICE_SOURCE_DEADLINE, PRICE_MIN_SOURCES = 0.02, 2.0, 1
+
+# Backfill: endpoint de candles históricos (API da Coinbase Exchange)
+BACKFILL_API_URL = os.getenv(
+    "BACKFILL_API_URL", "https://api.exchange.coinbase.com/products/{pair}/candles"
+)
+
+try:
+    # Requisições por segundo permitidas durante o backfill (token bucket)
+    BACKFILL_RATE_LIMIT = float(os.getenv("BACKFILL_RATE_LIMIT", "5"))
+except ValueError:
+    print("Aviso: BACKFILL_RATE_LIMIT não é um número válido. Usando o padrão 5.")
+    BACKFILL_RATE_LIMIT = 5.0
+
+try:
+    # Downloads simultâneos durante o backfill
+    BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+except ValueError:
+    print("Aviso: BACKFILL_WORKERS não é um inteiro válido. Usando o padrão 4.")
+    BACKFILL_WORKERS = 4
+
+try:
+    # Processos usados por export e stats sobre o histórico particionado (0 = núcleos)
+    PARTITION_WORKERS = int(os.getenv("PARTITION_WORKERS", "1"))
+except ValueError:
+    print("Aviso: PARTITION_WORKERS não é um inteiro válido. Usando o padrão 1.")
+    PARTITION_WORKERS = 1
+# Tamanho das partições: "month" (meses do calendário) ou uma duração (ex: 7d)
+PARTITION_SPAN = os.getenv("PARTITION_SPAN", "month")
+
+# Endpoint /metrics (formato do Prometheus) exposto pelo agendador; porta 0 desativa
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+try:
+    METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+except ValueError:
+    print("Aviso: METRICS_PORT não é um inteiro válido. Usando o padrão 9108.")
+    METRICS_PORT = 9108
+
 # Configurações do Agendador
 try:
     # Converte o intervalo do agendador para inteiro
@@ -43,3 +316,40 @@ try:
 except ValueError:
     print("Aviso: SCHEDULE_MINUTES não é um inteiro válido. Usando o padrão 5.")
     SCHEDULE_MINUTES = 5
+
+try:
+    # Intervalo do agendador em segundos; permite intervalos menores que 1 minuto
+    SCHEDULE_SECONDS = float(os.getenv("SCHEDULE_SECONDS", SCHEDULE_MINUTES * 60))
+    if SCHEDULE_SECONDS <= 0:
+        raise ValueError
+except ValueError:
+    print("Aviso: SCHEDULE_SECONDS não é um número positivo. Usando SCHEDULE_MINUTES.")
+    SCHEDULE_SECONDS = float(SCHEDULE_MINUTES * 60)
+
+try:
+    # Atraso aleatório máximo (s) somado a cada tick, para não sincronizar clientes
+    SCHEDULE_JITTER = float(os.getenv("SCHEDULE_JITTER", "0"))
+except ValueError:
+    print("Aviso: SCHEDULE_JITTER não é um número válido. Usando o padrão 0.")
+    SCHEDULE_JITTER = 0.0
+
+# Jobs com cadências diferentes no mesmo processo, ex: "BTC-USD@10s;ETH-USD,BTC-EUR@5m"
+# (vazio: um único job com todos os PAIRS a cada SCHEDULE_SECONDS)
+SCHEDULE_JOBS = os.getenv("SCHEDULE_JOBS", "")
+
+# Agendador: "async" (alinhado ao relógio, sem sobreposição) ou "legacy"
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "async").lower()
+
+# Daemon ('serve'): API local de consulta (history, stats, candles)
+DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+try:
+    DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+    # Tempo máximo (s) que a CLI espera a resposta do daemon antes de consultar localmente
+    DAEMON_TIMEOUT = float(os.getenv("DAEMON_TIMEOUT", "2.0"))
+except ValueError:
+    print("Aviso: configuração do daemon inválida. Usando os padrões.")
+    DAEMON_PORT, DAEMON_TIMEOUT = 8765, 2.0
+# Endereço do daemon em execução; a CLI só tenta usá-lo se este arquivo existir
+DAEMON_STATE_PATH = os.getenv(
+    "DAEMON_STATE_PATH", os.path.join(os.path.dirname(DB_PATH), "daemon.json")
+)
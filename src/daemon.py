@@ -0,0 +1,199 @@
+import json
+import os
+import signal
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from src import aggregates, cli, config, scheduler
+from src.aggregates import get_stats_engine
+from src.logger import logger
+from src.metrics import CONTENT_TYPE, DAEMON_REQUEST_SECONDS, exposition
+from src.pairs import format_pair, parse_pair
+from src.pipeline import storage_lock
+from src.storage import get_storage
+from src.timeutils import parse_time
+
+
+def _interval(value: str) -> str:
+    if value not in config.ROLLUP_INTERVALS:
+        raise ValueError(
+            f"Intervalo inválido: '{value}'. "
+            f"Use um de: {', '.join(config.ROLLUP_INTERVALS)}."
+        )
+    return value
+
+
+# Parâmetros aceitos nas consultas e seus conversores
+PARAMS = {
+    "since": parse_time,
+    "until": parse_time,
+    "limit": int,
+    "pair": lambda value: format_pair(*parse_pair(value)),
+    "window": str,
+    "interval": _interval,
+}
+
+# Endpoints -> consultas da CLI, chamadas com os mesmos parâmetros nomeados
+ROUTES = {
+    "/history": cli.get_history,
+    "/stats": cli.get_statistics,
+    "/candles": cli.get_candles,
+}
+
+
+def parse_params(query: str) -> dict:
+    """
+    Converte a query string de uma consulta nos argumentos da função da CLI.
+
+    Raises:
+        ValueError: Se algum parâmetro for desconhecido ou inválido.
+    """
+    params = {}
+    for name, values in parse_qs(query).items():
+        if name not in PARAMS:
+            raise ValueError(f"Parâmetro desconhecido: '{name}'.")
+        params[name] = PARAMS[name](values[-1])
+    return params
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    """Atende as consultas da CLI a partir dos dados já carregados em memória."""
+
+    server_version = "etl-daemon"
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._reply(200, {"status": "ok", "pid": os.getpid()})
+            return
+        if url.path == "/metrics":
+            self._send(200, exposition().encode(), CONTENT_TYPE)
+            return
+        route = ROUTES.get(url.path)
+        if route is None:
+            self._reply(404, {"error": f"Endpoint desconhecido: '{url.path}'."})
+            return
+
+        with DAEMON_REQUEST_SECONDS.labels(endpoint=url.path.strip("/")).time():
+            try:
+                params = parse_params(url.query)
+                with storage_lock:
+                    refresh()
+                    status, body = 200, route(**params)
+            except ValueError as e:
+                status, body = 400, {"error": str(e)}
+            except Exception:
+                logger.exception("Erro ao atender a consulta '%s'.", self.path)
+                status, body = 500, {"error": "Erro interno do daemon."}
+            self._reply(status, body)
+
+    def _reply(self, status: int, body) -> None:
+        self._send(status, json.dumps(body, default=str).encode(), "application/json")
+
+    def _send(self, status: int, payload: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug("Daemon: %s", format % args)
+
+
+class QueryServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_server(host: str | None = None, port: int | None = None) -> QueryServer:
+    """Inicia a API de consulta em uma thread e retorna o servidor."""
+    server = QueryServer(
+        (host or config.DAEMON_HOST, config.DAEMON_PORT if port is None else port),
+        QueryHandler,
+    )
+    threading.Thread(
+        target=server.serve_forever, name="etl-daemon", daemon=True
+    ).start()
+    return server
+
+
+def write_state(url: str) -> None:
+    """Publica o endereço do daemon em DAEMON_STATE_PATH, onde a CLI o procura."""
+    directory = os.path.dirname(config.DAEMON_STATE_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{config.DAEMON_STATE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"url": url, "pid": os.getpid()}, f)
+    os.replace(tmp_path, config.DAEMON_STATE_PATH)
+
+
+def remove_state() -> None:
+    if os.path.exists(config.DAEMON_STATE_PATH):
+        os.remove(config.DAEMON_STATE_PATH)
+
+
+def warm_up() -> None:
+    """Carrega o histórico, as janelas de estatísticas e os candles de cada par."""
+    storage = get_storage()
+    for pair in config.PAIRS:
+        get_stats_engine(pair)
+        for interval in config.ROLLUP_INTERVALS:
+            # Consome o primeiro candle: em alguns backends a leitura é preguiçosa
+            next(iter(storage.iter_candles(interval, pair=pair)), None)
+
+
+def refresh() -> None:
+    """
+    Torna visíveis as gravações de outros processos antes de uma consulta.
+
+    Com 'serve --no-schedule' (ou um 'fetch' ao lado do daemon), os registros
+    são gravados por outro processo: os índices em memória dos backends são
+    recarregados se o arquivo mudou, e as janelas de estatísticas aplicam os
+    registros novos.
+    """
+    if get_storage().refresh():
+        logger.debug("Armazenamento alterado por outro processo; índices recarregados.")
+    aggregates.catch_up()
+
+
+def _wait_for_signal() -> None:
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda signum, frame: stop.set())
+    stop.wait()
+
+
+def run(
+    host: str | None = None, port: int | None = None, schedule: bool = True
+) -> None:
+    """
+    Executa o daemon: a API de consulta e, com 'schedule', o agendador do ETL.
+
+    Os dados ficam em memória no processo, e as gravações dos jobs agendados
+    atualizam o mesmo armazenamento que atende as consultas. Enquanto o daemon
+    estiver em execução, os comandos history, stats e candles da CLI são
+    respondidos por ele.
+    """
+    logger.info("Carregando dados do daemon.")
+    warm_up()
+    server = start_server(host, port)
+    write_state(server.url)
+    logger.info("Daemon atendendo consultas em %s.", server.url)
+    try:
+        if schedule:
+            # As métricas já são servidas em /metrics pela API do daemon
+            scheduler.start(metrics=False)
+        else:
+            _wait_for_signal()
+    finally:
+        remove_state()
+        server.shutdown()
+        server.server_close()
+        logger.info("Daemon encerrado.")
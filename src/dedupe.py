@@ -0,0 +1,219 @@
+from collections import deque
+from datetime import datetime
+
+from src import aggregates, config, rollups
+from src.logger import logger
+from src.metrics import RECORDS_DEDUPED
+from src.pairs import pair_of
+from src.rollups import bucket_start
+from src.storage import Storage, get_storage
+from src.timeutils import parse_duration, to_epoch
+
+Key = tuple[str, float]
+
+
+def bucket_span(value: str | None = None) -> float:
+    """Tamanho do bucket de deduplicação em segundos (0 desativa), de DEDUPE_BUCKET."""
+    value = config.DEDUPE_BUCKET if value is None else value
+    if not value or value.strip() == "0":
+        return 0.0
+    return parse_duration(value).total_seconds()
+
+
+def dedupe_key(record: dict, span: float) -> Key:
+    """Chave de idempotência do registro: o par e o início do bucket do seu timestamp."""
+    return pair_of(record), bucket_start(to_epoch(record["timestamp"]), span)
+
+
+class DedupeIndex:
+    """
+    Índice em memória (hash) das chaves gravadas recentemente.
+
+    Guarda as chaves dos registros da última 'window' em um set, para que a
+    checagem de cada registro novo seja O(1) em vez de uma consulta ao banco.
+    É carregado do armazenamento no primeiro uso e, a cada lote, relê os
+    registros gravados desde o último visto, o que cobre outro processo
+    gravando no mesmo banco (ex: dois agendadores sobrepostos). Registros
+    anteriores à janela são conferidos direto no banco, pelo intervalo do
+    bucket.
+    """
+
+    def __init__(self, span: float, window: float) -> None:
+        self.span = span
+        self.window = window
+        self.keys: set[Key] = set()
+        # Chaves em ordem de inserção, para descartar as que saem da janela
+        self.order: deque[Key] = deque()
+        self.storage: Storage | None = None
+        self.since = 0.0
+        self.synced = 0.0
+
+    def _add(self, key: Key) -> None:
+        if key not in self.keys:
+            self.keys.add(key)
+            self.order.append(key)
+        self.synced = max(self.synced, key[1])
+
+    def _load(self, storage: Storage) -> None:
+        """Recarrega as chaves da janela a partir do armazenamento."""
+        self.storage = storage
+        self.keys.clear()
+        self.order.clear()
+        self.since = self.synced = datetime.now().timestamp() - self.window
+        self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Aplica os registros gravados (por qualquer processo) desde o último visto."""
+        since = datetime.fromtimestamp(self.synced - self.span)
+        for record in self.storage.iter_range(since=since):
+            self._add(dedupe_key(record, self.span))
+
+    def _evict(self) -> None:
+        cutoff = self.synced - self.window
+        while self.order and self.order[0][1] < cutoff:
+            self.keys.discard(self.order.popleft())
+        self.since = max(self.since, cutoff)
+
+    def _stored(self, keys: list[Key]) -> set[Key]:
+        """
+        Chaves já gravadas entre as anteriores à janela do índice.
+
+        Lê do banco, uma vez por par, o intervalo coberto por elas (ex: um
+        trecho de backfill), em vez de uma consulta por registro.
+        """
+        bounds: dict[str, tuple[float, float]] = {}
+        for pair, start in keys:
+            low, high = bounds.get(pair, (start, start))
+            bounds[pair] = (min(low, start), max(high, start))
+        stored = set()
+        for pair, (low, high) in bounds.items():
+            for record in self.storage.iter_range(
+                since=datetime.fromtimestamp(low),
+                until=datetime.fromtimestamp(high + self.span),
+                pair=pair,
+            ):
+                stored.add(dedupe_key(record, self.span))
+        return stored
+
+    def filter(
+        self, storage: Storage, records: list[dict]
+    ) -> tuple[list[dict], list[dict]]:
+        """
+        Separa os registros de um lote em novos e duplicados.
+
+        Duplicados dentro do próprio lote também são detectados (vale o
+        primeiro). As chaves dos novos só entram no índice após a gravação
+        (ver add): se ela falhar, a nova tentativa do lote não é descartada.
+
+        Returns:
+            tuple[list[dict], list[dict]]: Os registros novos e os duplicados.
+        """
+        if storage is not self.storage:
+            self._load(storage)
+        else:
+            self._catch_up()
+        keys = [dedupe_key(record, self.span) for record in records]
+        stored = self._stored([key for key in keys if key[1] < self.since])
+        batch: set[Key] = set()
+        new, duplicates = [], []
+        for record, key in zip(records, keys):
+            if key in self.keys or key in batch or key in stored:
+                duplicates.append(record)
+                continue
+            batch.add(key)
+            new.append(record)
+        return new, duplicates
+
+    def add(self, records: list[dict]) -> None:
+        """Registra as chaves de registros já gravados no banco."""
+        for record in records:
+            self._add(dedupe_key(record, self.span))
+        self._evict()
+
+
+_index: DedupeIndex | None = None
+
+
+def get_dedupe_index() -> DedupeIndex | None:
+    """Retorna o índice de deduplicação configurado, ou None se desativado."""
+    global _index
+    if _index is None:
+        span = bucket_span()
+        if not span:
+            return None
+        window = parse_duration(config.DEDUPE_WINDOW).total_seconds()
+        _index = DedupeIndex(span, max(window, span))
+    return _index
+
+
+def filter_new(storage: Storage, records: list[dict]) -> list[dict]:
+    """
+    Descarta os registros cujo par e bucket já estão gravados.
+
+    A gravação fica idempotente: reexecuções, retentativas e processos
+    sobrepostos não duplicam registros. Vale o primeiro registro do bucket,
+    que já alimentou estatísticas, candles e alertas.
+    """
+    index = get_dedupe_index()
+    if index is None or not records:
+        return records
+    new, duplicates = index.filter(storage, records)
+    for record in duplicates:
+        RECORDS_DEDUPED.labels(pair=pair_of(record)).inc()
+    if duplicates:
+        logger.warning(
+            "%s registros duplicados descartados (mesmo par e bucket de %ss).",
+            len(duplicates),
+            index.span,
+        )
+    return new
+
+
+def records_inserted(records: list[dict]) -> None:
+    """Atualiza o índice após a gravação de um lote filtrado por filter_new."""
+    if _index is not None and records:
+        _index.add(records)
+
+
+def reset() -> None:
+    """Descarta o índice (ex: após mudar o config ou limpar o histórico)."""
+    global _index
+    _index = None
+
+
+def dedupe_history(storage: Storage, span: float) -> list[dict]:
+    """
+    Remove do histórico os registros que repetem o par e o bucket de um
+    registro anterior, em uma única passada em ordem de tempo.
+
+    Returns:
+        list[dict]: Os registros removidos.
+    """
+    removed = storage.drop_duplicates(lambda record: dedupe_key(record, span))
+    reset()
+    return removed
+
+
+def run(bucket: str | None = None) -> int:
+    """
+    Limpa o histórico do armazenamento configurado (comando 'dedupe') e
+    reconstrói as estatísticas e os candles afetados.
+
+    Returns:
+        int: Quantidade de registros removidos.
+
+    Raises:
+        ValueError: Se o bucket for inválido ou estiver desativado.
+    """
+    span = bucket_span(bucket)
+    if not span:
+        raise ValueError("informe um bucket (--bucket ou DEDUPE_BUCKET)")
+    logger.info("Removendo registros duplicados (bucket de %ss).", span)
+    removed = dedupe_history(get_storage(), span)
+    if removed:
+        for pair in sorted({pair_of(record) for record in removed}):
+            aggregates.rebuild(pair)
+        since = min(to_epoch(record["timestamp"]) for record in removed)
+        rollups.rebuild(since=datetime.fromtimestamp(since))
+    logger.info("%s registros duplicados removidos.", len(removed))
+    return len(removed)
@@ -0,0 +1,279 @@
+import csv
+import gzip
+import io
+import json
+import os
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+from functools import partial
+from itertools import chain, islice
+
+from src import config
+from src.pairs import LEGACY_ASSET
+from src.storage import Storage
+
+# Colunas exportadas nos formatos tabulares (CSV, Parquet, Arrow)
+EXPORT_FIELDS = ["timestamp", "asset", "quote", "price_usd", "price_real"]
+
+# Registros por lote nos formatos colunares; limita a memória usada na exportação
+BATCH_SIZE = 10_000
+
+
+class ExportError(Exception):
+    """Erro de exportação que deve ser reportado ao usuário (ex: dependência ausente)."""
+
+
+def _require(module: str, extra: str):
+    """Importa uma dependência opcional, com uma mensagem clara se ela faltar."""
+    try:
+        return __import__(module, fromlist=["_"])
+    except ImportError:
+        raise ExportError(
+            f"O formato requer o pacote opcional '{extra}'. "
+            f"Instale com: pip install {extra}"
+        )
+
+
+def _open_text(path: str, compression: str | None) -> io.TextIOBase:
+    """Abre o arquivo de saída em modo texto, com compressão opcional em streaming."""
+    if compression == "gzip":
+        return gzip.open(path, "wt", newline="", encoding="utf-8")
+    if compression == "zstd":
+        zstandard = _require("zstandard", "zstandard")
+        raw = open(path, "wb")
+        writer = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(writer, newline="", encoding="utf-8")
+    return open(path, "w", newline="", encoding="utf-8")
+
+
+def _batches(records: Iterable[dict], size: int = BATCH_SIZE) -> Iterator[list[dict]]:
+    """Agrupa um iterador de registros em listas de até 'size' itens."""
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def write_csv(
+    records: Iterable[dict], path: str, compression=None, header: bool = True
+) -> int:
+    """Grava os registros em CSV, um por vez."""
+    count = 0
+    with _open_text(path, compression) as f:
+        writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        if header:
+            writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    return count
+
+
+def write_json(records: Iterable[dict], path: str, compression=None) -> int:
+    """Grava os registros como um array JSON compacto, sem montá-lo em memória."""
+    count = 0
+    with _open_text(path, compression) as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(record, separators=(",", ":")))
+            count += 1
+        f.write("\n]\n")
+    return count
+
+
+def write_jsonl(records: Iterable[dict], path: str, compression=None) -> int:
+    """Grava um registro JSON por linha."""
+    count = 0
+    with _open_text(path, compression) as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")))
+            f.write("\n")
+            count += 1
+    return count
+
+
+def _arrow_table(pa, batch: list[dict]):
+    return pa.table(
+        {
+            "timestamp": pa.array(
+                [datetime.fromisoformat(r["timestamp"]) for r in batch],
+                type=pa.timestamp("us"),
+            ),
+            "asset": pa.array([r["asset"] for r in batch], pa.string()),
+            "quote": pa.array([r["quote"] for r in batch], pa.string()),
+            "price_usd": pa.array([r["price_usd"] for r in batch], pa.float64()),
+            # Registros sem cotação BRL (ex: backfill sem câmbio) ficam nulos
+            "price_real": pa.array([r.get("price_real") for r in batch], pa.float64()),
+        }
+    )
+
+
+def write_parquet(records: Iterable[dict], path: str, compression=None) -> int:
+    """Grava os registros em Parquet (compressão zstd), um row group por lote."""
+    pa = _require("pyarrow", "pyarrow")
+    pq = _require("pyarrow.parquet", "pyarrow")
+    count, writer = 0, None
+    try:
+        for batch in _batches(records):
+            table = _arrow_table(pa, batch)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_arrow(records: Iterable[dict], path: str, compression=None) -> int:
+    """Grava os registros no formato Arrow IPC (arquivo), um record batch por lote."""
+    pa = _require("pyarrow", "pyarrow")
+    count, writer, sink = 0, None, None
+    try:
+        for batch in _batches(records):
+            table = _arrow_table(pa, batch)
+            if writer is None:
+                sink = pa.OSFile(path, "wb")
+                writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+            count += len(batch)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    return count
+
+
+# formato -> (função de escrita, compressão, extensão padrão)
+FORMATS: dict[str, tuple[Callable, str | None, str]] = {
+    "csv": (write_csv, None, "csv"),
+    "csv.gz": (write_csv, "gzip", "csv.gz"),
+    "csv.zst": (write_csv, "zstd", "csv.zst"),
+    "json": (write_json, None, "json"),
+    "jsonl": (write_jsonl, None, "jsonl"),
+    "jsonl.gz": (write_jsonl, "gzip", "jsonl.gz"),
+    "parquet": (write_parquet, None, "parquet"),
+    "arrow": (write_arrow, None, "arrow"),
+}
+
+
+def default_filename(fmt: str) -> str:
+    """Nome de arquivo padrão para o formato (ex: prices.csv.gz)."""
+    return f"prices.{FORMATS[fmt][2]}"
+
+
+def _with_pair(records: Iterable[dict]) -> Iterator[dict]:
+    """Preenche ativo e moeda dos registros gravados antes do suporte a múltiplos pares."""
+    legacy = {"asset": LEGACY_ASSET, "quote": config.CURRENCY}
+    for record in records:
+        yield record if "asset" in record else {**legacy, **record}
+
+
+def export(
+    storage: Storage,
+    fmt: str,
+    path: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+    part: bool = False,
+) -> int:
+    """
+    Exporta em streaming os registros de [since, until), em ordem de timestamp.
+
+    Os registros fluem do backend para o arquivo sem serem acumulados, de modo
+    que a memória usada não depende do tamanho do histórico. Nenhum arquivo é
+    criado se o intervalo estiver vazio. Sem 'pair', todos os pares são
+    exportados. Com 'part', o arquivo é uma partição a ser juntada às demais
+    por concatenate (no CSV, sem cabeçalho).
+
+    Returns:
+        int: Quantidade de registros exportados.
+
+    Raises:
+        ExportError: Se o formato depender de um pacote opcional ausente.
+    """
+    writer, compression, _ = FORMATS[fmt]
+    if part and writer is write_csv:
+        writer = partial(write_csv, header=False)
+    records = _with_pair(storage.iter_range(since=since, until=until, pair=pair))
+    first = next(records, None)
+    if first is None:
+        return 0
+    return writer(chain([first], records), path, compression)
+
+
+def _append(source: str, dest, start: int = 0, end: int | None = None) -> None:
+    """Copia os bytes [start, end) de 'source' para o arquivo aberto 'dest'."""
+    with open(source, "rb") as f:
+        f.seek(start)
+        remaining = (os.path.getsize(source) if end is None else end) - start
+        while remaining > 0:
+            chunk = f.read(min(remaining, 1 << 20))
+            if not chunk:
+                break
+            dest.write(chunk)
+            remaining -= len(chunk)
+
+
+def concatenate(fmt: str, parts: list[str], path: str) -> None:
+    """
+    Junta em 'path', na ordem, as partições gravadas por export(..., part=True).
+
+    CSV e JSON-lines são copiados byte a byte (membros gzip e frames zstd
+    concatenados formam um arquivo válido), com o cabeçalho CSV gravado uma
+    única vez; no JSON, os elementos de cada partição são copiados para
+    dentro de um único array. Parquet e Arrow são reescritos lote a lote, sem
+    carregar o arquivo inteiro em memória.
+    """
+    writer, compression, _ = FORMATS[fmt]
+    if writer is write_csv:
+        write_csv([], path, compression)
+        with open(path, "ab") as out:
+            for source in parts:
+                _append(source, out)
+    elif writer is write_jsonl:
+        with open(path, "wb") as out:
+            for source in parts:
+                _append(source, out)
+    elif writer is write_json:
+        # Cada partição é "[" + elementos + "\n]\n" (ver write_json)
+        with open(path, "wb") as out:
+            out.write(b"[")
+            for i, source in enumerate(parts):
+                if i:
+                    out.write(b",")
+                _append(source, out, 1, os.path.getsize(source) - 3)
+            out.write(b"\n]\n")
+    elif writer is write_parquet:
+        pq = _require("pyarrow.parquet", "pyarrow")
+        output = None
+        try:
+            for source in parts:
+                part_file = pq.ParquetFile(source)
+                if output is None:
+                    output = pq.ParquetWriter(
+                        path, part_file.schema_arrow, compression="zstd"
+                    )
+                for i in range(part_file.num_row_groups):
+                    output.write_table(part_file.read_row_group(i))
+        finally:
+            if output is not None:
+                output.close()
+    else:
+        pa = _require("pyarrow", "pyarrow")
+        with pa.OSFile(path, "wb") as sink:
+            output = None
+            try:
+                for source in parts:
+                    with pa.memory_map(source) as f:
+                        reader = pa.ipc.open_file(f)
+                        if output is None:
+                            output = pa.ipc.new_file(sink, reader.schema)
+                        for i in range(reader.num_record_batches):
+                            output.write_batch(reader.get_batch(i))
+            finally:
+                if output is not None:
+                    output.close()
@@ -0,0 +1,128 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src import config
+from src.logger import logger
+from src.metrics import HTTP_REQUEST_SECONDS, HTTP_RETRIES
+from src.resilience import CircuitOpenError, backoff_delays, get_breaker
+
+_session: requests.Session | None = None
+_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Retorna a sessão HTTP compartilhada do processo.
+
+    A sessão mantém um pool de conexões com keep-alive, reaproveitado entre as
+    execuções do agendador, evitando um novo handshake TCP/TLS a cada requisição.
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=config.HTTP_POOL_SIZE,
+                    pool_maxsize=config.HTTP_POOL_SIZE,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_session() -> None:
+    """Fecha a sessão compartilhada e suas conexões."""
+    global _session
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _retryable(error: requests.exceptions.RequestException) -> bool:
+    """Falhas de rede, 429 e 5xx justificam nova tentativa; os demais 4xx não."""
+    if not isinstance(error, requests.exceptions.HTTPError):
+        return True
+    response = error.response
+    return (
+        response is None or response.status_code == 429 or response.status_code >= 500
+    )
+
+
+def fetch_json(
+    url: str,
+    provider: str,
+    params: dict | None = None,
+    timeout: float | None = None,
+    retries: int | None = None,
+    backoff_base: float | None = None,
+):
+    """
+    Faz um GET na sessão compartilhada e devolve o JSON da resposta.
+
+    Falhas de rede, 429 e 5xx são repetidas com backoff exponencial e jitter
+    (FETCH_RETRIES vezes). O disjuntor do provedor registra o resultado e,
+    enquanto estiver aberto, a chamada falha na hora com CircuitOpenError.
+    A latência de cada tentativa é registrada por provedor e resultado.
+
+    Raises:
+        requests.exceptions.RequestException: Após esgotar as tentativas, em
+            erros que não justificam nova tentativa ou com o disjuntor aberto.
+        ValueError: Se a resposta não for um JSON válido.
+    """
+    breaker = get_breaker(
+        provider, config.BREAKER_FAILURE_THRESHOLD, config.BREAKER_RESET_SECONDS
+    )
+    timeout = config.REQUEST_TIMEOUT if timeout is None else timeout
+    kwargs = {"timeout": timeout}
+    if params is not None:
+        kwargs["params"] = params
+    delays = backoff_delays(
+        config.FETCH_RETRIES if retries is None else retries,
+        config.FETCH_BACKOFF_BASE if backoff_base is None else backoff_base,
+        config.FETCH_BACKOFF_MAX,
+    )
+    while True:
+        if not breaker.allow():
+            raise CircuitOpenError(
+                f"Provedor '{provider}' indisponível (disjuntor aberto)."
+            )
+        start = time.perf_counter()
+        try:
+            response = get_session().get(url, **kwargs)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            HTTP_REQUEST_SECONDS.labels(provider=provider, outcome="error").observe(
+                time.perf_counter() - start
+            )
+            if not _retryable(e):
+                breaker.record_success()  # o provedor respondeu
+                raise
+            breaker.record_failure()
+            delay = next(delays, None)
+            if delay is None:
+                raise
+            HTTP_RETRIES.labels(provider=provider).inc()
+            logger.warning(
+                "Falha em '%s' (%s); nova tentativa em %.2fs.", provider, e, delay
+            )
+            time.sleep(delay)
+            continue
+        try:
+            data = response.json()
+        except ValueError:
+            HTTP_REQUEST_SECONDS.labels(provider=provider, outcome="error").observe(
+                time.perf_counter() - start
+            )
+            breaker.record_failure()
+            raise
+        HTTP_REQUEST_SECONDS.labels(provider=provider, outcome="ok").observe(
+            time.perf_counter() - start
+        )
+        breaker.record_success()
+        return data
@@ -1,33 +1,212 @@
+import atexit
+import gzip
+import json
 import logging
 import os
+import queue
+import shutil
 import sys
+import threading
+from datetime import datetime
+from logging.handlers import (
+    QueueHandler,
+    QueueListener,
+    RotatingFileHandler,
+    TimedRotatingFileHandler,
+)
+
+from src import config
+
+# Atributos padrão de um LogRecord; os demais vêm de 'extra' e vão para o JSON
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class _MakeDirsMixin:
+    """Cria o diretório do arquivo apenas quando ele é aberto (na primeira mensagem)."""
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+class LazyFileHandler(_MakeDirsMixin, logging.FileHandler):
+    """
+    FileHandler que só cria o diretório e abre o arquivo na primeira mensagem,
+    para que importar o logger (ex: em '--help') não tenha efeitos colaterais.
+    """
+
+    def __init__(self, filename: str) -> None:
+        super().__init__(filename, delay=True)
+
+
+class LazyRotatingFileHandler(_MakeDirsMixin, RotatingFileHandler):
+    """Rotação por tamanho, com abertura do arquivo na primeira mensagem."""
+
+
+class LazyTimedRotatingFileHandler(_MakeDirsMixin, TimedRotatingFileHandler):
+    """Rotação por horário, com abertura do arquivo na primeira mensagem."""
+
+
+def _gzip_rotator(source: str, dest: str) -> None:
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada mensagem como uma linha JSON (time, level, message, extras)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+# Argumentos que quem chamou o log pode alterar depois (ex: um lote reutilizado)
+_MUTABLE_ARGS = (list, dict, set, bytearray)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler que não formata a mensagem na thread de quem chamou o log.
+
+    O QueueHandler padrão junta mensagem e argumentos antes de enfileirar
+    (para poder serializar o registro); como a fila é local ao processo, a
+    formatação fica para a thread do QueueListener, fora do caminho crítico.
+
+    Listas, dicts e sets são formatados na hora, pois o chamador pode
+    alterá-los antes de o listener gravar a mensagem. Outros objetos
+    passados como argumento não devem ser alterados após a chamada.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if isinstance(args, _MUTABLE_ARGS) or (
+            isinstance(args, tuple) and any(isinstance(a, _MUTABLE_ARGS) for a in args)
+        ):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def build_file_handler(
+    path: str,
+    rotate: str = "size",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    when: str = "midnight",
+    compress: bool = True,
+) -> logging.FileHandler:
+    """
+    Cria o handler do arquivo de log com a rotação informada.
+
+    Raises:
+        ValueError: Se 'rotate' não for size, time ou none.
+    """
+    if rotate == "size":
+        handler = LazyRotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backup_count, delay=True
+        )
+    elif rotate == "time":
+        handler = LazyTimedRotatingFileHandler(
+            path, when=when, backupCount=backup_count, delay=True
+        )
+    elif rotate == "none":
+        return LazyFileHandler(path)
+    else:
+        raise ValueError(
+            f"Rotação de log inválida: '{rotate}'. Use size, time ou none."
+        )
+    if compress:
+        handler.namer = lambda name: f"{name}.gz"
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def _level(name: str) -> int:
+    level = logging.getLevelName(name)
+    return level if isinstance(level, int) else logging.INFO
 
-from src.config import LOG_LEVEL
 
 # Criar um logger
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
 # Criar um formatter
 formatter = logging.Formatter(
     "[%(asctime)s] [%(levelname)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
 )
 
-# Garante que o diretório de logs exista
-log_dir = "logs"
-os.makedirs(log_dir, exist_ok=True)
-log_file_path = os.path.join(log_dir, "app.log")
+# Criar um handler para o arquivo, alimentado por uma fila: a formatação, a
+# gravação em disco e a rotação acontecem na thread do QueueListener
+try:
+    file_handler = build_file_handler(
+        config.LOG_FILE,
+        config.LOG_ROTATE,
+        config.LOG_MAX_BYTES,
+        config.LOG_BACKUP_COUNT,
+        config.LOG_ROTATE_WHEN,
+        config.LOG_COMPRESS,
+    )
+except ValueError as e:
+    print(f"Aviso: {e} Usando rotação por tamanho.")
+    file_handler = build_file_handler(config.LOG_FILE)
+file_handler.setLevel(_level(config.LOG_FILE_LEVEL))
+file_handler.setFormatter(JsonFormatter() if config.LOG_FORMAT == "json" else formatter)
+
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+queue_handler = DeferredQueueHandler(log_queue)
+queue_handler.setLevel(file_handler.level)
+listener = QueueListener(log_queue, file_handler, respect_handler_level=True)
+_listener_lock = threading.Lock()
+_listener_started = False
+
+
+def start_listener() -> None:
+    """Inicia a thread que grava o arquivo de log (uma única vez por processo)."""
+    global _listener_started
+    with _listener_lock:
+        if not _listener_started:
+            listener.start()
+            atexit.register(stop_listener)
+            _listener_started = True
+
+
+def stop_listener() -> None:
+    """Grava as mensagens pendentes no arquivo e para a thread de log."""
+    global _listener_started
+    with _listener_lock:
+        if _listener_started:
+            listener.stop()
+            _listener_started = False
+
+
+class _StartListenerFilter(logging.Filter):
+    # A thread só é criada na primeira mensagem, e não ao importar o módulo
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not _listener_started:
+            start_listener()
+        return True
+
 
-# Criar um handler para o arquivo
-file_handler = logging.FileHandler(log_file_path)
-file_handler.setLevel(logging.DEBUG)
-file_handler.setFormatter(formatter)
+queue_handler.addFilter(_StartListenerFilter())
 
-# Criar um handler para o console
+# Criar um handler para o console (síncrono, para manter a ordem com os prints da CLI)
 stream_handler = logging.StreamHandler(sys.stdout)
-stream_handler.setLevel(LOG_LEVEL)  # Usa o nível de log do .env
+stream_handler.setLevel(_level(config.LOG_LEVEL))  # Usa o nível de log do .env
 stream_handler.setFormatter(formatter)
 
-# Adicionar os handlers ao logger
-logger.addHandler(file_handler)
+# Adicionar os handlers ao logger; mensagens abaixo de ambos os níveis são
+# descartadas antes de formatar os argumentos
+logger.setLevel(min(queue_handler.level, stream_handler.level))
+logger.addHandler(queue_handler)
 logger.addHandler(stream_handler)
@@ -1,138 +1,59 @@
 import argparse
 import os
-from datetime import datetime
-
-import requests
-from tinydb import TinyDB
 
 from src import cli, config
+from src.exporters import FORMATS, default_filename
 from src.logger import logger
+from src.pairs import format_pair, parse_pair
+from src.timeutils import parse_time
 
-# Garante que o diretório do banco de dados exista
-db_dir = os.path.dirname(config.DB_PATH)
-if db_dir:
-    os.makedirs(db_dir, exist_ok=True)
-
-db = TinyDB(config.DB_PATH)
-
-
-def get_price() -> dict | None:
-    """
-    Busca o preço atual do Bitcoin em USD na API da Coinbase.
-
-    Define um timeout de 5 segundos e trata exceções de conexão,
-    timeout e outras exceções de requisição HTTP.
 
-    Returns:
-        dict: Os dados de preço em formato JSON, ou None em caso de erro.
-    """
-    logger.info("Iniciando busca de preço na API da Coinbase.")
+def time_argument(value: str):
+    """Converte um argumento de tempo da CLI, reportando erros pelo argparse."""
     try:
-        url = f"{config.API_URL}?currency={config.CURRENCY}"
-        response = requests.get(url, timeout=config.REQUEST_TIMEOUT)
-        response.raise_for_status()  # Levanta um erro para respostas 4xx/5xx
-        price_data = response.json()
-        logger.info(f"Preço obtido com sucesso: {price_data}")
-        return price_data
-    except requests.exceptions.ConnectionError as e:
-        logger.error(f"Erro de conexão ao buscar preço: {e}")
-        return None
-    except requests.exceptions.Timeout as e:
-        logger.error(f"Timeout ao buscar preço: {e}")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Erro na requisição ao buscar preço: {e}")
-        return None
-
-
-def get_usd_to_brl_rate() -> float | None:
-    """
-    Busca a cotação atual de USD para BRL de uma API externa.
+        return parse_time(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
-    Returns:
-        float: A cotação de USD para BRL, ou None em caso de erro.
-    """
-    logger.info("Iniciando busca da cotação USD->BRL.")
-    try:
-        response = requests.get(
-            config.EXCHANGE_RATE_API_URL, timeout=config.REQUEST_TIMEOUT
-        )
-        response.raise_for_status()
-        data = response.json()
-        rate = float(data["rates"]["BRL"])
-        logger.info(f"Cotação USD->BRL obtida com sucesso: {rate}")
-        return rate
-    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
-        logger.error(f"Erro ao buscar cotação USD->BRL: {e}")
-        return None
-
-
-def calculate_kpis(price_data: dict, usd_to_brl_rate: float) -> dict | None:
-    """
-    Calcula os KPIs (Key Performance Indicators) a partir dos dados de preço.
-
-    Args:
-        price_data (dict): Dicionário contendo os dados de preço da API.
-                           Ex: {'data': {'amount': '50000.00'}}
-        usd_to_brl_rate (float): A cotação atual de USD para BRL.
-
-    Returns:
-        dict: Um dicionário com price_usd, price_real e timestamp.
-              Retorna None em caso de dados inválidos ou erro.
-    """
-    logger.info("Iniciando cálculo de KPIs.")
-    if not price_data:
-        logger.error("Erro: price_data está vazio.")
-        return None
-
-    if "data" not in price_data or "amount" not in price_data.get("data", {}):
-        logger.error(f"Erro: Estrutura de dados inválida em price_data: {price_data}")
-        return None
 
+def pair_argument(value: str) -> str:
+    """Valida um par da CLI (ex: BTC-USD), reportando erros pelo argparse."""
     try:
-        price_usd = float(price_data["data"]["amount"])
-        price_real = price_usd * usd_to_brl_rate
-        logger.info(f"Convertendo ${price_usd} para R$ {price_real}")
-        kpis = {
-            "price_usd": price_usd,
-            "price_real": price_real,
-            "timestamp": datetime.now().isoformat(),
-        }
-        logger.debug(f"KPIs calculados: {kpis}")
-        return kpis
-    except ValueError:
-        logger.error(
-            f"Erro: 'amount' não é um número válido: {price_data['data']['amount']}"
-        )
-        return None
+        return format_pair(*parse_pair(value))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
 
 
-def save_kpis_to_db(kpis: dict) -> None:
-    """Salva os KPIs no banco de dados TinyDB."""
-    logger.info("Iniciando salvamento no banco de dados.")
-    if kpis:
-        db.insert(kpis)
-        logger.info(f"Registro salvo no DB: {kpis}")
-    else:
-        logger.error("Nenhum KPI para salvar.")
+def add_pair_argument(parser: argparse.ArgumentParser, help_text: str) -> None:
+    """Adiciona a opção --pair a um subcomando."""
+    parser.add_argument("--pair", type=pair_argument, default=None, help=help_text)
 
 
-def run_etl_pipeline() -> None:
-    """Função que executa o pipeline de ETL uma vez."""
-    logger.info("--- Iniciando pipeline de ETL de Preço do Bitcoin ---")
+def add_workers_argument(parser: argparse.ArgumentParser) -> None:
+    """Adiciona a opção --workers (processamento particionado em paralelo) a um subcomando."""
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processos para o histórico particionado (0 = núcleos disponíveis). "
+        "Padrão: PARTITION_WORKERS.",
+    )
 
-    # Busca a cotação do dólar, com fallback para o valor configurado
-    usd_to_brl_rate = get_usd_to_brl_rate()
-    if not usd_to_brl_rate:
-        usd_to_brl_rate = config.FALLBACK_USD_TO_BRL_RATE
-        logger.warning(
-            f"Falha ao buscar cotação. Usando valor de fallback: {usd_to_brl_rate}"
-        )
 
-    price_data = get_price()
-    kpis = calculate_kpis(price_data, usd_to_brl_rate)
-    save_kpis_to_db(kpis)
-    logger.info("--- Pipeline de ETL finalizado ---")
+def add_range_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adiciona as opções --since/--until a um subcomando."""
+    parser.add_argument(
+        "--since",
+        type=time_argument,
+        default=None,
+        help="Início do intervalo: data ISO (2024-01-01T12:00) ou duração relativa (24h, 7d).",
+    )
+    parser.add_argument(
+        "--until",
+        type=time_argument,
+        default=None,
+        help="Fim do intervalo (exclusivo), no mesmo formato de --since.",
+    )
 
 
 def main() -> None:
@@ -147,63 +68,295 @@ def main() -> None:
     )
 
     # Comando 'fetch'
-    subparsers.add_parser(
+    fetch_parser = subparsers.add_parser(
         "fetch", help="Busca o preço mais recente e salva no banco de dados."
     )
+    fetch_parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Exibe ao final o tempo de cada etapa (requisições, cálculo, gravação).",
+    )
 
     # Comando 'schedule'
     subparsers.add_parser(
         "schedule", help="Executa o ETL continuamente em intervalos agendados."
     )
 
+    # Comando 'stream'
+    subparsers.add_parser(
+        "stream",
+        help="Ingere os preços continuamente pelo feed WebSocket (extra 'stream').",
+    )
+
+    # Comando 'serve'
+    serve_parser = subparsers.add_parser(
+        "serve",
+        help="Executa o daemon: agendador do ETL e API local de consulta.",
+    )
+    serve_parser.add_argument(
+        "--host", default=None, help="Endereço da API. Padrão: DAEMON_HOST."
+    )
+    serve_parser.add_argument(
+        "--port", type=int, default=None, help="Porta da API. Padrão: DAEMON_PORT."
+    )
+    serve_parser.add_argument(
+        "--no-schedule",
+        action="store_true",
+        help="Apenas atende consultas, sem executar o agendador.",
+    )
+
     # Comando 'history'
-    subparsers.add_parser("history", help="Mostra os últimos 10 registros de preço.")
+    history_parser = subparsers.add_parser(
+        "history", help="Mostra os últimos 10 registros de preço."
+    )
+    add_range_arguments(history_parser)
+    add_pair_argument(history_parser, "Filtra por par (ex: ETH-USD). Padrão: todos.")
+    history_parser.add_argument(
+        "--limit",
+        type=int,
+        default=10,
+        help="Quantidade máxima de registros exibidos. Padrão: 10.",
+    )
 
     # Comando 'stats'
-    subparsers.add_parser(
+    stats_parser = subparsers.add_parser(
         "stats", help="Exibe estatísticas (mín, máx, média) dos preços registrados."
     )
+    add_range_arguments(stats_parser)
+    add_pair_argument(
+        stats_parser, "Par consultado (ex: ETH-USD). Padrão: o primeiro de PAIRS."
+    )
+    stats_parser.add_argument(
+        "--limit",
+        type=int,
+        default=None,
+        help="Considera apenas os N registros mais recentes do intervalo.",
+    )
+    stats_parser.add_argument(
+        "--window",
+        default="24h",
+        help="Janela deslizante das estatísticas (ex: 1h, 24h, 7d, 30d). Padrão: 24h.",
+    )
+    add_workers_argument(stats_parser)
+
+    # Comando 'analyze'
+    analyze_parser = subparsers.add_parser(
+        "analyze",
+        help="Exibe volatilidade, TWAP, percentis e média móvel dos preços.",
+    )
+    add_range_arguments(analyze_parser)
+    add_pair_argument(
+        analyze_parser, "Par consultado (ex: ETH-USD). Padrão: o primeiro de PAIRS."
+    )
+    analyze_parser.add_argument(
+        "--window",
+        default="24h",
+        help="Período analisado quando --since não é informado. Padrão: 24h.",
+    )
+    analyze_parser.add_argument(
+        "--rolling",
+        type=int,
+        default=12,
+        help="Quantidade de registros da média móvel. Padrão: 12.",
+    )
+
+    # Comando 'candles'
+    candles_parser = subparsers.add_parser(
+        "candles", help="Mostra candles OHLC pré-agregados (1m, 5m, 1h, 1d)."
+    )
+    candles_parser.add_argument(
+        "--interval",
+        choices=config.ROLLUP_INTERVALS,
+        default="1h",
+        help="Resolução dos candles. Padrão: 1h.",
+    )
+    add_range_arguments(candles_parser)
+    add_pair_argument(
+        candles_parser, "Par consultado (ex: ETH-USD). Padrão: o primeiro de PAIRS."
+    )
+    candles_parser.add_argument(
+        "--limit",
+        type=int,
+        default=24,
+        help="Quantidade máxima de candles exibidos (os mais recentes). Padrão: 24.",
+    )
+
+    # Comando 'rollup'
+    rollup_parser = subparsers.add_parser(
+        "rollup",
+        help="Reconstrói os candles a partir do histórico em uma única passada.",
+    )
+    rollup_parser.add_argument(
+        "--since",
+        type=time_argument,
+        default=None,
+        help="Reconstrói apenas a partir desta data (ISO ou duração, ex: 30d).",
+    )
+
+    # Comando 'compact'
+    subparsers.add_parser(
+        "compact",
+        help="Aplica a retenção: arquiva os ticks antigos e remove candles expirados.",
+    )
+
+    # Comando 'dedupe'
+    dedupe_parser = subparsers.add_parser(
+        "dedupe",
+        help="Remove os registros que repetem o par e o bucket de tempo de outro.",
+    )
+    dedupe_parser.add_argument(
+        "--bucket",
+        default=None,
+        help="Tamanho do bucket (ex: 1s, 1m). Padrão: DEDUPE_BUCKET.",
+    )
+
+    # Comando 'backfill'
+    backfill_parser = subparsers.add_parser(
+        "backfill",
+        help="Baixa o histórico de candles de um par e grava os registros ausentes.",
+    )
+    backfill_parser.add_argument(
+        "--since",
+        type=time_argument,
+        required=True,
+        help="Início do histórico: data ISO (2023-01-01) ou duração relativa (30d).",
+    )
+    backfill_parser.add_argument(
+        "--until",
+        type=time_argument,
+        default=None,
+        help="Fim do histórico (exclusivo). Padrão: agora.",
+    )
+    backfill_parser.add_argument(
+        "--granularity",
+        choices=["1m", "5m", "15m", "1h", "6h", "1d"],
+        default="1h",
+        help="Resolução dos candles baixados. Padrão: 1h.",
+    )
+    add_pair_argument(
+        backfill_parser, "Par baixado (ex: ETH-USD). Padrão: o primeiro de PAIRS."
+    )
+    backfill_parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Downloads simultâneos. Padrão: BACKFILL_WORKERS.",
+    )
 
     # Comando 'export'
     export_parser = subparsers.add_parser("export", help="Exporta os dados de preço.")
     export_parser.add_argument(
         "--format",
-        choices=["csv", "json"],
+        choices=list(FORMATS),
         required=True,
-        help="O formato do arquivo de exportação (csv ou json).",
+        help="O formato do arquivo de exportação (csv, csv.gz, csv.zst, json, jsonl, jsonl.gz, parquet ou arrow).",
     )
     export_parser.add_argument(
         "--output",
         default=None,
-        help="O nome do arquivo de saída. Padrão: prices.csv ou prices.json.",
+        help="O nome do arquivo de saída. Padrão: prices.<formato>.",
+    )
+    add_range_arguments(export_parser)
+    add_pair_argument(
+        export_parser, "Exporta apenas o par (ex: ETH-USD). Padrão: todos."
+    )
+    add_workers_argument(export_parser)
+    export_parser.add_argument(
+        "--partitioned",
+        action="store_true",
+        help="Grava um arquivo por partição (ex: db/prices/2024-01.csv) em vez de um único arquivo.",
     )
 
     args = parser.parse_args()
 
+    # Cada comando importa apenas o que usa: o pipeline (e o cliente HTTP) só é
+    # carregado por fetch, schedule, stream e serve
     if args.command == "fetch":
-        run_etl_pipeline()
+        from src import pipeline
+
+        pipeline.run_etl_pipeline()
+        pipeline.close_writer()
+        if args.profile:
+            cli.show_profile()
     elif args.command == "schedule":
-        # Import local para evitar dependência circular
         from src import scheduler
 
         scheduler.start()
+    elif args.command == "stream":
+        from src import streaming
+
+        try:
+            streaming.start()
+        except streaming.StreamError as e:
+            logger.error("%s", e)
+            print(f"{cli.Colors.RED}{e}{cli.Colors.ENDC}")
+    elif args.command == "serve":
+        from src import daemon
+
+        try:
+            daemon.run(args.host, args.port, schedule=not args.no_schedule)
+        except OSError as e:
+            logger.error("Não foi possível iniciar o daemon: %s", e)
+            print(
+                f"{cli.Colors.RED}Não foi possível iniciar o daemon: {e}{cli.Colors.ENDC}"
+            )
     elif args.command == "history":
-        cli.show_history()
+        cli.show_history(args.limit, since=args.since, until=args.until, pair=args.pair)
     elif args.command == "stats":
-        cli.show_stats()
+        cli.show_stats(
+            since=args.since,
+            until=args.until,
+            limit=args.limit,
+            window=args.window,
+            pair=args.pair,
+            workers=args.workers,
+        )
+    elif args.command == "analyze":
+        cli.show_analysis(
+            since=args.since,
+            until=args.until,
+            window=args.window,
+            rolling=args.rolling,
+            pair=args.pair,
+        )
+    elif args.command == "candles":
+        cli.show_candles(
+            args.interval,
+            since=args.since,
+            until=args.until,
+            limit=args.limit,
+            pair=args.pair,
+        )
+    elif args.command == "rollup":
+        cli.rebuild_rollups(since=args.since)
+    elif args.command == "compact":
+        cli.run_compaction()
+    elif args.command == "dedupe":
+        cli.run_dedupe(args.bucket)
+    elif args.command == "backfill":
+        cli.run_backfill(
+            args.since,
+            until=args.until,
+            granularity=args.granularity,
+            pair=args.pair,
+            workers=args.workers,
+        )
     elif args.command == "export":
         # Garante que o diretório de saída exista
         output_dir = "db"
         os.makedirs(output_dir, exist_ok=True)
 
-        if args.format == "csv":
-            filename = args.output or "prices.csv"
-            output_path = os.path.join(output_dir, os.path.basename(filename))
-            cli.export_to_csv(output_path)
-        elif args.format == "json":
-            filename = args.output or "prices.json"
-            output_path = os.path.join(output_dir, os.path.basename(filename))
-            cli.export_to_json(output_path)
+        filename = args.output or default_filename(args.format)
+        output_path = os.path.join(output_dir, os.path.basename(filename))
+        cli.export_data(
+            args.format,
+            output_path,
+            since=args.since,
+            until=args.until,
+            pair=args.pair,
+            workers=args.workers,
+            partitioned=args.partitioned,
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,522 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Limites dos buckets de latência, em segundos
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Tipo de conteúdo do formato de texto do Prometheus
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Registry:
+    """Conjunto de métricas expostas juntas (ex: no endpoint /metrics)."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric) -> None:
+        """Registra uma métrica; uma métrica de mesmo nome é substituída."""
+        with self._lock:
+            self._metrics[metric.name] = metric
+
+    def collect(self) -> list:
+        """Retorna as métricas registradas, em ordem de registro."""
+        with self._lock:
+            return list(self._metrics.values())
+
+
+# Registro padrão, usado por todas as métricas definidas neste módulo
+REGISTRY = Registry()
+
+
+class _HistogramChild:
+    """Série de um histograma para um conjunto específico de rótulos."""
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # o último é o bucket +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.last: float | None = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Registra uma observação."""
+        with self._lock:
+            self.counts[bisect_left(self.buckets, value)] += 1
+            self.sum += value
+            self.count += 1
+            self.last = value
+
+    @contextmanager
+    def time(self):
+        """Mede a duração do bloco e a registra como observação."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class Histogram:
+    """
+    Histograma cumulativo com rótulos, no modelo do Prometheus.
+
+    Exemplo:
+        STAGE_SECONDS = Histogram("etl_stage_seconds", "Duração", ["stage"])
+        with STAGE_SECONDS.labels(stage="fetch").time():
+            ...
+    """
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: list[str] | tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: dict[tuple, _HistogramChild] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels: str) -> _HistogramChild:
+        """Retorna a série do histograma para os rótulos informados."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            if key not in self._children:
+                self._children[key] = _HistogramChild(self.buckets)
+            return self._children[key]
+
+    def observe(self, value: float) -> None:
+        """Registra uma observação em um histograma sem rótulos."""
+        self.labels().observe(value)
+
+    def time(self):
+        """Mede a duração do bloco em um histograma sem rótulos."""
+        return self.labels().time()
+
+    def samples(self) -> dict[tuple, _HistogramChild]:
+        """Retorna uma cópia das séries existentes, indexadas pelos valores dos rótulos."""
+        with self._lock:
+            return dict(self._children)
+
+
+class _CounterChild:
+    """Série de um contador para um conjunto específico de rótulos."""
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Incrementa o contador (apenas valores não negativos)."""
+        if amount < 0:
+            raise ValueError("Contadores só podem ser incrementados.")
+        with self._lock:
+            self.value += amount
+
+
+class Counter:
+    """
+    Contador monotônico com rótulos, no modelo do Prometheus.
+
+    Exemplo:
+        SKIPPED = Counter("etl_skipped_total", "Execuções puladas", ["job"])
+        SKIPPED.labels(job="etl").inc()
+    """
+
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: list[str] | tuple[str, ...] = (),
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, _CounterChild] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels: str) -> _CounterChild:
+        """Retorna a série do contador para os rótulos informados."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            if key not in self._children:
+                self._children[key] = _CounterChild()
+            return self._children[key]
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Incrementa um contador sem rótulos."""
+        self.labels().inc(amount)
+
+    def samples(self) -> dict[tuple, _CounterChild]:
+        """Retorna uma cópia das séries existentes, indexadas pelos valores dos rótulos."""
+        with self._lock:
+            return dict(self._children)
+
+
+class _GaugeChild:
+    """Série de um medidor para um conjunto específico de rótulos."""
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+
+class Gauge:
+    """Medidor com rótulos (valor que sobe e desce), no modelo do Prometheus."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: list[str] | tuple[str, ...] = (),
+        registry: Registry | None = REGISTRY,
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple, _GaugeChild] = {}
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, **labels: str) -> _GaugeChild:
+        """Retorna a série do medidor para os rótulos informados."""
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            if key not in self._children:
+                self._children[key] = _GaugeChild()
+            return self._children[key]
+
+    def set(self, value: float) -> None:
+        """Define o valor de um medidor sem rótulos."""
+        self.labels().set(value)
+
+    def samples(self) -> dict[tuple, _GaugeChild]:
+        """Retorna uma cópia das séries existentes, indexadas pelos valores dos rótulos."""
+        with self._lock:
+            return dict(self._children)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == float("inf") else repr(float(value))
+
+
+def exposition(registry: Registry = REGISTRY) -> str:
+    """Gera o texto das métricas no formato de exposição do Prometheus (0.0.4)."""
+    lines = []
+    for metric in registry.collect():
+        documentation = metric.documentation.replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {metric.name} {documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for values, child in sorted(metric.samples().items()):
+            labels = _format_labels(metric.labelnames, values)
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+                continue
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip((*metric.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(
+                    metric.labelnames, values, (("le", _format_value(bound)),)
+                )
+                lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{metric.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{metric.name}_count{labels} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server(host: str, port: int, registry: Registry = REGISTRY):
+    """
+    Expõe as métricas em GET /metrics, em uma thread.
+
+    Returns:
+        ThreadingHTTPServer: O servidor (a porta efetiva está em server_address).
+    """
+    # Import local: só os processos de longa duração servem as métricas
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            payload = exposition(registry).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name="etl-metrics", daemon=True
+    ).start()
+    return server
+
+
+# Duração de cada etapa do pipeline de ETL
+PIPELINE_STAGE_SECONDS = Histogram(
+    "etl_pipeline_stage_seconds",
+    "Duração de cada etapa do pipeline de ETL, em segundos.",
+    ["stage"],
+)
+
+# Atraso entre o horário agendado de cada job e o início da sua execução
+SCHEDULER_LAG_SECONDS = Histogram(
+    "etl_scheduler_lag_seconds",
+    "Atraso entre o instante agendado e o início da execução do job, em segundos.",
+    ["job"],
+)
+
+# Duração das execuções de cada job agendado
+SCHEDULER_RUN_SECONDS = Histogram(
+    "etl_scheduler_run_seconds",
+    "Duração das execuções de cada job agendado, em segundos.",
+    ["job"],
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0),
+)
+
+# Execuções que duraram mais que o intervalo do job
+SCHEDULER_OVERRUNS = Counter(
+    "etl_scheduler_overruns_total",
+    "Execuções que duraram mais que o intervalo do job.",
+    ["job"],
+)
+
+# Ticks não executados porque a execução anterior ainda estava em andamento
+# ou porque o job ficou para trás (coalescidos na execução seguinte)
+SCHEDULER_SKIPPED = Counter(
+    "etl_scheduler_skipped_total",
+    "Ticks não executados por sobreposição ou atraso, coalescidos na execução seguinte.",
+    ["job"],
+)
+
+# Registros aguardando gravação no buffer de escrita
+WRITE_QUEUE_DEPTH = Gauge(
+    "etl_write_queue_depth",
+    "Registros aguardando gravação no buffer de escrita.",
+)
+
+# Duração de cada gravação em lote do buffer de escrita
+WRITE_FLUSH_SECONDS = Histogram(
+    "etl_write_flush_seconds",
+    "Duração de cada gravação em lote do buffer de escrita, em segundos.",
+)
+
+# Registros gravados por lote
+WRITE_BATCH_RECORDS = Histogram(
+    "etl_write_batch_records",
+    "Quantidade de registros gravados em cada lote.",
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000),
+)
+
+# Latência das requisições HTTP por provedor e resultado
+HTTP_REQUEST_SECONDS = Histogram(
+    "etl_http_request_seconds",
+    "Latência das requisições HTTP por provedor e resultado, em segundos.",
+    ["provider", "outcome"],
+)
+
+# Novas tentativas de requisições HTTP por provedor
+HTTP_RETRIES = Counter(
+    "etl_http_retries_total",
+    "Novas tentativas de requisições HTTP por provedor.",
+    ["provider"],
+)
+
+# Estado do disjuntor de cada provedor (0 = fechado, 1 = meio-aberto, 2 = aberto)
+CIRCUIT_STATE = Gauge(
+    "etl_circuit_state",
+    "Estado do disjuntor de cada provedor (0 = fechado, 1 = meio-aberto, 2 = aberto).",
+    ["provider"],
+)
+
+# Desvio relativo da cotação de cada fonte em relação ao preço agregado
+PRICE_SOURCE_DEVIATION = Gauge(
+    "etl_price_source_deviation",
+    "Desvio relativo da última cotação de cada fonte em relação ao preço agregado.",
+    ["source"],
+)
+
+# Cotações descartadas por fonte e motivo (error, timeout, outlier)
+PRICE_SOURCE_FAILURES = Counter(
+    "etl_price_source_failures_total",
+    "Cotações descartadas por fonte e motivo (error, timeout, outlier).",
+    ["source", "reason"],
+)
+
+# Latência das consultas atendidas pelo daemon, por endpoint
+DAEMON_REQUEST_SECONDS = Histogram(
+    "etl_daemon_request_seconds",
+    "Latência das consultas atendidas pelo daemon, por endpoint, em segundos.",
+    ["endpoint"],
+)
+
+# Buscas de preço por par e resultado (success, error, skipped)
+PRICE_FETCHES = Counter(
+    "etl_price_fetches_total",
+    "Buscas de preço por par e resultado (success, error, skipped).",
+    ["pair", "outcome"],
+)
+
+# Buscas da tabela de câmbio por resultado (success, error)
+EXCHANGE_RATE_FETCHES = Counter(
+    "etl_exchange_rate_fetches_total",
+    "Buscas da tabela de câmbio por resultado (success, error).",
+    ["outcome"],
+)
+
+# Execuções do pipeline que usaram FALLBACK_USD_TO_BRL_RATE
+FALLBACK_RATE_USED = Counter(
+    "etl_fallback_rate_used_total",
+    "Execuções do pipeline que usaram a cotação USD->BRL de fallback.",
+)
+
+# Cálculos de KPI descartados, por motivo (empty, invalid_structure, invalid_amount)
+KPI_FAILURES = Counter(
+    "etl_kpi_failures_total",
+    "Cálculos de KPI descartados, por motivo.",
+    ["reason"],
+)
+
+# Registros gravados no banco, por par
+RECORDS_SAVED = Counter(
+    "etl_records_saved_total",
+    "Registros gravados no banco, por par.",
+    ["pair"],
+)
+
+# Registros descartados pela deduplicação (mesmo par e bucket), por par
+RECORDS_DEDUPED = Counter(
+    "etl_records_deduplicated_total",
+    "Registros descartados por repetirem o par e o bucket de um já gravado.",
+    ["pair"],
+)
+
+# Duração de cada gravação no banco (inserção, estatísticas e candles)
+STORAGE_COMMIT_SECONDS = Histogram(
+    "etl_storage_commit_seconds",
+    "Duração de cada gravação no banco, incluindo estatísticas e candles, em segundos.",
+)
+
+# Execuções de jobs agendados que terminaram com erro
+SCHEDULER_ERRORS = Counter(
+    "etl_scheduler_errors_total",
+    "Execuções de jobs agendados que terminaram com erro.",
+    ["job"],
+)
+
+# Ticks brutos movidos do banco pela política de retenção, por par
+RETENTION_ARCHIVED = Counter(
+    "etl_retention_archived_total",
+    "Ticks brutos movidos do banco para o arquivo (ou descartados), por par.",
+    ["pair"],
+)
+
+# Candles removidos pela política de retenção, por resolução
+RETENTION_PRUNED = Counter(
+    "etl_retention_pruned_total",
+    "Candles removidos pela política de retenção, por resolução.",
+    ["interval"],
+)
+
+# Alertas disparados, por par e tipo de regra (above, below, rise, drop, move)
+ALERTS_FIRED = Counter(
+    "etl_alerts_fired_total",
+    "Alertas disparados, por par e tipo de regra.",
+    ["pair", "kind"],
+)
+
+# Disparos suprimidos porque a regra ainda estava em cooldown
+ALERTS_SUPPRESSED = Counter(
+    "etl_alerts_suppressed_total",
+    "Disparos de alerta suprimidos pelo cooldown da regra, por par.",
+    ["pair"],
+)
+
+# Entregas de alertas por sink e resultado (success, error)
+ALERT_DELIVERIES = Counter(
+    "etl_alert_deliveries_total",
+    "Entregas de alertas por sink e resultado (success, error).",
+    ["sink", "outcome"],
+)
+
+# Ticks recebidos do feed WebSocket, por par
+STREAM_MESSAGES = Counter(
+    "etl_stream_messages_total",
+    "Ticks recebidos do feed WebSocket, por par.",
+    ["pair"],
+)
+
+# Buckets agregados do feed entregues para gravação
+STREAM_BUCKETS = Counter(
+    "etl_stream_buckets_total",
+    "Buckets agregados do feed entregues para gravação.",
+)
+
+# Reconexões ao feed WebSocket
+STREAM_RECONNECTS = Counter(
+    "etl_stream_reconnects_total",
+    "Reconexões ao feed WebSocket.",
+)
+
+# Buscas pelo REST quando o feed fica sem ticks
+STREAM_FALLBACK_POLLS = Counter(
+    "etl_stream_fallback_polls_total",
+    "Buscas pelo REST por falta de ticks do feed.",
+)
+
+# Estado da conexão com o feed WebSocket (1 = conectado)
+STREAM_CONNECTED = Gauge(
+    "etl_stream_connected",
+    "1 enquanto o feed WebSocket está conectado.",
+)
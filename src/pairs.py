@@ -0,0 +1,45 @@
+import re
+
+from src import config
+
+_PAIR_RE = re.compile(r"^([A-Z0-9]+)-([A-Z]+)$")
+
+# Ativo dos registros gravados antes do suporte a múltiplos pares
+LEGACY_ASSET = "BTC"
+
+
+def parse_pair(text: str) -> tuple[str, str]:
+    """
+    Converte um par no formato 'ATIVO-MOEDA' (ex: 'BTC-USD') em (ativo, moeda).
+
+    Raises:
+        ValueError: Se o texto não estiver no formato esperado.
+    """
+    match = _PAIR_RE.match(text.strip().upper())
+    if not match:
+        raise ValueError(
+            f"Par inválido: '{text}'. Use o formato ATIVO-MOEDA, ex: BTC-USD."
+        )
+    return match.group(1), match.group(2)
+
+
+def format_pair(asset: str, quote: str) -> str:
+    """Monta o identificador do par (ex: 'BTC-USD')."""
+    return f"{asset}-{quote}".upper()
+
+
+def pair_of(record: dict) -> str:
+    """
+    Retorna o par de um registro.
+
+    Registros antigos, sem 'asset'/'quote', pertencem ao par BTC na moeda
+    configurada em CURRENCY, que era o único coletado.
+    """
+    return format_pair(
+        record.get("asset", LEGACY_ASSET), record.get("quote", config.CURRENCY)
+    )
+
+
+def default_pair() -> str:
+    """Par padrão das consultas: o primeiro configurado em PAIRS."""
+    return config.PAIRS[0]
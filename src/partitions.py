@@ -0,0 +1,241 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from src import config, exporters
+from src.logger import logger
+from src.rollups import bucket_start
+from src.storage import Storage, get_storage, set_storage
+from src.timeutils import parse_duration, to_epoch
+
+# Valores do config repassados aos processos do pool, que abrem o próprio handle
+WORKER_CONFIG = ("DB_BACKEND", "DB_PATH", "ARCHIVE_DIR", "CURRENCY")
+
+
+def resolve_workers(workers: int | None = None) -> int:
+    """Quantidade de processos: 'workers', PARTITION_WORKERS ou, com 0, os núcleos."""
+    workers = config.PARTITION_WORKERS if workers is None else workers
+    return workers if workers > 0 else os.cpu_count() or 1
+
+
+def split_range(
+    start: datetime, end: datetime, span: str = "month"
+) -> list[tuple[datetime, datetime]]:
+    """
+    Divide [start, end) em partições consecutivas: meses do calendário
+    ("month") ou buckets de duração fixa (ex: "7d") alinhados ao relógio
+    local, como os candles. A primeira e a última são recortadas ao intervalo.
+    """
+    if start >= end:
+        return []
+    bounds = [start]
+    if span == "month":
+        boundary = start.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        while True:
+            year, month = divmod(boundary.month, 12)
+            boundary = boundary.replace(year=boundary.year + year, month=month + 1)
+            if boundary >= end:
+                break
+            bounds.append(boundary)
+    else:
+        step = parse_duration(span).total_seconds()
+        boundary = bucket_start(start.timestamp(), step) + step
+        while boundary < end.timestamp():
+            bounds.append(datetime.fromtimestamp(boundary))
+            boundary += step
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+
+def data_bounds(
+    storage: Storage,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+) -> tuple[datetime, datetime] | None:
+    """Intervalo [primeiro, último] ocupado pelos registros, ou None se vazio."""
+    records = storage.iter_range(since=since, until=until, pair=pair)
+    first = next(iter(records), None)
+    if hasattr(records, "close"):
+        records.close()
+    if first is None:
+        return None
+    [last] = storage.last(1, since=since, until=until, pair=pair)
+    return (
+        datetime.fromtimestamp(to_epoch(first["timestamp"])),
+        datetime.fromtimestamp(to_epoch(last["timestamp"])) + timedelta(microseconds=1),
+    )
+
+
+def _init_worker(values: dict) -> None:
+    """Inicializa um processo do pool com o armazenamento do processo principal."""
+    for name, value in values.items():
+        setattr(config, name, value)
+    set_storage(None)
+
+
+def _run(func, tasks: list[tuple], workers: int) -> list:
+    """
+    Executa func(*task) para cada partição, na ordem, em um pool de processos.
+
+    Com um único worker, as partições são processadas no próprio processo. O
+    pool usa 'spawn': os processos não herdam as threads do principal (fila
+    do logger, buffer de escrita), e cada um abre o próprio handle do banco.
+    """
+    if workers <= 1 or len(tasks) <= 1:
+        return [func(*task) for task in tasks]
+    values = {name: getattr(config, name) for name in WORKER_CONFIG}
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(tasks)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(values,),
+    ) as pool:
+        return list(pool.map(func, *zip(*tasks)))
+
+
+def summarize_partition(
+    since: datetime, until: datetime, pair: str | None = None
+) -> dict | None:
+    """Agregados parciais (contagem, soma, mín, máx, primeiro e último preço) de [since, until)."""
+    # Import local: src.cli importa este módulo sob demanda
+    from src.cli import get_series
+
+    prices = get_series(since, until, pair=pair).price_usd
+    if not len(prices):
+        return None
+    return {
+        "count": len(prices),
+        "sum": float(prices.sum()),
+        "min": float(prices.min()),
+        "max": float(prices.max()),
+        "first": float(prices[0]),
+        "last": float(prices[-1]),
+    }
+
+
+def merge_summaries(parts: list[dict | None]) -> dict | None:
+    """Combina os agregados das partições (em ordem de tempo) no formato de PriceSeries.summary."""
+    parts = [part for part in parts if part]
+    count = sum(part["count"] for part in parts)
+    if count < 2:
+        return None
+    first_price, last_price = parts[0]["first"], parts[-1]["last"]
+    variation = (
+        ((last_price - first_price) / first_price) * 100 if first_price != 0 else 0
+    )
+    return {
+        "records_count": count,
+        "avg_price": sum(part["sum"] for part in parts) / count,
+        "min_price": min(part["min"] for part in parts),
+        "max_price": max(part["max"] for part in parts),
+        "variation": float(variation),
+    }
+
+
+def statistics(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+    workers: int | None = None,
+    span: str | None = None,
+) -> dict | None:
+    """
+    Calcula as estatísticas de 'stats' sobre [since, until) particionando o
+    histórico (padrão: por mês) e processando as partições em paralelo.
+    """
+    bounds = data_bounds(get_storage(), since, until, pair)
+    if bounds is None:
+        return None
+    ranges = split_range(*bounds, span or config.PARTITION_SPAN)
+    workers = resolve_workers(workers)
+    logger.info(
+        "Calculando estatísticas em %s partições com %s processos.",
+        len(ranges),
+        workers,
+    )
+    tasks = [(start, end, pair) for start, end in ranges]
+    return merge_summaries(_run(summarize_partition, tasks, workers))
+
+
+def partition_name(start: datetime, span: str) -> str:
+    """Nome do arquivo de uma partição (ex: 2024-01 para partições mensais)."""
+    if span == "month":
+        return start.strftime("%Y-%m")
+    if parse_duration(span).total_seconds() % 86400 == 0:
+        return start.strftime("%Y-%m-%d")
+    return start.strftime("%Y-%m-%dT%H-%M")
+
+
+def export_partition(
+    fmt: str,
+    path: str,
+    since: datetime,
+    until: datetime,
+    pair: str | None = None,
+    part: bool = False,
+) -> int:
+    """Exporta uma partição; com 'part', para ser concatenada às demais."""
+    return exporters.export(get_storage(), fmt, path, since, until, pair, part=part)
+
+
+def export(
+    fmt: str,
+    path: str,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    pair: str | None = None,
+    workers: int | None = None,
+    partitioned: bool = False,
+    span: str | None = None,
+) -> int:
+    """
+    Exporta [since, until) gravando as partições do histórico em paralelo.
+
+    Com 'partitioned', o resultado é um diretório (o caminho sem a extensão)
+    com um arquivo completo por partição, ex: db/prices/2024-01.parquet.
+    Senão, as partições são gravadas em um diretório temporário e juntadas
+    em 'path' (ver exporters.concatenate).
+
+    Returns:
+        int: Quantidade de registros exportados.
+
+    Raises:
+        ExportError: Se o formato depender de um pacote opcional ausente.
+    """
+    _, _, extension = exporters.FORMATS[fmt]
+    bounds = data_bounds(get_storage(), since, until, pair)
+    if bounds is None:
+        return 0
+    span = span or config.PARTITION_SPAN
+    ranges = split_range(*bounds, span)
+    workers = resolve_workers(workers)
+    logger.info("Exportando %s partições com %s processos.", len(ranges), workers)
+
+    if partitioned:
+        directory = path.removesuffix(f".{extension}")
+    else:
+        directory = tempfile.mkdtemp(
+            prefix=".export-", dir=os.path.dirname(path) or None
+        )
+    os.makedirs(directory, exist_ok=True)
+    try:
+        paths = [
+            os.path.join(directory, f"{partition_name(start, span)}.{extension}")
+            for start, _ in ranges
+        ]
+        tasks = [
+            (fmt, part_path, start, end, pair, not partitioned)
+            for part_path, (start, end) in zip(paths, ranges)
+        ]
+        counts = _run(export_partition, tasks, workers)
+        if not partitioned:
+            written = [p for p, count in zip(paths, counts) if count]
+            exporters.concatenate(fmt, written, path)
+    finally:
+        if not partitioned:
+            shutil.rmtree(directory, ignore_errors=True)
+    return sum(counts)
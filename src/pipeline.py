@@ -0,0 +1,417 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from src import aggregates, alerts, config, dedupe, rollups
+from src.http_client import fetch_json
+from src.logger import logger
+from src.metrics import (
+    EXCHANGE_RATE_FETCHES,
+    FALLBACK_RATE_USED,
+    KPI_FAILURES,
+    PIPELINE_STAGE_SECONDS,
+    PRICE_FETCHES,
+    RECORDS_SAVED,
+    STORAGE_COMMIT_SECONDS,
+)
+from src.pairs import LEGACY_ASSET, format_pair, pair_of, parse_pair
+from src.providers import coinbase_url, get_aggregated_price, price_sources
+from src.rate_cache import RateCache
+from src.resilience import CircuitOpenError, hedged
+from src.storage import get_storage
+from src.writer import BufferedWriter, install_shutdown_hooks
+
+
+def fetch_primary_price(asset: str, quote: str) -> dict:
+    """Busca o preço do par na API principal (Coinbase)."""
+    return fetch_json(coinbase_url(asset, quote), "coinbase")
+
+
+def fetch_secondary_price(asset: str, quote: str) -> dict:
+    """
+    Busca o preço do par na fonte secundária (ticker da Coinbase Exchange).
+
+    A resposta é normalizada para o formato da API principal.
+    """
+    url = config.SECONDARY_PRICE_API_URL.format(pair=format_pair(asset, quote))
+    data = fetch_json(url, "coinbase_exchange")
+    try:
+        return {"data": {"amount": str(data["price"]), "source": "secondary"}}
+    except (KeyError, TypeError):
+        raise ValueError(f"Resposta inesperada da fonte secundária: {data}")
+
+
+def get_price(asset: str = LEGACY_ASSET, quote: str | None = None) -> dict | None:
+    """
+    Busca o preço atual de um ativo (padrão: Bitcoin) na API da Coinbase.
+
+    Falhas transitórias são repetidas com backoff (ver http_client.fetch_json)
+    e, com HEDGE_AFTER_SECONDS > 0, a fonte secundária é consultada em paralelo
+    quando a principal demora, valendo a primeira resposta. Com mais de uma
+    fonte em PRICE_SOURCES, o preço é a agregação robusta de todas elas (ver
+    providers.get_aggregated_price).
+
+    Args:
+        asset (str): O ativo cotado (ex: 'BTC', 'ETH').
+        quote (str): A moeda da cotação. Padrão: CURRENCY.
+
+    Returns:
+        dict: Os dados de preço em formato JSON, ou None em caso de erro.
+    """
+    quote = quote or config.CURRENCY
+    pair = format_pair(asset, quote)
+    sources = price_sources()
+    if len(sources) > 1:
+        logger.info("Iniciando busca de preço de %s em %s fontes.", pair, len(sources))
+        try:
+            price_data = get_aggregated_price(asset, quote)
+        except ValueError as e:
+            logger.error("Configuração de agregação de preços inválida: %s", e)
+            PRICE_FETCHES.labels(pair=pair, outcome="error").inc()
+            return None
+        outcome = "success" if price_data else "error"
+        PRICE_FETCHES.labels(pair=pair, outcome=outcome).inc()
+        return price_data
+
+    logger.info("Iniciando busca de preço de %s na API da Coinbase.", pair)
+    try:
+        if config.HEDGE_AFTER_SECONDS > 0 and config.SECONDARY_PRICE_API_URL:
+            price_data = hedged(
+                lambda: fetch_primary_price(asset, quote),
+                lambda: fetch_secondary_price(asset, quote),
+                config.HEDGE_AFTER_SECONDS,
+            )
+        else:
+            price_data = fetch_primary_price(asset, quote)
+        logger.info("Preço de %s obtido com sucesso.", pair)
+        logger.debug("Resposta da busca de preço: %s", price_data)
+        PRICE_FETCHES.labels(pair=pair, outcome="success").inc()
+        return price_data
+    except CircuitOpenError as e:
+        logger.warning("Busca de preço ignorada: %s", e)
+        PRICE_FETCHES.labels(pair=pair, outcome="skipped").inc()
+        return None
+    except requests.exceptions.ConnectionError as e:
+        logger.error("Erro de conexão ao buscar preço: %s", e)
+        PRICE_FETCHES.labels(pair=pair, outcome="error").inc()
+        return None
+    except requests.exceptions.Timeout as e:
+        logger.error("Timeout ao buscar preço: %s", e)
+        PRICE_FETCHES.labels(pair=pair, outcome="error").inc()
+        return None
+    except requests.exceptions.RequestException as e:
+        logger.error("Erro na requisição ao buscar preço: %s", e)
+        PRICE_FETCHES.labels(pair=pair, outcome="error").inc()
+        return None
+    except ValueError as e:
+        logger.error("Resposta inválida ao buscar preço: %s", e)
+        PRICE_FETCHES.labels(pair=pair, outcome="error").inc()
+        return None
+
+
+def fetch_exchange_rates() -> dict | None:
+    """
+    Busca a tabela de cotações com base em USD de uma API externa.
+
+    Returns:
+        dict: Cotações por moeda (ex: {'BRL': 5.15, 'EUR': 0.92}),
+              ou None em caso de erro ou se a cotação BRL estiver ausente.
+    """
+    logger.info("Iniciando busca da cotação USD->BRL.")
+    try:
+        data = fetch_json(config.EXCHANGE_RATE_API_URL, "exchange_rate")
+        rates = {currency: float(rate) for currency, rate in data["rates"].items()}
+        logger.info("Cotação USD->BRL obtida com sucesso: %s", rates["BRL"])
+        EXCHANGE_RATE_FETCHES.labels(outcome="success").inc()
+        return rates
+    except (
+        requests.exceptions.RequestException,
+        KeyError,
+        ValueError,
+        AttributeError,
+        TypeError,  # cotação nula no payload (float(None))
+    ) as e:
+        logger.error("Erro ao buscar cotação USD->BRL: %s", e)
+        EXCHANGE_RATE_FETCHES.labels(outcome="error").inc()
+        return None
+
+
+def get_usd_to_brl_rate() -> float | None:
+    """
+    Busca a cotação atual de USD para BRL de uma API externa.
+
+    Returns:
+        float: A cotação de USD para BRL, ou None em caso de erro.
+    """
+    rates = fetch_exchange_rates()
+    return rates["BRL"] if rates else None
+
+
+_rate_cache: RateCache | None = None
+
+
+def get_rate_cache() -> RateCache:
+    """Retorna o cache de cotações compartilhado (persistido em RATE_CACHE_PATH)."""
+    global _rate_cache
+    if _rate_cache is None:
+        _rate_cache = RateCache(
+            fetch_exchange_rates, config.RATE_CACHE_TTL, config.RATE_CACHE_PATH
+        )
+    return _rate_cache
+
+
+def get_exchange_rates() -> dict | None:
+    """
+    Retorna a tabela de cotações com base em USD usada pelo pipeline.
+
+    Usa o cache com TTL: dentro do prazo não há requisição; depois dele, a
+    última tabela válida é usada enquanto uma nova é buscada em segundo plano.
+
+    Returns:
+        dict: Cotações por moeda, ou None se nenhuma cotação for conhecida.
+    """
+    return get_rate_cache().get()
+
+
+def get_exchange_rate() -> float | None:
+    """
+    Retorna a cotação USD->BRL usada pelo pipeline.
+
+    Usa o cache com TTL: dentro do prazo não há requisição; depois dele, a
+    última cotação válida é usada enquanto uma nova é buscada em segundo plano.
+
+    Returns:
+        float: A cotação de USD para BRL, ou None se nenhuma cotação for conhecida.
+    """
+    rates = get_exchange_rates()
+    return rates["BRL"] if rates else None
+
+
+def quote_to_usd_rate(rates: dict, quote: str) -> float | None:
+    """Retorna quantas unidades de 'quote' valem 1 USD (None se a moeda for desconhecida)."""
+    if quote == "USD":
+        return 1.0
+    return rates.get(quote)
+
+
+def calculate_kpis(
+    price_data: dict,
+    usd_to_brl_rate: float,
+    asset: str = LEGACY_ASSET,
+    quote: str | None = None,
+    quote_rate: float = 1.0,
+) -> dict | None:
+    """
+    Calcula os KPIs (Key Performance Indicators) a partir dos dados de preço.
+
+    Args:
+        price_data (dict): Dicionário contendo os dados de preço da API.
+                           Ex: {'data': {'amount': '50000.00'}}
+        usd_to_brl_rate (float): A cotação atual de USD para BRL.
+        asset (str): O ativo cotado. Padrão: 'BTC'.
+        quote (str): A moeda do preço em price_data. Padrão: CURRENCY.
+        quote_rate (float): Unidades da moeda 'quote' por 1 USD. Padrão: 1.0.
+
+    Returns:
+        dict: Um dicionário com asset, quote, price (na moeda do par),
+              price_usd, price_real e timestamp; com várias fontes, também
+              as cotações aceitas ('sources') e descartadas ('rejected').
+              Retorna None em caso de dados inválidos ou erro.
+    """
+    logger.info("Iniciando cálculo de KPIs.")
+    if not price_data:
+        logger.error("Erro: price_data está vazio.")
+        KPI_FAILURES.labels(reason="empty").inc()
+        return None
+
+    if "data" not in price_data or "amount" not in price_data.get("data", {}):
+        logger.error("Erro: Estrutura de dados inválida em price_data: %s", price_data)
+        KPI_FAILURES.labels(reason="invalid_structure").inc()
+        return None
+
+    try:
+        price = float(price_data["data"]["amount"])
+        price_usd = price / quote_rate
+        price_real = price_usd * usd_to_brl_rate
+        logger.info("Convertendo $%s para R$ %s", price_usd, price_real)
+        kpis = {
+            "asset": asset,
+            "quote": quote or config.CURRENCY,
+            "price": price,
+            "price_usd": price_usd,
+            "price_real": price_real,
+            "timestamp": datetime.now().isoformat(),
+        }
+        for key in ("sources", "rejected"):
+            if price_data["data"].get(key):
+                kpis[key] = price_data["data"][key]
+        logger.debug("KPIs calculados: %s", kpis)
+        return kpis
+    except ValueError:
+        logger.error(
+            "Erro: 'amount' não é um número válido: %s", price_data["data"]["amount"]
+        )
+        KPI_FAILURES.labels(reason="invalid_amount").inc()
+        return None
+
+
+# Serializa gravações e consultas ao armazenamento (jobs, buffer e daemon)
+storage_lock = threading.Lock()
+
+
+def commit_records(records: list[dict]) -> int:
+    """
+    Grava um lote de registros no backend configurado, em uma única transação,
+    e atualiza as estatísticas e os candles.
+
+    Registros que repetem o par e o bucket de tempo de um já gravado são
+    descartados (ver src.dedupe).
+
+    Returns:
+        int: Quantidade de registros gravados.
+    """
+    # Jobs agendados em cadências diferentes podem gravar ao mesmo tempo
+    with storage_lock, STORAGE_COMMIT_SECONDS.time():
+        storage = get_storage()
+        records = dedupe.filter_new(storage, records)
+        count = storage.insert_many(records) if records else 0
+        dedupe.records_inserted(records)
+        aggregates.records_inserted(records)
+        rollups.records_inserted(records)
+        for record in records:
+            RECORDS_SAVED.labels(pair=pair_of(record)).inc()
+    logger.info("%s registros salvos no DB.", count)
+    logger.debug("Registros salvos: %s", records)
+    return count
+
+
+_writer: BufferedWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BufferedWriter:
+    """Retorna o buffer de escrita compartilhado, gravado ao encerrar o processo."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BufferedWriter(
+                commit_records, config.WRITE_BATCH_SIZE, config.WRITE_FLUSH_SECONDS
+            )
+            install_shutdown_hooks(_writer)
+        return _writer
+
+
+def close_writer() -> None:
+    """Grava os registros pendentes e fecha o buffer de escrita, se houver."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.close()
+
+
+def save_records(records: list[dict]) -> int:
+    """
+    Salva um lote de registros no backend configurado.
+
+    Com WRITE_BATCH_SIZE > 1, os registros passam pelo buffer de escrita e são
+    gravados em grupo (por tamanho ou após WRITE_FLUSH_SECONDS); caso
+    contrário, são gravados imediatamente em uma única transação.
+
+    Returns:
+        int: Quantidade de registros aceitos.
+    """
+    logger.info("Iniciando salvamento no banco de dados.")
+    if not records:
+        logger.error("Nenhum KPI para salvar.")
+        return 0
+    if config.WRITE_BATCH_SIZE <= 1:
+        return commit_records(records)
+    get_writer().add(records)
+    logger.info("%s registros enfileirados para gravação.", len(records))
+    return len(records)
+
+
+def save_kpis_to_db(kpis: dict) -> None:
+    """Salva os KPIs no backend de armazenamento configurado."""
+    save_records([kpis] if kpis else [])
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """
+    Retorna o pool de threads das requisições, reaproveitado entre execuções.
+
+    O tamanho do pool (FETCH_CONCURRENCY) limita as requisições simultâneas.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=max(1, config.FETCH_CONCURRENCY),
+            thread_name_prefix="etl-fetch",
+        )
+    return _executor
+
+
+def timed(stage: str, func, *args):
+    """Executa 'func' registrando sua duração no histograma de etapas do pipeline."""
+    with PIPELINE_STAGE_SECONDS.labels(stage=stage).time():
+        return func(*args)
+
+
+def run_etl_pipeline(pairs: list[str] | None = None) -> None:
+    """Função que executa o pipeline de ETL uma vez, para os pares informados (padrão: PAIRS)."""
+    logger.info("--- Iniciando pipeline de ETL de Preço do Bitcoin ---")
+
+    # As cotações de câmbio e os preços de todos os pares são buscados em
+    # paralelo, de modo que a etapa de busca dura o tempo da requisição mais
+    # lenta, não a soma de todas
+    with PIPELINE_STAGE_SECONDS.labels(stage="fetch").time():
+        executor = get_executor()
+        rates_future = executor.submit(timed, "fetch_rate", get_exchange_rates)
+        price_futures = {
+            pair: executor.submit(timed, "fetch_price", get_price, *parse_pair(pair))
+            for pair in pairs or config.PAIRS
+        }
+        rates = rates_future.result()
+        prices = {pair: future.result() for pair, future in price_futures.items()}
+
+    # Sem nenhuma cotação conhecida (nem em cache), usa o valor configurado
+    if not rates or not rates.get("BRL"):
+        rates = {**(rates or {}), "BRL": config.FALLBACK_USD_TO_BRL_RATE}
+        FALLBACK_RATE_USED.inc()
+        logger.warning(
+            "Falha ao buscar cotação. Usando valor de fallback: %s", rates["BRL"]
+        )
+
+    records = []
+    with PIPELINE_STAGE_SECONDS.labels(stage="calculate").time():
+        for pair, price_data in prices.items():
+            asset, quote = parse_pair(pair)
+            quote_rate = quote_to_usd_rate(rates, quote)
+            if not quote_rate:
+                logger.error("Cotação de %s indisponível; ignorando %s.", quote, pair)
+                continue
+            kpis = calculate_kpis(price_data, rates["BRL"], asset, quote, quote_rate)
+            if kpis:
+                records.append(kpis)
+    timed("save", save_records, records)
+    timed("alerts", alerts.evaluate, records, storage_lock)
+
+    timings = ", ".join(
+        f"{stage}={PIPELINE_STAGE_SECONDS.labels(stage=stage).last:.3f}s"
+        for stage in (
+            "fetch_rate",
+            "fetch_price",
+            "fetch",
+            "calculate",
+            "save",
+            "alerts",
+        )
+    )
+    logger.info("Tempos das etapas: %s", timings)
+    logger.info("--- Pipeline de ETL finalizado ---")
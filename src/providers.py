@@ -0,0 +1,261 @@
+import functools
+import statistics
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+
+from src import config
+from src.http_client import fetch_json
+from src.logger import logger
+from src.metrics import PRICE_SOURCE_DEVIATION, PRICE_SOURCE_FAILURES
+from src.pairs import LEGACY_ASSET, format_pair
+
+# Métodos de agregação aceitos em PRICE_AGGREGATION
+AGGREGATIONS = config.PRICE_AGGREGATIONS
+
+# Fração descartada em cada extremo na média aparada
+TRIM_FRACTION = 0.2
+
+
+class PriceProvider:
+    """
+    Fonte de preço à vista de um par.
+
+    'url' monta o endereço a partir de (ativo, moeda) e 'parse' extrai o
+    preço (float) do JSON da resposta.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        url: Callable[[str, str], str],
+        parse: Callable[[object], float],
+    ) -> None:
+        self.name = name
+        self.url = url
+        self.parse = parse
+
+    def fetch(self, asset: str, quote: str, timeout: float | None = None) -> float:
+        """
+        Busca o preço do par nesta fonte, sem novas tentativas.
+
+        Raises:
+            requests.exceptions.RequestException: Em falhas de rede ou HTTP.
+            ValueError: Se a resposta não tiver um preço válido.
+        """
+        data = fetch_json(self.url(asset, quote), self.name, timeout=timeout, retries=0)
+        try:
+            price = float(self.parse(data))
+        except (KeyError, IndexError, TypeError, StopIteration) as e:
+            raise ValueError(f"Resposta inesperada de '{self.name}': {e}")
+        if not price > 0:
+            raise ValueError(f"Preço inválido de '{self.name}': {price}")
+        return price
+
+
+def coinbase_url(asset: str, quote: str) -> str:
+    """Endpoint de preço à vista da Coinbase (o legado, com ?currency=, para o BTC)."""
+    if asset == LEGACY_ASSET:
+        return f"{config.API_URL}?currency={quote}"
+    return config.PAIR_API_URL.format(pair=format_pair(asset, quote))
+
+
+def _kraken_url(asset: str, quote: str) -> str:
+    kraken_asset = {"BTC": "XBT"}.get(asset, asset)
+    return f"https://api.kraken.com/0/public/Ticker?pair={kraken_asset}{quote}"
+
+
+PROVIDERS: dict[str, PriceProvider] = {
+    provider.name: provider
+    for provider in (
+        PriceProvider("coinbase", coinbase_url, lambda data: data["data"]["amount"]),
+        PriceProvider(
+            "coinbase_exchange",
+            lambda a, q: config.SECONDARY_PRICE_API_URL.format(pair=format_pair(a, q)),
+            lambda data: data["price"],
+        ),
+        PriceProvider(
+            "kraken",
+            _kraken_url,
+            lambda data: next(iter(data["result"].values()))["c"][0],
+        ),
+        PriceProvider(
+            "bitstamp",
+            lambda a, q: f"https://www.bitstamp.net/api/v2/ticker/{a}{q}/".lower(),
+            lambda data: data["last"],
+        ),
+    )
+}
+
+
+@functools.lru_cache(maxsize=None)
+def _known_sources(names: tuple[str, ...]) -> tuple[str, ...]:
+    unknown = [name for name in names if name not in PROVIDERS]
+    if unknown:
+        logger.warning(
+            "PRICE_SOURCES com fontes desconhecidas (%s); ignorando-as. Use: %s.",
+            ", ".join(unknown),
+            ", ".join(PROVIDERS),
+        )
+    return tuple(name for name in names if name in PROVIDERS) or ("coinbase",)
+
+
+def price_sources() -> list[str]:
+    """
+    Fontes de PRICE_SOURCES conhecidas em PROVIDERS.
+
+    Nomes desconhecidos são ignorados (com um aviso, uma vez por
+    configuração); sem nenhuma fonte válida, usa a coinbase.
+    """
+    return list(_known_sources(tuple(config.PRICE_SOURCES)))
+
+
+def aggregate(
+    quotes: dict[str, float],
+    method: str = "median",
+    max_deviation: float = 0.02,
+) -> tuple[float | None, dict[str, float], dict[str, float]]:
+    """
+    Calcula um preço robusto a partir das cotações de várias fontes.
+
+    Cotações que se afastam da mediana em mais de 'max_deviation' (fração,
+    ex: 0.02 = 2%) são descartadas como outliers; as restantes são agregadas
+    pela mediana ou pela média aparada. Sem cotações, ou com todas
+    descartadas (ex: duas fontes que divergem entre si), o preço é None.
+
+    Returns:
+        tuple: (preço agregado ou None, cotações aceitas, cotações descartadas).
+    """
+    if method not in AGGREGATIONS:
+        raise ValueError(
+            f"Agregação inválida: '{method}'. Use uma de: {', '.join(AGGREGATIONS)}."
+        )
+    if not quotes:
+        return None, {}, {}
+
+    center = statistics.median(quotes.values())
+    accepted, rejected = {}, {}
+    for name, price in quotes.items():
+        if abs(price - center) / center > max_deviation:
+            rejected[name] = price
+        else:
+            accepted[name] = price
+
+    if not accepted:
+        return None, accepted, rejected
+
+    values = sorted(accepted.values())
+    if method == "median":
+        return statistics.median(values), accepted, rejected
+    trim = int(len(values) * TRIM_FRACTION)
+    kept = values[trim : len(values) - trim] if trim else values
+    return statistics.fmean(kept), accepted, rejected
+
+
+_executor: ThreadPoolExecutor | None = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="etl-source")
+    return _executor
+
+
+def fetch_quotes(
+    asset: str,
+    quote: str,
+    providers: list[PriceProvider],
+    deadline: float,
+) -> dict[str, float]:
+    """
+    Consulta as fontes em paralelo e devolve as cotações obtidas dentro do prazo.
+
+    O prazo é único para o conjunto: a chamada dura no máximo 'deadline'
+    segundos, não importa quantas fontes estejam configuradas. Fontes que
+    falham ou não respondem a tempo são ignoradas.
+    """
+    start = time.perf_counter()
+    futures = {
+        _get_executor().submit(p.fetch, asset, quote, deadline): p.name
+        for p in providers
+    }
+    done, late = wait(futures, timeout=deadline)
+
+    quotes = {}
+    for future in done:
+        name = futures[future]
+        try:
+            quotes[name] = future.result()
+        except requests.exceptions.Timeout:
+            # O timeout da requisição é o próprio prazo: pode vencer antes do wait
+            late.add(future)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            PRICE_SOURCE_FAILURES.labels(source=name, reason="error").inc()
+            logger.warning("Fonte '%s' falhou: %s", name, e)
+    for future in late:
+        name = futures[future]
+        PRICE_SOURCE_FAILURES.labels(source=name, reason="timeout").inc()
+        logger.warning("Fonte '%s' não respondeu em %gs; ignorada.", name, deadline)
+    logger.debug(
+        "%s/%s fontes em %.3fs.",
+        len(quotes),
+        len(providers),
+        time.perf_counter() - start,
+    )
+    return quotes
+
+
+def get_aggregated_price(
+    asset: str,
+    quote: str,
+    providers: list[PriceProvider] | None = None,
+) -> dict | None:
+    """
+    Busca o preço do par em todas as fontes de PRICE_SOURCES e o agrega.
+
+    Returns:
+        dict: No formato da API principal ({'data': {'amount': ...}}), com as
+              cotações aceitas em 'sources' e os outliers em 'rejected'; ou
+              None se menos de PRICE_MIN_SOURCES fontes forem aceitas.
+
+    Raises:
+        ValueError: Se PRICE_AGGREGATION for inválida.
+    """
+    if providers is None:
+        providers = [PROVIDERS[name] for name in price_sources()]
+    quotes = fetch_quotes(asset, quote, providers, config.PRICE_SOURCE_DEADLINE)
+    price, accepted, rejected = aggregate(
+        quotes, config.PRICE_AGGREGATION, config.PRICE_MAX_DEVIATION
+    )
+
+    for name, value in quotes.items():
+        # Concordância de cada fonte: desvio relativo em relação ao agregado
+        if price:
+            PRICE_SOURCE_DEVIATION.labels(source=name).set((value - price) / price)
+    for name, value in rejected.items():
+        PRICE_SOURCE_FAILURES.labels(source=name, reason="outlier").inc()
+        logger.warning(
+            "Cotação de '%s' (%s) descartada: fora de %.1f%% da mediana.",
+            name,
+            value,
+            config.PRICE_MAX_DEVIATION * 100,
+        )
+
+    if price is None or len(accepted) < config.PRICE_MIN_SOURCES:
+        logger.error(
+            "Fontes insuficientes para %s: %s aceitas, mínimo %s.",
+            format_pair(asset, quote),
+            len(accepted),
+            config.PRICE_MIN_SOURCES,
+        )
+        return None
+    return {
+        "data": {
+            "amount": str(price),
+            "sources": accepted,
+            "rejected": rejected,
+        }
+    }
@@ -0,0 +1,112 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+
+from src.logger import logger
+
+
+class RateCache:
+    """
+    Cache das cotações de câmbio com TTL e stale-while-revalidate.
+
+    - Dentro do TTL, a cotação em cache é devolvida sem acessar a rede.
+    - Após o TTL, a última cotação válida continua sendo devolvida
+      imediatamente e uma atualização é disparada em segundo plano.
+    - Sem nenhuma cotação conhecida, a busca é feita de forma síncrona.
+
+    O estado é persistido em disco, de modo que execuções da CLI e reinícios
+    do agendador reaproveitam a última cotação obtida.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], dict | None],
+        ttl: float,
+        path: str | None = None,
+    ) -> None:
+        self.fetch = fetch
+        self.ttl = ttl
+        self.path = path
+        self.rates: dict | None = None
+        self.fetched_at: float | None = None
+        self._lock = threading.Lock()
+        self._refreshing: threading.Thread | None = None
+        self._load()
+
+    def _load(self) -> None:
+        """Restaura a última cotação persistida, se houver."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            self.rates = data["rates"]
+            self.fetched_at = float(data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Cache de cotações inválido, ignorando: %s", e)
+
+    def _save(self) -> None:
+        """Persiste a cotação atual de forma atômica."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"rates": self.rates, "fetched_at": self.fetched_at}, f)
+        os.replace(tmp_path, self.path)
+
+    @property
+    def age(self) -> float | None:
+        """Idade da cotação em cache, em segundos (None se não houver)."""
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+
+    def is_fresh(self) -> bool:
+        age = self.age
+        return age is not None and age < self.ttl
+
+    def refresh(self) -> dict | None:
+        """Busca as cotações na rede e atualiza o cache em caso de sucesso."""
+        rates = self.fetch()
+        if rates:
+            with self._lock:
+                self.rates = rates
+                self.fetched_at = time.time()
+                self._save()
+        return rates
+
+    def _refresh_in_background(self) -> None:
+        """Dispara uma única atualização em segundo plano (se já não houver uma)."""
+        with self._lock:
+            if self._refreshing is not None and self._refreshing.is_alive():
+                return
+            # Thread não-daemon: em execuções únicas da CLI, o processo aguarda a
+            # atualização terminar para que ela seja persistida
+            self._refreshing = threading.Thread(
+                target=self.refresh, name="rate-cache-refresh"
+            )
+            self._refreshing.start()
+
+    def get(self) -> dict | None:
+        """Retorna as cotações, servindo a última válida enquanto revalida em segundo plano."""
+        if self.is_fresh():
+            return self.rates
+        if self.rates is not None:
+            logger.info(
+                "Cotação em cache expirada (%.0fs); revalidando em segundo plano.",
+                self.age,
+            )
+            self._refresh_in_background()
+            return self.rates
+        return self.refresh()
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Aguarda a atualização em segundo plano em andamento, se houver."""
+        thread = self._refreshing
+        if thread is not None:
+            thread.join(timeout)
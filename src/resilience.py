@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+import requests
+
+from src.logger import logger
+from src.metrics import CIRCUIT_STATE
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Requisição recusada sem acessar a rede porque o provedor está indisponível."""
+
+
+def backoff_delays(retries: int, base: float, maximum: float) -> Iterator[float]:
+    """
+    Gera as esperas entre tentativas: backoff exponencial com jitter completo.
+
+    A n-ésima espera é sorteada em [0, min(maximum, base * 2**n)], o que
+    espalha as novas tentativas de vários clientes no tempo.
+    """
+    for attempt in range(retries):
+        yield random.uniform(0, min(maximum, base * 2**attempt))
+
+
+class CircuitBreaker:
+    """
+    Disjuntor por provedor.
+
+    - Fechado: as requisições passam; falhas consecutivas são contadas.
+    - Aberto: após 'failure_threshold' falhas seguidas, as requisições falham
+      na hora (sem gastar o timeout) por 'reset_timeout' segundos.
+    - Meio-aberto: passado esse prazo, uma única requisição de teste é
+      liberada; sucesso fecha o disjuntor e falha o reabre.
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("Disjuntor '%s': %s -> %s.", self.name, self.state, state)
+        self.state = state
+        CIRCUIT_STATE.labels(provider=self.name).set(_STATE_VALUES[state])
+
+    def allow(self) -> bool:
+        """Indica se uma requisição pode ser feita agora."""
+        with self._lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(
+    provider: str, failure_threshold: int = 5, reset_timeout: float = 30.0
+) -> CircuitBreaker:
+    """Retorna o disjuntor compartilhado do provedor."""
+    with _breakers_lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(
+                provider, failure_threshold, reset_timeout
+            )
+        return _breakers[provider]
+
+
+def reset_breakers() -> None:
+    """Descarta o estado de todos os disjuntores."""
+    with _breakers_lock:
+        _breakers.clear()
+
+
+_hedge_executor: ThreadPoolExecutor | None = None
+_hedge_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=8, thread_name_prefix="etl-hedge"
+            )
+        return _hedge_executor
+
+
+def hedged(primary: Callable, secondary: Callable, delay: float):
+    """
+    Executa 'primary' e, se ela não responder em 'delay' segundos, dispara
+    'secondary' em paralelo; devolve o primeiro resultado bem-sucedido.
+
+    Uma falha rápida da primária dispara a secundária imediatamente. Se as
+    duas falharem, a exceção da última a terminar é propagada.
+    """
+    executor = _get_hedge_executor()
+    pending: set[Future] = {executor.submit(primary)}
+    done, _ = wait(pending, timeout=delay)
+    hedge_started = False
+    error: BaseException | None = None
+    while True:
+        for future in done:
+            pending.discard(future)
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        if not hedge_started:
+            logger.info("Requisição primária lenta ou com falha; disparando hedge.")
+            pending.add(executor.submit(secondary))
+            hedge_started = True
+        if not pending:
+            raise error
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
@@ -0,0 +1,156 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+
+from src import config
+from src.archive import Archive, TieredStorage
+from src.logger import logger
+from src.metrics import RETENTION_ARCHIVED, RETENTION_PRUNED
+from src.storage import Storage, get_storage
+from src.timeutils import parse_duration, to_epoch
+
+
+def parse_candle_retention(spec: str) -> dict[str, timedelta]:
+    """
+    Converte RETENTION_CANDLES em {resolução: tempo de retenção}.
+
+    Formato: entradas 'RESOLUÇÃO=DURAÇÃO' separadas por vírgula
+    (ex: "1m=7d,5m=90d"). Resoluções ausentes são mantidas para sempre.
+
+    Raises:
+        ValueError: Se alguma entrada estiver mal formatada.
+    """
+    policy = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        interval, sep, keep = entry.partition("=")
+        if not sep:
+            raise ValueError(
+                f"Retenção inválida: '{entry}'. Use o formato RESOLUÇÃO=DURAÇÃO."
+            )
+        policy[interval.strip()] = parse_duration(keep)
+    return policy
+
+
+def _next_month(epoch: float) -> float:
+    moment = datetime.fromtimestamp(epoch)
+    year, month = divmod(moment.year * 12 + moment.month, 12)
+    return datetime(year, month + 1, 1).timestamp()
+
+
+def compact_step(
+    storage: Storage,
+    archive: Archive | None,
+    pair: str,
+    cutoff: datetime,
+    batch_size: int,
+) -> int:
+    """
+    Move o próximo lote de ticks brutos do par anteriores a 'cutoff' para o
+    arquivo (ou os descarta, sem arquivo).
+
+    Cada lote vem de um único mês e tem até 'batch_size' ticks (ticks com o
+    mesmo timestamp nunca são separados). O segmento é gravado antes da
+    remoção no banco; se uma execução anterior foi interrompida entre as duas
+    etapas, o lote já arquivado é reconhecido e apenas removido.
+
+    Returns:
+        int: Quantidade de ticks movidos (0 quando não há mais nada a compactar).
+    """
+    records: list[dict] = []
+    month_end = None
+    boundary = cutoff
+    for record in storage.iter_range(until=cutoff, pair=pair):
+        epoch = to_epoch(record["timestamp"])
+        if month_end is None:
+            month_end = _next_month(epoch)
+        full = len(records) >= batch_size
+        if epoch >= month_end or (
+            full and record["timestamp"] != records[-1]["timestamp"]
+        ):
+            boundary = record["timestamp"]
+            break
+        records.append(record)
+    if not records:
+        return 0
+
+    if archive is not None:
+        newest = archive.newest(pair)
+        batch = (records[0]["timestamp"], records[-1]["timestamp"], len(records))
+        if newest and (newest["first"], newest["last"], newest["count"]) == batch:
+            logger.warning(
+                "Lote de %s já arquivado em '%s'; concluindo a remoção.",
+                pair,
+                newest["file"],
+            )
+        else:
+            archive.write_segment(pair, records)
+    storage.delete_before(boundary, pair=pair)
+    RETENTION_ARCHIVED.labels(pair=pair).inc(len(records))
+    return len(records)
+
+
+def prune_candles(
+    storage: Storage, policy: dict[str, timedelta], now: datetime, pairs: list[str]
+) -> int:
+    """Remove os candles mais antigos que a retenção de cada resolução."""
+    pruned = 0
+    for interval, keep in policy.items():
+        for pair in pairs:
+            count = storage.prune_candles(interval, now - keep, pair=pair)
+            RETENTION_PRUNED.labels(interval=interval).inc(count)
+            pruned += count
+    return pruned
+
+
+def compact(
+    storage: Storage | None = None,
+    archive: Archive | None = None,
+    now: datetime | None = None,
+    lock=None,
+    pairs: list[str] | None = None,
+) -> tuple[int, int]:
+    """
+    Aplica a política de retenção (RETENTION_RAW e RETENTION_CANDLES).
+
+    Sem 'storage', usa o armazenamento configurado (e o seu arquivo frio, se
+    houver). O trabalho é feito em lotes curtos, cada um sob 'lock' (ex: o
+    storage_lock do pipeline); o lock é liberado entre lotes para que as
+    gravações do ETL não fiquem esperando a compactação inteira.
+
+    Returns:
+        tuple[int, int]: Ticks movidos para o arquivo e candles removidos.
+    """
+    if storage is None:
+        storage = get_storage()
+        if isinstance(storage, TieredStorage):
+            storage, archive = storage.hot, storage.archive
+    now = now or datetime.now()
+    lock = lock or nullcontext()
+    pairs = pairs or config.PAIRS
+
+    moved = 0
+    if config.RETENTION_RAW:
+        cutoff = now - parse_duration(config.RETENTION_RAW)
+        for pair in pairs:
+            while True:
+                with lock:
+                    count = compact_step(
+                        storage, archive, pair, cutoff, config.COMPACTION_BATCH_SIZE
+                    )
+                if not count:
+                    break
+                moved += count
+
+    with lock:
+        pruned = prune_candles(
+            storage, parse_candle_retention(config.RETENTION_CANDLES), now, pairs
+        )
+    if moved or pruned:
+        logger.info(
+            "Compactação concluída: %s ticks %s, %s candles removidos.",
+            moved,
+            "arquivados" if archive is not None else "descartados",
+            pruned,
+        )
+    return moved, pruned
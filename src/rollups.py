@@ -0,0 +1,195 @@
+import time
+from collections.abc import Iterable
+from datetime import datetime
+
+from src import config
+from src.logger import logger
+from src.pairs import pair_of
+from src.storage import Storage, get_storage
+from src.timeutils import parse_duration, to_epoch
+
+# Quantidade de candles fechados acumulados antes de cada gravação no rebuild
+REBUILD_BATCH_SIZE = 1000
+
+
+def bucket_start(epoch: float, span: float) -> float:
+    """
+    Retorna o início do bucket de 'span' segundos que contém 'epoch'.
+
+    Os buckets são alinhados ao relógio local (ex: candles diários começam à
+    meia-noite local), como os timestamps gravados pelo pipeline.
+    """
+    offset = time.localtime(epoch).tm_gmtoff
+    local = epoch + offset
+    return local - local % span - offset
+
+
+def new_candle(bucket: str, timestamp: str, price: float) -> dict:
+    """Cria um candle OHLC a partir do primeiro tick do bucket."""
+    return {
+        "bucket": bucket,
+        "open": price,
+        "high": price,
+        "low": price,
+        "close": price,
+        "count": 1,
+        "updated_at": timestamp,
+    }
+
+
+def merge_tick(candle: dict, timestamp: str, price: float) -> dict:
+    """Aplica um tick a um candle existente."""
+    candle["high"] = max(candle["high"], price)
+    candle["low"] = min(candle["low"], price)
+    candle["count"] += 1
+    # Ticks atrasados não alteram o fechamento
+    if timestamp >= candle["updated_at"]:
+        candle["close"] = price
+        candle["updated_at"] = timestamp
+    return candle
+
+
+class RollupEngine:
+    """
+    Mantém candles OHLC em várias resoluções (ex: 1m, 5m, 1h, 1d).
+
+    Cada inserção atualiza apenas o candle corrente de cada resolução (e de
+    cada par), de modo que consultas de longo prazo leem os candles e nunca
+    os ticks brutos.
+    """
+
+    def __init__(self, storage: Storage, intervals: list[str]) -> None:
+        self.storage = storage
+        self.spans = {name: parse_duration(name).total_seconds() for name in intervals}
+        self.current: dict[tuple[str, str], dict] = {}  # (par, intervalo) -> candle
+
+    def _bucket(self, interval: str, epoch: float) -> str:
+        return datetime.fromtimestamp(
+            bucket_start(epoch, self.spans[interval])
+        ).isoformat()
+
+    def _load(self, pair: str, interval: str, bucket: str) -> dict | None:
+        """Busca no armazenamento o candle já gravado para o bucket, se houver."""
+        for candle in self.storage.iter_candles(interval, since=bucket, pair=pair):
+            return candle if candle["bucket"] == bucket else None
+        return None
+
+    def update(self, record: dict) -> None:
+        """Aplica um novo registro aos candles correntes e os grava."""
+        self.update_many([record])
+
+    def update_many(self, records: Iterable[dict]) -> None:
+        """
+        Aplica um lote de registros aos candles correntes e os grava.
+
+        O lote é consolidado em memória antes: cada candle alterado é gravado
+        uma única vez, em uma chamada a upsert_candles por par e intervalo.
+        """
+        touched: dict[tuple[str, str], dict[str, dict]] = {}
+        for record in records:
+            timestamp, price = record["timestamp"], record["price_usd"]
+            pair = pair_of(record)
+            epoch = to_epoch(timestamp)
+            for interval in self.spans:
+                key = (pair, interval)
+                bucket = self._bucket(interval, epoch)
+                candles = touched.setdefault(key, {})
+                candle = candles.get(bucket, self.current.get(key))
+                if candle is None or candle["bucket"] != bucket:
+                    candle = self._load(pair, interval, bucket)
+                if candle is None:
+                    candle = new_candle(bucket, timestamp, price)
+                else:
+                    merge_tick(candle, timestamp, price)
+                candles[bucket] = candle
+                self.current[key] = candle
+        for (pair, interval), candles in touched.items():
+            self.storage.upsert_candles(
+                interval, [candles[b] for b in sorted(candles)], pair=pair
+            )
+
+    def rebuild(self, records: Iterable[dict] | None = None, since=None) -> int:
+        """
+        Reconstrói os candles a partir do histórico em uma única passada.
+
+        O início é alinhado ao bucket da maior resolução, para que nenhum
+        candle seja reconstruído com apenas parte dos seus ticks.
+
+        Returns:
+            int: Quantidade de ticks processados.
+        """
+        if since is not None:
+            since = datetime.fromtimestamp(
+                bucket_start(to_epoch(since), max(self.spans.values()))
+            )
+        if records is None:
+            records = self.storage.iter_range(since=since)
+
+        cleared: set[str] = set()
+        open_candles: dict[tuple[str, str], dict] = {}
+        pending: dict[tuple[str, str], list] = {}
+
+        def flush(key: tuple[str, str]) -> None:
+            pair, interval = key
+            self.storage.upsert_candles(interval, pending.pop(key), pair=pair)
+
+        processed = 0
+        for record in records:
+            timestamp, price = record["timestamp"], record["price_usd"]
+            pair = pair_of(record)
+            if pair not in cleared:
+                # Os candles antigos do par só são removidos se ele tiver ticks
+                for interval in self.spans:
+                    self.storage.clear_candles(interval, since=since, pair=pair)
+                cleared.add(pair)
+            epoch = to_epoch(timestamp)
+            for interval in self.spans:
+                key = (pair, interval)
+                bucket = self._bucket(interval, epoch)
+                candle = open_candles.get(key)
+                if candle is not None and candle["bucket"] == bucket:
+                    merge_tick(candle, timestamp, price)
+                    continue
+                if candle is not None:
+                    pending.setdefault(key, []).append(candle)
+                    if len(pending[key]) >= REBUILD_BATCH_SIZE:
+                        flush(key)
+                open_candles[key] = new_candle(bucket, timestamp, price)
+            processed += 1
+
+        for key, candle in open_candles.items():
+            pending.setdefault(key, []).append(candle)
+        for key in list(pending):
+            flush(key)
+        self.current = open_candles
+        return processed
+
+
+_engine: RollupEngine | None = None
+
+
+def get_rollup_engine() -> RollupEngine:
+    """Retorna o motor de rollups compartilhado sobre o armazenamento configurado."""
+    global _engine
+    if _engine is None:
+        _engine = RollupEngine(get_storage(), config.ROLLUP_INTERVALS)
+    return _engine
+
+
+def record_inserted(record: dict) -> None:
+    """Atualiza os candles após uma inserção no banco."""
+    records_inserted([record])
+
+
+def records_inserted(records: list[dict]) -> None:
+    """Atualiza os candles após a gravação de um lote (cada candle é gravado uma vez)."""
+    if records:
+        get_rollup_engine().update_many(records)
+
+
+def rebuild(since=None) -> int:
+    """Reconstrói os candles do armazenamento configurado a partir dos ticks brutos."""
+    logger.info("Reconstruindo candles a partir do histórico.")
+    processed = get_rollup_engine().rebuild(since=since)
+    logger.info("Candles reconstruídos a partir de %s registros.", processed)
+    return processed
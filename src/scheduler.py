@@ -1,10 +1,26 @@
+import asyncio
+import random
+import signal
 import time
+from collections.abc import Callable
 
 import schedule
 
 from src import config
 from src.logger import logger
-from src.main import run_etl_pipeline
+from src.metrics import (
+    SCHEDULER_ERRORS,
+    SCHEDULER_LAG_SECONDS,
+    SCHEDULER_OVERRUNS,
+    SCHEDULER_RUN_SECONDS,
+    SCHEDULER_SKIPPED,
+    start_metrics_server,
+)
+from src.pairs import format_pair, parse_pair
+from src.pipeline import close_writer, run_etl_pipeline, storage_lock
+from src.retention import compact
+from src.rollups import bucket_start
+from src.timeutils import parse_duration
 
 
 def schedule_price_check() -> None:
@@ -13,17 +29,248 @@ def schedule_price_check() -> None:
     Encapsula a lógica principal para ser chamada pelo agendador.
     """
     logger.info("Executando job agendado: verificação de preço.")
-    run_etl_pipeline()
+    with SCHEDULER_RUN_SECONDS.labels(job="etl").time():
+        run_etl_pipeline()
 
 
-def start() -> None:
-    """Inicia o agendador para rodar o job no intervalo configurado."""
+def run_compaction() -> None:
+    """Job agendado que aplica a política de retenção (ver src.retention)."""
+    compact(lock=storage_lock)
+
+
+def compaction_interval() -> float | None:
+    """Intervalo (s) do job de compactação, ou None se não houver retenção configurada."""
+    if not (config.RETENTION_RAW or config.RETENTION_CANDLES):
+        return None
+    return parse_duration(config.COMPACTION_INTERVAL).total_seconds()
+
+
+class Job:
+    """
+    Tarefa periódica do agendador assíncrono.
+
+    Os ticks são alinhados aos limites do intervalo no relógio local (ex: um
+    job de 5m roda em :00, :05, :10...), e não ao instante em que o processo
+    foi iniciado.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        jitter: float = 0.0,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError(f"Intervalo inválido para o job '{name}': {interval}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+
+    def next_tick(self, now: float) -> float:
+        """Retorna o primeiro limite do intervalo estritamente posterior a 'now'."""
+        return bucket_start(now, self.interval) + self.interval
+
+
+class AsyncScheduler:
+    """
+    Agendador baseado em asyncio para vários jobs com cadências diferentes.
+
+    - Sem deriva: cada espera é recalculada a partir do relógio até o próximo
+      limite do intervalo, então atrasos não se acumulam entre ticks.
+    - Sem sobreposição: se a execução anterior de um job ainda estiver em
+      andamento, o tick é pulado; ticks perdidos enquanto o job estava atrasado
+      são coalescidos em uma única execução.
+    - Cada execução roda em uma thread, sem bloquear os demais jobs.
+
+    Atraso, duração, estouros e ticks pulados são registrados em src.metrics.
+    """
+
+    def __init__(self, jobs: list[Job] | None = None) -> None:
+        self.jobs: list[Job] = list(jobs or [])
+        self._stop: asyncio.Event | None = None
+
+    def add_job(
+        self,
+        name: str,
+        func: Callable[[], None],
+        interval: float,
+        jitter: float = 0.0,
+    ) -> Job:
+        """Registra um job periódico."""
+        job = Job(name, func, interval, jitter)
+        self.jobs.append(job)
+        return job
+
+    def stop(self) -> None:
+        """Solicita o encerramento; as execuções em andamento são aguardadas."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _sleep_until(self, deadline: float) -> bool:
+        """Dorme até 'deadline' (epoch). Retorna False se o agendador foi parado."""
+        delay = deadline - time.time()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+        return not self._stop.is_set()
+
+    async def _execute(self, job: Job) -> None:
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(job.func)
+        except Exception:
+            SCHEDULER_ERRORS.labels(job=job.name).inc()
+            logger.exception("Erro na execução do job '%s'.", job.name)
+        duration = time.perf_counter() - start
+        SCHEDULER_RUN_SECONDS.labels(job=job.name).observe(duration)
+        if duration > job.interval:
+            SCHEDULER_OVERRUNS.labels(job=job.name).inc()
+            logger.warning(
+                "Job '%s' levou %.2fs, mais que o intervalo de %gs.",
+                job.name,
+                duration,
+                job.interval,
+            )
+
+    async def _run_job(self, job: Job) -> None:
+        running: asyncio.Task | None = None
+        tick = job.next_tick(time.time())
+        while await self._sleep_until(tick + random.uniform(0, job.jitter)):
+            if running is not None and not running.done():
+                SCHEDULER_SKIPPED.labels(job=job.name).inc()
+                logger.warning(
+                    "Job '%s' ainda em execução; tick de %s pulado.",
+                    job.name,
+                    time.strftime("%H:%M:%S", time.localtime(tick)),
+                )
+            else:
+                SCHEDULER_LAG_SECONDS.labels(job=job.name).observe(time.time() - tick)
+                running = asyncio.create_task(self._execute(job))
+
+            following = job.next_tick(time.time())
+            missed = round((following - tick) / job.interval) - 1
+            if missed > 0:
+                SCHEDULER_SKIPPED.labels(job=job.name).inc(missed)
+                logger.warning(
+                    "Job '%s' atrasado; %s ticks coalescidos.", job.name, missed
+                )
+            tick = following
+
+        if running is not None:
+            await running
+
+    async def run(self) -> None:
+        """Executa os jobs até que stop() seja chamado."""
+        self._stop = asyncio.Event()
+        await asyncio.gather(*(self._run_job(job) for job in self.jobs))
+
+
+def parse_jobs(spec: str) -> list[tuple[list[str] | None, float]]:
+    """
+    Converte SCHEDULE_JOBS em uma lista de (pares, intervalo em segundos).
+
+    Formato: entradas 'PARES@INTERVALO' separadas por ';', onde PARES é uma
+    lista separada por vírgulas ou '*' para todos os PAIRS.
+    Ex: "BTC-USD@10s;ETH-USD,BTC-EUR@5m".
+
+    Raises:
+        ValueError: Se alguma entrada estiver mal formatada.
+    """
+    jobs = []
+    for entry in spec.split(";"):
+        if not entry.strip():
+            continue
+        pairs_text, sep, interval = entry.rpartition("@")
+        if not sep:
+            raise ValueError(f"Job inválido: '{entry}'. Use o formato PARES@INTERVALO.")
+        pairs = None
+        if pairs_text.strip() != "*":
+            pairs = [format_pair(*parse_pair(p)) for p in pairs_text.split(",")]
+        jobs.append((pairs, parse_duration(interval).total_seconds()))
+    return jobs
+
+
+def build_scheduler() -> AsyncScheduler:
+    """Monta o agendador com os jobs de SCHEDULE_JOBS (ou o job padrão)."""
+    scheduler = AsyncScheduler()
+    jobs = parse_jobs(config.SCHEDULE_JOBS) or [(None, config.SCHEDULE_SECONDS)]
+    for pairs, interval in jobs:
+        name = ",".join(pairs) if pairs else "etl"
+        logger.info("Agendando o job '%s' a cada %g segundos.", name, interval)
+        scheduler.add_job(
+            name,
+            lambda pairs=pairs: run_etl_pipeline(pairs),
+            interval,
+            config.SCHEDULE_JITTER,
+        )
+    interval = compaction_interval()
+    if interval is not None:
+        logger.info("Agendando a compactação a cada %g segundos.", interval)
+        scheduler.add_job("compaction", run_compaction, interval)
+    return scheduler
+
+
+async def run_async(scheduler: AsyncScheduler) -> None:
+    """Executa o agendador, encerrando de forma limpa em SIGINT/SIGTERM."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, scheduler.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # ex: Windows ou fora da thread principal
+    await scheduler.run()
+
+
+def start_legacy() -> None:
+    """Agendador original (biblioteca 'schedule'), com ticks relativos ao início."""
     logger.info(
-        f"Agendando a execução do job a cada {config.SCHEDULE_MINUTES} minutos."
+        "Agendando a execução do job a cada %s minutos.", config.SCHEDULE_MINUTES
     )
     schedule.every(config.SCHEDULE_MINUTES).minutes.do(schedule_price_check)
+    interval = compaction_interval()
+    if interval is not None:
+        schedule.every(interval).seconds.do(run_compaction)
 
     logger.info("Agendador iniciado. Pressione Ctrl+C para sair.")
     while True:
         schedule.run_pending()
         time.sleep(1)
+
+
+def serve_metrics() -> None:
+    """Expõe /metrics em METRICS_HOST:METRICS_PORT (se a porta for maior que 0)."""
+    if config.METRICS_PORT <= 0:
+        return
+    try:
+        start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+    except OSError as e:
+        logger.error("Não foi possível expor as métricas: %s", e)
+        return
+    logger.info(
+        "Métricas em http://%s:%s/metrics.", config.METRICS_HOST, config.METRICS_PORT
+    )
+
+
+def start(metrics: bool = True) -> None:
+    """
+    Inicia o agendador para rodar o job no intervalo configurado.
+
+    Com 'metrics', expõe também o endpoint /metrics (ver serve_metrics).
+    """
+    if metrics:
+        serve_metrics()
+    if config.SCHEDULER_MODE == "legacy":
+        start_legacy()
+        return
+
+    scheduler = build_scheduler()
+    logger.info("Agendador iniciado. Pressione Ctrl+C para sair.")
+    try:
+        asyncio.run(run_async(scheduler))
+    finally:
+        close_writer()
+    logger.info("Agendador encerrado.")
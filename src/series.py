@@ -0,0 +1,160 @@
+from array import array
+from collections.abc import Iterable
+from datetime import datetime
+
+import numpy as np
+
+from src.timeutils import to_epoch
+
+# Segundos em um ano, para anualizar a volatilidade
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+
+
+class PriceSeries:
+    """
+    Série de preços em formato colunar, apoiada em arrays NumPy contíguos.
+
+    Guarda os timestamps como int64 (microssegundos desde a época) e os
+    preços como float64, ocupando 24 bytes por registro em vez de um
+    dicionário por linha. Todas as análises são vetorizadas.
+    """
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        price_usd: np.ndarray,
+        price_real: np.ndarray,
+    ) -> None:
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.price_usd = np.asarray(price_usd, dtype=np.float64)
+        self.price_real = np.asarray(price_real, dtype=np.float64)
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict]) -> "PriceSeries":
+        """Constrói a série em uma única passada sobre registros ordenados por timestamp."""
+        timestamps, usd, real = array("q"), array("d"), array("d")
+        for rec in records:
+            timestamps.append(int(to_epoch(rec["timestamp"]) * 1_000_000))
+            usd.append(rec["price_usd"])
+            real.append(rec.get("price_real", float("nan")))
+        return cls(
+            np.frombuffer(timestamps, dtype=np.int64),
+            np.frombuffer(usd, dtype=np.float64),
+            np.frombuffer(real, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_columns(cls, rows: np.ndarray) -> "PriceSeries":
+        """
+        Constrói a série sobre um array estruturado (ver Storage.columns).
+
+        As colunas são visões do array original, sem cópia: sobre o backend
+        binário, a série lê os preços direto do arquivo mapeado em memória.
+        """
+        return cls(rows["t"], rows["price_usd"], rows["price_real"])
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def nbytes(self) -> int:
+        """Memória ocupada pelos arrays da série."""
+        return self.timestamps.nbytes + self.price_usd.nbytes + self.price_real.nbytes
+
+    def slice(
+        self, since: datetime | None = None, until: datetime | None = None
+    ) -> "PriceSeries":
+        """Retorna uma visão (sem cópia) dos registros em [since, until)."""
+        lo = (
+            0
+            if since is None
+            else np.searchsorted(self.timestamps, int(since.timestamp() * 1_000_000))
+        )
+        hi = (
+            len(self)
+            if until is None
+            else np.searchsorted(self.timestamps, int(until.timestamp() * 1_000_000))
+        )
+        return PriceSeries(
+            self.timestamps[lo:hi], self.price_usd[lo:hi], self.price_real[lo:hi]
+        )
+
+    def returns(self, log: bool = False) -> np.ndarray:
+        """Retornos entre registros consecutivos (simples ou logarítmicos)."""
+        prices = self.price_usd
+        if len(prices) < 2:
+            return np.empty(0, dtype=np.float64)
+        if log:
+            return np.diff(np.log(prices))
+        return prices[1:] / prices[:-1] - 1.0
+
+    def volatility(self, annualize: bool = False) -> float:
+        """
+        Desvio padrão dos retornos logarítmicos.
+
+        Com 'annualize', escala pela quantidade média de registros por ano,
+        estimada a partir do espaçamento entre os timestamps.
+        """
+        rets = self.returns(log=True)
+        if len(rets) < 2:
+            return float("nan")
+        vol = float(np.std(rets, ddof=1))
+        if annualize:
+            span = (self.timestamps[-1] - self.timestamps[0]) / 1_000_000
+            if span > 0:
+                vol *= np.sqrt(SECONDS_PER_YEAR / (span / len(rets)))
+        return vol
+
+    def rolling_mean(self, window: int) -> np.ndarray:
+        """Média móvel simples de 'window' registros (via soma acumulada)."""
+        if window <= 0 or window > len(self):
+            return np.empty(0, dtype=np.float64)
+        csum = np.cumsum(np.concatenate(([0.0], self.price_usd)))
+        return (csum[window:] - csum[:-window]) / window
+
+    def weighted_average(self, weights: np.ndarray | None = None) -> float:
+        """
+        Média ponderada do preço, no estilo VWAP.
+
+        Sem volume disponível, o peso padrão é o tempo em que cada preço
+        vigorou (TWAP): o intervalo até o registro seguinte.
+        """
+        if len(self) == 0:
+            return float("nan")
+        if weights is None:
+            if len(self) == 1:
+                return float(self.price_usd[0])
+            weights = np.diff(self.timestamps).astype(np.float64)
+            prices = self.price_usd[:-1]
+        else:
+            prices = self.price_usd
+        total = weights.sum()
+        if total == 0:
+            return float(self.price_usd.mean())
+        return float(np.dot(prices, weights) / total)
+
+    def percentile_bands(
+        self, percentiles: tuple[float, ...] = (5, 25, 50, 75, 95)
+    ) -> dict[float, float]:
+        """Percentis do preço em USD."""
+        if len(self) == 0:
+            return {}
+        values = np.percentile(self.price_usd, percentiles)
+        return dict(zip(percentiles, (float(v) for v in values)))
+
+    def summary(self) -> dict | None:
+        """Estatísticas básicas (as mesmas do comando 'stats'), ou None com menos de 2 registros."""
+        if len(self) < 2:
+            return None
+        first_price = self.price_usd[0]
+        last_price = self.price_usd[-1]
+        variation = (
+            ((last_price - first_price) / first_price) * 100 if first_price != 0 else 0
+        )
+        return {
+            "records_count": len(self),
+            "avg_price": float(self.price_usd.mean()),
+            "min_price": float(self.price_usd.min()),
+            "max_price": float(self.price_usd.max()),
+            "variation": float(variation),
+        }
@@ -0,0 +1,1286 @@
+import functools
+import heapq
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import zlib
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from datetime import datetime
+from typing import BinaryIO
+
+from src import config
+from src.logger import logger
+from src.pairs import default_pair, pair_of, parse_pair
+from src.timeutils import from_epoch_us, to_epoch, to_epoch_us
+
+BACKENDS = ("tinydb", "sqlite", "jsonl", "binary")
+
+# Linhas obsoletas toleradas nos arquivos de candles JSON-lines antes de compactar
+CANDLE_COMPACTION_SLACK = 1000
+
+
+def _as_iso(value: str | datetime | None) -> str | None:
+    """Normaliza um limite de intervalo para string ISO (ou None)."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _as_epoch(value: str | datetime | None) -> float | None:
+    """Normaliza um limite de intervalo para epoch em segundos (ou None)."""
+    if value is None:
+        return None
+    return to_epoch(value)
+
+
+def _file_signature(path: str) -> tuple | None:
+    """Inode, tamanho e mtime do arquivo, para detectar gravações de outros processos."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _syncs(method):
+    """Marca um método de gravação: depois dele, o estado em memória reflete o arquivo."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self._synced = _file_signature(self.path)
+        return result
+
+    return wrapper
+
+
+def _duplicates(key: Callable[[dict], Hashable]) -> Callable[[dict], bool]:
+    """
+    Retorna um teste que marca os registros cuja chave repete a do registro
+    anterior do mesmo par. Os registros devem ser visitados em ordem de tempo
+    dentro de cada par; só a última chave de cada par fica em memória.
+    """
+    previous: dict[str, Hashable] = {}
+
+    def duplicate(record: dict) -> bool:
+        pair, current = pair_of(record), key(record)
+        if pair in previous and previous[pair] == current:
+            return True
+        previous[pair] = current
+        return False
+
+    return duplicate
+
+
+class TimeIndex:
+    """
+    Índice ordenado por tempo mantido a cada inserção.
+
+    Guarda os timestamps (epoch em segundos) em um array contíguo ordenado e,
+    em paralelo, um valor associado a cada registro (offset no arquivo,
+    documento etc.). Inserções em ordem são O(1); consultas "últimos N" e
+    "registros em [t0, t1)" custam O(log n + k) via bisect.
+    """
+
+    def __init__(self) -> None:
+        self.epochs = array("d")
+        self.values: list = []
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def add(self, epoch: float, value) -> None:
+        """Adiciona uma entrada mantendo a ordenação por tempo."""
+        if not self.epochs or epoch >= self.epochs[-1]:
+            self.epochs.append(epoch)
+            self.values.append(value)
+            return
+        # Inserção fora de ordem (rara): posiciona após timestamps iguais
+        pos = bisect_left(self.epochs, epoch)
+        while pos < len(self.epochs) and self.epochs[pos] == epoch:
+            pos += 1
+        self.epochs.insert(pos, epoch)
+        self.values.insert(pos, value)
+
+    def bounds(self, since: float | None = None, until: float | None = None) -> tuple:
+        """Retorna as posições [lo, hi) dos registros no intervalo [since, until)."""
+        lo = 0 if since is None else bisect_left(self.epochs, since)
+        hi = len(self.epochs) if until is None else bisect_left(self.epochs, until)
+        return lo, max(lo, hi)
+
+    def range(self, since: float | None = None, until: float | None = None) -> list:
+        """Retorna, em ordem crescente de tempo, os valores em [since, until)."""
+        lo, hi = self.bounds(since, until)
+        return self.values[lo:hi]
+
+    def last(
+        self, n: int, since: float | None = None, until: float | None = None
+    ) -> list:
+        """Retorna os N valores mais recentes em [since, until), do mais novo ao mais antigo."""
+        lo, hi = self.bounds(since, until)
+        return self.values[max(lo, hi - n) : hi][::-1]
+
+    def drop_before(self, until: float, where: Callable | None = None) -> int:
+        """
+        Remove as entradas anteriores a 'until' (apenas as cujo valor satisfaz
+        'where', se informado) e retorna quantas foram removidas.
+        """
+        _, hi = self.bounds(until=until)
+        if where is None:
+            del self.epochs[:hi]
+            del self.values[:hi]
+            return hi
+        kept = [
+            (epoch, value)
+            for epoch, value in zip(self.epochs[:hi], self.values[:hi])
+            if not where(value)
+        ]
+        self.epochs[:hi] = array("d", (epoch for epoch, _ in kept))
+        self.values[:hi] = [value for _, value in kept]
+        return hi - len(kept)
+
+
+class CandleIndex:
+    """
+    Tabela de candles OHLC em memória, indexada pelo início do bucket.
+
+    Usada pelos backends que não têm índice próprio (TinyDB e JSON-lines)
+    para responder consultas por intervalo em O(log n + k).
+    """
+
+    def __init__(self, candles: Iterable[dict] = ()) -> None:
+        self.by_bucket: dict[str, dict] = {}
+        self.index = TimeIndex()
+        for candle in candles:
+            self.upsert(candle)
+
+    def __len__(self) -> int:
+        return len(self.by_bucket)
+
+    def upsert(self, candle: dict) -> None:
+        """Insere ou substitui o candle do bucket."""
+        bucket = candle["bucket"]
+        if bucket not in self.by_bucket:
+            self.index.add(to_epoch(bucket), bucket)
+        self.by_bucket[bucket] = candle
+
+    def range(self, since=None, until=None) -> list[dict]:
+        """Retorna os candles com início em [since, until), em ordem crescente."""
+        buckets = self.index.range(_as_epoch(since), _as_epoch(until))
+        return [self.by_bucket[b] for b in buckets]
+
+    def clear(self, since=None) -> list[dict]:
+        """Remove os candles a partir de 'since' (ou todos) e retorna os que restaram."""
+        kept = self.range(until=since) if since is not None else []
+        self.by_bucket = {}
+        self.index = TimeIndex()
+        for candle in kept:
+            self.upsert(candle)
+        return kept
+
+    def drop_before(self, until) -> list[str]:
+        """Remove os candles com início anterior a 'until' e retorna seus buckets."""
+        removed = self.index.range(until=_as_epoch(until))
+        self.index.drop_before(_as_epoch(until))
+        for bucket in removed:
+            del self.by_bucket[bucket]
+        return removed
+
+
+class Storage(ABC):
+    """
+    Interface comum dos backends de armazenamento de registros de preço.
+
+    Os registros são dicionários com pelo menos a chave 'timestamp'
+    (string ISO 8601). Os intervalos são semiabertos: [since, until).
+    As consultas aceitam um par opcional (ex: 'BTC-USD'), resolvido por um
+    índice por par; sem par, consideram todos os registros.
+    """
+
+    @abstractmethod
+    def insert(self, record: dict) -> None:
+        """Insere um único registro."""
+
+    def insert_many(self, records: Iterable[dict]) -> int:
+        """Insere vários registros (em uma única transação, quando suportado)."""
+        count = 0
+        for record in records:
+            self.insert(record)
+            count += 1
+        return count
+
+    @abstractmethod
+    def iter_range(
+        self,
+        since: str | datetime | None = None,
+        until: str | datetime | None = None,
+        pair: str | None = None,
+    ) -> Iterator[dict]:
+        """Itera, em ordem crescente de timestamp, os registros em [since, until)."""
+
+    @abstractmethod
+    def last(
+        self,
+        n: int = 10,
+        since: str | datetime | None = None,
+        until: str | datetime | None = None,
+        pair: str | None = None,
+    ) -> list[dict]:
+        """Retorna os N registros mais recentes em [since, until), do mais novo para o mais antigo."""
+
+    @abstractmethod
+    def count(self) -> int:
+        """Retorna o total de registros armazenados."""
+
+    @abstractmethod
+    def upsert_candles(
+        self, interval: str, candles: Iterable[dict], pair: str | None = None
+    ) -> None:
+        """Insere ou substitui candles OHLC (chave: par + intervalo + 'bucket')."""
+
+    @abstractmethod
+    def iter_candles(
+        self,
+        interval: str,
+        since: str | datetime | None = None,
+        until: str | datetime | None = None,
+        pair: str | None = None,
+    ) -> Iterator[dict]:
+        """Itera, em ordem crescente, os candles do intervalo com início em [since, until)."""
+
+    @abstractmethod
+    def clear_candles(
+        self,
+        interval: str,
+        since: str | datetime | None = None,
+        pair: str | None = None,
+    ) -> None:
+        """Remove os candles do intervalo a partir de 'since' (ou todos)."""
+
+    @abstractmethod
+    def delete_before(self, until: str | datetime, pair: str | None = None) -> int:
+        """
+        Remove os registros anteriores a 'until' (do par, se informado).
+
+        Usado pela política de retenção (ver src.retention).
+
+        Returns:
+            int: Quantidade de registros removidos.
+        """
+
+    @abstractmethod
+    def prune_candles(
+        self, interval: str, until: str | datetime, pair: str | None = None
+    ) -> int:
+        """Remove os candles do intervalo com início anterior a 'until' e retorna quantos foram removidos."""
+
+    @abstractmethod
+    def drop_duplicates(self, key: Callable[[dict], Hashable]) -> list[dict]:
+        """
+        Remove, em uma única passada em ordem de tempo, os registros cuja
+        chave (ex: par + bucket do timestamp, ver src.dedupe) é igual à do
+        registro anterior do mesmo par, mantendo o primeiro.
+
+        Returns:
+            list[dict]: Os registros removidos.
+        """
+
+    def refresh(self) -> bool:
+        """
+        Recarrega o estado mantido em memória (índices, candles) se outro
+        processo gravou no banco desde a última leitura ou gravação deste handle.
+
+        Returns:
+            bool: True se algo foi recarregado.
+        """
+        return False
+
+    def columns(
+        self,
+        pair: str,
+        since: str | datetime | None = None,
+        until: str | datetime | None = None,
+    ):
+        """
+        Retorna os ticks do par em [since, until) como um array NumPy
+        estruturado (campos t, price, price_usd e price_real), sem cópia.
+
+        Returns:
+            numpy.ndarray | None: None se o backend não guardar os ticks em
+                formato colunar; nesse caso, use iter_range.
+        """
+        return None
+
+    def close(self) -> None:
+        """Libera os recursos do backend."""
+
+
+class TinyDBStorage(Storage):
+    """
+    Backend legado: TinyDB com o armazenamento JSON padrão.
+
+    O TinyDB reescreve o arquivo a cada inserção; as consultas por tempo usam
+    TimeIndex (global e por par) construídos uma única vez na abertura.
+    """
+
+    def __init__(self, path: str) -> None:
+        from tinydb import TinyDB
+
+        self.path = path
+        self.db = TinyDB(path)
+        self._candle_tables: dict[tuple, tuple] = {}
+        self._reindex()
+        self._synced = _file_signature(path)
+
+    def _reindex(self) -> None:
+        self.index = TimeIndex()
+        self.pair_indexes: dict[str, TimeIndex] = {}
+        for rec in sorted(self.db.all(), key=lambda x: x["timestamp"]):
+            self._index(dict(rec))
+
+    def _index(self, record: dict) -> None:
+        epoch = to_epoch(record["timestamp"])
+        self.index.add(epoch, record)
+        self.pair_indexes.setdefault(pair_of(record), TimeIndex()).add(epoch, record)
+
+    def _select(self, pair: str | None) -> TimeIndex:
+        if pair is None:
+            return self.index
+        return self.pair_indexes.get(pair, TimeIndex())
+
+    @_syncs
+    def insert(self, record: dict) -> None:
+        self.db.insert(record)
+        self._index(dict(record))
+
+    @_syncs
+    def insert_many(self, records: Iterable[dict]) -> int:
+        records = list(records)
+        self.db.insert_multiple(records)
+        for rec in records:
+            self._index(dict(rec))
+        return len(records)
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        index = self._select(pair)
+        return iter(index.range(_as_epoch(since), _as_epoch(until)))
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        if n <= 0:
+            return []
+        return self._select(pair).last(n, _as_epoch(since), _as_epoch(until))
+
+    def count(self) -> int:
+        return len(self.db)
+
+    def _candles(self, interval: str, pair: str | None) -> tuple:
+        """Retorna a tabela TinyDB e o índice em memória dos candles do par e intervalo."""
+        key = (pair or default_pair(), interval)
+        if key not in self._candle_tables:
+            table = self.db.table(f"candles_{key[0]}_{interval}")
+            docs = table.all()
+            index = CandleIndex(dict(doc) for doc in docs)
+            doc_ids = {doc["bucket"]: doc.doc_id for doc in docs}
+            self._candle_tables[key] = (table, index, doc_ids)
+        return self._candle_tables[key]
+
+    @_syncs
+    def upsert_candles(self, interval: str, candles: Iterable[dict], pair=None) -> None:
+        table, index, doc_ids = self._candles(interval, pair)
+        # Cada chamada ao TinyDB reescreve o arquivo: no máximo uma para os
+        # candles existentes e outra para os novos
+        candles = {candle["bucket"]: candle for candle in candles}
+        updates = [bucket for bucket in candles if bucket in doc_ids]
+        new = [candle for bucket, candle in candles.items() if bucket not in doc_ids]
+        if updates:
+            table.update(
+                lambda doc: doc.update(candles[doc["bucket"]]),
+                doc_ids=[doc_ids[bucket] for bucket in updates],
+            )
+        if new:
+            for candle, doc_id in zip(new, table.insert_multiple(new)):
+                doc_ids[candle["bucket"]] = doc_id
+        for candle in candles.values():
+            index.upsert(dict(candle))
+
+    def iter_candles(
+        self, interval: str, since=None, until=None, pair=None
+    ) -> Iterator[dict]:
+        _, index, _ = self._candles(interval, pair)
+        return iter(index.range(since, until))
+
+    @_syncs
+    def clear_candles(self, interval: str, since=None, pair=None) -> None:
+        table, index, doc_ids = self._candles(interval, pair)
+        removed = [c["bucket"] for c in index.range(since=since)]
+        table.remove(doc_ids=[doc_ids.pop(bucket) for bucket in removed])
+        index.clear(since)
+
+    @_syncs
+    def delete_before(self, until, pair=None) -> int:
+        cutoff = _as_epoch(until)
+
+        def expired(doc) -> bool:
+            return to_epoch(doc["timestamp"]) < cutoff and (
+                pair is None or pair_of(doc) == pair
+            )
+
+        removed = self.db.remove(expired)
+        if pair is None:
+            self.index.drop_before(cutoff)
+            for index in self.pair_indexes.values():
+                index.drop_before(cutoff)
+        else:
+            self.index.drop_before(cutoff, where=lambda rec: pair_of(rec) == pair)
+            self._select(pair).drop_before(cutoff)
+        return len(removed)
+
+    @_syncs
+    def prune_candles(self, interval: str, until, pair=None) -> int:
+        table, index, doc_ids = self._candles(interval, pair)
+        removed = index.drop_before(until)
+        table.remove(doc_ids=[doc_ids.pop(bucket) for bucket in removed])
+        return len(removed)
+
+    @_syncs
+    def drop_duplicates(self, key) -> list[dict]:
+        duplicate = _duplicates(key)
+        docs = sorted(self.db.all(), key=lambda d: (to_epoch(d["timestamp"]), d.doc_id))
+        removed = [doc for doc in docs if duplicate(doc)]
+        if removed:
+            self.db.remove(doc_ids=[doc.doc_id for doc in removed])
+            self._reindex()
+        return [dict(doc) for doc in removed]
+
+    def refresh(self) -> bool:
+        from tinydb import TinyDB
+
+        if _file_signature(self.path) == self._synced:
+            return False
+        # O TinyDB também guarda em cache o próximo id: o arquivo é reaberto
+        self.db.close()
+        self.db = TinyDB(self.path)
+        self._candle_tables = {}
+        self._reindex()
+        self._synced = _file_signature(self.path)
+        return True
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class SQLiteStorage(Storage):
+    """Backend SQLite em modo WAL, com índices sobre o timestamp e sobre (par, timestamp)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ticks ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "timestamp TEXT NOT NULL, "
+            "data TEXT NOT NULL, "
+            "pair TEXT)"
+        )
+        self._migrate()
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ticks_timestamp ON ticks (timestamp)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ticks_pair_timestamp "
+            "ON ticks (pair, timestamp)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS candles ("
+            "pair TEXT NOT NULL, "
+            "interval TEXT NOT NULL, "
+            "bucket TEXT NOT NULL, "
+            "data TEXT NOT NULL, "
+            "PRIMARY KEY (pair, interval, bucket)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+    def _columns(self, table: str) -> set[str]:
+        return {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+
+    def _migrate(self) -> None:
+        """Atualiza bancos criados antes do suporte a múltiplos pares."""
+        if "pair" not in self._columns("ticks"):
+            legacy_pair = pair_of({})
+            logger.info("Migrando registros existentes para o par %s.", legacy_pair)
+            with self.conn:
+                self.conn.execute("ALTER TABLE ticks ADD COLUMN pair TEXT")
+                self.conn.execute("UPDATE ticks SET pair = ?", (legacy_pair,))
+        candle_columns = self._columns("candles")
+        if candle_columns and "pair" not in candle_columns:
+            # Candles são derivados dos ticks: basta recriá-los com 'rollup'
+            logger.warning(
+                "Tabela de candles sem par; recriando. Execute 'rollup' para reconstruí-los."
+            )
+            with self.conn:
+                self.conn.execute("DROP TABLE candles")
+
+    def insert(self, record: dict) -> None:
+        self.insert_many([record])
+
+    def insert_many(self, records: Iterable[dict]) -> int:
+        rows = [(rec["timestamp"], json.dumps(rec), pair_of(rec)) for rec in records]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO ticks (timestamp, data, pair) VALUES (?, ?, ?)", rows
+            )
+        return len(rows)
+
+    @staticmethod
+    def _where(
+        since, until, column: str = "timestamp", **equals: str | None
+    ) -> tuple[str, list]:
+        """Monta a cláusula WHERE do intervalo, resolvida pelos índices da tabela."""
+        since, until = _as_iso(since), _as_iso(until)
+        clauses, params = [], []
+        for name, value in equals.items():
+            if value is not None:
+                clauses.append(f"{name} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append(f"{column} >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append(f"{column} < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        where, params = self._where(since, until, pair=pair)
+        cursor = self.conn.execute(
+            f"SELECT data FROM ticks {where} ORDER BY timestamp, id", params
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        if n <= 0:
+            return []
+        where, params = self._where(since, until, pair=pair)
+        cursor = self.conn.execute(
+            f"SELECT data FROM ticks {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            [*params, n],
+        )
+        return [json.loads(data) for (data,) in cursor]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM ticks").fetchone()[0]
+
+    def upsert_candles(self, interval: str, candles: Iterable[dict], pair=None) -> None:
+        pair = pair or default_pair()
+        rows = [(pair, interval, c["bucket"], json.dumps(c)) for c in candles]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO candles (pair, interval, bucket, data) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (pair, interval, bucket) DO UPDATE SET data = excluded.data",
+                rows,
+            )
+
+    def iter_candles(
+        self, interval: str, since=None, until=None, pair=None
+    ) -> Iterator[dict]:
+        where, params = self._where(
+            since, until, "bucket", pair=pair or default_pair(), interval=interval
+        )
+        cursor = self.conn.execute(
+            f"SELECT data FROM candles {where} ORDER BY bucket", params
+        )
+        for (data,) in cursor:
+            yield json.loads(data)
+
+    def clear_candles(self, interval: str, since=None, pair=None) -> None:
+        where, params = self._where(
+            since, None, "bucket", pair=pair or default_pair(), interval=interval
+        )
+        with self.conn:
+            self.conn.execute(f"DELETE FROM candles {where}", params)
+
+    def delete_before(self, until, pair=None) -> int:
+        where, params = self._where(None, until, pair=pair)
+        with self.conn:
+            return self.conn.execute(f"DELETE FROM ticks {where}", params).rowcount
+
+    def prune_candles(self, interval: str, until, pair=None) -> int:
+        where, params = self._where(
+            None, until, "bucket", pair=pair or default_pair(), interval=interval
+        )
+        with self.conn:
+            return self.conn.execute(f"DELETE FROM candles {where}", params).rowcount
+
+    def drop_duplicates(self, key) -> list[dict]:
+        # Percorre o índice (par, timestamp); só os registros removidos ficam em memória
+        duplicate = _duplicates(key)
+        cursor = self.conn.execute(
+            "SELECT id, data FROM ticks ORDER BY pair, timestamp, id"
+        )
+        removed = []
+        for row_id, data in cursor:
+            record = json.loads(data)
+            if duplicate(record):
+                removed.append((row_id, record))
+        with self.conn:
+            self.conn.executemany(
+                "DELETE FROM ticks WHERE id = ?", [(row_id,) for row_id, _ in removed]
+            )
+        return [record for _, record in removed]
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class JsonLinesCandles(ABC):
+    """
+    Candles OHLC em arquivos JSON-lines, um por par e intervalo, com um
+    CandleIndex em memória para as consultas.
+
+    Usado pelos backends sem tabela própria para candles; a classe concreta
+    define '_candle_path' e inicializa '_candle_indexes' e '_candle_synced'
+    (a assinatura de cada arquivo ao ser lido ou gravado por este handle).
+    """
+
+    _candle_indexes: dict[tuple, CandleIndex]
+    _candle_synced: dict[tuple, tuple | None]
+
+    @abstractmethod
+    def _candle_path(self, interval: str, pair: str) -> str:
+        """Caminho do arquivo de candles do par e intervalo."""
+
+    def _candles(self, interval: str, pair: str | None) -> tuple[CandleIndex, str]:
+        """
+        Carrega os candles do par e intervalo (a última linha de cada bucket prevalece).
+
+        Cada atualização de candle é uma nova linha; quando as versões antigas
+        passam a dominar o arquivo, ele é compactado na abertura.
+        """
+        pair = pair or default_pair()
+        path = self._candle_path(interval, pair)
+        key = (pair, interval)
+        if key not in self._candle_indexes:
+            lines = 0
+            index = CandleIndex()
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            index.upsert(json.loads(line))
+                            lines += 1
+            self._candle_indexes[key] = index
+            if lines > 2 * len(index) + CANDLE_COMPACTION_SLACK:
+                self._rewrite_candles(index, path)
+            self._candle_synced[key] = _file_signature(path)
+        return self._candle_indexes[key], path
+
+    def _candles_written(self, interval: str, pair: str | None) -> None:
+        pair = pair or default_pair()
+        path = self._candle_path(interval, pair)
+        self._candle_synced[(pair, interval)] = _file_signature(path)
+
+    def _refresh_candles(self) -> bool:
+        """Descarta os candles em memória cujo arquivo foi alterado por outro processo."""
+        stale = [
+            key
+            for key in self._candle_indexes
+            if _file_signature(self._candle_path(key[1], key[0]))
+            != self._candle_synced.get(key)
+        ]
+        for key in stale:
+            del self._candle_indexes[key]
+        return bool(stale)
+
+    @staticmethod
+    def _rewrite_candles(index: CandleIndex, path: str) -> None:
+        """Reescreve o arquivo de candles apenas com a versão atual de cada bucket."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for candle in index.range():
+                f.write(json.dumps(candle) + "\n")
+        os.replace(tmp_path, path)
+
+    def upsert_candles(self, interval: str, candles: Iterable[dict], pair=None) -> None:
+        index, path = self._candles(interval, pair)
+        lines = []
+        for candle in candles:
+            index.upsert(candle)
+            lines.append(json.dumps(candle) + "\n")
+        with open(path, "a", encoding="utf-8") as f:
+            f.writelines(lines)
+        self._candles_written(interval, pair)
+
+    def iter_candles(
+        self, interval: str, since=None, until=None, pair=None
+    ) -> Iterator[dict]:
+        index, _ = self._candles(interval, pair)
+        return iter(index.range(since, until))
+
+    def clear_candles(self, interval: str, since=None, pair=None) -> None:
+        index, path = self._candles(interval, pair)
+        index.clear(since)
+        self._rewrite_candles(index, path)
+        self._candles_written(interval, pair)
+
+    def prune_candles(self, interval: str, until, pair=None) -> int:
+        index, path = self._candles(interval, pair)
+        removed = index.drop_before(until)
+        if removed:
+            self._rewrite_candles(index, path)
+            self._candles_written(interval, pair)
+        return len(removed)
+
+
+def _pair_code(pair: str) -> float:
+    """Código numérico estável do par, gravado no índice lateral do JSON-lines."""
+    return float(zlib.crc32(pair.encode("utf-8")))
+
+
+class JsonLinesStorage(JsonLinesCandles, Storage):
+    """
+    Backend append-only: um registro JSON por linha, sem reescrever o arquivo.
+
+    Um índice lateral (arquivo '.idx') guarda triplas (epoch, offset, código do
+    par) em binário, também append-only, para que a abertura não precise
+    reler todo o histórico. Os índices por par são montados sob demanda a
+    partir desse arquivo.
+    """
+
+    ENTRY_SIZE = 3
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index_path = f"{path}.idx"
+        # Garante que o arquivo exista para leituras antes da primeira inserção
+        open(self.path, "ab").close()
+        self.index = TimeIndex()
+        self.pair_indexes: dict[str, TimeIndex] = {}
+        self._candle_indexes: dict[tuple, CandleIndex] = {}
+        self._candle_synced: dict[tuple, tuple | None] = {}
+        self._load_index()
+        self._file = open(self.path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._synced = _file_signature(path)
+
+    def _read_entries(self) -> array:
+        """Lê o índice lateral, descartando uma eventual entrada incompleta."""
+        entries = array("d")
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "rb") as f:
+                data = f.read()
+            entry_bytes = self.ENTRY_SIZE * entries.itemsize
+            entries.frombytes(data[: len(data) - len(data) % entry_bytes])
+        return entries
+
+    def _load_index(self) -> None:
+        """Carrega o índice lateral e indexa as linhas que ainda não estão nele."""
+        entries = self._read_entries()
+        epochs, offsets = entries[0::3], entries[1::3]
+        next_offset = 0
+        if offsets:
+            with open(self.path, "rb") as f:
+                f.seek(int(offsets[-1]))
+                next_offset = int(offsets[-1]) + len(f.readline())
+
+        if all(a <= b for a, b in zip(epochs, epochs[1:])):
+            self.index.epochs = epochs
+            self.index.values = [int(o) for o in offsets]
+        else:
+            for epoch, offset in sorted(zip(epochs, offsets)):
+                self.index.add(epoch, int(offset))
+
+        # Linhas gravadas sem entrada no índice (ex.: índice ausente ou antigo)
+        missing = array("d")
+        with open(self.path, "rb") as f:
+            f.seek(next_offset)
+            offset = next_offset
+            for line in iter(f.readline, b""):
+                if line.strip():
+                    record = json.loads(line)
+                    epoch = to_epoch(record["timestamp"])
+                    self.index.add(epoch, offset)
+                    missing.extend((epoch, float(offset), _pair_code(pair_of(record))))
+                offset += len(line)
+        if missing:
+            logger.debug(
+                "Indexando %s registros em %s.",
+                len(missing) // self.ENTRY_SIZE,
+                self.path,
+            )
+            with open(self.index_path, "ab") as f:
+                f.truncate(len(entries) * entries.itemsize)
+                missing.tofile(f)
+
+    def _pair_index(self, pair: str) -> TimeIndex:
+        """Monta (uma vez) o índice do par a partir do índice lateral."""
+        if pair not in self.pair_indexes:
+            code = _pair_code(pair)
+            entries = self._read_entries()
+            index = TimeIndex()
+            for i in range(0, len(entries), self.ENTRY_SIZE):
+                if entries[i + 2] == code:
+                    index.add(entries[i], int(entries[i + 1]))
+            self.pair_indexes[pair] = index
+        return self.pair_indexes[pair]
+
+    @_syncs
+    def _append(self, records: Iterable[dict]) -> int:
+        offset = self._file.seek(0, os.SEEK_END)
+        lines, entries = [], array("d")
+        for rec in records:
+            line = (json.dumps(rec) + "\n").encode("utf-8")
+            epoch = to_epoch(rec["timestamp"])
+            pair = pair_of(rec)
+            lines.append(line)
+            entries.extend((epoch, float(offset), _pair_code(pair)))
+            self.index.add(epoch, offset)
+            if pair in self.pair_indexes:
+                self.pair_indexes[pair].add(epoch, offset)
+            offset += len(line)
+        self._file.writelines(lines)
+        self._file.flush()
+        entries.tofile(self._index_file)
+        self._index_file.flush()
+        return len(lines)
+
+    def insert(self, record: dict) -> None:
+        self._append([record])
+
+    def insert_many(self, records: Iterable[dict]) -> int:
+        return self._append(records)
+
+    def _read(self, offsets: list[int], pair: str | None = None) -> Iterator[dict]:
+        with open(self.path, "rb") as f:
+            for offset in offsets:
+                f.seek(offset)
+                record = json.loads(f.readline())
+                # Protege contra colisões do código do par no índice lateral
+                if pair is None or pair_of(record) == pair:
+                    yield record
+
+    def _select(self, pair: str | None) -> TimeIndex:
+        return self.index if pair is None else self._pair_index(pair)
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        offsets = self._select(pair).range(_as_epoch(since), _as_epoch(until))
+        return self._read(offsets, pair)
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        if n <= 0:
+            return []
+        offsets = self._select(pair).last(n, _as_epoch(since), _as_epoch(until))
+        return list(self._read(offsets, pair))
+
+    def count(self) -> int:
+        return len(self.index)
+
+    def _candle_path(self, interval: str, pair: str) -> str:
+        return f"{os.path.splitext(self.path)[0]}.candles-{pair}-{interval}.jsonl"
+
+    def delete_before(self, until, pair=None) -> int:
+        """
+        Remove os registros anteriores a 'until' reescrevendo o arquivo.
+
+        O formato é append-only, então a remoção copia as linhas mantidas para
+        um novo arquivo e reconstrói o índice lateral; a política de retenção
+        a executa em lotes, fora do caminho das inserções.
+        """
+        cutoff = _as_epoch(until)
+
+        def expired(offset: int, line: bytes) -> bool:
+            if not line.strip():
+                return False
+            record = json.loads(line)
+            return to_epoch(record["timestamp"]) < cutoff and (
+                pair is None or pair_of(record) == pair
+            )
+
+        return self._rewrite(expired)
+
+    def drop_duplicates(self, key) -> list[dict]:
+        # O arquivo está em ordem de chegada; o índice dá a ordem de tempo
+        duplicate = _duplicates(key)
+        self._file.flush()
+        offsets = self.index.values
+        removed = {
+            offset: record
+            for offset, record in zip(offsets, self._read(offsets))
+            if duplicate(record)
+        }
+        if removed:
+            self._rewrite(lambda offset, line: offset in removed)
+        return list(removed.values())
+
+    def _rewrite(self, drop: Callable[[int, bytes], bool]) -> int:
+        """
+        Reescreve o arquivo sem as linhas para as quais drop(offset, linha) é
+        verdadeiro e reconstrói o índice lateral.
+
+        Returns:
+            int: Quantidade de linhas removidas.
+        """
+        removed = 0
+        tmp_path = f"{self.path}.tmp"
+        self._file.flush()
+        with open(self.path, "rb") as src, open(tmp_path, "wb") as dst:
+            offset = 0
+            for line in src:
+                if drop(offset, line):
+                    removed += 1
+                else:
+                    dst.write(line)
+                offset += len(line)
+        if not removed:
+            os.remove(tmp_path)
+            return 0
+
+        self.close()
+        os.replace(tmp_path, self.path)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        self._reload()
+        return removed
+
+    def _reload(self) -> None:
+        """Reabre os arquivos e recarrega o índice lateral."""
+        self.close()
+        self.index = TimeIndex()
+        self.pair_indexes = {}
+        self._load_index()
+        self._file = open(self.path, "ab")
+        self._index_file = open(self.index_path, "ab")
+        self._synced = _file_signature(self.path)
+
+    def refresh(self) -> bool:
+        candles = self._refresh_candles()
+        if _file_signature(self.path) == self._synced:
+            return candles
+        self._reload()
+        return True
+
+    def close(self) -> None:
+        self._file.close()
+        self._index_file.close()
+
+
+class BinaryStorage(JsonLinesCandles, Storage):
+    """
+    Backend binário: registros de largura fixa, um arquivo por par, lidos via mmap.
+
+    Cada tick ocupa 32 bytes (epoch em microssegundos int64 e price,
+    price_usd e price_real float64), em ordem de tempo, após um cabeçalho
+    de 16 bytes. As consultas fazem busca binária direto no arquivo mapeado,
+    sem parse de JSON nem de datas, e 'columns' expõe o trecho consultado
+    como um array NumPy estruturado, sem cópia. 'path' é um diretório; os
+    candles ficam ao lado dos ticks, em JSON-lines.
+
+    Apenas asset, quote, price, price_usd, price_real e timestamp são
+    gravados: campos extras (ex: 'sources') são descartados.
+    """
+
+    MAGIC = b"ETLTICK\0"
+    VERSION = 1
+    HEADER_SIZE = 16
+    SUFFIX = ".ticks"
+    # Registros convertidos em dicionários por vez nas consultas por intervalo
+    DECODE_CHUNK = 10_000
+
+    def __init__(self, path: str) -> None:
+        # Import local: o NumPy só é carregado quando este backend é usado
+        import numpy as np
+
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.dtype = np.dtype(
+            [
+                ("t", "<i8"),
+                ("price", "<f8"),
+                ("price_usd", "<f8"),
+                ("price_real", "<f8"),
+            ]
+        )
+        self.header = self.MAGIC + struct.pack("<II", self.VERSION, self.dtype.itemsize)
+        self._views: dict[str, tuple] = {}
+        self._files: dict[str, BinaryIO] = {}
+        self._candle_indexes: dict[tuple, CandleIndex] = {}
+        self._candle_synced: dict[tuple, tuple | None] = {}
+        for pair in self.pairs():
+            self._check(pair)
+
+    def _tick_path(self, pair: str) -> str:
+        return os.path.join(self.path, f"{pair}{self.SUFFIX}")
+
+    def _candle_path(self, interval: str, pair: str) -> str:
+        return os.path.join(self.path, f"candles-{pair}-{interval}.jsonl")
+
+    def pairs(self) -> list[str]:
+        """Pares com ticks gravados."""
+        return sorted(
+            name[: -len(self.SUFFIX)]
+            for name in os.listdir(self.path)
+            if name.endswith(self.SUFFIX)
+        )
+
+    def _check(self, pair: str) -> None:
+        """
+        Valida o cabeçalho do arquivo do par e descarta um registro incompleto
+        no final (gravação interrompida).
+
+        Raises:
+            ValueError: Se o arquivo não for deste formato ou versão.
+        """
+        path = self._tick_path(pair)
+        with open(path, "rb+") as f:
+            if f.read(self.HEADER_SIZE) != self.header:
+                raise ValueError(
+                    f"Arquivo de ticks inválido ou de outra versão: {path}"
+                )
+            size = f.seek(0, os.SEEK_END)
+            partial = (size - self.HEADER_SIZE) % self.dtype.itemsize
+            if partial:
+                logger.warning(
+                    "Descartando %s bytes de um registro incompleto em '%s'.",
+                    partial,
+                    path,
+                )
+                f.truncate(size - partial)
+
+    def _view(self, pair: str):
+        """
+        Array (sem cópia) com todos os ticks do par, mapeado do arquivo.
+
+        O mapeamento é refeito quando o arquivo cresce ou é substituído, o que
+        também torna visíveis as gravações de outros processos.
+        """
+        import numpy as np
+
+        try:
+            stat = os.stat(self._tick_path(pair))
+        except FileNotFoundError:
+            return np.empty(0, dtype=self.dtype)
+        key = (stat.st_ino, stat.st_size)
+        cached = self._views.get(pair)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        count = (stat.st_size - self.HEADER_SIZE) // self.dtype.itemsize
+        if count <= 0:
+            view = np.empty(0, dtype=self.dtype)
+        else:
+            with open(self._tick_path(pair), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # O array mantém o mapeamento vivo enquanto houver referências a ele
+            view = np.frombuffer(
+                mapped, dtype=self.dtype, count=count, offset=self.HEADER_SIZE
+            )
+        self._views[pair] = (key, view)
+        return view
+
+    def _encode(self, records: list[dict]):
+        import numpy as np
+
+        rows = np.empty(len(records), dtype=self.dtype)
+        for i, rec in enumerate(records):
+            rows[i] = (
+                to_epoch_us(rec["timestamp"]),
+                rec.get("price", rec["price_usd"]),
+                rec["price_usd"],
+                rec.get("price_real", float("nan")),
+            )
+        return rows
+
+    def _decode(self, pair: str, rows) -> list[dict]:
+        asset, quote = parse_pair(pair)
+        records = []
+        for t, price, usd, real in rows.tolist():
+            record = {"asset": asset, "quote": quote, "price": price, "price_usd": usd}
+            if real == real:  # NaN: registro gravado sem price_real
+                record["price_real"] = real
+            record["timestamp"] = from_epoch_us(t)
+            records.append(record)
+        return records
+
+    def _append(self, pair: str, rows) -> None:
+        f = self._files.get(pair)
+        if f is None:
+            f = open(self._tick_path(pair), "ab")
+            if f.tell() == 0:
+                f.write(self.header)
+            self._files[pair] = f
+        f.write(rows.tobytes())
+        f.flush()
+
+    def _rewrite(self, pair: str, rows) -> None:
+        """Substitui o arquivo do par de forma atômica (arquivo temporário + rename)."""
+        path = self._tick_path(pair)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.header)
+            f.write(rows.tobytes())
+        f = self._files.pop(pair, None)
+        if f is not None:
+            f.close()
+        os.replace(tmp_path, path)
+        self._views.pop(pair, None)
+
+    def insert(self, record: dict) -> None:
+        self.insert_many([record])
+
+    def insert_many(self, records: Iterable[dict]) -> int:
+        """
+        Grava os registros agrupados por par.
+
+        Registros em ordem são acrescentados ao final do arquivo; um lote que
+        chega antes do último tick gravado (ex: backfill) é intercalado,
+        reescrevendo o arquivo do par.
+        """
+        import numpy as np
+
+        by_pair: dict[str, list[dict]] = {}
+        for rec in records:
+            by_pair.setdefault(pair_of(rec), []).append(rec)
+        for pair, recs in by_pair.items():
+            rows = self._encode(recs)
+            current = self._view(pair)
+            ordered = bool(np.all(rows["t"][1:] >= rows["t"][:-1]))
+            if ordered and (not len(current) or rows["t"][0] >= current["t"][-1]):
+                self._append(pair, rows)
+            else:
+                merged = np.concatenate([current, rows])
+                self._rewrite(pair, merged[np.argsort(merged["t"], kind="stable")])
+        return sum(len(recs) for recs in by_pair.values())
+
+    def _bounds(self, view, since, until) -> tuple[int, int]:
+        # bisect sobre a coluna (uma visão com passo de 32 bytes): O(log n), sem cópia
+        times = view["t"]
+        lo = 0 if since is None else bisect_left(times, to_epoch_us(since))
+        hi = len(view) if until is None else bisect_left(times, to_epoch_us(until))
+        return lo, max(lo, hi)
+
+    def columns(self, pair: str, since=None, until=None):
+        view = self._view(pair)
+        lo, hi = self._bounds(view, since, until)
+        return view[lo:hi]
+
+    def _iter_pair(self, pair: str, since, until) -> Iterator[dict]:
+        rows = self.columns(pair, since, until)
+        for start in range(0, len(rows), self.DECODE_CHUNK):
+            yield from self._decode(pair, rows[start : start + self.DECODE_CHUNK])
+
+    def iter_range(self, since=None, until=None, pair=None) -> Iterator[dict]:
+        if pair is not None:
+            return self._iter_pair(pair, since, until)
+        streams = [
+            ((to_epoch(r["timestamp"]), r) for r in self._iter_pair(p, since, until))
+            for p in self.pairs()
+        ]
+        return (r for _, r in heapq.merge(*streams, key=lambda item: item[0]))
+
+    def last(self, n: int = 10, since=None, until=None, pair=None) -> list[dict]:
+        if n <= 0:
+            return []
+        newest = []
+        for p in [pair] if pair is not None else self.pairs():
+            rows = self.columns(p, since, until)[-n:]
+            newest += zip(rows["t"].tolist(), self._decode(p, rows))
+        newest.sort(key=lambda item: item[0], reverse=True)
+        return [r for _, r in newest[:n]]
+
+    def count(self) -> int:
+        return sum(len(self._view(pair)) for pair in self.pairs())
+
+    def delete_before(self, until, pair=None) -> int:
+        removed = 0
+        for p in [pair] if pair is not None else self.pairs():
+            view = self._view(p)
+            _, hi = self._bounds(view, None, until)
+            if hi:
+                self._rewrite(p, view[hi:])
+                removed += hi
+        return removed
+
+    def drop_duplicates(self, key) -> list[dict]:
+        import numpy as np
+
+        removed = []
+        for pair in self.pairs():
+            duplicate = _duplicates(key)
+            view = self._view(pair)
+            keep = np.ones(len(view), dtype=bool)
+            for start in range(0, len(view), self.DECODE_CHUNK):
+                chunk = self._decode(pair, view[start : start + self.DECODE_CHUNK])
+                for i, record in enumerate(chunk, start):
+                    if duplicate(record):
+                        keep[i] = False
+                        removed.append(record)
+            if not keep.all():
+                self._rewrite(pair, view[keep])
+        return removed
+
+    def refresh(self) -> bool:
+        # Os ticks já são remapeados quando o arquivo muda (ver _view)
+        return self._refresh_candles()
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files = {}
+        self._views = {}
+
+
+def open_storage(backend: str, path: str) -> Storage:
+    """Cria o backend de armazenamento indicado para o caminho informado."""
+    db_dir = os.path.dirname(path)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+
+    if backend == "tinydb":
+        return TinyDBStorage(path)
+    if backend == "sqlite":
+        return SQLiteStorage(path)
+    if backend == "jsonl":
+        return JsonLinesStorage(path)
+    if backend == "binary":
+        return BinaryStorage(path)
+    raise ValueError(f"Backend de armazenamento desconhecido: {backend}")
+
+
+_storage: Storage | None = None
+
+
+def get_storage() -> Storage:
+    """
+    Retorna o handle compartilhado do armazenamento configurado, abrindo-o sob demanda.
+
+    Com ARCHIVE_DIR definido, o backend é combinado ao arquivo frio (ver
+    src.archive), para que as consultas alcancem também os ticks arquivados.
+    """
+    global _storage
+    if _storage is None:
+        logger.debug(
+            "Abrindo armazenamento '%s' em '%s'.", config.DB_BACKEND, config.DB_PATH
+        )
+        storage = open_storage(config.DB_BACKEND, config.DB_PATH)
+        if config.ARCHIVE_DIR:
+            # Import local: src.archive depende das classes deste módulo
+            from src.archive import Archive, TieredStorage
+
+            storage = TieredStorage(storage, Archive(config.ARCHIVE_DIR))
+        _storage = storage
+    return _storage
+
+
+def set_storage(storage: Storage | None) -> None:
+    """Substitui o handle compartilhado (útil para testes e ferramentas)."""
+    global _storage
+    _storage = storage
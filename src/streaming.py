@@ -0,0 +1,374 @@
+import asyncio
+import json
+import random
+import signal
+import time
+from contextlib import suppress
+from datetime import datetime
+
+from src import alerts, config, pipeline
+from src.logger import logger
+from src.metrics import (
+    STREAM_BUCKETS,
+    STREAM_CONNECTED,
+    STREAM_FALLBACK_POLLS,
+    STREAM_MESSAGES,
+    STREAM_RECONNECTS,
+)
+from src.pairs import format_pair, parse_pair
+from src.rollups import bucket_start
+from src.timeutils import parse_duration
+
+
+class StreamError(Exception):
+    """Erro de configuração do modo streaming (ex: dependência ausente)."""
+
+
+def _require_websockets():
+    """Importa o pacote opcional 'websockets' (extra 'stream')."""
+    try:
+        import websockets
+        from websockets.asyncio.client import connect
+    except ImportError:
+        raise StreamError(
+            "O modo streaming requer o pacote opcional 'websockets'. "
+            "Instale com: pip install websockets"
+        )
+    return websockets, connect
+
+
+def parse_ticker(message: dict) -> tuple[str, float, float] | None:
+    """
+    Extrai (par, epoch, preço) de uma mensagem do canal 'ticker' da Coinbase
+    Exchange, ou None para as demais mensagens (subscriptions, heartbeat).
+    """
+    if message.get("type") != "ticker":
+        return None
+    try:
+        pair = format_pair(*parse_pair(message["product_id"]))
+        price = float(message["price"])
+        moment = message.get("time")
+        epoch = datetime.fromisoformat(moment).timestamp() if moment else time.time()
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning("Mensagem de ticker inválida ignorada: %s", e)
+        return None
+    return pair, epoch, price
+
+
+class TickCoalescer:
+    """
+    Agrega ticks de alta frequência em um bucket por par e intervalo.
+
+    Cada bucket guarda o último preço, a máxima, a mínima e a quantidade de
+    ticks de [start, start + interval), alinhado ao relógio como os candles.
+    O bucket de um par é fechado quando chega um tick de um intervalo
+    posterior (pelo horário do evento) ou, para pares sem novos ticks, por
+    close. Ticks de um intervalo já fechado são descartados.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self.buckets: dict[str, dict] = {}
+
+    def add(self, pair: str, epoch: float, price: float) -> dict | None:
+        """Aplica um tick e retorna o bucket do par fechado por ele, se houver."""
+        start = bucket_start(epoch, self.interval)
+        current = self.buckets.get(pair)
+        closed = None
+        if current is not None:
+            if start < current["start"]:
+                return None
+            if start > current["start"]:
+                closed, current = self.buckets.pop(pair), None
+        if current is None:
+            self.buckets[pair] = {
+                "pair": pair,
+                "start": start,
+                "epoch": epoch,
+                "last": price,
+                "high": price,
+                "low": price,
+                "count": 1,
+            }
+        else:
+            current["epoch"] = max(current["epoch"], epoch)
+            current["last"] = price
+            current["high"] = max(current["high"], price)
+            current["low"] = min(current["low"], price)
+            current["count"] += 1
+        return closed
+
+    def close(self, pairs) -> list[dict]:
+        """Fecha e retorna os buckets abertos dos pares informados."""
+        return [self.buckets.pop(pair) for pair in pairs if pair in self.buckets]
+
+    def drain(self) -> list[dict]:
+        """Fecha e retorna todos os buckets abertos."""
+        return self.close(list(self.buckets))
+
+
+def bucket_record(bucket: dict, rates: dict) -> dict | None:
+    """
+    Converte um bucket em registro no formato do pipeline, com price (último
+    preço), high, low e count na moeda do par.
+    """
+    asset, quote = parse_pair(bucket["pair"])
+    quote_rate = pipeline.quote_to_usd_rate(rates, quote)
+    if not quote_rate:
+        logger.error("Cotação de %s indisponível; ignorando %s.", quote, bucket["pair"])
+        return None
+    price_usd = bucket["last"] / quote_rate
+    return {
+        "asset": asset,
+        "quote": quote,
+        "price": bucket["last"],
+        "price_usd": price_usd,
+        "price_real": price_usd * rates["BRL"],
+        "timestamp": datetime.fromtimestamp(bucket["epoch"]).isoformat(),
+        "high": bucket["high"],
+        "low": bucket["low"],
+        "count": bucket["count"],
+        "source": "stream",
+    }
+
+
+def save_buckets(buckets: list[dict]) -> int:
+    """
+    Converte os buckets fechados em registros, grava o lote (pelo buffer de
+    escrita do pipeline) e avalia as regras de alerta.
+
+    Returns:
+        int: Quantidade de registros aceitos.
+    """
+    rates = pipeline.get_exchange_rates()
+    if not rates or not rates.get("BRL"):
+        rates = {**(rates or {}), "BRL": config.FALLBACK_USD_TO_BRL_RATE}
+    records = [r for r in (bucket_record(b, rates) for b in buckets) if r]
+    count = pipeline.save_records(records)
+    alerts.evaluate(records, pipeline.storage_lock)
+    return count
+
+
+class TickerStream:
+    """
+    Ingestão contínua a partir do feed WebSocket de tickers.
+
+    - Os ticks são agregados em memória (TickCoalescer) em buckets de
+      'interval' segundos; os buckets fechados são entregues a 'deliver' em
+      lotes, a cada 'flush_every' segundos (padrão: 'interval'). O bucket de
+      um par sem ticks há 'interval' segundos é fechado na entrega seguinte.
+    - A conexão é refeita com backoff exponencial e jitter quando cai ou
+      quando fica 'stale_after' segundos sem nenhuma mensagem.
+    - Lacunas: pares sem ticks há mais de 'stale_after' segundos (feed
+      desconectado, par parado ou não assinado) são buscados pelo REST
+      ('poll'), no máximo a cada 'poll_interval' segundos, até o feed voltar.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pairs: list[str],
+        interval: float,
+        deliver=save_buckets,
+        poll=pipeline.run_etl_pipeline,
+        stale_after: float = 30.0,
+        poll_interval: float = 300.0,
+        reconnect_max: float = 30.0,
+        flush_every: float | None = None,
+    ) -> None:
+        self.url = url
+        self.pairs = pairs
+        self.interval = interval
+        self.deliver = deliver
+        self.poll = poll
+        self.stale_after = stale_after
+        self.poll_interval = poll_interval
+        self.reconnect_max = reconnect_max
+        self.flush_every = flush_every or interval
+        self.coalescer = TickCoalescer(interval)
+        self.pending: list[dict] = []
+        started = time.monotonic()
+        # Último tick (relógio monotônico) de cada par e última mensagem do feed
+        self.last_tick = {pair: started for pair in pairs}
+        self.last_message = started
+        self.last_poll: float | None = None
+        self.connected = False
+        self._stop: asyncio.Event | None = None
+
+    def subscribe_message(self) -> dict:
+        return {
+            "type": "subscribe",
+            "product_ids": self.pairs,
+            "channels": ["ticker", "heartbeat"],
+        }
+
+    def handle(self, raw: str | bytes) -> None:
+        """Processa uma mensagem do feed."""
+        self.last_message = time.monotonic()
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            logger.warning("Mensagem inválida do feed ignorada.")
+            return
+        tick = parse_ticker(message)
+        if tick is None:
+            return
+        pair, epoch, price = tick
+        if pair not in self.last_tick:
+            return
+        STREAM_MESSAGES.labels(pair=pair).inc()
+        self.last_tick[pair] = self.last_message
+        closed = self.coalescer.add(pair, epoch, price)
+        if closed is not None:
+            self.pending.append(closed)
+
+    def stop(self) -> None:
+        """Solicita o encerramento; os buckets abertos são gravados antes de sair."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def _wait(self, seconds: float) -> bool:
+        """Espera 'seconds'. Retorna False se o stream foi parado."""
+        with suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, seconds))
+        return not self._stop.is_set()
+
+    async def _receive_loop(self) -> None:
+        websockets, connect = _require_websockets()
+        attempt = 0
+        while not self._stop.is_set():
+            try:
+                async with connect(
+                    self.url, open_timeout=config.REQUEST_TIMEOUT
+                ) as websocket:
+                    await websocket.send(json.dumps(self.subscribe_message()))
+                    gap = time.monotonic() - self.last_message
+                    self.connected = True
+                    STREAM_CONNECTED.set(1)
+                    logger.info(
+                        "Conectado ao feed %s (%s pares; %.1fs sem mensagens).",
+                        self.url,
+                        len(self.pairs),
+                        gap,
+                    )
+                    while True:
+                        try:
+                            raw = await asyncio.wait_for(
+                                websocket.recv(), timeout=self.stale_after
+                            )
+                        except asyncio.TimeoutError:
+                            logger.warning(
+                                "Feed sem mensagens há %gs; reconectando.",
+                                self.stale_after,
+                            )
+                            break
+                        attempt = 0
+                        self.handle(raw)
+            except (OSError, asyncio.TimeoutError, websockets.WebSocketException) as e:
+                logger.warning("Conexão com o feed perdida: %s", e)
+            finally:
+                self.connected = False
+                STREAM_CONNECTED.set(0)
+            STREAM_RECONNECTS.inc()
+            delay = random.uniform(0, min(self.reconnect_max, 0.5 * 2**attempt))
+            attempt += 1
+            if not await self._wait(delay):
+                break
+
+    def stale_pairs(self, now: float) -> list[str]:
+        return [
+            p for p, last in self.last_tick.items() if now - last > self.stale_after
+        ]
+
+    async def flush(self) -> None:
+        """Fecha os buckets de pares parados e entrega os buckets pendentes."""
+        now = time.monotonic()
+        idle = [p for p, last in self.last_tick.items() if now - last >= self.interval]
+        self.pending += self.coalescer.close(idle)
+        if self.pending:
+            buckets, self.pending = self.pending, []
+            STREAM_BUCKETS.inc(len(buckets))
+            try:
+                await asyncio.to_thread(self.deliver, buckets)
+            except Exception:
+                logger.exception("Falha ao gravar %s buckets do feed.", len(buckets))
+
+        stale = self.stale_pairs(now)
+        due = self.last_poll is None or now - self.last_poll >= self.poll_interval
+        if stale and due:
+            self.last_poll = now
+            STREAM_FALLBACK_POLLS.inc()
+            logger.warning(
+                "Sem ticks do feed para %s; buscando pelo REST.", ", ".join(stale)
+            )
+            try:
+                await asyncio.to_thread(self.poll, stale)
+            except Exception:
+                logger.exception("Falha na busca REST de %s.", ", ".join(stale))
+
+    async def run(self) -> None:
+        """Consome o feed até que stop() seja chamado."""
+        self._stop = asyncio.Event()
+        receiver = asyncio.create_task(self._receive_loop())
+        try:
+            while await self._wait(self.flush_every):
+                if receiver.done():
+                    # Ex: 'websockets' ausente; propaga o erro
+                    receiver.result()
+                await self.flush()
+        finally:
+            receiver.cancel()
+            with suppress(asyncio.CancelledError):
+                await receiver
+            self.pending += self.coalescer.drain()
+            # Entrega final sem busca REST
+            self.last_tick = dict.fromkeys(self.last_tick, time.monotonic())
+            await self.flush()
+
+
+def build_stream() -> TickerStream:
+    """Monta o stream com os pares e intervalos do config."""
+    return TickerStream(
+        config.STREAM_URL,
+        config.PAIRS,
+        parse_duration(config.STREAM_INTERVAL).total_seconds(),
+        stale_after=parse_duration(config.STREAM_STALE_AFTER).total_seconds(),
+        poll_interval=config.SCHEDULE_SECONDS,
+        reconnect_max=parse_duration(config.STREAM_RECONNECT_MAX).total_seconds(),
+    )
+
+
+async def run_stream(stream: TickerStream) -> None:
+    """Executa o stream, encerrando de forma limpa em SIGINT/SIGTERM."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stream.stop)
+        except (NotImplementedError, RuntimeError):
+            pass  # ex: Windows ou fora da thread principal
+    await stream.run()
+
+
+def start() -> None:
+    """
+    Inicia a ingestão pelo feed WebSocket (comando 'stream').
+
+    Raises:
+        StreamError: Se o pacote opcional 'websockets' não estiver instalado.
+    """
+    _require_websockets()
+    # Import local: o agendador só é necessário para expor as métricas
+    from src.scheduler import serve_metrics
+
+    serve_metrics()
+    stream = build_stream()
+    logger.info(
+        "Streaming de %s em buckets de %gs. Pressione Ctrl+C para sair.",
+        ", ".join(stream.pairs),
+        stream.interval,
+    )
+    try:
+        asyncio.run(run_stream(stream))
+    finally:
+        pipeline.close_writer()
+    logger.info("Streaming encerrado.")
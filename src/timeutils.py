@@ -0,0 +1,66 @@
+import re
+from datetime import datetime, timedelta
+
+_DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*$")
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def to_epoch(value: str | datetime) -> float:
+    """Converte um timestamp ISO 8601 (ou datetime) em segundos desde a época."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.timestamp()
+
+
+def to_epoch_us(value: str | datetime) -> int:
+    """
+    Converte um timestamp ISO 8601 (ou datetime) em microssegundos desde a época.
+
+    O cálculo é inteiro, então a conversão de volta (from_epoch_us) é exata.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    seconds = int(value.replace(microsecond=0).timestamp())
+    return seconds * 1_000_000 + value.microsecond
+
+
+def from_epoch_us(value: int) -> str:
+    """Converte microssegundos desde a época em timestamp ISO 8601 (hora local)."""
+    seconds, micros = divmod(int(value), 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=micros).isoformat()
+
+
+def parse_duration(text: str) -> timedelta:
+    """
+    Converte uma duração curta em timedelta.
+
+    Aceita um número seguido de unidade: s, m, h, d ou w (ex: '15m', '24h', '7d').
+
+    Raises:
+        ValueError: Se o texto não estiver em um formato reconhecido.
+    """
+    match = _DURATION_RE.match(text)
+    if not match:
+        raise ValueError(
+            f"Duração inválida: '{text}'. Use, por exemplo, 15m, 24h ou 7d."
+        )
+    amount, unit = match.groups()
+    return timedelta(seconds=float(amount) * _UNITS[unit])
+
+
+def parse_time(text: str, now: datetime | None = None) -> datetime:
+    """
+    Converte um limite de tempo da CLI em datetime.
+
+    Aceita uma data/hora ISO 8601 ('2024-01-01', '2024-01-01T12:00') ou uma
+    duração relativa ao momento atual ('24h' equivale a agora - 24 horas).
+
+    Raises:
+        ValueError: Se o texto não for uma data ISO nem uma duração válida.
+    """
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        pass
+    now = now or datetime.now()
+    return now - parse_duration(text)
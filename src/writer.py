@@ -0,0 +1,138 @@
+import atexit
+import signal
+import threading
+import time
+from collections.abc import Callable
+
+from src.logger import logger
+from src.metrics import WRITE_BATCH_RECORDS, WRITE_FLUSH_SECONDS, WRITE_QUEUE_DEPTH
+
+
+class BufferedWriter:
+    """
+    Buffer de escrita com commit em grupo.
+
+    Os registros são acumulados em memória e gravados em lote pela função
+    'commit' quando o buffer atinge 'max_records' ou quando o registro mais
+    antigo espera há mais de 'max_delay' segundos. Com backends que reescrevem
+    ou sincronizam o arquivo a cada inserção (como o TinyDB), isso troca N
+    gravações por uma.
+
+    Se o commit falhar, o lote volta para o início do buffer e é tentado de
+    novo na gravação seguinte. close() grava tudo o que estiver pendente.
+    """
+
+    def __init__(
+        self,
+        commit: Callable[[list[dict]], object],
+        max_records: int = 100,
+        max_delay: float = 1.0,
+    ) -> None:
+        self.commit = commit
+        self.max_records = max(1, max_records)
+        self.max_delay = max_delay
+        self._buffer: list[dict] = []
+        self._oldest: float | None = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="buffered-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def add(self, records: list[dict]) -> None:
+        """Enfileira registros; grava o lote na hora se o limite de tamanho for atingido."""
+        if not records:
+            return
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("O buffer de escrita já foi fechado.")
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._buffer.extend(records)
+            WRITE_QUEUE_DEPTH.set(len(self._buffer))
+            full = len(self._buffer) >= self.max_records
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Grava o conteúdo atual do buffer em um único lote.
+
+        Returns:
+            int: Quantidade de registros gravados.
+        """
+        with self._flush_lock:
+            with self._cond:
+                batch, self._buffer = self._buffer, []
+                self._oldest = None
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.commit(batch)
+            except Exception:
+                logger.exception(
+                    "Falha ao gravar lote de %s registros; mantidos no buffer para nova "
+                    "tentativa.",
+                    len(batch),
+                )
+                with self._cond:
+                    self._buffer[:0] = batch
+                    self._oldest = time.monotonic()
+                    WRITE_QUEUE_DEPTH.set(len(self._buffer))
+                return 0
+            duration = time.perf_counter() - start
+            WRITE_FLUSH_SECONDS.observe(duration)
+            WRITE_BATCH_RECORDS.observe(len(batch))
+            WRITE_QUEUE_DEPTH.set(len(self._buffer))
+            logger.debug("Lote de %s registros gravado em %.3fs.", len(batch), duration)
+            return len(batch)
+
+    def _run(self) -> None:
+        """Grava o buffer quando o registro mais antigo atinge 'max_delay'."""
+        while True:
+            with self._cond:
+                while not self._closed and self._oldest is None:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._oldest + self.max_delay - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+            self.flush()
+
+    def close(self) -> None:
+        """Para a gravação periódica e grava os registros pendentes."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+
+
+def install_shutdown_hooks(writer: BufferedWriter) -> None:
+    """
+    Garante que o buffer seja gravado ao encerrar o processo.
+
+    Registra o fechamento no atexit e, se o SIGTERM ainda tiver o tratamento
+    padrão (que encerra o processo sem executar o atexit), o converte em uma
+    saída normal.
+    """
+    atexit.register(writer.close)
+    if threading.current_thread() is not threading.main_thread():
+        return
+    if signal.getsignal(signal.SIGTERM) is signal.SIG_DFL:
+
+        def _exit(signum, frame):
+            raise SystemExit(128 + signum)
+
+        signal.signal(signal.SIGTERM, _exit)
@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+from src import config
+from src import logger as logger_module
+
+
+@pytest.fixture(autouse=True, scope="session")
+def log_file(tmp_path_factory):
+    """Sends the test run's log file (and that of subprocesses) to a temporary directory."""
+    path = str(tmp_path_factory.mktemp("logs") / "app.log")
+    patch = pytest.MonkeyPatch()
+    patch.setattr(config, "LOG_FILE", path)
+    patch.setenv("LOG_FILE", path)
+    # The handler is built on import and opens its file on the first message
+    handler = logger_module.file_handler
+    with handler.lock:
+        if handler.stream is not None:
+            handler.stream.close()
+            handler.stream = None
+        handler.baseFilename = os.path.abspath(path)
+    yield path
+    patch.undo()
@@ -0,0 +1,158 @@
+import json
+import random
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+
+from src import aggregates, config
+from src.aggregates import RollingWindow, StatsEngine
+from src.pairs import pair_of
+from src.storage import open_storage, set_storage
+
+
+def brute_force(prices: list[tuple[float, float]], now: float, span: float) -> dict:
+    """Computes window statistics from scratch for comparison."""
+    window = [p for e, p in prices if e >= now - span]
+    return {
+        "records_count": len(window),
+        "avg_price": sum(window) / len(window),
+        "min_price": min(window),
+        "max_price": max(window),
+        "variation": (window[-1] - window[0]) / window[0] * 100,
+    }
+
+
+def test_rolling_window_matches_brute_force() -> None:
+    """Tests that incremental min/max/avg match a full recomputation."""
+    rng = random.Random(42)
+    window = RollingWindow(span_seconds=100)
+    prices = []
+    for epoch in range(0, 1000, 7):
+        price = rng.uniform(100, 200)
+        prices.append((float(epoch), price))
+        window.add(float(epoch), price)
+        stats = window.stats()
+        if stats:
+            expected = brute_force(prices, epoch, 100)
+            assert stats["records_count"] == expected["records_count"]
+            assert stats["min_price"] == expected["min_price"]
+            assert stats["max_price"] == expected["max_price"]
+            assert abs(stats["avg_price"] - expected["avg_price"]) < 1e-6
+
+
+def test_rolling_window_rejects_out_of_order() -> None:
+    """Tests that a record older than the newest one is not applied."""
+    window = RollingWindow(span_seconds=100)
+    assert window.add(10.0, 1.0)
+    assert not window.add(5.0, 1.0)
+
+
+def test_snapshot_round_trip(tmp_path) -> None:
+    """Tests that a saved snapshot restores identical statistics."""
+    path = str(tmp_path / "stats.json")
+    engine = StatsEngine(["1h", "24h"], path)
+    for minute in range(30):
+        engine.update(
+            {"timestamp": f"2024-01-01T00:{minute:02d}:00", "price_usd": 100.0 + minute}
+        )
+    engine.save()
+
+    restored = StatsEngine(["1h", "24h"], path)
+    assert restored.load()
+    now = engine.last_epoch
+    assert restored.stats("1h", now) == engine.stats("1h", now)
+    assert restored.last_epoch == engine.last_epoch
+
+
+def test_snapshot_stores_the_largest_window_once(tmp_path) -> None:
+    """Tests that the snapshot keeps only the largest window and restores every window."""
+    path = str(tmp_path / "stats.json")
+    engine = StatsEngine(["1h", "24h"], path)
+    for minute in range(0, 180, 5):
+        engine.update(
+            {
+                "timestamp": f"2024-01-01T{minute // 60:02d}:{minute % 60:02d}:00",
+                "price_usd": 100.0 + minute,
+            }
+        )
+    engine.save()
+    with open(path) as f:
+        data = json.load(f)
+    assert len(data["epochs"]) == len(data["prices"]) == 36
+
+    restored = StatsEngine(["1h"], path)
+    assert restored.load()
+    now = engine.last_epoch
+    assert restored.stats("1h", now) == engine.stats("1h", now)
+    assert not StatsEngine(["1h", "7d"], path).load()
+
+
+def test_snapshot_writes_are_throttled(tmp_path, monkeypatch) -> None:
+    """Tests that batches rewrite the snapshot at most once per interval."""
+    path = tmp_path / "stats.json"
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", str(path))
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_INTERVAL", "1h")
+    monkeypatch.setattr(aggregates, "_engines", {})
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    set_storage(storage)
+    start = datetime.now() - timedelta(minutes=30)
+    try:
+        for m in range(3):
+            record = {"timestamp": (start + timedelta(minutes=m)).isoformat()}
+            record["price_usd"] = 1.0 + m
+            storage.insert(record)
+            aggregates.records_inserted([record])
+            if m == 0:
+                path.unlink()
+        assert not path.exists()
+        engine = aggregates.get_stats_engine(pair_of(record))
+        assert engine.dirty
+        aggregates.save_snapshots()
+    finally:
+        set_storage(None)
+        storage.close()
+    restored = StatsEngine(["1h"], str(path))
+    assert restored.load()
+    assert restored.stats("1h", restored.last_epoch)["records_count"] == 3
+
+
+def test_catch_up_applies_only_new_records(tmp_path) -> None:
+    """Tests that catch_up replays only records newer than the snapshot."""
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    records = [
+        {"timestamp": f"2024-01-01T00:{m:02d}:00", "price_usd": float(m)}
+        for m in range(10)
+    ]
+    storage.insert_many(records)
+
+    engine = StatsEngine(["24h"])
+    for rec in records[:6]:
+        engine.update(rec)
+    assert engine.catch_up(storage) == 4
+    stats = engine.stats("24h", engine.last_epoch)
+    assert stats["records_count"] == 10
+    assert stats["max_price"] == 9.0
+    storage.close()
+
+
+def test_batch_on_fresh_engine_is_applied_once(tmp_path, monkeypatch) -> None:
+    """Tests that a batch saved before the engine exists is neither rebuilt nor double-counted."""
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", str(tmp_path / "stats.json"))
+    monkeypatch.setattr(aggregates, "_engines", {})
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    set_storage(storage)
+    start = datetime.now() - timedelta(minutes=30)
+    records = [
+        {"timestamp": (start + timedelta(minutes=m)).isoformat(), "price_usd": 1.0 + m}
+        for m in range(20)
+    ]
+    storage.insert_many(records)
+    rebuild = Mock(wraps=aggregates.StatsEngine.rebuild)
+    monkeypatch.setattr(aggregates.StatsEngine, "rebuild", rebuild)
+    try:
+        aggregates.records_inserted(records)
+        stats = aggregates.get_stats_engine(pair_of(records[0])).stats("1h")
+    finally:
+        set_storage(None)
+        storage.close()
+    assert stats["records_count"] == 20
+    rebuild.assert_not_called()
@@ -0,0 +1,220 @@
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import alerts, config
+from src.alerts import AlertEngine, parse_rule, parse_rules
+from src.storage import open_storage, set_storage
+
+START = datetime(2024, 1, 1)
+
+
+def tick(minute: float, price: float, pair: str = "BTC-USD") -> dict:
+    """Builds a tick `minute` minutes after 2024-01-01T00:00:00."""
+    asset, quote = pair.split("-")
+    return {
+        "asset": asset,
+        "quote": quote,
+        "price": price,
+        "price_usd": price,
+        "timestamp": (START + timedelta(minutes=minute)).isoformat(),
+    }
+
+
+def fired(engine: AlertEngine, *ticks: dict) -> list[str]:
+    """Feeds ticks to the engine and returns the ids of the rules that fired."""
+    return [alert["rule"] for alert in engine.evaluate(list(ticks))]
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """Local webhook endpoint that records the JSON bodies it receives."""
+
+    def __init__(self, status: int = 200) -> None:
+        received = self.received = []
+        self.status = status
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(handler) -> None:
+                length = int(handler.headers["Content-Length"])
+                received.append(json.loads(handler.rfile.read(length)))
+                handler.send_response(self.status)
+                handler.end_headers()
+
+            def log_message(handler, format, *args) -> None:
+                pass
+
+        super().__init__(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return "http://%s:%s/hook" % self.server_address[:2]
+
+
+@pytest.fixture
+def receiver():
+    """Fixture with a running fake webhook receiver."""
+    server = WebhookReceiver()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_rules() -> None:
+    """Tests the rule grammar, comments and that invalid rules are skipped."""
+    rules = parse_rules(
+        "btc-usd > 70000; BTC-USD<60000.5\nETH-USD +3%/15m # rally\n"
+        "ETH-USD -5% / 1h;ETH-USD 2%/5m;BTC-USD >> 1;ETH-USD 0%/1m"
+    )
+    assert [r.id for r in rules] == [
+        "BTC-USD>70000",
+        "BTC-USD<60000.5",
+        "ETH-USD+3%/15m",
+        "ETH-USD-5%/1h",
+        "ETH-USD2%/5m",
+    ]
+    assert [r.kind for r in rules] == ["above", "below", "rise", "drop", "move"]
+    assert rules[2].span == 900
+    with pytest.raises(ValueError):
+        parse_rule("BTC-USD crosses 70000")
+
+
+def test_threshold_crossings() -> None:
+    """Tests that a tick fires exactly the levels crossed since the previous price."""
+    engine = AlertEngine(
+        parse_rules("BTC-USD>100; BTC-USD>110; BTC-USD>120; BTC-USD<90; ETH-USD>1")
+    )
+    assert fired(engine, tick(0, 95.0)) == []
+    assert fired(engine, tick(1, 110.0)) == ["BTC-USD>100", "BTC-USD>110"]
+    assert fired(engine, tick(2, 115.0)) == []
+    assert fired(engine, tick(3, 90.0)) == ["BTC-USD<90"]
+    assert fired(engine, tick(4, 89.0)) == []
+
+
+def test_change_rules_share_a_window() -> None:
+    """Tests rise/drop/move rules against the min and max of their window."""
+    engine = AlertEngine(
+        parse_rules("BTC-USD +3%/15m; BTC-USD +5%/15m; BTC-USD 4%/15m; BTC-USD -2%/1h")
+    )
+    assert len(engine.pairs["BTC-USD"].changes) == 2
+    assert fired(engine, tick(0, 100.0), tick(5, 101.0)) == []
+    assert fired(engine, tick(10, 104.0)) == ["BTC-USD+3%/15m", "BTC-USD4%/15m"]
+    # 100 left the 15m window: the rise is now measured from 101
+    assert fired(engine, tick(16, 105.5)) == ["BTC-USD+3%/15m", "BTC-USD4%/15m"]
+    assert fired(engine, tick(20, 103.0)) == ["BTC-USD-2%/1h"]
+
+
+def test_cooldown_and_duplicate_ticks() -> None:
+    """Tests that repeated ticks are ignored and a rule stays quiet during its cooldown."""
+    engine = AlertEngine(parse_rules("BTC-USD>100"), cooldown=600)
+    assert fired(engine, tick(0, 99.0), tick(1, 101.0)) == ["BTC-USD>100"]
+    assert fired(engine, tick(1, 99.0)) == []
+    assert fired(engine, tick(2, 99.0), tick(3, 101.0)) == []
+    assert fired(engine, tick(12, 99.0), tick(13, 101.0)) == ["BTC-USD>100"]
+
+
+def test_cooldown_survives_restart(tmp_path) -> None:
+    """Tests that the last firing of each rule is restored from the state file."""
+    path = str(tmp_path / "alerts.json")
+    rules = parse_rules("BTC-USD>100")
+    assert fired(AlertEngine(rules, 600, path), tick(0, 99.0), tick(1, 101.0))
+    engine = AlertEngine(rules, 600, path)
+    assert fired(engine, tick(2, 99.0), tick(3, 101.0)) == []
+
+
+def test_engine_is_seeded_from_storage(tmp_path) -> None:
+    """Tests that the first tick of a process is compared with the stored history."""
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    storage.insert_many([tick(0, 100.0), tick(5, 101.0)])
+    engine = AlertEngine(parse_rules("BTC-USD>102; BTC-USD +4%/15m"))
+
+    alerts = engine.evaluate([tick(10, 104.5)], storage)
+    storage.close()
+    assert [a["rule"] for a in alerts] == ["BTC-USD>102", "BTC-USD+4%/15m"]
+    assert alerts[1]["change"] == pytest.approx(4.5)
+
+
+def test_pipeline_delivers_alerts_to_sinks(tmp_path, monkeypatch, receiver) -> None:
+    """Tests that alerts of a pipeline run reach the webhook and file sinks once."""
+    monkeypatch.setattr(config, "ALERT_RULES", "BTC-USD > 100; BTC-USD < 50")
+    monkeypatch.setattr(config, "ALERT_RULES_FILE", "")
+    monkeypatch.setattr(config, "ALERT_SINKS", ["webhook", "file"])
+    monkeypatch.setattr(config, "ALERT_WEBHOOK_URL", receiver.url)
+    monkeypatch.setattr(config, "ALERT_FILE", str(tmp_path / "alerts.jsonl"))
+    monkeypatch.setattr(config, "ALERT_STATE_PATH", str(tmp_path / "state.json"))
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    storage.insert(tick(0, 99.0))
+    set_storage(storage)
+    alerts.reset()
+    try:
+        assert len(alerts.evaluate([tick(1, 101.0)])) == 1
+        assert alerts.evaluate([tick(1, 101.0)]) == []
+        alerts.get_alert_engine()
+        alerts._dispatcher.flush()
+    finally:
+        alerts.reset()
+        set_storage(None)
+        storage.close()
+
+    assert [body["rule"] for body in receiver.received] == ["BTC-USD>100"]
+    assert receiver.received[0]["id"] == "BTC-USD>100@2024-01-01T00:01:00"
+    lines = (tmp_path / "alerts.jsonl").read_text().splitlines()
+    assert [json.loads(line) for line in lines] == receiver.received
+
+
+def test_failed_engine_build_is_retried(tmp_path, monkeypatch) -> None:
+    """Tests that an engine that fails to build is built again on the next tick."""
+    monkeypatch.setattr(config, "ALERT_RULES", "BTC-USD > 100")
+    monkeypatch.setattr(config, "ALERT_RULES_FILE", "")
+    monkeypatch.setattr(config, "ALERT_SINKS", ["stdout"])
+    monkeypatch.setattr(config, "ALERT_STATE_PATH", str(tmp_path / "state.json"))
+    calls = []
+
+    def flaky(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError("state file unreadable")
+        return AlertEngine(*args)
+
+    monkeypatch.setattr(alerts, "AlertEngine", flaky)
+    alerts.reset()
+    try:
+        with pytest.raises(OSError):
+            alerts.get_alert_engine()
+        assert alerts.get_alert_engine() is not None
+        assert len(calls) == 2
+    finally:
+        alerts.reset()
+
+
+def test_sinks_must_implement_send() -> None:
+    """Tests that a sink without send cannot be instantiated."""
+
+    class Incomplete(alerts.AlertSink):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+def test_failing_sink_does_not_block_the_others(tmp_path, monkeypatch) -> None:
+    """Tests that a webhook answering 4xx is reported without retries or affecting other sinks."""
+    server = WebhookReceiver(status=400)
+    monkeypatch.setattr(config, "FETCH_BACKOFF_BASE", 0.0)
+    file_sink = alerts.FileSink(str(tmp_path / "out" / "alerts.jsonl"))
+    dispatcher = alerts.AlertDispatcher(
+        [alerts.WebhookSink(server.url, retries=3), file_sink]
+    )
+    alert = alerts.build_alert(parse_rule("BTC-USD>100"), tick(1, 101.0), 101.0)
+    try:
+        dispatcher.submit([alert])
+        dispatcher.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(server.received) == 1
+    assert (tmp_path / "out" / "alerts.jsonl").exists()
@@ -0,0 +1,187 @@
+import json
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src import backfill, config, dedupe
+from src.backfill import Backfill, BackfillError, TokenBucket, chunk_ranges
+from src.resilience import reset_breakers
+from src.storage import open_storage
+
+SINCE = datetime(2024, 1, 1)
+UNTIL = datetime(2024, 1, 1, 12)  # 720 one-minute candles = 3 chunks
+
+
+class StubCandles(BaseHTTPRequestHandler):
+    """Serves Coinbase-style candles (newest first) with scripted failures."""
+
+    requests: list[str] = []
+    fail_first = 0  # number of initial requests answered with 429
+    broken_after: float | None = None  # chunks starting at or after this epoch fail
+
+    def do_GET(self) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        start = datetime.fromisoformat(query["start"][0]).timestamp()
+        end = datetime.fromisoformat(query["end"][0]).timestamp()
+        step = int(query["granularity"][0])
+        cls = type(self)
+        cls.requests.append(self.path)
+        if len(cls.requests) <= cls.fail_first or (
+            cls.broken_after is not None and start >= cls.broken_after
+        ):
+            self.send_response(429 if cls.broken_after is None else 500)
+            self.end_headers()
+            return
+        # Inclusive end, as in the real API
+        epochs = range(int(start), int(end) + 1, step)
+        rows = [[e, 1.0, 2.0, 1.5, 100.0 + (e % 3600) / 60, 10.0] for e in epochs]
+        body = json.dumps(rows[::-1]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server():
+    """Fixture with a local candles server, reset for every test."""
+    StubCandles.requests = []
+    StubCandles.fail_first = 0
+    StubCandles.broken_after = None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StubCandles)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/products/{{pair}}/candles"
+    httpd.shutdown()
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Fixture with an empty SQLite store."""
+    backend = open_storage("sqlite", str(tmp_path / "prices.db"))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Avoids network FX lookups, rebuilding the global stats/candles and a shared dedupe index."""
+    monkeypatch.setattr(backfill, "get_exchange_rates", lambda: {"BRL": 5.0})
+    monkeypatch.setattr(backfill.rollups, "rebuild", lambda since=None: 0)
+    monkeypatch.setattr(backfill.aggregates, "rebuild", lambda pair=None: None)
+    monkeypatch.setattr(backfill, "BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(config, "DEDUPE_BUCKET", "1s")
+    dedupe.reset()
+    reset_breakers()
+    yield
+    dedupe.reset()
+
+
+def make_backfill(storage, server, tmp_path, **kwargs) -> Backfill:
+    return Backfill(
+        storage,
+        "BTC-USD",
+        "1m",
+        url=server,
+        workers=2,
+        rate_limit=1000,
+        checkpoint_path=str(tmp_path / "checkpoint.json"),
+        **kwargs,
+    )
+
+
+def test_chunk_ranges_cover_interval() -> None:
+    """Tests that chunks are contiguous and hold at most 300 candles."""
+    chunks = chunk_ranges(0, 60 * 700, 60)
+    assert chunks == [(0, 18000), (18000, 36000), (36000, 42000)]
+
+
+def test_token_bucket_limits_rate() -> None:
+    """Tests that the bucket spaces out acquisitions beyond its capacity."""
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.18
+
+
+def test_backfill_loads_and_deduplicates(storage, server, tmp_path) -> None:
+    """Tests a full backfill, then that a second run inserts nothing new."""
+    StubCandles.fail_first = 1  # first request is rate limited and retried
+    job = make_backfill(storage, server, tmp_path)
+    assert job.run(SINCE, UNTIL) == 720
+    assert len(StubCandles.requests) == 4
+
+    records = list(storage.iter_range(pair="BTC-USD"))
+    assert len(records) == 720
+    assert records[0]["timestamp"] == "2024-01-01T00:00:00"
+    assert records[-1]["timestamp"] == "2024-01-01T11:59:00"
+    assert records[1]["price_real"] == records[1]["price_usd"] * 5.0
+    assert not (tmp_path / "checkpoint.json").exists()
+
+    assert make_backfill(storage, server, tmp_path).run(SINCE, UNTIL) == 0
+    assert storage.count() == 720
+
+
+def test_backfill_resumes_from_checkpoint(storage, server, tmp_path) -> None:
+    """Tests that an interrupted backfill keeps its progress and resumes there."""
+    StubCandles.broken_after = datetime(2024, 1, 1, 10).timestamp()
+    with patch.object(backfill, "CHUNKS_PER_WORKER", 1):
+        with pytest.raises(BackfillError):
+            make_backfill(storage, server, tmp_path).run(SINCE, UNTIL)
+        assert storage.count() == 600
+        assert (tmp_path / "checkpoint.json").exists()
+
+        StubCandles.broken_after = None
+        StubCandles.requests = []
+        reset_breakers()  # the failing chunk opened the provider's breaker
+        assert make_backfill(storage, server, tmp_path).run(SINCE, UNTIL) == 120
+    assert len(StubCandles.requests) == 1
+    assert storage.count() == 720
+
+
+def test_checkpoint_of_another_range_is_ignored(storage, server, tmp_path) -> None:
+    """Tests that a checkpoint is only resumed by a run with the same since and until."""
+    job = make_backfill(storage, server, tmp_path)
+    start, end = SINCE.timestamp(), UNTIL.timestamp()
+    job.save_checkpoint(start, end, datetime(2024, 1, 1, 10).timestamp())
+    assert job.load_checkpoint(start, end) == datetime(2024, 1, 1, 10).timestamp()
+    assert job.load_checkpoint(start, datetime(2024, 1, 1, 11).timestamp()) == start
+
+    # A shorter run must not skip the range the longer one had not reached
+    assert job.run(SINCE, datetime(2024, 1, 1, 11)) == 660
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def test_backfill_goes_through_dedupe_and_lock(storage, server, tmp_path) -> None:
+    """Tests that backfilled rows skip existing buckets and are written under the storage lock."""
+    storage.insert(
+        {
+            "asset": "BTC",
+            "quote": "USD",
+            "price_usd": 1.0,
+            "timestamp": "2024-01-01T00:05:00.250000",
+        }
+    )
+    locked = []
+    insert_many = storage.insert_many
+
+    def checked(records):
+        locked.append(backfill.storage_lock.locked())
+        return insert_many(records)
+
+    storage.insert_many = checked
+    job = make_backfill(storage, server, tmp_path)
+    assert job.run(SINCE, UNTIL) == 719
+    assert locked and all(locked)
+    assert storage.count() == 720
+    assert dedupe.get_dedupe_index().storage is storage
@@ -0,0 +1,68 @@
+import json
+
+from benchmarks import bench_parallel, bench_suite
+from benchmarks.fake_server import FakePriceServer, config_for
+from src import pipeline
+from src.storage import open_storage, set_storage
+
+
+def test_pipeline_against_fake_price_server(tmp_path) -> None:
+    """Tests that the fake server answers the price and exchange rate requests of a full run."""
+    server = FakePriceServer().start()
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    set_storage(storage)
+    pairs = ["BTC-USD", "ETH-EUR"]
+    try:
+        with bench_suite.isolated(
+            str(tmp_path), PAIRS=pairs, WRITE_BATCH_SIZE=1, **config_for(server)
+        ):
+            pipeline.run_etl_pipeline()
+    finally:
+        set_storage(None)
+        server.stop()
+
+    records = {r["asset"]: r for r in storage.iter_range()}
+    storage.close()
+    assert server.requests == 2
+    assert set(records) == {"BTC", "ETH"}
+    assert records["BTC"]["price_real"] == records["BTC"]["price_usd"] * 5.5
+    assert records["ETH"]["price_usd"] == records["ETH"]["price"] / 0.92
+
+
+def test_suite_writes_comparable_results(tmp_path, capsys) -> None:
+    """Tests that the suite records every metric as JSON and compares two runs."""
+    output = tmp_path / "results.json"
+    args = ["--rows", "300", "--backend", "sqlite", "jsonl", "--queries", "3"]
+    report = bench_suite.main([*args, "--format", "csv", "--output", str(output)])
+
+    saved = json.loads(output.read_text())
+    assert saved["results"] == report["results"]
+    metrics = {(e["backend"], e["metric"]) for e in saved["results"]}
+    for metric in (
+        "insert",
+        "size",
+        "history_p95",
+        "stats_cold",
+        "commit",
+        "export_csv_rss",
+    ):
+        assert ("sqlite", metric) in metrics and ("jsonl", metric) in metrics
+
+    bench_suite.main([*args, "--format", "--output", str(tmp_path / "b.json")])
+    bench_suite.compare(report["results"], str(output))
+    assert "(+0.0%)" in capsys.readouterr().out
+
+
+def test_parallel_benchmark_reports_speedup(capsys) -> None:
+    """Tests that the partitioned benchmark times both tasks for every worker count."""
+    results = bench_parallel.main(["--rows", "20000", "--workers", "1", "2"])
+    assert [(r["task"], r["workers"]) for r in results] == [
+        ("export", "seq"),
+        ("export", 1),
+        ("export", 2),
+        ("stats", "seq"),
+        ("stats", 1),
+        ("stats", 2),
+    ]
+    assert all(r["seconds"] > 0 for r in results)
+    assert "speed-up" in capsys.readouterr().out
@@ -0,0 +1,46 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+def load_config(tmp_path, expression: str, **env: str) -> list[str]:
+    """Imports the config in a fresh process with the given environment and prints an expression."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"from src import config; print({expression})"],
+        cwd=tmp_path,
+        env=dict(os.environ, PYTHONPATH=os.getcwd(), **env),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.splitlines()
+
+
+@pytest.mark.parametrize(
+    "name, value, expected",
+    [
+        ("STATS_WINDOWS", "1h,5min,7d", "['1h', '7d']"),
+        ("STATS_WINDOWS", "day", "['1h', '24h', '7d', '30d']"),
+        ("STATS_SNAPSHOT_INTERVAL", "5min", "5m"),
+        ("ROLLUP_INTERVALS", "1m,1hour", "['1m']"),
+        ("COMPACTION_INTERVAL", "hourly", "1h"),
+        ("DEDUPE_BUCKET", "1 sec", "1s"),
+        ("DEDUPE_WINDOW", "-1h", "1h"),
+        ("ALERT_COOLDOWN", "15 minutes", "15m"),
+        ("PRICE_AGGREGATION", "mode", "median"),
+    ],
+)
+def test_invalid_settings_fall_back(
+    tmp_path, name: str, value: str, expected: str
+) -> None:
+    """Tests that invalid settings are reported and replaced when the config loads."""
+    output = load_config(tmp_path, f"config.{name}", **{name: value})
+    assert output[0].startswith(f"Aviso: {name}")
+    assert output[-1] == expected
+
+
+def test_dedupe_can_still_be_disabled(tmp_path) -> None:
+    """Tests that an empty or zero DEDUPE_BUCKET is accepted as "disabled"."""
+    assert load_config(tmp_path, "config.DEDUPE_BUCKET", DEDUPE_BUCKET="0") == ["0"]
@@ -0,0 +1,156 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import aggregates, cli, client, config, daemon, rollups
+from src.storage import BACKENDS, open_storage, set_storage
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    """Fixture with a populated temporary storage and no daemon running."""
+    monkeypatch.setattr(config, "DAEMON_STATE_PATH", str(tmp_path / "daemon.json"))
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", str(tmp_path / "stats.json"))
+    monkeypatch.setattr(aggregates, "_engines", {})
+    backend = open_storage("sqlite", str(tmp_path / "prices.db"))
+    set_storage(backend)
+    engine = rollups.RollupEngine(backend, config.ROLLUP_INTERVALS)
+    start = datetime.now() - timedelta(hours=2)
+    for i in range(120):
+        record = {
+            "asset": "BTC",
+            "quote": "USD",
+            "price": 100.0 + i,
+            "price_usd": 100.0 + i,
+            "price_real": 500.0 + i * 5,
+            "timestamp": (start + timedelta(minutes=i)).isoformat(),
+        }
+        backend.insert(record)
+        engine.update(record)
+    yield backend
+    set_storage(None)
+    backend.close()
+
+
+@pytest.fixture
+def server(storage):
+    """Fixture with the query API running on a free port."""
+    daemon.warm_up()
+    httpd = daemon.start_server("127.0.0.1", 0)
+    daemon.write_state(httpd.url)
+    yield httpd
+    daemon.remove_state()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_cli_falls_back_without_daemon(storage) -> None:
+    """Tests that queries run locally when no daemon state file exists."""
+    with pytest.raises(client.DaemonUnavailable):
+        client.query("history", limit=5)
+    history = cli.query("history", cli.get_history, limit=5, pair="BTC-USD")
+    assert [r["price_usd"] for r in history] == [219.0, 218.0, 217.0, 216.0, 215.0]
+
+
+def test_history_without_price_real(tmp_path, monkeypatch, capsys) -> None:
+    """Tests that history prints a placeholder for records stored without price_real."""
+    monkeypatch.setattr(config, "DAEMON_STATE_PATH", str(tmp_path / "daemon.json"))
+    backend = open_storage("binary", str(tmp_path / "ticks"))
+    set_storage(backend)
+    try:
+        backend.insert({"timestamp": "2024-01-01T00:00:00", "price_usd": 100.0})
+        assert "price_real" not in backend.last(1)[0]
+        cli.show_history(limit=1)
+    finally:
+        set_storage(None)
+        backend.close()
+    row = next(line for line in capsys.readouterr().out.splitlines() if "2024" in line)
+    assert "$100.00" in row and "R$" not in row
+
+
+def test_daemon_answers_like_local_queries(server) -> None:
+    """Tests that history, stats and candles match the local results."""
+    since = datetime.now() - timedelta(hours=1)
+    for endpoint, local, params in [
+        ("history", cli.get_history, {"limit": 5, "since": since}),
+        ("stats", cli.get_statistics, {"window": "24h"}),
+        ("stats", cli.get_statistics, {"since": since, "limit": 30}),
+        ("candles", cli.get_candles, {"interval": "1h", "limit": 3}),
+    ]:
+        assert client.query(endpoint, **params) == local(**params)
+
+
+def test_daemon_rejects_invalid_queries(server) -> None:
+    """Tests that invalid parameters surface as ValueError on the client."""
+    with pytest.raises(ValueError, match="Intervalo inválido"):
+        client.query("candles", interval="3h")
+    with pytest.raises(ValueError, match="desconhecido"):
+        client.query("history", n=3)
+
+
+def test_stale_state_file_falls_back(storage) -> None:
+    """Tests that a state file left by a dead daemon does not break the CLI."""
+    httpd = daemon.start_server("127.0.0.1", 0)
+    daemon.write_state(httpd.url)
+    httpd.shutdown()
+    httpd.server_close()
+    assert len(cli.query("history", cli.get_history, limit=3)) == 3
+
+
+def test_daemon_queries_are_fast(server) -> None:
+    """Tests that a warm daemon answers in a few milliseconds."""
+    client.query("stats", window="24h")
+    durations = []
+    for _ in range(20):
+        start = time.perf_counter()
+        client.query("history", limit=10)
+        durations.append(time.perf_counter() - start)
+    assert sorted(durations)[len(durations) // 2] < 0.02
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_daemon_sees_writes_from_other_processes(
+    tmp_path, monkeypatch, backend
+) -> None:
+    """Tests that history, stats and candles include records written by another handle."""
+    if backend == "tinydb":
+        pytest.importorskip("tinydb")
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", "")
+    monkeypatch.setattr(aggregates, "_engines", {})
+    monkeypatch.setattr(config, "PAIRS", ["BTC-USD"])
+    path = str(tmp_path / f"prices.{backend}")
+    served = open_storage(backend, path)
+    set_storage(served)
+    start = datetime.now() - timedelta(minutes=10)
+    records = [
+        {
+            "asset": "BTC",
+            "quote": "USD",
+            "price": 100.0 + i,
+            "price_usd": 100.0 + i,
+            "price_real": 500.0,
+            "timestamp": (start + timedelta(minutes=i)).isoformat(),
+        }
+        for i in range(4)
+    ]
+    try:
+        served.insert_many(records[:2])
+        daemon.warm_up()
+        assert cli.get_statistics(window="1h")["records_count"] == 2
+        assert list(served.iter_candles("1m", pair="BTC-USD")) == []
+
+        writer = open_storage(backend, path)
+        engine = rollups.RollupEngine(writer, ["1m"])
+        writer.insert_many(records[2:])
+        for record in records[2:]:
+            engine.update(record)
+        writer.close()
+
+        daemon.refresh()
+        assert [r["price_usd"] for r in cli.get_history(limit=2)] == [103.0, 102.0]
+        assert cli.get_statistics(window="1h")["records_count"] == 4
+        assert len(list(served.iter_candles("1m", pair="BTC-USD"))) == 2
+    finally:
+        set_storage(None)
+        served.close()
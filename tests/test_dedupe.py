@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import aggregates, config, dedupe, rollups
+from src.pipeline import commit_records
+from src.storage import BACKENDS, get_storage, open_storage, set_storage
+
+START = datetime.now().replace(second=0, microsecond=0) - timedelta(minutes=30)
+
+
+def make_record(seconds: float, price: float, asset: str = "BTC") -> dict:
+    """Builds a record for the asset at START plus the given seconds."""
+    return {
+        "asset": asset,
+        "quote": "USD",
+        "price": price,
+        "price_usd": price,
+        "price_real": price * 5,
+        "timestamp": (START + timedelta(seconds=seconds)).isoformat(),
+    }
+
+
+@pytest.fixture
+def configured(tmp_path, monkeypatch):
+    """Fixture with a fresh SQLite storage, stats, candles and dedupe index."""
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "prices.db"))
+    monkeypatch.setattr(config, "ARCHIVE_DIR", "")
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", "")
+    monkeypatch.setattr(config, "DEDUPE_BUCKET", "1s")
+    monkeypatch.setattr(aggregates, "_engines", {})
+    monkeypatch.setattr(rollups, "_engine", None)
+    dedupe.reset()
+    set_storage(None)
+    yield
+    set_storage(None)
+    dedupe.reset()
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_drop_duplicates(tmp_path, backend) -> None:
+    """Tests that each backend keeps the first record of every pair and bucket."""
+    if backend == "tinydb":
+        pytest.importorskip("tinydb")
+    storage = open_storage(backend, str(tmp_path / f"db.{backend}"))
+    try:
+        storage.insert_many(
+            [make_record(s, 100.0 + s) for s in (0, 0.2, 1, 1.5, 2)]
+            + [make_record(0.5, 7.0, asset="ETH"), make_record(3, 8.0, asset="ETH")]
+            + [make_record(0.7, 100.7)]
+        )
+        removed = storage.drop_duplicates(lambda r: dedupe.dedupe_key(r, 1.0))
+        assert sorted(r["price_usd"] for r in removed) == [100.2, 100.7, 101.5]
+        assert [r["price_usd"] for r in storage.iter_range(pair="BTC-USD")] == [
+            100.0,
+            101.0,
+            102.0,
+        ]
+        assert storage.count() == 5
+        assert storage.drop_duplicates(lambda r: dedupe.dedupe_key(r, 1.0)) == []
+        storage.insert(make_record(4, 104.0))
+        assert storage.count() == 6
+    finally:
+        storage.close()
+
+
+def test_commit_records_is_idempotent(configured) -> None:
+    """Tests that retried and overlapping batches are written only once."""
+    batch = [make_record(0, 100.0), make_record(0, 50.0, asset="ETH")]
+    assert commit_records(batch) == 2
+    assert commit_records(batch) == 0
+    assert commit_records([make_record(0.4, 101.0), make_record(1, 102.0)]) == 1
+
+    # Another process (or a restart) sees what is already stored
+    dedupe.reset()
+    assert commit_records([make_record(0.9, 103.0), make_record(2, 104.0)]) == 1
+    stats = aggregates.get_stats_engine("BTC-USD").stats("1h")
+    assert stats["records_count"] == 3
+    assert stats["avg_price"] == pytest.approx(102.0)
+
+
+def test_failed_insert_is_not_marked_as_written(configured, monkeypatch) -> None:
+    """Tests that a batch whose insert fails is written when it is retried."""
+    storage = get_storage()
+    insert_many = storage.insert_many
+    calls = []
+
+    def flaky(records):
+        calls.append(records)
+        if len(calls) == 1:
+            raise OSError("disk full")
+        return insert_many(records)
+
+    monkeypatch.setattr(storage, "insert_many", flaky)
+    batch = [make_record(0, 100.0), make_record(0.5, 100.5)]
+    with pytest.raises(OSError):
+        commit_records(batch)
+    assert commit_records(batch) == 1
+    assert [r["price_usd"] for r in storage.iter_range()] == [100.0]
+    assert commit_records(batch) == 0
+
+
+def test_old_duplicates_are_checked_in_storage(configured, monkeypatch) -> None:
+    """Tests that records older than the in-memory window are checked against the storage."""
+    monkeypatch.setattr(config, "DEDUPE_WINDOW", "5m")
+    assert commit_records([make_record(0, 100.0)]) == 1
+    assert not dedupe.get_dedupe_index().keys
+    assert commit_records([make_record(0.5, 100.5)]) == 0
+    assert commit_records([make_record(1, 101.0)]) == 1
+
+
+def test_disabled_dedupe_writes_everything(configured, monkeypatch) -> None:
+    """Tests that an empty DEDUPE_BUCKET keeps the blind insert path."""
+    monkeypatch.setattr(config, "DEDUPE_BUCKET", "")
+    batch = [make_record(0, 100.0)]
+    assert commit_records(batch) == 1
+    assert commit_records(batch) == 1
+
+
+def test_dedupe_command(configured, capsys, monkeypatch) -> None:
+    """Tests that the command cleans the history and rebuilds stats and candles."""
+    from src import cli
+
+    monkeypatch.setattr(config, "DEDUPE_BUCKET", "")
+    commit_records([make_record(s, 100.0 + s) for s in (0, 10, 10.5, 30, 70)])
+    commit_records([make_record(10, 999.0)])
+
+    cli.run_dedupe("1m")
+    assert "4 registros duplicados removidos" in capsys.readouterr().out
+    assert [r["price_usd"] for r in get_storage().iter_range()] == [100.0, 170.0]
+    assert aggregates.get_stats_engine("BTC-USD").stats("1h")["records_count"] == 2
+    candles = list(get_storage().iter_candles("1h"))
+    assert max(candle["high"] for candle in candles) == 170.0
+
+    cli.run_dedupe("")
+    assert "inválido" in capsys.readouterr().out
@@ -1,10 +1,26 @@
+import time
 from unittest.mock import Mock, patch
 
 import pytest
 import requests
 
 from src import config
-from src.main import calculate_kpis, get_price, get_usd_to_brl_rate
+from src.http_client import get_session
+from src.metrics import FALLBACK_RATE_USED, PIPELINE_STAGE_SECONDS
+from src.pipeline import (
+    calculate_kpis,
+    get_price,
+    get_usd_to_brl_rate,
+    run_etl_pipeline,
+)
+from src.resilience import reset_breakers
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    """Keeps retry backoff short and circuit breakers closed between tests."""
+    monkeypatch.setattr(config, "FETCH_BACKOFF_BASE", 0.0)
+    reset_breakers()
 
 
 # Fixture for valid price data to avoid repetition
@@ -53,7 +69,7 @@ def test_calculate_kpis_with_invalid_amount_value() -> None:
 # --- Tests for get_price (using mock) ---
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_price_success(mock_get: Mock) -> None:
     """Tests the price fetching function on a successful API call."""
     mock_response = Mock()
@@ -67,21 +83,21 @@ def test_get_price_success(mock_get: Mock) -> None:
     mock_get.assert_called_once_with(expected_url, timeout=config.REQUEST_TIMEOUT)
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_price_connection_error(mock_get: Mock) -> None:
     """Tests the price fetching function when a ConnectionError occurs."""
     mock_get.side_effect = requests.exceptions.ConnectionError("Connection failed")
     assert get_price() is None
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_price_timeout(mock_get: Mock) -> None:
     """Tests the price fetching function when a Timeout occurs."""
     mock_get.side_effect = requests.exceptions.Timeout("Request timed out")
     assert get_price() is None
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_price_http_error(mock_get: Mock) -> None:
     """Tests price fetching when the API returns an HTTP error (e.g., 404, 500)."""
     mock_response = Mock()
@@ -95,7 +111,7 @@ def test_get_price_http_error(mock_get: Mock) -> None:
 # --- Tests for get_usd_to_brl_rate (using mock) ---
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_usd_to_brl_rate_success(mock_get: Mock) -> None:
     """Tests the currency rate fetching on a successful API call."""
     mock_response = Mock()
@@ -110,14 +126,14 @@ def test_get_usd_to_brl_rate_success(mock_get: Mock) -> None:
     )
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_usd_to_brl_rate_api_error(mock_get: Mock) -> None:
     """Tests the currency rate fetching when the API returns an error."""
     mock_get.side_effect = requests.exceptions.RequestException("API Error")
     assert get_usd_to_brl_rate() is None
 
 
-@patch("src.main.requests.get")
+@patch("src.pipeline.requests.Session.get")
 def test_get_usd_to_brl_rate_key_error(mock_get: Mock) -> None:
     """Tests the currency rate fetching with a malformed JSON response."""
     mock_response = Mock()
@@ -126,3 +142,107 @@ def test_get_usd_to_brl_rate_key_error(mock_get: Mock) -> None:
     mock_get.return_value = mock_response
 
     assert get_usd_to_brl_rate() is None
+
+
+@patch("src.pipeline.requests.Session.get")
+def test_get_usd_to_brl_rate_null_rate(mock_get: Mock) -> None:
+    """Tests the currency rate fetching when the API returns a null rate."""
+    mock_response = Mock()
+    mock_response.raise_for_status.return_value = None
+    mock_response.json.return_value = {"rates": {"BRL": None, "EUR": 0.9}}
+    mock_get.return_value = mock_response
+
+    assert get_usd_to_brl_rate() is None
+
+
+# --- Tests for run_etl_pipeline ---
+
+
+def test_session_is_shared() -> None:
+    """Tests that the pooled HTTP session is reused across calls."""
+    assert get_session() is get_session()
+
+
+@patch("src.pipeline.save_records")
+@patch("src.pipeline.get_price")
+@patch("src.pipeline.get_exchange_rates")
+def test_run_etl_pipeline_fetches_concurrently(
+    mock_rate: Mock, mock_price: Mock, mock_save: Mock
+) -> None:
+    """Tests that the pipeline takes as long as the slowest fetch, not the sum."""
+
+    def slow_rate() -> dict:
+        time.sleep(0.3)
+        return {"BRL": 5.0}
+
+    def slow_price(asset: str, quote: str) -> dict:
+        time.sleep(0.3)
+        return {"data": {"amount": "100.00"}}
+
+    mock_rate.side_effect = slow_rate
+    mock_price.side_effect = slow_price
+
+    start = time.perf_counter()
+    run_etl_pipeline()
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.55
+    saved = mock_save.call_args.args[0][0]
+    assert saved["price_real"] == 500.0
+    assert PIPELINE_STAGE_SECONDS.labels(stage="fetch").last >= 0.3
+
+
+@patch("src.pipeline.save_records")
+@patch("src.pipeline.get_price")
+@patch("src.pipeline.get_exchange_rates")
+def test_run_etl_pipeline_uses_fallback_rate(
+    mock_rate: Mock, mock_price: Mock, mock_save: Mock
+) -> None:
+    """Tests that the configured fallback rate is used when the FX fetch fails."""
+    mock_rate.return_value = None
+    mock_price.return_value = {"data": {"amount": "100.00"}}
+    fallbacks = FALLBACK_RATE_USED.labels().value
+    run_etl_pipeline()
+    saved = mock_save.call_args.args[0][0]
+    assert saved["price_real"] == 100.0 * config.FALLBACK_USD_TO_BRL_RATE
+    assert FALLBACK_RATE_USED.labels().value == fallbacks + 1
+
+
+@patch("src.pipeline.save_records")
+@patch("src.pipeline.get_price")
+@patch("src.pipeline.get_exchange_rates")
+def test_run_etl_pipeline_fetches_every_pair(
+    mock_rates: Mock, mock_price: Mock, mock_save: Mock
+) -> None:
+    """Tests that all configured pairs are fetched, converted and saved in one batch."""
+    mock_rates.return_value = {"BRL": 5.0, "EUR": 0.5}
+    prices = {
+        "BTC-USD": "100.00",
+        "ETH-USD": "10.00",
+        "BTC-EUR": "50.00",
+        "BTC-JPY": "1.00",
+    }
+    mock_price.side_effect = lambda asset, quote: {
+        "data": {"amount": prices[f"{asset}-{quote}"]}
+    }
+
+    with patch.object(config, "PAIRS", list(prices)):
+        run_etl_pipeline()
+
+    saved = {f"{r['asset']}-{r['quote']}": r for r in mock_save.call_args.args[0]}
+    # JPY has no known rate, so the pair is skipped
+    assert set(saved) == {"BTC-USD", "ETH-USD", "BTC-EUR"}
+    assert saved["ETH-USD"]["price_usd"] == 10.0
+    assert saved["BTC-EUR"]["price"] == 50.0
+    assert saved["BTC-EUR"]["price_usd"] == 100.0
+    assert saved["BTC-EUR"]["price_real"] == 500.0
+
+
+@patch("src.pipeline.requests.Session.get")
+def test_get_price_other_asset_uses_pair_url(mock_get: Mock) -> None:
+    """Tests that non-Bitcoin assets are fetched from the per-pair endpoint."""
+    mock_get.return_value.json.return_value = {"data": {"amount": "10.00"}}
+    assert get_price("ETH", "USD") == {"data": {"amount": "10.00"}}
+    mock_get.assert_called_once_with(
+        config.PAIR_API_URL.format(pair="ETH-USD"), timeout=config.REQUEST_TIMEOUT
+    )
@@ -0,0 +1,113 @@
+import csv
+import gzip
+import json
+
+import pytest
+
+from src.exporters import FORMATS, default_filename, export
+from src.storage import open_storage
+
+
+@pytest.fixture
+def storage(tmp_path):
+    """Fixture with five minutes of records in a SQLite store."""
+    backend = open_storage("sqlite", str(tmp_path / "prices.db"))
+    backend.insert_many(
+        {
+            "timestamp": f"2024-01-01T00:0{m}:00",
+            "price_usd": 100.0 + m,
+            "price_real": (100.0 + m) * 5,
+        }
+        for m in range(5)
+    )
+    yield backend
+    backend.close()
+
+
+def test_export_csv_is_ordered(storage, tmp_path) -> None:
+    """Tests that CSV export writes the header and every record in order."""
+    path = str(tmp_path / "out.csv")
+    assert export(storage, "csv", path) == 5
+    with open(path) as f:
+        rows = list(csv.DictReader(f))
+    assert [float(r["price_usd"]) for r in rows] == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+
+def test_export_json_is_valid_array(storage, tmp_path) -> None:
+    """Tests that the streamed JSON output parses as a single array."""
+    path = str(tmp_path / "out.json")
+    export(storage, "json", path)
+    with open(path) as f:
+        assert [r["price_usd"] for r in json.load(f)] == [
+            100.0,
+            101.0,
+            102.0,
+            103.0,
+            104.0,
+        ]
+
+
+def test_export_gzip_jsonl_with_range(storage, tmp_path) -> None:
+    """Tests compressed JSON-lines export restricted by since/until."""
+    path = str(tmp_path / "out.jsonl.gz")
+    count = export(
+        storage,
+        "jsonl.gz",
+        path,
+        since="2024-01-01T00:01:00",
+        until="2024-01-01T00:03:00",
+    )
+    assert count == 2
+    with gzip.open(path, "rt") as f:
+        assert [json.loads(line)["price_usd"] for line in f] == [101.0, 102.0]
+
+
+def test_export_empty_range_creates_no_file(storage, tmp_path) -> None:
+    """Tests that nothing is written when the range has no records."""
+    path = tmp_path / "out.csv"
+    assert export(storage, "csv", str(path), since="2030-01-01") == 0
+    assert not path.exists()
+
+
+def test_export_zstd_csv(storage, tmp_path) -> None:
+    """Tests zstd-compressed CSV export (optional dependency)."""
+    zstandard = pytest.importorskip("zstandard")
+    path = str(tmp_path / "out.csv.zst")
+    export(storage, "csv.zst", path)
+    with open(path, "rb") as f:
+        text = zstandard.ZstdDecompressor().stream_reader(f).read().decode()
+    assert text.splitlines()[0] == "timestamp,asset,quote,price_usd,price_real"
+    assert len(text.splitlines()) == 6
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_export_columnar(storage, tmp_path, fmt: str) -> None:
+    """Tests Parquet and Arrow IPC exports (optional dependency)."""
+    pytest.importorskip("pyarrow")
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / default_filename(fmt))
+    export(storage, fmt, path)
+    table = pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+    assert table.column("price_usd").to_pylist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_export_columnar_without_price_real(storage, tmp_path, fmt: str) -> None:
+    """Tests that records without price_real export as nulls instead of failing."""
+    pytest.importorskip("pyarrow")
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    storage.insert({"timestamp": "2024-01-01T00:05:00", "price_usd": 105.0})
+    path = str(tmp_path / default_filename(fmt))
+    assert export(storage, fmt, path) == 6
+    table = pq.read_table(path) if fmt == "parquet" else feather.read_table(path)
+    assert table.column("price_real").to_pylist()[-2:] == [520.0, None]
+
+
+def test_default_filenames() -> None:
+    """Tests that every format has a matching default file name."""
+    assert default_filename("csv.gz") == "prices.csv.gz"
+    assert all(default_filename(fmt).startswith("prices.") for fmt in FORMATS)
@@ -0,0 +1,124 @@
+import gzip
+import json
+import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueListener
+
+from src.logger import DeferredQueueHandler, JsonFormatter, build_file_handler
+
+
+class CountingArg:
+    """Argument that records how many times it was rendered."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.threads = []
+
+    def __str__(self) -> str:
+        self.calls += 1
+        self.threads.append(threading.current_thread().name)
+        return "payload"
+
+
+def _isolated_logger(name: str, handler: logging.Handler, level: int) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.handlers = [handler]
+    log.propagate = False
+    log.setLevel(level)
+    return log
+
+
+def test_json_formatter_includes_extras_and_exception() -> None:
+    """Tests that each JSON line carries the message, extras and traceback."""
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logging.getLogger("test").makeRecord(
+            "test",
+            logging.ERROR,
+            __file__,
+            1,
+            "Falha em %s",
+            ("BTC-USD",),
+            exc_info=sys.exc_info(),
+            extra={"pair": "BTC-USD"},
+        )
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["level"] == "ERROR"
+    assert entry["message"] == "Falha em BTC-USD"
+    assert entry["pair"] == "BTC-USD"
+    assert "RuntimeError: boom" in entry["exc_info"]
+
+
+def test_size_rotation_compresses_backups(tmp_path) -> None:
+    """Tests that rotated files are gzipped and keep their content."""
+    path = tmp_path / "logs" / "app.log"
+    handler = build_file_handler(
+        str(path), "size", max_bytes=200, backup_count=2, compress=True
+    )
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log = _isolated_logger("test.rotation", handler, logging.INFO)
+    for i in range(20):
+        log.info("linha %03d %s", i, "x" * 40)
+    handler.close()
+
+    backups = sorted(p.name for p in path.parent.iterdir() if p.name != "app.log")
+    assert backups == ["app.log.1.gz", "app.log.2.gz"]
+    with gzip.open(path.parent / "app.log.1.gz", "rt") as f:
+        assert f.read().startswith("linha ")
+
+
+def test_disabled_level_skips_formatting() -> None:
+    """Tests that arguments of filtered-out messages are never rendered."""
+    arg = CountingArg()
+    log = _isolated_logger("test.lazy", logging.NullHandler(), logging.INFO)
+    log.debug("Resposta: %s", arg)
+    assert arg.calls == 0
+
+
+def test_queue_handler_formats_on_listener_thread(tmp_path) -> None:
+    """Tests that messages are rendered by the listener, not the caller."""
+    path = tmp_path / "app.log"
+    file_handler = build_file_handler(str(path), "none")
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler)
+    log = _isolated_logger("test.queue", DeferredQueueHandler(log_queue), logging.INFO)
+    arg = CountingArg()
+
+    listener.start()
+    log.info("Resposta: %s", arg)
+    listener.stop()
+    file_handler.close()
+
+    assert path.read_text() == "Resposta: payload\n"
+    assert len(arg.threads) == 1
+    assert threading.current_thread().name not in arg.threads
+
+
+def test_queue_handler_snapshots_mutable_args(tmp_path) -> None:
+    """Tests that lists and dicts are rendered before the caller can change them."""
+    path = tmp_path / "app.log"
+    file_handler = build_file_handler(str(path), "none")
+    file_handler.setFormatter(logging.Formatter("%(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler)
+    log = _isolated_logger(
+        "test.snapshot", DeferredQueueHandler(log_queue), logging.INFO
+    )
+    records = [{"price_usd": 100.0}]
+
+    log.info("Registros salvos: %s", records)
+    log.info("KPIs: %(price_usd)s", records[0])
+    records[0]["price_usd"] = 0.0
+    records.clear()
+    listener.start()
+    listener.stop()
+    file_handler.close()
+
+    assert path.read_text().splitlines() == [
+        "Registros salvos: [{'price_usd': 100.0}]",
+        "KPIs: 100.0",
+    ]
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+import requests
+
+from src.cli import show_profile
+from src.metrics import (
+    PIPELINE_STAGE_SECONDS,
+    Counter,
+    Gauge,
+    Histogram,
+    Registry,
+    exposition,
+    start_metrics_server,
+)
+
+
+def test_histogram_buckets_and_sum() -> None:
+    """Tests that observations land in the right bucket and update sum/count."""
+    hist = Histogram("test_seconds", "Test histogram.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0, 0.1):
+        hist.observe(value)
+    child = hist.labels()
+    assert child.counts == [2, 1, 1]
+    assert child.count == 4
+    assert abs(child.sum - 5.65) < 1e-9
+    assert child.last == 0.1
+
+
+def test_histogram_labels_and_timer() -> None:
+    """Tests labelled series and the timing context manager."""
+    hist = Histogram("test_stage_seconds", "Test histogram.", ["stage"])
+    with hist.labels(stage="fetch").time():
+        time.sleep(0.01)
+    assert hist.labels(stage="fetch").last >= 0.01
+    assert list(hist.samples()) == [("fetch",)]
+
+
+def test_counter_labels_and_increment() -> None:
+    """Tests labelled counters and that they cannot be decremented."""
+    counter = Counter("test_total", "Test counter.", ["job"])
+    counter.labels(job="a").inc()
+    counter.labels(job="a").inc(2)
+    assert counter.labels(job="a").value == 3
+    assert counter.labels(job="b").value == 0
+    with pytest.raises(ValueError):
+        counter.labels(job="a").inc(-1)
+
+
+def test_exposition_format() -> None:
+    """Tests the Prometheus text format for each metric type."""
+    registry = Registry()
+    hist = Histogram("t_seconds", "Hist.", ["stage"], (0.1, 1.0), registry=registry)
+    counter = Counter("t_total", "Counter.", ["job"], registry=registry)
+    gauge = Gauge("t_depth", "Gauge.", registry=registry)
+    hist.labels(stage="fetch").observe(0.05)
+    hist.labels(stage="fetch").observe(0.5)
+    counter.labels(job='a"b').inc(2)
+    gauge.set(3)
+
+    assert exposition(registry).splitlines() == [
+        "# HELP t_seconds Hist.",
+        "# TYPE t_seconds histogram",
+        't_seconds_bucket{stage="fetch",le="0.1"} 1',
+        't_seconds_bucket{stage="fetch",le="1.0"} 2',
+        't_seconds_bucket{stage="fetch",le="+Inf"} 2',
+        't_seconds_sum{stage="fetch"} 0.55',
+        't_seconds_count{stage="fetch"} 2',
+        "# HELP t_total Counter.",
+        "# TYPE t_total counter",
+        't_total{job="a\\"b"} 2.0',
+        "# HELP t_depth Gauge.",
+        "# TYPE t_depth gauge",
+        "t_depth 3.0",
+    ]
+
+
+def test_metrics_endpoint() -> None:
+    """Tests that /metrics serves the default registry over HTTP."""
+    PIPELINE_STAGE_SECONDS.labels(stage="endpoint_test").observe(0.01)
+    server = start_metrics_server("127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        response = requests.get(f"{url}/metrics", timeout=5)
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert 'etl_pipeline_stage_seconds_count{stage="endpoint_test"} 1' in (
+            response.text
+        )
+        assert requests.get(f"{url}/other", timeout=5).status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_fetch_profile_lists_stages(capsys) -> None:
+    """Tests that the --profile report includes the measured stages."""
+    PIPELINE_STAGE_SECONDS.labels(stage="profile_test").observe(0.25)
+    show_profile()
+    output = capsys.readouterr().out
+    row = next(line for line in output.splitlines() if "stage=profile_test" in line)
+    assert "pipeline_stage" in row
+    assert "250" in row
@@ -0,0 +1,23 @@
+import pytest
+
+from src import config
+from src.pairs import format_pair, pair_of, parse_pair
+
+
+def test_parse_pair_normalizes_case() -> None:
+    """Tests that pairs are parsed into (asset, quote) in upper case."""
+    assert parse_pair(" eth-usd ") == ("ETH", "USD")
+    assert format_pair("btc", "eur") == "BTC-EUR"
+
+
+@pytest.mark.parametrize("text", ["BTC", "BTC/USD", "BTC-", "-USD", "BTC-US1"])
+def test_parse_pair_rejects_invalid(text: str) -> None:
+    """Tests that malformed pairs raise a ValueError."""
+    with pytest.raises(ValueError):
+        parse_pair(text)
+
+
+def test_pair_of_legacy_record() -> None:
+    """Tests that records without asset/quote map to BTC in the configured currency."""
+    assert pair_of({"price_usd": 1.0}) == f"BTC-{config.CURRENCY}"
+    assert pair_of({"asset": "ETH", "quote": "EUR"}) == "ETH-EUR"
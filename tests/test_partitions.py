@@ -0,0 +1,108 @@
+import csv
+import gzip
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import config, exporters, partitions
+from src.cli import get_series
+from src.storage import get_storage, set_storage
+
+START = datetime(2024, 1, 20)
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    """Fixture with two pairs every 6 hours from 2024-01-20 to mid-April in SQLite."""
+    monkeypatch.setattr(config, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "prices.db"))
+    monkeypatch.setattr(config, "ARCHIVE_DIR", "")
+    set_storage(None)
+    storage = get_storage()
+    storage.insert_many(
+        {
+            "asset": asset,
+            "quote": "USD",
+            "price": 100.0 + i,
+            "price_usd": 100.0 + i,
+            "price_real": (100.0 + i) * 5,
+            "timestamp": (START + timedelta(hours=6 * i)).isoformat(),
+        }
+        for i in range(320)
+        for asset in ("BTC", "ETH")
+    )
+    yield storage
+    storage.close()
+    set_storage(None)
+
+
+def test_split_range() -> None:
+    """Tests calendar-month and fixed-duration partitions clipped to the range."""
+    months = partitions.split_range(datetime(2023, 11, 15), datetime(2024, 2, 3))
+    assert [start.isoformat()[:10] for start, _ in months] == [
+        "2023-11-15",
+        "2023-12-01",
+        "2024-01-01",
+        "2024-02-01",
+    ]
+    assert months[-1][1] == datetime(2024, 2, 3)
+    days = partitions.split_range(
+        datetime(2024, 1, 1, 12), datetime(2024, 1, 15), span="7d"
+    )
+    assert all(a[1] == b[0] for a, b in zip(days, days[1:]))
+    assert len(days) in (2, 3)
+    assert partitions.split_range(START, START) == []
+
+
+@pytest.mark.parametrize("fmt", ["csv", "json", "jsonl", "csv.gz"])
+def test_parallel_export_matches_sequential(history, tmp_path, fmt) -> None:
+    """Tests that the concatenated partitions equal a single-threaded export."""
+    expected, actual = tmp_path / f"seq.{fmt}", tmp_path / f"par.{fmt}"
+    assert exporters.export(history, fmt, str(expected)) == 640
+    assert partitions.export(fmt, str(actual), workers=2) == 640
+
+    def read(path):
+        if fmt == "csv.gz":
+            return gzip.decompress(path.read_bytes())
+        return path.read_bytes()
+
+    assert read(actual) == read(expected)
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".export-")]
+
+
+def test_parallel_export_parquet(history, tmp_path) -> None:
+    """Tests that Parquet partitions are merged into one file with every row."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = tmp_path / "prices.parquet"
+    since = datetime(2024, 2, 10)
+    count = partitions.export("parquet", str(path), since, pair="ETH-USD", workers=2)
+    assert count == 236
+    table = pq.read_table(path)
+    assert table.num_rows == 236
+    assert table.column("price_usd").to_pylist()[:2] == [184.0, 185.0]
+
+
+def test_partitioned_dataset(history, tmp_path) -> None:
+    """Tests that --partitioned leaves one complete file per month."""
+    path = tmp_path / "out" / "prices.csv"
+    path.parent.mkdir()
+    count = partitions.export("csv", str(path), pair="BTC-USD", partitioned=True)
+    assert count == 320
+    directory = tmp_path / "out" / "prices"
+    names = sorted(p.name for p in directory.iterdir())
+    assert names == ["2024-01.csv", "2024-02.csv", "2024-03.csv", "2024-04.csv"]
+    with open(directory / "2024-02.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 29 * 4
+    assert rows[0]["timestamp"] == "2024-02-01T00:00:00"
+
+
+def test_partitioned_statistics(history) -> None:
+    """Tests that merged per-partition aggregates equal the whole-range summary."""
+    since = datetime(2024, 1, 25)
+    expected = get_series(since, pair="ETH-USD").summary()
+    stats = partitions.statistics(since, pair="ETH-USD", workers=2)
+    assert stats == pytest.approx(expected)
+    assert partitions.statistics(datetime(2025, 1, 1), workers=2) is None
+    assert json.dumps(stats)
@@ -0,0 +1,167 @@
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src import config
+from src.logger import logger
+from src.metrics import PRICE_SOURCE_FAILURES
+from src.pipeline import calculate_kpis
+from src.providers import (
+    PROVIDERS,
+    PriceProvider,
+    aggregate,
+    get_aggregated_price,
+    price_sources,
+)
+from src.resilience import reset_breakers
+
+
+class FakeExchange(BaseHTTPRequestHandler):
+    """Serves '/<price>' as {"price": "<price>"}; '/slow/<price>' answers after 1s."""
+
+    def do_GET(self) -> None:
+        parts = self.path.strip("/").split("/")
+        if parts[0] == "slow":
+            time.sleep(1.0)
+        payload = json.dumps({"price": parts[-1]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def base_url():
+    """Fixture with a local fake exchange server."""
+    reset_breakers()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeExchange)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def make_provider(name: str, url: str) -> PriceProvider:
+    return PriceProvider(name, lambda asset, quote: url, lambda data: data["price"])
+
+
+def test_aggregate_median_rejects_outliers() -> None:
+    """Tests that quotes far from the median are dropped before aggregating."""
+    price, accepted, rejected = aggregate(
+        {"a": 100.0, "b": 101.0, "c": 99.0, "d": 150.0}, "median", 0.02
+    )
+    assert price == 100.0
+    assert set(accepted) == {"a", "b", "c"}
+    assert rejected == {"d": 150.0}
+
+
+def test_aggregate_trimmed_mean() -> None:
+    """Tests that the trimmed mean drops the extremes of the accepted quotes."""
+    quotes = {str(i): p for i, p in enumerate([100.0, 100.5, 101.0, 101.5, 99.0])}
+    price, accepted, _ = aggregate(quotes, "trimmed_mean", 0.05)
+    assert len(accepted) == 5
+    assert price == pytest.approx((100.0 + 100.5 + 101.0) / 3)
+
+
+def test_aggregate_validates_method() -> None:
+    """Tests that unknown aggregation methods are rejected."""
+    with pytest.raises(ValueError):
+        aggregate({"a": 1.0}, "mode")
+    assert aggregate({}) == (None, {}, {})
+
+
+def test_aggregate_without_accepted_quotes() -> None:
+    """Tests that no price is produced when every quote is an outlier."""
+    assert aggregate({"a": 100.0, "b": 110.0}) == (
+        None,
+        {},
+        {"a": 100.0, "b": 110.0},
+    )
+
+
+def test_invalid_aggregation_does_not_crash(monkeypatch) -> None:
+    """Tests that get_price returns None for an unknown aggregation."""
+    from src.pipeline import get_price
+
+    monkeypatch.setattr(config, "PRICE_SOURCES", ["coinbase", "kraken"])
+    monkeypatch.setattr(config, "PRICE_AGGREGATION", "mode")
+    monkeypatch.setattr("src.providers.fetch_quotes", lambda *args: {"coinbase": 100.0})
+    assert get_price() is None
+
+
+def test_unknown_sources_are_ignored(monkeypatch, caplog) -> None:
+    """Tests that PRICE_SOURCES is checked against PROVIDERS on use, warning once."""
+    from src.pipeline import get_price
+
+    monkeypatch.setattr(config, "PRICE_SOURCES", ["coinbase", "nope", "kraken"])
+    requested = []
+
+    def fetch(asset, quote, providers, deadline):
+        requested.append([p.name for p in providers])
+        return {"coinbase": 100.0, "kraken": 100.0}
+
+    monkeypatch.setattr("src.providers.fetch_quotes", fetch)
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        assert get_price()["data"]["amount"] == "100.0"
+        assert get_price() is not None
+    assert requested == [["coinbase", "kraken"]] * 2
+    assert [r.getMessage() for r in caplog.records if "nope" in r.getMessage()] == [
+        "PRICE_SOURCES com fontes desconhecidas (nope); ignorando-as. "
+        f"Use: {', '.join(PROVIDERS)}."
+    ]
+    monkeypatch.setattr(config, "PRICE_SOURCES", ["nope"])
+    assert price_sources() == ["coinbase"]
+
+
+def test_diverging_sources_do_not_crash(monkeypatch) -> None:
+    """Tests that get_price returns None when every source is rejected."""
+    from src.pipeline import get_price
+
+    monkeypatch.setattr(config, "PRICE_SOURCES", ["coinbase", "kraken"])
+    monkeypatch.setattr(
+        "src.providers.fetch_quotes",
+        lambda *args: {"coinbase": 100.0, "kraken": 110.0},
+    )
+    assert get_price() is None
+
+
+def test_slow_source_does_not_add_latency(base_url, monkeypatch) -> None:
+    """Tests that the total deadline bounds the call and late sources are skipped."""
+    monkeypatch.setattr(config, "PRICE_SOURCE_DEADLINE", 0.3)
+    monkeypatch.setattr(config, "PRICE_MIN_SOURCES", 2)
+    providers = [
+        make_provider("fast_a", f"{base_url}/100.0"),
+        make_provider("fast_b", f"{base_url}/102.0"),
+        make_provider("outlier", f"{base_url}/90.0"),
+        make_provider("slow", f"{base_url}/slow/101.0"),
+    ]
+    timeouts = PRICE_SOURCE_FAILURES.labels(source="slow", reason="timeout").value
+
+    start = time.perf_counter()
+    result = get_aggregated_price("BTC", "USD", providers)
+    assert time.perf_counter() - start < 0.6
+
+    assert result["data"]["sources"] == {"fast_a": 100.0, "fast_b": 102.0}
+    assert result["data"]["rejected"] == {"outlier": 90.0}
+    assert float(result["data"]["amount"]) == 101.0
+    assert (
+        PRICE_SOURCE_FAILURES.labels(source="slow", reason="timeout").value
+        == timeouts + 1
+    )
+
+    kpis = calculate_kpis(result, 5.0)
+    assert kpis["price_usd"] == 101.0
+    assert kpis["sources"] == {"fast_a": 100.0, "fast_b": 102.0}
+
+
+def test_too_few_sources_returns_none(base_url, monkeypatch) -> None:
+    """Tests that no price is produced below the configured minimum of sources."""
+    monkeypatch.setattr(config, "PRICE_MIN_SOURCES", 2)
+    providers = [make_provider("only", f"{base_url}/100.0")]
+    assert get_aggregated_price("BTC", "USD", providers) is None
@@ -0,0 +1,55 @@
+import json
+import time
+from unittest.mock import Mock
+
+from src.rate_cache import RateCache
+
+
+def test_fresh_rates_skip_network(tmp_path) -> None:
+    """Tests that rates within the TTL are served without fetching."""
+    fetch = Mock(return_value={"BRL": 5.0})
+    cache = RateCache(fetch, ttl=60, path=str(tmp_path / "rates.json"))
+    assert cache.get() == {"BRL": 5.0}
+    assert cache.get() == {"BRL": 5.0}
+    fetch.assert_called_once()
+
+
+def test_stale_rates_are_served_while_revalidating(tmp_path) -> None:
+    """Tests stale-while-revalidate: the old rate is returned and refreshed in background."""
+    fetch = Mock(side_effect=[{"BRL": 5.0}, {"BRL": 6.0}])
+    cache = RateCache(fetch, ttl=60, path=str(tmp_path / "rates.json"))
+    cache.get()
+    cache.fetched_at = time.time() - 120
+
+    assert cache.get() == {"BRL": 5.0}
+    cache.wait(timeout=5)
+    assert cache.get() == {"BRL": 6.0}
+    assert fetch.call_count == 2
+
+
+def test_failed_refresh_keeps_last_known_good(tmp_path) -> None:
+    """Tests that a failed refresh does not discard the cached rate."""
+    path = tmp_path / "rates.json"
+    path.write_text(json.dumps({"rates": {"BRL": 5.2}, "fetched_at": 0}))
+    fetch = Mock(return_value=None)
+    cache = RateCache(fetch, ttl=60, path=str(path))
+
+    assert cache.get() == {"BRL": 5.2}
+    cache.wait(timeout=5)
+    assert cache.get() == {"BRL": 5.2}
+    fetch.assert_called()
+
+
+def test_rates_persist_across_instances(tmp_path) -> None:
+    """Tests that a new cache instance reuses the rate saved on disk."""
+    path = str(tmp_path / "rates.json")
+    RateCache(Mock(return_value={"BRL": 5.3}), ttl=60, path=path).get()
+    fetch = Mock()
+    assert RateCache(fetch, ttl=60, path=path).get() == {"BRL": 5.3}
+    fetch.assert_not_called()
+
+
+def test_no_rate_and_failed_fetch_returns_none(tmp_path) -> None:
+    """Tests that None is returned when no rate was ever obtained."""
+    cache = RateCache(Mock(return_value=None), ttl=60, path=str(tmp_path / "r.json"))
+    assert cache.get() is None
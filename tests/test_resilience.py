@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from src import config
+from src.http_client import fetch_json
+from src.metrics import HTTP_REQUEST_SECONDS, HTTP_RETRIES
+from src.pipeline import get_price
+from src.resilience import CircuitBreaker, CircuitOpenError, hedged, reset_breakers
+
+
+class FakeProvider(BaseHTTPRequestHandler):
+    """Fake API: '/flaky' fails `failures` times, '/slow' sleeps, '/down' always fails."""
+
+    hits: dict[str, int] = {}
+    failures = 0
+
+    def do_GET(self) -> None:
+        path = self.path.split("?")[0]
+        cls = type(self)
+        cls.hits[path] = cls.hits.get(path, 0) + 1
+        if path == "/down" or (path == "/flaky" and cls.hits[path] <= cls.failures):
+            self.send_response(503)
+            self.end_headers()
+            return
+        if path == "/notfound":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if path.startswith("/slow"):
+            time.sleep(0.5)
+        if path.startswith("/ticker"):
+            body = {"price": "101.00"}
+        else:
+            body = {"data": {"amount": "100.00"}}
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """Fixture with a local fake provider and fast retry settings."""
+    FakeProvider.hits = {}
+    FakeProvider.failures = 0
+    reset_breakers()
+    monkeypatch.setattr(config, "FETCH_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(config, "FETCH_RETRIES", 2)
+    monkeypatch.setattr(config, "BREAKER_FAILURE_THRESHOLD", 3)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeProvider)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    reset_breakers()
+
+
+def test_retries_transient_errors(server) -> None:
+    """Tests that 5xx responses are retried until the provider recovers."""
+    FakeProvider.failures = 2
+    retries = HTTP_RETRIES.labels(provider="flaky").value
+    assert fetch_json(f"{server}/flaky", "flaky") == {"data": {"amount": "100.00"}}
+    assert FakeProvider.hits["/flaky"] == 3
+    assert HTTP_RETRIES.labels(provider="flaky").value == retries + 2
+    assert HTTP_REQUEST_SECONDS.labels(provider="flaky", outcome="ok").count >= 1
+
+
+def test_client_errors_are_not_retried(server) -> None:
+    """Tests that a 404 fails immediately, without retries."""
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_json(f"{server}/notfound", "notfound")
+    assert FakeProvider.hits["/notfound"] == 1
+
+
+def test_circuit_breaker_fails_fast(server) -> None:
+    """Tests that an unhealthy provider is skipped without network calls."""
+    with pytest.raises(requests.exceptions.HTTPError):
+        fetch_json(f"{server}/down", "down")  # 3 attempts open the breaker
+    assert FakeProvider.hits["/down"] == 3
+
+    start = time.perf_counter()
+    with pytest.raises(CircuitOpenError):
+        fetch_json(f"{server}/down", "down")
+    assert time.perf_counter() - start < 0.05
+    assert FakeProvider.hits["/down"] == 3
+
+
+def test_circuit_breaker_half_open_probe() -> None:
+    """Tests that one probe is allowed after the reset timeout and closes the breaker."""
+    breaker = CircuitBreaker("probe", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_hedged_request_cuts_tail_latency(server, monkeypatch) -> None:
+    """Tests that a slow primary is raced against the secondary source."""
+    monkeypatch.setattr(config, "API_URL", f"{server}/slow")
+    monkeypatch.setattr(config, "SECONDARY_PRICE_API_URL", f"{server}/ticker/{{pair}}")
+    monkeypatch.setattr(config, "HEDGE_AFTER_SECONDS", 0.1)
+
+    start = time.perf_counter()
+    price = get_price("BTC", "USD")
+    assert time.perf_counter() - start < 0.4
+    assert price == {"data": {"amount": "101.00", "source": "secondary"}}
+
+
+def test_hedged_prefers_primary_when_fast() -> None:
+    """Tests that the secondary is never called when the primary answers in time."""
+    calls = []
+    result = hedged(lambda: "primary", lambda: calls.append(1) or "secondary", 0.5)
+    assert result == "primary" and calls == []
+
+
+def test_hedged_falls_back_when_primary_fails() -> None:
+    """Tests that a failed primary triggers the secondary immediately."""
+
+    def fail():
+        raise requests.exceptions.ConnectionError("down")
+
+    assert hedged(fail, lambda: "secondary", 5.0) == "secondary"
+    with pytest.raises(requests.exceptions.ConnectionError):
+        hedged(fail, fail, 5.0)
@@ -0,0 +1,125 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src import config, retention
+from src.archive import Archive, TieredStorage
+from src.storage import BACKENDS, open_storage
+
+NOW = datetime(2024, 4, 1)
+
+
+def make_ticks() -> list[dict]:
+    """Builds one tick every 12 hours for two pairs, January to March 2024."""
+    ticks = []
+    moment = datetime(2024, 1, 1)
+    while moment < NOW:
+        for asset, price in (("BTC", 40000.0), ("ETH", 2000.0)):
+            ticks.append(
+                {
+                    "timestamp": moment.isoformat(),
+                    "price_usd": price + moment.day,
+                    "asset": asset,
+                    "quote": "USD",
+                }
+            )
+        moment += timedelta(hours=12)
+    return ticks
+
+
+@pytest.fixture(params=BACKENDS)
+def storage(request: pytest.FixtureRequest, tmp_path):
+    """Fixture that opens each storage backend on a temporary path."""
+    backend = open_storage(request.param, str(tmp_path / f"db.{request.param}"))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    """Fixture that keeps 30 days of raw ticks, archived in small batches."""
+    monkeypatch.setattr(config, "PAIRS", ["BTC-USD", "ETH-USD"])
+    monkeypatch.setattr(config, "RETENTION_RAW", "30d")
+    monkeypatch.setattr(config, "RETENTION_CANDLES", "")
+    monkeypatch.setattr(config, "COMPACTION_BATCH_SIZE", 25)
+
+
+def test_delete_before_only_touches_the_pair(storage) -> None:
+    """Tests that delete_before removes older ticks of one pair and keeps the indexes coherent."""
+    ticks = make_ticks()
+    storage.insert_many(ticks)
+    removed = storage.delete_before("2024-02-01T00:00:00", pair="BTC-USD")
+
+    assert removed == 62
+    assert storage.count() == len(ticks) - 62
+    first = next(storage.iter_range(pair="BTC-USD"))
+    assert first["timestamp"] == "2024-02-01T00:00:00"
+    assert next(storage.iter_range())["timestamp"] == "2024-01-01T00:00:00"
+    storage.insert(ticks[-1])
+    assert storage.last(1, pair="BTC-USD")[0]["timestamp"] == ticks[-1]["timestamp"]
+
+
+def test_compaction_is_transparent_to_queries(storage, policy, tmp_path) -> None:
+    """Tests that archived ticks are still returned, in order, by range and last-N queries."""
+    storage.insert_many(make_ticks())
+    tiered = TieredStorage(storage, Archive(str(tmp_path / "archive")))
+    before = list(tiered.iter_range(pair="ETH-USD"))
+    since, until = "2024-01-20T00:00:00", "2024-03-10T00:00:00"
+    window = list(tiered.iter_range(since, until))
+    latest = tiered.last(5, until=until)
+
+    moved, _ = retention.compact(storage, tiered.archive, now=NOW)
+
+    assert moved == 2 * 122
+    assert storage.count() == 2 * 60
+    months = {s["month"] for s in tiered.archive.segments}
+    assert months == {"2024-01", "2024-02", "2024-03"}
+    assert max(s["count"] for s in tiered.archive.segments) <= 25
+    assert list(tiered.iter_range(pair="ETH-USD")) == before
+    assert list(tiered.iter_range(since, until)) == window
+    assert tiered.last(5, until=until) == latest
+    assert tiered.count() == len(make_ticks())
+    # Reopening the archive reads the same segments from the manifest
+    assert len(Archive(str(tmp_path / "archive"))) == moved
+    assert retention.compact(storage, tiered.archive, now=NOW) == (0, 0)
+
+
+def test_interrupted_compaction_is_not_archived_twice(tmp_path, policy) -> None:
+    """Tests that a batch already written to the archive is only removed on retry."""
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    storage.insert_many(make_ticks())
+    archive = Archive(str(tmp_path / "archive"))
+    first_batch = list(storage.iter_range(pair="BTC-USD"))[:25]
+    archive.write_segment("BTC-USD", first_batch)
+
+    retention.compact(storage, archive, now=NOW, pairs=["BTC-USD"])
+
+    archived = list(archive.iter_range(pair="BTC-USD"))
+    assert len(archived) == len({r["timestamp"] for r in archived}) == 122
+
+
+def test_candle_retention(storage, monkeypatch) -> None:
+    """Tests that candles older than their interval's retention are pruned."""
+    monkeypatch.setattr(config, "RETENTION_RAW", "")
+    monkeypatch.setattr(config, "RETENTION_CANDLES", "1h=7d")
+    candles = [
+        {"bucket": f"2024-03-{day:02d}T00:00:00", "close": float(day)}
+        for day in range(1, 32)
+    ]
+    storage.upsert_candles("1h", candles, pair="BTC-USD")
+    storage.upsert_candles("1d", candles, pair="BTC-USD")
+
+    assert retention.compact(storage, None, now=NOW, pairs=["BTC-USD"]) == (0, 24)
+    remaining = list(storage.iter_candles("1h", pair="BTC-USD"))
+    assert remaining[0]["bucket"] == "2024-03-25T00:00:00"
+    assert len(list(storage.iter_candles("1d", pair="BTC-USD"))) == 31
+
+
+def test_parse_candle_retention() -> None:
+    """Tests parsing and validation of RETENTION_CANDLES."""
+    assert retention.parse_candle_retention("1m=7d, 1h=90d") == {
+        "1m": timedelta(days=7),
+        "1h": timedelta(days=90),
+    }
+    with pytest.raises(ValueError):
+        retention.parse_candle_retention("1m:7d")
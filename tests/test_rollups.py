@@ -0,0 +1,115 @@
+import pytest
+
+from src.rollups import RollupEngine, bucket_start
+from src.storage import BACKENDS, open_storage
+
+
+def make_tick(second: int, price: float) -> dict:
+    """Builds a tick record `second` seconds after 2024-01-01T00:00:00."""
+    return {
+        "timestamp": f"2024-01-01T{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}",
+        "price_usd": price,
+    }
+
+
+TICKS = [make_tick(s, p) for s, p in [(0, 10.0), (20, 15.0), (50, 8.0), (70, 12.0)]]
+
+
+@pytest.fixture(params=BACKENDS)
+def storage(request: pytest.FixtureRequest, tmp_path):
+    """Fixture that opens each storage backend on a temporary path."""
+    backend = open_storage(request.param, str(tmp_path / f"db.{request.param}"))
+    yield backend
+    backend.close()
+
+
+def test_bucket_start_alignment() -> None:
+    """Tests that bucket starts are multiples of the span (in local time)."""
+    assert bucket_start(125.0, 60) % 60 == bucket_start(0.0, 60) % 60
+    assert bucket_start(125.0, 60) <= 125.0 < bucket_start(125.0, 60) + 60
+
+
+def test_incremental_update_builds_ohlc(storage) -> None:
+    """Tests that each tick updates the current candle of every interval."""
+    engine = RollupEngine(storage, ["1m", "1h"])
+    for tick in TICKS:
+        storage.insert(tick)
+        engine.update(tick)
+
+    minute = list(storage.iter_candles("1m"))
+    assert [
+        (c["open"], c["high"], c["low"], c["close"], c["count"]) for c in minute
+    ] == [
+        (10.0, 15.0, 8.0, 8.0, 3),
+        (12.0, 12.0, 12.0, 12.0, 1),
+    ]
+    (hour,) = storage.iter_candles("1h")
+    assert (hour["open"], hour["high"], hour["low"], hour["close"]) == (
+        10.0,
+        15.0,
+        8.0,
+        12.0,
+    )
+    assert hour["count"] == 4
+
+
+def test_rebuild_matches_incremental(storage) -> None:
+    """Tests that a streaming rebuild yields the same candles as live updates."""
+    engine = RollupEngine(storage, ["1m", "1h"])
+    for tick in TICKS:
+        storage.insert(tick)
+        engine.update(tick)
+    incremental = {i: list(storage.iter_candles(i)) for i in ("1m", "1h")}
+
+    assert RollupEngine(storage, ["1m", "1h"]).rebuild() == len(TICKS)
+    assert {i: list(storage.iter_candles(i)) for i in ("1m", "1h")} == incremental
+
+
+def test_update_resumes_persisted_candle(storage) -> None:
+    """Tests that a fresh engine continues the candle already in storage."""
+    RollupEngine(storage, ["1h"]).update(TICKS[0])
+    RollupEngine(storage, ["1h"]).update(TICKS[1])
+    (hour,) = storage.iter_candles("1h")
+    assert hour["count"] == 2
+    assert hour["close"] == 15.0
+
+
+def test_candles_are_kept_per_pair(storage) -> None:
+    """Tests that ticks of different pairs feed separate candles, live and rebuilt."""
+    engine = RollupEngine(storage, ["1h"])
+    for tick in TICKS:
+        eth = {**tick, "asset": "ETH", "quote": "USD", "price_usd": 1.0}
+        storage.insert_many([tick, eth])
+        engine.update(tick)
+        engine.update(eth)
+
+    (eth_hour,) = storage.iter_candles("1h", pair="ETH-USD")
+    assert (eth_hour["high"], eth_hour["count"]) == (1.0, 4)
+    (btc_hour,) = storage.iter_candles("1h")
+    assert (btc_hour["high"], btc_hour["count"]) == (15.0, 4)
+
+    assert RollupEngine(storage, ["1h"]).rebuild() == 2 * len(TICKS)
+    assert list(storage.iter_candles("1h", pair="ETH-USD")) == [eth_hour]
+
+
+def test_batch_update_writes_each_candle_once(storage) -> None:
+    """Tests that a batch yields the live candles with one upsert per pair and interval."""
+    eth = [{**t, "asset": "ETH", "quote": "USD", "price_usd": 1.0} for t in TICKS]
+    storage.insert_many(TICKS + eth)
+    engine = RollupEngine(storage, ["1m", "1h"])
+    calls = []
+    upsert_candles = storage.upsert_candles
+
+    def counted(interval, candles, pair=None):
+        calls.append((pair, interval))
+        return upsert_candles(interval, candles, pair=pair)
+
+    storage.upsert_candles = counted
+    engine.update_many([tick for pair in zip(TICKS, eth) for tick in pair])
+    assert sorted(calls) == sorted(
+        (pair, interval) for pair in ("BTC-USD", "ETH-USD") for interval in ("1m", "1h")
+    )
+    batched = {i: list(storage.iter_candles(i)) for i in ("1m", "1h")}
+
+    assert RollupEngine(storage, ["1m", "1h"]).rebuild() == 2 * len(TICKS)
+    assert {i: list(storage.iter_candles(i)) for i in ("1m", "1h")} == batched
@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.metrics import SCHEDULER_LAG_SECONDS, SCHEDULER_SKIPPED
+from src.scheduler import AsyncScheduler, Job, parse_jobs
+
+
+def run_for(scheduler: AsyncScheduler, seconds: float) -> None:
+    """Runs the scheduler for a fixed time, then stops it and waits for in-flight runs."""
+
+    async def main() -> None:
+        task = asyncio.create_task(scheduler.run())
+        await asyncio.sleep(seconds)
+        scheduler.stop()
+        await task
+
+    asyncio.run(main())
+
+
+def test_next_tick_is_aligned() -> None:
+    """Tests that ticks fall on interval boundaries, not relative to start."""
+    job = Job("test", lambda: None, 0.25)
+    tick = job.next_tick(time.time())
+    assert tick > time.time()
+    assert job.next_tick(tick) == pytest.approx(tick + 0.25)
+    assert job.next_tick(tick - 0.1) == pytest.approx(tick)
+
+
+def test_ticks_do_not_drift() -> None:
+    """Tests that runs start close to boundaries even when each run takes time."""
+    starts = []
+
+    def work() -> None:
+        starts.append(time.time())
+        time.sleep(0.05)
+
+    scheduler = AsyncScheduler()
+    job = scheduler.add_job("drift", work, 0.2)
+    run_for(scheduler, 1.1)
+
+    assert len(starts) >= 4
+    for start in starts:
+        offset = start - (job.next_tick(start) - 0.2)
+        assert offset < 0.05
+    assert SCHEDULER_LAG_SECONDS.labels(job="drift").count == len(starts)
+
+
+def test_overlapping_ticks_are_skipped() -> None:
+    """Tests that a slow job never runs concurrently with itself."""
+    active, overlaps, runs = [0], [], []
+    lock = threading.Lock()
+
+    def slow() -> None:
+        with lock:
+            active[0] += 1
+            overlaps.append(active[0] > 1)
+        time.sleep(0.45)
+        with lock:
+            active[0] -= 1
+        runs.append(1)
+
+    scheduler = AsyncScheduler()
+    scheduler.add_job("slow", slow, 0.1)
+    run_for(scheduler, 1.0)
+
+    assert not any(overlaps)
+    assert 1 <= len(runs) <= 3
+    assert SCHEDULER_SKIPPED.labels(job="slow").value >= 4
+
+
+def test_jobs_run_at_their_own_cadence() -> None:
+    """Tests that several jobs with different intervals share one event loop."""
+    counts = {"fast": 0, "slow": 0}
+    scheduler = AsyncScheduler()
+    scheduler.add_job(
+        "fast", lambda: counts.__setitem__("fast", counts["fast"] + 1), 0.1
+    )
+    scheduler.add_job(
+        "slow", lambda: counts.__setitem__("slow", counts["slow"] + 1), 0.5
+    )
+    run_for(scheduler, 1.05)
+    assert counts["fast"] >= 3 * counts["slow"] >= 3
+
+
+def test_parse_jobs() -> None:
+    """Tests parsing of the SCHEDULE_JOBS specification."""
+    assert parse_jobs("btc-usd@10s; ETH-USD,BTC-EUR@5m;*@1h") == [
+        (["BTC-USD"], 10.0),
+        (["ETH-USD", "BTC-EUR"], 300.0),
+        (None, 3600.0),
+    ]
+    assert parse_jobs("") == []
+    with pytest.raises(ValueError):
+        parse_jobs("BTC-USD")
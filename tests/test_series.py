@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src import cli
+from src.series import PriceSeries
+from src.storage import open_storage, set_storage
+
+
+@pytest.fixture
+def series() -> PriceSeries:
+    """Fixture with five records spaced one minute apart."""
+    records = [
+        {
+            "timestamp": f"2024-01-01T00:0{m}:00",
+            "price_usd": price,
+            "price_real": price * 5.0,
+        }
+        for m, price in enumerate([100.0, 110.0, 99.0, 120.0, 130.0])
+    ]
+    return PriceSeries.from_records(records)
+
+
+def test_from_records_builds_contiguous_arrays(series: PriceSeries) -> None:
+    """Tests that records are loaded into typed NumPy columns."""
+    assert len(series) == 5
+    assert series.timestamps.dtype == np.int64
+    assert series.price_usd.dtype == np.float64
+    assert series.nbytes == 5 * 24
+    assert series.price_real[0] == 500.0
+
+
+def test_summary_matches_stats_contract(series: PriceSeries) -> None:
+    """Tests that summary returns the same keys and values as get_statistics."""
+    summary = series.summary()
+    assert summary["records_count"] == 5
+    assert summary["avg_price"] == pytest.approx(111.8)
+    assert summary["min_price"] == 99.0
+    assert summary["max_price"] == 130.0
+    assert summary["variation"] == pytest.approx(30.0)
+
+
+def test_returns_and_rolling_mean(series: PriceSeries) -> None:
+    """Tests simple returns and the cumulative-sum rolling mean."""
+    np.testing.assert_allclose(series.returns()[:2], [0.1, 99.0 / 110.0 - 1])
+    np.testing.assert_allclose(series.rolling_mean(2), [105.0, 104.5, 109.5, 125.0])
+    assert len(series.rolling_mean(10)) == 0
+
+
+def test_weighted_average_is_time_weighted() -> None:
+    """Tests that the default weights are the time each price was in effect."""
+    series = PriceSeries(
+        np.array([0, 1_000_000, 4_000_000]),
+        np.array([100.0, 200.0, 999.0]),
+        np.zeros(3),
+    )
+    # 100 for 1s, 200 for 3s; the last price has no duration yet
+    assert series.weighted_average() == pytest.approx(175.0)
+
+
+def test_slice_and_percentiles(series: PriceSeries) -> None:
+    """Tests time slicing via searchsorted and percentile bands."""
+    part = series.slice(
+        since=datetime(2024, 1, 1, 0, 1), until=datetime(2024, 1, 1, 0, 3)
+    )
+    assert list(part.price_usd) == [110.0, 99.0]
+    assert series.percentile_bands((50,)) == {50: 110.0}
+    assert np.isnan(PriceSeries.from_records([]).volatility())
+
+
+@pytest.mark.parametrize("backend", ["binary", "sqlite"])
+def test_get_series_over_storage(tmp_path, backend) -> None:
+    """Tests that get_series gives the same series from mmap columns and from records."""
+    storage = open_storage(backend, str(tmp_path / f"db.{backend}"))
+    storage.insert_many(
+        {
+            "asset": "BTC",
+            "quote": "USD",
+            "price_usd": 100.0 + m,
+            "price_real": 500.0 + m,
+            "timestamp": f"2024-01-01T00:{m:02d}:00.250000",
+        }
+        for m in range(30)
+    )
+    set_storage(storage)
+    try:
+        series = cli.get_series(since=datetime(2024, 1, 1, 0, 10), pair="BTC-USD")
+        latest = cli.get_series(limit=5, pair="BTC-USD")
+    finally:
+        set_storage(None)
+        storage.close()
+
+    assert len(series) == 20 and series.price_usd[0] == 110.0
+    assert series.timestamps[0] == int(
+        datetime(2024, 1, 1, 0, 10, 0, 250000).timestamp() * 1e6
+    )
+    assert list(latest.price_real) == [525.0, 526.0, 527.0, 528.0, 529.0]
+    assert latest.summary()["records_count"] == 5
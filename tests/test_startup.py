@@ -0,0 +1,21 @@
+from benchmarks.bench_startup import HEAVY_MODULES, measure, parse_importtime
+
+
+def test_parse_importtime() -> None:
+    """Tests parsing of the -X importtime report."""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+        "Traceback: unrelated line\n"
+    )
+    assert parse_importtime(stderr) == {"json.decoder": (120, 120), "json": (300, 420)}
+
+
+def test_help_is_light_and_side_effect_free(tmp_path) -> None:
+    """Tests that --help skips heavy imports and creates no files."""
+    for command in (["--help"], ["history", "--help"], ["export", "--help"]):
+        _, modules = measure(command, cwd=str(tmp_path))
+        assert "src.cli" in modules
+        assert [name for name in HEAVY_MODULES if name in modules] == []
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,221 @@
+import json
+import sqlite3
+
+import pytest
+
+from src import config
+from src.storage import BACKENDS, TimeIndex, open_storage
+
+
+def make_record(minute: int, price: float = 50000.0) -> dict:
+    """Builds a price record with a timestamp offset by the given minute."""
+    return {
+        "price_usd": price,
+        "price_real": price * 5.5,
+        "timestamp": f"2024-01-01T{minute // 60:02d}:{minute % 60:02d}:00",
+    }
+
+
+@pytest.fixture(params=BACKENDS)
+def storage(request: pytest.FixtureRequest, tmp_path):
+    """Fixture that opens each storage backend on a temporary path."""
+    backend = open_storage(request.param, str(tmp_path / f"db.{request.param}"))
+    yield backend
+    backend.close()
+
+
+def test_insert_and_count(storage) -> None:
+    """Tests that inserted records are counted by every backend."""
+    storage.insert(make_record(0))
+    assert storage.insert_many([make_record(1), make_record(2)]) == 2
+    assert storage.count() == 3
+
+
+def test_iter_range_is_ordered_and_half_open(storage) -> None:
+    """Tests that range queries are sorted and exclude the upper bound."""
+    storage.insert_many([make_record(m) for m in (5, 1, 3, 2, 4)])
+    records = list(
+        storage.iter_range(since="2024-01-01T00:02:00", until="2024-01-01T00:05:00")
+    )
+    assert [r["timestamp"][-5:] for r in records] == ["02:00", "03:00", "04:00"]
+
+
+def test_last_returns_most_recent_first(storage) -> None:
+    """Tests that last(n) returns the newest records in descending order."""
+    storage.insert_many([make_record(m, price=float(m)) for m in range(10)])
+    assert [r["price_usd"] for r in storage.last(3)] == [9.0, 8.0, 7.0]
+    assert storage.last(0) == []
+
+
+def test_open_storage_rejects_unknown_backend(tmp_path) -> None:
+    """Tests that an unknown backend name raises a ValueError."""
+    with pytest.raises(ValueError):
+        open_storage("csv", str(tmp_path / "db.csv"))
+
+
+def test_last_with_range(storage) -> None:
+    """Tests that last(n) honours since/until bounds."""
+    storage.insert_many([make_record(m, price=float(m)) for m in range(10)])
+    records = storage.last(2, since="2024-01-01T00:03:00", until="2024-01-01T00:06:00")
+    assert [r["price_usd"] for r in records] == [5.0, 4.0]
+
+
+def test_out_of_order_inserts_are_indexed(storage) -> None:
+    """Tests that late records are placed in timestamp order."""
+    storage.insert(make_record(5))
+    storage.insert(make_record(1))
+    storage.insert(make_record(3))
+    assert [r["timestamp"][-5:] for r in storage.iter_range()] == [
+        "01:00",
+        "03:00",
+        "05:00",
+    ]
+
+
+def test_jsonl_index_survives_reopen(tmp_path) -> None:
+    """Tests that the JSON-lines sidecar index is reused and completed on reopen."""
+    path = str(tmp_path / "prices.jsonl")
+    storage = open_storage("jsonl", path)
+    storage.insert_many([make_record(m) for m in range(3)])
+    storage.close()
+
+    # Simulates a line written without an index entry
+    with open(path, "a") as f:
+        f.write(json.dumps(make_record(3)) + "\n")
+
+    reopened = open_storage("jsonl", path)
+    assert reopened.count() == 4
+    assert reopened.last(1)[0]["timestamp"].endswith("00:03:00")
+    reopened.close()
+    assert open_storage("jsonl", path).count() == 4
+
+
+def test_time_index_bounds() -> None:
+    """Tests bisect-based range and top-N lookups on the TimeIndex."""
+    index = TimeIndex()
+    for epoch in (10.0, 20.0, 30.0, 40.0):
+        index.add(epoch, int(epoch))
+    assert index.range(20.0, 40.0) == [20, 30]
+    assert index.last(2) == [40, 30]
+    assert index.last(5, until=25.0) == [20, 10]
+
+
+def test_candles_upsert_range_and_clear(storage) -> None:
+    """Tests candle upserts, range reads and partial clears on every backend."""
+    candles = [
+        {"bucket": f"2024-01-01T0{h}:00:00", "open": 1.0, "close": float(h)}
+        for h in range(4)
+    ]
+    storage.upsert_candles("1h", candles)
+    storage.upsert_candles("1h", [{**candles[1], "close": 99.0}])
+
+    result = list(storage.iter_candles("1h", since="2024-01-01T01:00:00"))
+    assert [c["close"] for c in result] == [99.0, 2.0, 3.0]
+    assert list(storage.iter_candles("5m")) == []
+
+    storage.clear_candles("1h", since="2024-01-01T02:00:00")
+    assert [c["bucket"][11:13] for c in storage.iter_candles("1h")] == ["00", "01"]
+
+
+def test_queries_by_pair(storage) -> None:
+    """Tests that pair-filtered queries use the per-pair index, including after reopen."""
+    storage.insert_many(
+        [
+            {**make_record(m, price=float(m)), "asset": asset, "quote": "USD"}
+            for m in range(6)
+            for asset in ("BTC", "ETH")
+        ]
+    )
+    eth = list(storage.iter_range(since="2024-01-01T00:02:00", pair="ETH-USD"))
+    assert [r["price_usd"] for r in eth] == [2.0, 3.0, 4.0, 5.0]
+    assert all(r["asset"] == "ETH" for r in eth)
+    assert [r["asset"] for r in storage.last(1, pair="BTC-USD")] == ["BTC"]
+    assert len(storage.last(20)) == 12
+    assert storage.last(5, pair="SOL-USD") == []
+
+    storage.upsert_candles("1h", [{"bucket": "2024-01-01T00:00:00"}], pair="ETH-USD")
+    assert list(storage.iter_candles("1h", pair="BTC-USD")) == []
+    assert len(list(storage.iter_candles("1h", pair="ETH-USD"))) == 1
+
+
+def test_legacy_records_belong_to_default_pair(storage) -> None:
+    """Tests that records without asset/quote are attributed to BTC in CURRENCY."""
+    storage.insert(make_record(0))
+    assert len(storage.last(1, pair=f"BTC-{config.CURRENCY}")) == 1
+    assert storage.last(1, pair="ETH-USD") == []
+
+
+def test_sqlite_migrates_legacy_schema(tmp_path) -> None:
+    """Tests that a database created without the pair column is migrated on open."""
+    path = str(tmp_path / "legacy.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE ticks (id INTEGER PRIMARY KEY AUTOINCREMENT, "
+        "timestamp TEXT NOT NULL, data TEXT NOT NULL)"
+    )
+    record = make_record(0)
+    conn.execute(
+        "INSERT INTO ticks (timestamp, data) VALUES (?, ?)",
+        (record["timestamp"], json.dumps(record)),
+    )
+    conn.commit()
+    conn.close()
+
+    storage = open_storage("sqlite", path)
+    assert storage.last(1, pair=f"BTC-{config.CURRENCY}") == [record]
+    storage.close()
+
+
+def test_binary_records_are_fixed_width_and_exact(tmp_path) -> None:
+    """Tests the binary backend's file size, exact round trip and zero-copy columns."""
+    path = str(tmp_path / "ticks")
+    storage = open_storage("binary", path)
+    record = {
+        "asset": "ETH",
+        "quote": "EUR",
+        "price": 2000.5,
+        "price_usd": 2174.45,
+        "price_real": 11959.48,
+        "timestamp": "2024-01-01T12:00:00.123457",
+        "sources": {"coinbase": 2000.5},
+    }
+    storage.insert_many([record, make_record(0), make_record(1)])
+
+    assert storage.last(1, pair="ETH-EUR") == [
+        {k: v for k, v in record.items() if k != "sources"}
+    ]
+    ticks = tmp_path / "ticks" / f"BTC-{config.CURRENCY}.ticks"
+    assert ticks.stat().st_size == 16 + 2 * 32
+
+    rows = storage.columns(f"BTC-{config.CURRENCY}", since="2024-01-01T00:01:00")
+    assert len(rows) == 1 and not rows.flags.owndata
+    assert rows["price_real"][0] == 50000.0 * 5.5
+    assert (
+        open_storage("sqlite", str(tmp_path / "db.sqlite")).columns("BTC-USD") is None
+    )
+    storage.close()
+
+
+def test_binary_reopen_discards_partial_record(tmp_path) -> None:
+    """Tests that a record cut short by a crash is dropped and appends keep working."""
+    path = str(tmp_path / "ticks")
+    storage = open_storage("binary", path)
+    storage.insert_many([make_record(m) for m in range(3)])
+    storage.close()
+    ticks = next((tmp_path / "ticks").glob("*.ticks"))
+    with open(ticks, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    reopened = open_storage("binary", path)
+    reopened.insert(make_record(3))
+    assert [r["timestamp"][-5:] for r in reopened.iter_range()] == [
+        "00:00",
+        "01:00",
+        "02:00",
+        "03:00",
+    ]
+    reopened.close()
+
+    ticks.write_bytes(b"not a tick file!")
+    with pytest.raises(ValueError):
+        open_storage("binary", path)
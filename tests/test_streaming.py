@@ -0,0 +1,121 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src import alerts, config, pipeline
+from src.storage import open_storage, set_storage
+from src.streaming import TickCoalescer, TickerStream, parse_ticker, save_buckets
+
+pytest.importorskip("websockets")
+
+from benchmarks.fake_feed import FakeTickerFeed, recorded_ticks  # noqa: E402
+
+PAIRS = ["BTC-USD", "ETH-USD"]
+
+
+def coalesce(messages: list[dict], interval: float) -> list[dict]:
+    """Reference coalescing of recorded ticks, without the network in between."""
+    coalescer = TickCoalescer(interval)
+    closed = [coalescer.add(*parse_ticker(m)) for m in messages]
+    return [b for b in closed if b] + coalescer.drain()
+
+
+async def consume(stream: TickerStream, feed: FakeTickerFeed) -> None:
+    """Runs the stream until the feed has replayed every message."""
+    task = asyncio.create_task(stream.run())
+    await asyncio.wait_for(feed.done.wait(), timeout=20)
+    await asyncio.sleep(0.1)
+    stream.stop()
+    await task
+
+
+def test_coalescer_buckets() -> None:
+    """Tests last/high/low/count per interval and that late ticks are dropped."""
+    coalescer = TickCoalescer(10)
+    start = datetime(2024, 1, 1).timestamp()
+    assert coalescer.add("BTC-USD", start + 1, 100.0) is None
+    assert coalescer.add("BTC-USD", start + 4, 105.0) is None
+    assert coalescer.add("BTC-USD", start + 9, 102.0) is None
+    closed = coalescer.add("BTC-USD", start + 12, 101.0)
+    assert closed["start"] == start
+    assert (closed["last"], closed["high"], closed["low"]) == (102.0, 105.0, 100.0)
+    assert closed["count"] == 3
+    assert coalescer.add("BTC-USD", start + 8, 99.0) is None
+    assert [b["count"] for b in coalescer.drain()] == [1]
+
+
+def test_stream_survives_disconnects() -> None:
+    """Tests that a replay with dropped connections yields the same buckets as the ticks."""
+    ticks = recorded_ticks(PAIRS, 300, step=0.5)
+    delivered = []
+
+    async def scenario() -> None:
+        async with FakeTickerFeed(ticks, speed=500, drop_every=70) as feed:
+            stream = TickerStream(
+                feed.url,
+                PAIRS,
+                10,
+                deliver=delivered.extend,
+                reconnect_max=0.05,
+                flush_every=0.05,
+            )
+            await consume(stream, feed)
+            assert feed.connections >= 5
+
+    asyncio.run(scenario())
+    expected = coalesce(ticks, 10)
+    key = lambda b: (b["pair"], b["start"])  # noqa: E731
+    assert sorted(delivered, key=key) == sorted(expected, key=key)
+    assert sum(b["count"] for b in delivered) == len(ticks)
+
+
+def test_stale_pairs_fall_back_to_rest() -> None:
+    """Tests that a pair without ticks is polled through REST while the others stream."""
+    ticks = recorded_ticks(["BTC-USD"], 100, step=1.0)
+    polled = []
+
+    async def scenario() -> None:
+        async with FakeTickerFeed(ticks, speed=100) as feed:
+            stream = TickerStream(
+                feed.url,
+                PAIRS,
+                0.05,
+                deliver=lambda buckets: None,
+                poll=polled.append,
+                stale_after=0.2,
+                poll_interval=0.3,
+            )
+            await consume(stream, feed)
+
+    asyncio.run(scenario())
+    assert polled and all(pairs == ["ETH-USD"] for pairs in polled)
+
+
+def test_save_buckets(tmp_path, monkeypatch) -> None:
+    """Tests that buckets become pipeline records converted to USD and BRL."""
+    monkeypatch.setattr(
+        pipeline, "get_exchange_rates", lambda: {"BRL": 5.0, "EUR": 0.8}
+    )
+    monkeypatch.setattr(config, "ALERT_RULES", "")
+    monkeypatch.setattr(config, "ALERT_RULES_FILE", "")
+    storage = open_storage("sqlite", str(tmp_path / "prices.db"))
+    set_storage(storage)
+    alerts.reset()
+    start = datetime(2024, 1, 1).timestamp()
+    coalescer = TickCoalescer(10)
+    coalescer.add("BTC-EUR", start + 1, 40000.0)
+    coalescer.add("BTC-EUR", start + 3, 40800.0)
+    try:
+        assert save_buckets(coalescer.drain()) == 1
+        pipeline.close_writer()
+        [record] = list(storage.iter_range(pair="BTC-EUR"))
+    finally:
+        alerts.reset()
+        set_storage(None)
+        storage.close()
+
+    assert record["price"] == 40800.0
+    assert record["price_usd"] == pytest.approx(51000.0)
+    assert record["price_real"] == pytest.approx(255000.0)
+    assert record["timestamp"] == "2024-01-01T00:00:03"
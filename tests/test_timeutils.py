@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.timeutils import parse_duration, parse_time
+
+
+def test_parse_duration_units() -> None:
+    """Tests that short durations are converted to timedeltas."""
+    assert parse_duration("15m") == timedelta(minutes=15)
+    assert parse_duration("24h") == timedelta(hours=24)
+    assert parse_duration("7d") == timedelta(days=7)
+
+
+def test_parse_duration_invalid() -> None:
+    """Tests that an unknown duration format raises a ValueError."""
+    with pytest.raises(ValueError):
+        parse_duration("7 days")
+
+
+def test_parse_time_iso_and_relative() -> None:
+    """Tests that ISO dates and relative durations are both accepted."""
+    now = datetime(2024, 1, 2, 12, 0)
+    assert parse_time("2024-01-01T10:00") == datetime(2024, 1, 1, 10, 0)
+    assert parse_time("24h", now=now) == datetime(2024, 1, 1, 12, 0)
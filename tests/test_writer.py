@@ -0,0 +1,137 @@
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from src import aggregates, config, dedupe, rollups
+from src.metrics import WRITE_FLUSH_SECONDS, WRITE_QUEUE_DEPTH
+from src.pipeline import commit_records
+from src.storage import get_storage, open_storage, set_storage
+from src.writer import BufferedWriter
+
+
+def make_records(n: int, start: int = 0) -> list[dict]:
+    """Builds n price records one minute apart."""
+    return [
+        {"timestamp": f"2024-01-01T00:{m:02d}:00", "price_usd": float(m)}
+        for m in range(start, start + n)
+    ]
+
+
+def test_flushes_when_batch_is_full() -> None:
+    """Tests that reaching max_records commits one batch synchronously."""
+    batches = []
+    writer = BufferedWriter(batches.append, max_records=3, max_delay=60)
+    writer.add(make_records(2))
+    assert batches == [] and len(writer) == 2
+    assert WRITE_QUEUE_DEPTH.labels().value == 2
+    writer.add(make_records(1, start=2))
+    assert [len(b) for b in batches] == [3]
+    assert WRITE_QUEUE_DEPTH.labels().value == 0
+    writer.close()
+
+
+def test_flushes_after_max_delay() -> None:
+    """Tests that a partial batch is committed once the oldest record is too old."""
+    batches = []
+    flushes = WRITE_FLUSH_SECONDS.labels().count
+    writer = BufferedWriter(batches.append, max_records=100, max_delay=0.1)
+    writer.add(make_records(2))
+    time.sleep(0.3)
+    assert [len(b) for b in batches] == [2]
+    assert WRITE_FLUSH_SECONDS.labels().count == flushes + 1
+    writer.close()
+
+
+def test_close_flushes_pending_records() -> None:
+    """Tests that close() commits whatever is still buffered."""
+    batches = []
+    writer = BufferedWriter(batches.append, max_records=100, max_delay=60)
+    writer.add(make_records(5))
+    writer.close()
+    assert [len(b) for b in batches] == [5]
+
+
+def test_failed_commit_keeps_records() -> None:
+    """Tests that a failed batch is retried, in order, on the next flush."""
+    batches, fail = [], [True]
+
+    def commit(batch: list[dict]) -> None:
+        if fail[0]:
+            fail[0] = False
+            raise OSError("disk full")
+        batches.append(batch)
+
+    writer = BufferedWriter(commit, max_records=100, max_delay=60)
+    writer.add(make_records(2))
+    assert writer.flush() == 0 and len(writer) == 2
+    writer.add(make_records(1, start=2))
+    assert writer.flush() == 3
+    assert [r["price_usd"] for r in batches[0]] == [0.0, 1.0, 2.0]
+    writer.close()
+
+
+def test_sigterm_flushes_to_storage(tmp_path) -> None:
+    """Tests that buffered records reach storage when the process gets SIGTERM."""
+    path = tmp_path / "prices.jsonl"
+    script = textwrap.dedent(f"""
+        import os, signal, time
+        from src.storage import open_storage
+        from src.writer import BufferedWriter, install_shutdown_hooks
+
+        storage = open_storage("jsonl", {str(path)!r})
+        writer = BufferedWriter(storage.insert_many, max_records=1000, max_delay=60)
+        install_shutdown_hooks(writer)
+        writer.add([{{"timestamp": "2024-01-01T00:0%d:00" % m, "price_usd": 1.0}}
+                    for m in range(5)])
+        os.kill(os.getpid(), signal.SIGTERM)
+        time.sleep(5)
+        """)
+    result = subprocess.run([sys.executable, "-c", script], timeout=30)
+    assert result.returncode != 0
+    storage = open_storage("jsonl", str(path))
+    assert storage.count() == 5
+    storage.close()
+
+
+def test_group_commit_bounds_tinydb_writes(tmp_path, monkeypatch) -> None:
+    """Tests that a batch costs a few TinyDB file rewrites, not several per record."""
+    pytest.importorskip("tinydb")
+    monkeypatch.setattr(config, "DB_BACKEND", "tinydb")
+    monkeypatch.setattr(config, "DB_PATH", str(tmp_path / "db.json"))
+    monkeypatch.setattr(config, "ARCHIVE_DIR", "")
+    monkeypatch.setattr(config, "STATS_SNAPSHOT_PATH", "")
+    monkeypatch.setattr(config, "ROLLUP_INTERVALS", ["1m", "5m", "1h", "1d"])
+    monkeypatch.setattr(aggregates, "_engines", {})
+    monkeypatch.setattr(rollups, "_engine", None)
+    dedupe.reset()
+    set_storage(None)
+    try:
+        db = get_storage().db
+        writes = []
+        write = db.storage.write
+
+        def counted(data) -> None:
+            writes.append(len(data))
+            write(data)
+
+        monkeypatch.setattr(db.storage, "write", counted)
+        assert commit_records(make_records(60)) == 60
+        # One insert, then one write of new candles per interval
+        assert len(writes) == 1 + 4
+
+        writes.clear()
+        later = [
+            {**record, "timestamp": record["timestamp"].replace("T00", "T01")}
+            for record in make_records(60)
+        ]
+        assert commit_records(later) == 60
+        # At most one update and one insert of candles per interval
+        assert len(writes) <= 1 + 2 * 4
+        (day,) = get_storage().iter_candles("1d")
+        assert day["count"] == 120
+    finally:
+        set_storage(None)
+        dedupe.reset()